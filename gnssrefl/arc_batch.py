@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Compact representation of the arcs of a day.
+
+extract_arcs used to return a list of (metadata, data) tuples: per arc a
+dict of 17 values and a dict of five small numpy arrays (ele, azi, snr,
+seconds, edot). A day of a multi-GNSS station has thousands of arcs. An
+ArcBatch keeps the same information in a few arrays:
+
+    ele, azi, snr, seconds, edot   the samples of all arcs, one after the other
+    offsets                        arc i is samples offsets[i]:offsets[i+1]
+    meta                           structured array, one row per arc (META_DTYPE)
+
+so the arcs of a day can be selected, sorted, pickled to a worker process or
+handed to a batched periodogram without a Python object per arc.
+
+It is also a sequence of (metadata, data) tuples, for the code that loops over
+the arcs: batch[i] and iteration give the metadata dict and a dict of views
+into the sample arrays. The metadata dict of an arc is made the first time it
+is needed and then kept, so keys added to it (attach_track_id,
+attach_gnssir_processing_results, ...) stay with the arc; the meta columns are
+the values extract_arcs computed.
+"""
+import numpy as np
+
+# per arc metadata, in the order of extract_arcs._compute_arc_metadata
+META_DTYPE = np.dtype([
+    ('sat', np.int64), ('freq', np.int64), ('arc_num', np.int64), ('arc_type', 'U7'),
+    ('ele_start', np.float64), ('ele_end', np.float64),
+    ('az_min_ele', np.float64), ('az_avg', np.float64),
+    ('time_start', np.float64), ('time_end', np.float64), ('arc_timestamp', np.float64),
+    ('num_pts', np.int64), ('delT', np.float64), ('edot_factor', np.float64), ('cf', np.float64),
+    ('e1', np.float64), ('e2', np.float64),
+])
+META_KEYS = META_DTYPE.names
+DATA_KEYS = ('ele', 'azi', 'snr', 'seconds', 'edot')
+
+
+class ArcBatch:
+    """
+    Arcs of a day: concatenated samples, offsets and a metadata table.
+
+    Parameters
+    ----------
+    meta : numpy structured array
+        one row per arc, META_DTYPE
+    offsets : numpy array of int
+        len(meta) + 1 sample offsets, starting with 0
+    data : dict
+        DATA_KEYS : the concatenated samples of the arcs (float arrays of length offsets[-1])
+    """
+
+    def __init__(self, meta, offsets, data):
+        self.meta = meta
+        self.offsets = offsets
+        self.data = data
+        self._arcs = [None]*len(meta)
+
+    @classmethod
+    def from_arcs(cls, arcs):
+        """
+        ArcBatch of a list of (metadata, data) tuples.
+
+        Parameters
+        ----------
+        arcs : list of (dict, dict)
+            metadata with (at least) the META_KEYS, data with the DATA_KEYS arrays
+
+        Returns
+        -------
+        ArcBatch
+            the metadata dicts are the ones of arcs
+        """
+        batch = cls.from_rows([tuple(m[k] for k in META_KEYS) for m, d in arcs],
+                              {k: [d[k] for m, d in arcs] for k in DATA_KEYS})
+        batch._arcs = [m for m, d in arcs]
+        return batch
+
+    @classmethod
+    def from_rows(cls, rows, samples):
+        """
+        ArcBatch of metadata rows and the sample arrays of each arc.
+
+        Parameters
+        ----------
+        rows : list of tuple
+            metadata of each arc, the META_KEYS values
+        samples : dict
+            DATA_KEYS : list of the arrays of each arc
+
+        Returns
+        -------
+        ArcBatch
+        """
+        meta = np.array(rows, dtype=META_DTYPE)
+        lengths = [len(a) for a in samples['ele']]
+        offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+        data = {k: np.concatenate(samples[k]).astype(float, copy=False) if rows else np.empty(0)
+                for k in DATA_KEYS}
+        return cls(meta, offsets, data)
+
+    def __len__(self):
+        return len(self.meta)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('arc index out of range')
+        return self.metadata(i), self.arc_data(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return 'ArcBatch({0:d} arcs, {1:d} samples)'.format(len(self), int(self.offsets[-1]))
+
+    def metadata(self, i):
+        """metadata dict of arc i, the same dict every time"""
+        if self._arcs[i] is None:
+            self._arcs[i] = dict(zip(META_KEYS, self.meta[i].item()))
+        return self._arcs[i]
+
+    def arc_data(self, i):
+        """dict of views of the samples of arc i"""
+        s = slice(self.offsets[i], self.offsets[i + 1])
+        return {k: self.data[k][s] for k in DATA_KEYS}
+
+    def take(self, index):
+        """
+        ArcBatch of some of the arcs.
+
+        Parameters
+        ----------
+        index : array of int or bool
+            arc numbers, in the order wanted (repeats allowed), or a mask
+
+        Returns
+        -------
+        ArcBatch
+            with copies of the samples. Metadata dicts that were made already
+            are copied too, with the keys that were added to them.
+        """
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        index = index.astype(np.int64, copy=False)
+        lengths = self.offsets[index + 1] - self.offsets[index]
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        # sample numbers of the arcs, one after the other
+        samples = np.repeat(self.offsets[index] - offsets[:-1], lengths) + np.arange(offsets[-1])
+        batch = ArcBatch(self.meta[index], offsets, {k: self.data[k][samples] for k in DATA_KEYS})
+        batch._arcs = [None if self._arcs[i] is None else dict(self._arcs[i]) for i in index]
+        return batch
+
+    def __getstate__(self):
+        # the metadata dicts only for the keys that were added to them
+        extra = {i: {k: v for k, v in m.items() if k not in META_DTYPE.fields}
+                 for i, m in enumerate(self._arcs) if m is not None and len(m) > len(META_KEYS)}
+        return {'meta': self.meta, 'offsets': self.offsets, 'data': self.data, 'extra': extra}
+
+    def __setstate__(self, state):
+        self.__init__(state['meta'], state['offsets'], state['data'])
+        for i, keys in state['extra'].items():
+            self.metadata(i).update(keys)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Periodogram peaks of all the arcs of a day, for gnssir -reqc.
+
+The quality control of gnssir (pre_check_arc and check_arc_quality in
+utils.py) is applied after the periodograms are computed: PkNoise, reqAmp,
+ediff and delTmax only decide which arcs go to the result file and which to
+failQC. retrieve_rh returns one row per arc of the day (the arcs that failed
+and the ones that passed), and gnssir -savepeaks T (or -reqc T) keeps them
+next to the result files::
+
+    {REFL_CODE}/{yyyy}/results/{ssss}/{extension}/peaks/ddd.npz
+
+Each row is the row the arc has in the result file when it passes (17
+columns, 22 with mmdd), followed by EXTRA_COLUMNS: the rising/setting flag of
+the arc, the periodogram noise, the elevation angles of the arc and of the
+analysis, and whether the periodogram was computed. Arcs that failed the
+ediff or delTmax check before their periodogram was computed have NaN peaks.
+
+gnssir -reqc T applies the QC settings of the run to these rows and writes the
+result and failQC files again, the same files gnssir writes, without reading
+the SNR files. The peaks are only used when every other setting is the one
+they were computed with (peaks_key). A day is analyzed from its SNR files when
+its peaks cannot be used, e.g. when a larger ediff or delTmax lets through an
+arc whose periodogram was never computed.
+"""
+import os
+from collections import defaultdict
+
+import numpy as np
+
+from gnssrefl import manifest
+from gnssrefl.utils import FileManagement, pre_check_arc, check_arc_quality, format_qc_summary
+
+# the QC settings -reqc can change
+REQC_KEYS = ('PkNoise', 'reqAmp', 'ediff', 'delTmax')
+# columns after those of the result rows
+EXTRA_COLUMNS = ['riseset', 'noise', 'ele_start', 'ele_end', 'e1', 'e2', 'lsp']
+RISESET, NOISE, ELE_START, ELE_END, E1, E2, LSP = range(-len(EXTRA_COLUMNS), 0)
+
+
+def peaks_name(station, year, doy, extension=''):
+    """
+    Name of the peaks file of a day.
+
+    Parameters
+    ----------
+    station : str
+        4 character station name
+    year : int
+        full year
+    doy : int
+        day of year
+    extension : str
+        analysis extension, '' for none
+
+    Returns
+    -------
+    pathlib.Path
+        peaks filename
+    """
+    return FileManagement(station, 'gnssir_peaks', year, doy, extension=extension).get_file_path(ensure_directory=False)
+
+
+def peaks_key(station_config, snr_type):
+    """
+    Key of the settings the peaks depend on: all but REQC_KEYS (and the
+    manifest.RUNTIME_KEYS).
+
+    Parameters
+    ----------
+    station_config : dict
+        station analysis parameters, with the command line overrides
+    snr_type : int
+        SNR file type
+
+    Returns
+    -------
+    str
+        settings key, see manifest.settings_key
+    """
+    config = {k: v for k, v in station_config.items() if k not in REQC_KEYS}
+    return manifest.settings_key(config, snr_type=snr_type)
+
+
+def peak_row(row, meta, noise, lsp):
+    """
+    Row of an arc in the peaks file.
+
+    Parameters
+    ----------
+    row : list
+        result row of the arc: as in the result file when it has a periodogram,
+        as in the failQC file when it failed before
+    meta : dict
+        arc metadata from extract_arcs
+    noise : float
+        periodogram noise, NaN without a periodogram
+    lsp : bool
+        whether the periodogram was computed
+
+    Returns
+    -------
+    list
+    """
+    riseset = 1 if meta['arc_type'] == 'rising' else -1
+    return list(row) + [riseset, noise, meta['ele_start'], meta['ele_end'], meta['e1'], meta['e2'], int(lsp)]
+
+
+def write_peaks(fname, rows, key, ncols):
+    """
+    Writes the peaks of a day.
+
+    Parameters
+    ----------
+    fname : str or Path
+        peaks filename
+    rows : list
+        peak_row of each arc, in the order they were analyzed
+    key : str
+        peaks_key of the settings
+    ncols : int
+        number of columns of the result rows
+    """
+    peaks = np.asarray(rows, dtype=float) if rows else np.empty((0, ncols + len(EXTRA_COLUMNS)))
+    os.makedirs(os.path.dirname(str(fname)), exist_ok=True)
+    # savez adds .npz to names that do not end with it
+    with open(fname, 'wb') as f:
+        np.savez(f, peaks=peaks, key=np.array(key))
+
+
+def read_peaks(fname, key):
+    """
+    Peaks of a day, when they were computed with these settings.
+
+    Parameters
+    ----------
+    fname : str or Path
+        peaks filename
+    key : str
+        peaks_key of the settings
+
+    Returns
+    -------
+    numpy array or None
+        peak rows, None when the file does not exist, cannot be read or was
+        made with other settings
+    """
+    try:
+        with np.load(fname) as data:
+            if str(data['key']) != key:
+                return None
+            return data['peaks']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def reqc_day(peaks, station_config):
+    """
+    Applies the QC of station_config to the peaks of a day.
+
+    Parameters
+    ----------
+    peaks : numpy array
+        peak rows, from read_peaks
+    station_config : dict
+        station analysis parameters, with the QC settings to apply
+
+    Returns
+    -------
+    all_lsp : list of numpy arrays
+        rows of the arcs that pass, in the order retrieve_rh makes them
+    all_failqc : list of numpy arrays
+        rows of the arcs that fail
+    qc_lines : list of str
+        QC summary of each frequency (format_qc_summary)
+
+    None when an arc that passes the ediff and delTmax checks has no periodogram.
+    """
+    ncols = peaks.shape[1] - len(EXTRA_COLUMNS)
+    all_lsp = []; all_failqc = []; qc_lines = []
+    for f in station_config['freqs']:
+        qc_counts = defaultdict(int)
+        good_arcs = 0
+        freq_peaks = peaks[peaks[:, 10] == f]
+        for p in freq_peaks:
+            meta = {'e1': p[E1], 'e2': p[E2], 'ele_start': p[ELE_START], 'ele_end': p[ELE_END], 'delT': p[14], 'freq': f}
+            passed, reason = pre_check_arc(meta, station_config)
+            row = p[0:ncols].copy()
+            if passed:
+                if not p[LSP]:
+                    return None
+                passed, reason = check_arc_quality(meta, p[2], p[6], p[NOISE], station_config)
+            elif p[LSP]:
+                # the row of an arc that fails before its periodogram
+                row[[2, 6, 13]] = np.nan
+                row[7] = p[ELE_START]; row[8] = p[ELE_END]
+            if passed:
+                good_arcs += 1
+                all_lsp.append(row)
+            else:
+                qc_counts[reason] += 1
+                row[11] = p[RISESET]
+                all_failqc.append(row)
+        qc_lines.append(format_qc_summary(f, len(freq_peaks), qc_counts, good_arcs))
+    return all_lsp, all_failqc, qc_lines
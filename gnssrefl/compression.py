@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Compressed SNR files, written and read in-process.
+
+SNR files used to be written as text and then compressed by running gzip on
+them (or read back and recompressed), and gunzip was run to get them back.
+Here the text goes straight into the compressor while it is produced, and
+readers decompress in memory, so a file is written once and never expanded
+on disk.
+
+Two codecs are supported:
+
+    gzip  .gz   always available. level 1-9, default 6
+    zstd  .zst  needs the zstandard package (or python 3.14). level 1-22, default 3
+
+The codec of a compressed file is given by its ending when writing and by its
+first bytes when reading. The codec and level used for new SNR files are set
+with the GNSSREFL_SNR_COMPRESSION environment variable, codec[:level[:threads]],
+e.g. gzip:1 (faster, larger files) or zstd:3. The default is gzip:6. If zstd
+is asked for but not installed, gzip is used.
+
+Compression is done on blocks of BLOCK_SIZE bytes. With more than one thread
+the blocks are compressed in parallel (zlib and zstd release the GIL); a
+parallel gzip file is a series of gzip members, which gzip, gunzip and python
+read as one file. The default is one thread, since rinex2snr -par already
+runs a process per CPU.
+"""
+import gzip
+import io
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    from compression import zstd as _stdlib_zstd
+except ImportError:
+    _stdlib_zstd = None
+
+ENVIRONMENT = 'GNSSREFL_SNR_COMPRESSION'
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+MAGIC = {'gzip': b'\x1f\x8b', 'zstd': b'\x28\xb5\x2f\xfd'}
+# bytes compressed at a time
+BLOCK_SIZE = 4*1024*1024
+
+
+def zstd_available():
+    """True if zstd files can be written and read."""
+    return zstandard is not None or _stdlib_zstd is not None
+
+
+def settings(spec=None):
+    """
+    Codec, level and number of threads for new compressed files.
+
+    Parameters
+    ----------
+    spec : str, optional
+        codec[:level[:threads]], e.g. 'gzip:6' or 'zstd'. default is the
+        GNSSREFL_SNR_COMPRESSION environment variable, else gzip
+
+    Returns
+    -------
+    codec : str
+        gzip or zstd
+    level : int
+        compression level
+    threads : int
+        threads used to compress
+
+    """
+    if spec is None:
+        spec = os.environ.get(ENVIRONMENT, '')
+    parts = [p.strip() for p in spec.strip().lower().split(':')]
+    codec = parts[0] or 'gzip'
+    if codec not in SUFFIXES:
+        print('Unknown compression', spec, '- gzip is used')
+        return 'gzip', DEFAULT_LEVELS['gzip'], 1
+    if codec == 'zstd' and not zstd_available():
+        print('zstd compression needs the zstandard package - gzip is used')
+        return 'gzip', DEFAULT_LEVELS['gzip'], 1
+    try:
+        level = int(parts[1]) if len(parts) > 1 and parts[1] else DEFAULT_LEVELS[codec]
+        threads = max(1, int(parts[2])) if len(parts) > 2 and parts[2] else 1
+    except ValueError:
+        print('Illegal compression setting', spec, '- defaults are used')
+        level, threads = DEFAULT_LEVELS[codec], 1
+    return codec, level, threads
+
+
+def codec_of(filename):
+    """
+    Codec of a file from its ending.
+
+    Returns
+    -------
+    str or None
+        gzip or zstd, None for an uncompressed file
+
+    """
+    filename = str(filename)
+    for codec, suffix in SUFFIXES.items():
+        if filename.endswith(suffix):
+            return codec
+    return None
+
+
+def plain_name(filename):
+    """filename without the ending of a compressed file"""
+    filename = str(filename)
+    codec = codec_of(filename)
+    return filename[:-len(SUFFIXES[codec])] if codec else filename
+
+
+def compressed_name(filename, codec=None):
+    """
+    Name of the compressed version of a file.
+
+    Parameters
+    ----------
+    filename : str
+        uncompressed (or compressed) filename
+    codec : str, optional
+        default is the codec of settings()
+
+    Returns
+    -------
+    str
+
+    """
+    if codec is None:
+        codec = settings()[0]
+    return plain_name(filename) + SUFFIXES[codec]
+
+
+def compressed_versions(filename):
+    """
+    Names of the compressed versions of a file, one per codec, default codec first.
+
+    Parameters
+    ----------
+    filename : str
+        uncompressed filename
+
+    Returns
+    -------
+    list of str
+
+    """
+    first = settings()[0]
+    return [plain_name(filename) + SUFFIXES[c] for c in sorted(SUFFIXES, key=lambda c: c != first)]
+
+
+class _BlockWriter(io.RawIOBase):
+    """
+    Writes independently compressed blocks, compressed by a pool of threads,
+    into a binary file, in order.
+    """
+
+    def __init__(self, fileobj, compress, threads):
+        self._file = fileobj
+        self._compress = compress
+        self._buffer = bytearray()
+        self._pool = ThreadPoolExecutor(threads)
+        self._pending = []
+        self._threads = threads
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= BLOCK_SIZE:
+            self._submit(bytes(self._buffer[:BLOCK_SIZE]))
+            del self._buffer[:BLOCK_SIZE]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self._pool.submit(self._compress, block))
+        # keep a few blocks in flight, write the finished ones in order
+        while len(self._pending) > 2*self._threads:
+            self._file.write(self._pending.pop(0).result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            for future in self._pending:
+                self._file.write(future.result())
+            self._pending = []
+        finally:
+            self._pool.shutdown()
+            self._file.close()
+            super().close()
+
+
+def open_write(filename, level=None, threads=None):
+    """
+    Opens a file for writing bytes, compressed according to its ending.
+
+    Parameters
+    ----------
+    filename : str
+        output file. .gz is gzip, .zst is zstd, anything else is not compressed
+    level : int, optional
+        compression level. default is from settings() when the codec is the
+        configured one, else the default level of the codec
+    threads : int, optional
+        threads that compress blocks in parallel. default is from settings()
+
+    Returns
+    -------
+    binary file object, to be closed (or used with with)
+
+    """
+    filename = str(filename)
+    codec = codec_of(filename)
+    if codec is None:
+        return open(filename, 'wb')
+    configured, conf_level, conf_threads = settings()
+    if level is None:
+        level = conf_level if codec == configured else DEFAULT_LEVELS[codec]
+    if threads is None:
+        threads = conf_threads
+    if codec == 'gzip':
+        if threads == 1:
+            return gzip.open(filename, 'wb', compresslevel=level)
+        return _BlockWriter(open(filename, 'wb'), lambda b: gzip.compress(b, compresslevel=level, mtime=0), threads)
+    if zstandard is not None:
+        cctx = zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0)
+        return cctx.stream_writer(open(filename, 'wb'), closefd=True)
+    if _stdlib_zstd is not None:
+        if threads == 1:
+            return _stdlib_zstd.open(filename, 'wb', level=level)
+        return _BlockWriter(open(filename, 'wb'), lambda b: _stdlib_zstd.compress(b, level=level), threads)
+    raise OSError('zstd compression needs the zstandard package: ' + filename)
+
+
+def open_read(filename):
+    """
+    Opens a file for reading bytes, decompressing it if it is a gzip or zstd file.
+
+    The codec is recognized from the first bytes of the file, not the name.
+
+    Parameters
+    ----------
+    filename : str
+        input file
+
+    Returns
+    -------
+    binary file object, to be closed (or used with with)
+
+    """
+    filename = str(filename)
+    with open(filename, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(MAGIC['gzip']):
+        return gzip.open(filename, 'rb')
+    if head.startswith(MAGIC['zstd']):
+        if zstandard is not None:
+            reader = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), read_across_frames=True,
+                                                                closefd=True)
+            return io.BufferedReader(reader)
+        if _stdlib_zstd is not None:
+            return _stdlib_zstd.open(filename, 'rb')
+        raise OSError('zstd files need the zstandard package: ' + filename)
+    return open(filename, 'rb')
+
+
+def read_bytes(filename):
+    """
+    Contents of a file, decompressed, see open_read.
+
+    Parameters
+    ----------
+    filename : str
+        input file
+
+    Returns
+    -------
+    bytes
+
+    """
+    with open_read(filename) as f:
+        return f.read()
+
+
+def is_empty(filename):
+    """True if a file, once decompressed, has no bytes (e.g. an empty .gz file)."""
+    if os.path.getsize(filename) == 0:
+        return True
+    with open_read(filename) as f:
+        return len(f.read(1)) == 0
+
+
+def _copy(source, destination, level=None, threads=None):
+    """
+    Copies the decompressed contents of source into destination, compressed
+    according to its ending. Written to a temporary name first, so an
+    interrupted copy never leaves a partial destination file. The destination
+    keeps the access and modification times of source, as gzip and gunzip do:
+    snr_store.preferred_snr_file compares them with those of the binary files.
+    """
+    codec = codec_of(destination)
+    partial = plain_name(destination) + '.part' + (SUFFIXES[codec] if codec else '')
+    try:
+        with open_read(source) as f_in, open_write(partial, level, threads) as f_out:
+            shutil.copyfileobj(f_in, f_out, BLOCK_SIZE)
+        st = os.stat(source)
+        os.utime(partial, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(partial, destination)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def compress_file(filename, codec=None, level=None, threads=None):
+    """
+    Compresses a file in place, as the gzip command does: the compressed file
+    replaces the original, which is removed once the compressed one is complete.
+
+    Parameters
+    ----------
+    filename : str
+        uncompressed file
+    codec : str, optional
+        gzip or zstd. default is from settings()
+    level : int, optional
+        compression level
+    threads : int, optional
+        threads that compress in parallel
+
+    Returns
+    -------
+    str
+        name of the compressed file
+
+    """
+    filename = str(filename)
+    if codec is None:
+        codec = settings()[0]
+    output = compressed_name(filename, codec)
+    _copy(filename, output, level, threads)
+    os.remove(filename)
+    return output
+
+
+def decompress_file(filename):
+    """
+    Decompresses a file in place, as gunzip does: the compressed file is removed
+    once the uncompressed one is complete.
+
+    Parameters
+    ----------
+    filename : str
+        compressed file (.gz or .zst)
+
+    Returns
+    -------
+    str
+        name of the uncompressed file
+
+    """
+    filename = str(filename)
+    output = plain_name(filename)
+    _copy(filename, output)
+    os.remove(filename)
+    return output
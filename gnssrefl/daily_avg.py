@@ -6,16 +6,21 @@ import numpy as np
 import os
 import sys
 import warnings
-import time
 
 from datetime import date
 
 # my code
 import gnssrefl.gps as g
+import gnssrefl.results_store as results_store
 import gnssrefl.sd_libs as sd
+import gnssrefl.snr_format as snr_format
 import gnssrefl.gnssir_v2 as guts2
 #
 
+# rows of the allRH files: year, doy, RH, month, day, azimuth, frequency, satellite, LSP amplitude, peak2noise, UTC hour
+ALLRH_FORMAT = " %4.0f   %3.0f %7.3f %2.0f %2.0f %6.1f %4.0f %4.0f %6.2f %6.2f %6.2f\n"
+ALLRH_CSV_FORMAT = " %4.0f,  %3.0f,%7.3f, %2.0f, %2.0f,%6.1f,%4.0f,%4.0f,%6.2f,%6.2f,%6.2f\n"
+
 def fbias_daily_avg(station):
     """
     reads QC-RH values and the daily averages
@@ -107,6 +112,10 @@ def readin_plot_daily(station,extension,year1,year2,fr,alldatafile,csvformat,
     if there is only one RH on a given day - there is no median value and thus nothing will 
     be saved for that day.  
 
+    All the daily files are read at once and the median filter and daily averages are 
+    computed for all days together.  The two RH files are written in one go, and the 
+    plots are made at the end (plot_daily), unless plots=False.
+
     Gosh it would be nice if someone would clean this up.  It was written before I understood python.
 
     Parameters
@@ -153,6 +162,9 @@ def readin_plot_daily(station,extension,year1,year2,fr,alldatafile,csvformat,
     subdir : bool
         whether plot limits for the median filter are shown
 
+    plots : bool, optional
+        keyword argument. whether the plots are made. default is True
+
     Returns
     -------
     tv : numpy array
@@ -187,223 +199,267 @@ def readin_plot_daily(station,extension,year1,year2,fr,alldatafile,csvformat,
             date2 = None
 
     print('Median Filter', howBig, ' Required number of tracks/day ', ReqTracks)
-    xdir = os.environ['REFL_CODE']
     print('All RH retrievals - including bad ones - will be written to: ' )
     alldatafile2 = alldatafile + '.noqc'
     print(alldatafile2, '\n')
 
-    noqc = open(alldatafile2, 'w+')
-    # put in a header
-    noqc.write(" {0:s}  \n".format('% NO QUALITY CONTROL AT ALL' ))
-    noqc.write(" {0:s}  \n".format('% year,doy, RH(m),Mon, Day, Azim, freq,sat,LSPamp,pk2n,UTC(hr)' ))
-    noqc.write(" {0:s}  \n".format('% (1), (2), (3),  (4), (5),  (6), (7), (8), (9),   (10), (11)' ))
+    # all the daily files at once, then the median filter and daily averages of all the days
+    a, day, NumFiles = read_daily_results(station, extension, year1, year2, azim1, azim2, mjd1, mjd2)
+    keep, averaged, tv_median, nsat, NotEnough = daily_median_filter(a, day, howBig, ReqTracks, fr)
 
+    # year, doy, RH, month, day, azimuth, frequency, satellite, amplitude, peak2noise, UTC
+    yr = np.trunc(a[:,0]); doy = np.trunc(a[:,1])
+    first = np.searchsorted(day, day)
+    month, dom = _month_day(yr[first], doy[first])[1:]
+    rows = np.column_stack((yr[first], doy[first], a[:,2], month, dom, a[:,5], a[:,10], a[:,3], a[:,6], a[:,13], a[:,4]))
+    if csvformat:
+        fmt = ALLRH_CSV_FORMAT
+    else:
+        fmt = ALLRH_FORMAT
+
+    with open(alldatafile2, 'wb') as noqc:
+        # put in a header
+        noqc.write(" {0:s}  \n".format('% NO QUALITY CONTROL AT ALL' ).encode())
+        noqc.write(" {0:s}  \n".format('% year,doy, RH(m),Mon, Day, Azim, freq,sat,LSPamp,pk2n,UTC(hr)' ).encode())
+        noqc.write(" {0:s}  \n".format('% (1), (2), (3),  (4), (5),  (6), (7), (8), (9),   (10), (11)' ).encode())
+        snr_format.write_rows(noqc, rows, fmt)
 
     print('All RH retrievals that meet your median filter and ReqTracks criteria will be written to: ' )
     print(alldatafile, '\n')
-    allrh = open(alldatafile, 'w+')
-    # put in a header
-    allrh.write(" {0:s}  \n".format('% year,doy,RH(m),Mon,day, azim,freq,sat,LSPamp,pk2n,UTC(hr)' ))
-    allrh.write(" {0:s}  \n".format('% (1), (2),(3), (4),(5),  (6), (7), (8), (9),  (10), (11)' ))
+    with open(alldatafile, 'wb') as allrh:
+        # put in a header
+        allrh.write(" {0:s}  \n".format('% year,doy,RH(m),Mon,day, azim,freq,sat,LSPamp,pk2n,UTC(hr)' ).encode())
+        allrh.write(" {0:s}  \n".format('% (1), (2),(3), (4),(5),  (6), (7), (8), (9),  (10), (11)' ).encode())
+        snr_format.write_rows(allrh, rows[keep], fmt)
 
-    fs = 12
-    NotEnough = 0
-    tv = np.empty(shape=[0, 8])
-    tv_median = np.empty(shape=[0, 9])
-    tvall = np.empty(shape=[0, 7])
-    tv_list = []
-    tv_median_list = []
-    #
-    ngps = []; nglo = [] ; ngal = []; nbei = []
-    obstimes = []; medRH = []; meanRH = [] ; alltimes = []; meanAmp = []
-    tttimes = []
-    fig,ax=plt.subplots()
-    year_list = np.arange(year1, year2+1, 1)
+    if len(tv_median) == 0 :
+        print('No results fit your inputs. Exiting.'); sys.exit()
+    tv = tv_median[:,0:8]
+    obstimes = [datetime.datetime(year=int(t[0]), month=int(t[4]), day=int(t[5]), hour=12, minute=0, second=0) for t in tv]
+
+    print('A total of ', NumFiles, ' days were evaluated.')
+    print( NotEnough, ' days did not meet the threshold set for a dependable daily average')
+
+    if kwargs.get('plots', True):
+        plot_daily(station, subdir, tv_median, obstimes, rows[keep], averaged[keep], rows, nsat, howBig, plot_limits,
+                   NumFiles, test, csvformat)
+
+    return tv, obstimes
+
+
+def read_daily_results(station, extension, year1, year2, azim1, azim2, mjd1=None, mjd2=None):
+    """
+    reads the daily RH files of a station for a range of years in one go
+
+    days with fewer than two RH are not used, nor days without RH between the azimuths
+
+    Parameters
+    ----------
+    station : str
+        4 ch station name
+    extension : str
+        analysis extension name
+    year1 : int
+        first year
+    year2 : int
+        last year
+    azim1 : int
+        minimum azimuth, degrees
+    azim2 : int
+        maximum azimuth, degrees
+    mjd1 : float, optional
+        first modified julian day
+    mjd2 : float, optional
+        last modified julian day
+
+    Returns
+    -------
+    a : numpy array
+        first 14 columns of the RH files (year, doy, RH, sat, UTC, azimuth, amplitude, ... peak2noise)
+        of all the days, one day after the other
+    day : numpy array of int
+        index of the day of each row, starting at zero
+    NumFiles : int
+        number of daily files that were evaluated
+
+    """
+    xdir = os.environ['REFL_CODE']
+    blocks = []
     NumFiles = 0
-    test_alltimes = []
-    test_good = []
-    s1 = time.time()
-    for yr in year_list:
+    for yr in range(year1, year2+1):
         direc = xdir + '/' + str(yr) + '/results/' + station + '/' + extension + '/'
-        # counter for the legends
-        nle = 0
-        # i understand why python people like this - but then the results are not sorted ...
-        if os.path.isdir(direc):
-            all_files = os.listdir(direc)
-            all_files = np.sort(all_files)
-            #print('Number of files in ', yr, len(all_files))
-            for f in all_files:
-                fname = direc + f
-                L = len(f)
-                keep_this_one1 = True
-                keep_this_one2 = True
-        # file names must have 7 characters in them ...  and end in txt 
-                if (L == 7) and (f[-3::] == 'txt'):
-                    mjd = g.ydoy2mjd(yr,int(f[0:3]))
-                    if mjd1 is not None:
-                        if (mjd >= mjd1):
-                            keep_this_one1 = True
-                        else:
-                            keep_this_one1 = False
-                    if mjd2 is not None:
-                        if (mjd <= mjd2):
-                            keep_this_one2 = True
-                        else:
-                            keep_this_one2 = False
-                if keep_this_one1 & keep_this_one2:
-                    keepit = True
-                else:
-                    keepit = False
-
-                #if not keepit:
-                #    print('thrown out because it was not between your dates',f)
-
-                if (L == 7) & keepit:
-                    NumFiles +=  1
-        # check that it is a file and not a directory and that it has something/anything in it
-                    try:
-                        # trying to turn off the annoying empty file warnings
-                        with warnings.catch_warnings():
-                            warnings.simplefilter("ignore")
-                            a = np.loadtxt(fname,skiprows=3,comments='%')
-                        nr,nc=a.shape
-                        if (nr > 0):
-                            nle = nle + 1
-                            # add the new azimuth constraint here ... 2022sep04
-                            www = (a[:,5] > azim1 ) & (a[:,5] < azim2 )
-                            a = a[www,:]
-
-                            y = a[:,0] +a[:,1]/365.25; rh = a[:,2] ; 
-                            frequency = a[:,10]; azimuth = a[:,5]; sat = a[:,3]; amplitude=a[:,6]
-                            # added utc to the all RH file
-                            utcTime = a[:,4]; 
-                            yr = int(a[0,0]); doy = int(a[0,1])
-                            d = datetime.date(yr,1,1) + datetime.timedelta(doy-1)
-                            peak2noise = a[:,13]
-
-                            medv = np.median(rh)
-                            # 0 means use all frequencies.  otherwise, you can specify 
-                            # this is applying the medial filter
-                            if fr == 0:
-                                cc = (rh < (medv+howBig))  & (rh > (medv-howBig))
-                            else:
-                                cc = (rh < (medv+howBig))  & (rh > (medv-howBig)) & (frequency == fr)
-                            good =rh[cc]; goodT =y[cc]; goodAmp = amplitude[cc]
-                            gazim = azimuth[cc]; gsat = sat[cc]; gamp = amplitude[cc]; gpeak2noise = peak2noise[cc]
-                            gfreq = frequency[cc]
-                            # added 21may14
-                            gutcTime = utcTime[cc]
-
-                            # write out everyting including bad retrievals
-                            dumb= write_out_all(noqc, csvformat, len(rh), yr, doy, d, rh, azimuth, frequency, sat,amplitude,peak2noise,utcTime,[])
-                            
-                            # tvall no longer being used as a variable but still sending it to the function.
-                            # unfortunately the info is not sorted - because of the way the directory listing works....
-                            NG = len(good)
-
-        # only save if there are some minimal number of values
-                            if (len(good) >= ReqTracks):
-
-                                # write out the individual tracks that made your met your QC metrics ...
-                                tvall = write_out_all(allrh, csvformat, NG, yr, doy, d, good, gazim, gfreq, gsat,gamp,gpeak2noise,gutcTime,tvall)
-
-                                rh = good
-                                # this is the plot with all the data -not the daily average
-                                alltimes = []
-
-                                # put in the real time (as opposed to just year,month day)
-                                #filler = datetime.datetime(year=yr, month=d.month, day=d.day, hour = hrr, minute=mm, second = ss)
-                                for w in range(0,len(good)):
-                                    hrr = int(np.floor(gutcTime[w])) # 
-                                    mm = int(60*(gutcTime[w] - hrr )); ss = 0
-                                    filler = datetime.datetime(year=yr, month=d.month, day=d.day, hour = hrr, minute=mm, second = ss)
-                                    alltimes.append(filler)
-                                # 
-                                # this probably should not be inside the loop
-                                # maybe this makes it slow? will try accumulating it all and plot outside the loop
-                                #test_alltimes.append(alltimes)
-                                #test_good.append(good)
-
-                                ax.plot(alltimes,good,'b.')
-
-                                # this are stats for the daily averages - is this slowing it down? - apparently not
-                                # turned off for now
-                                if True:
-                                    ijk = (gsat  < 100); 
-                                    ngps = np.append(ngps, len(gsat[ijk]))
-
-                                    ijk = (gsat  > 300);  # beidou
-                                    nbei = np.append(nbei, len(gsat[ijk]))
-   
-                                    ijk = (gsat > 100) * (gsat < 200);  # glonass
-                                    nglo = np.append(nglo, len(gsat[ijk]))
-
-                                    ijk = (gsat > 200) * (gsat < 300); # galileo
-                                    ngal = np.append(ngal, len(gsat[ijk]))
-
-                                obstimes.append(datetime.datetime(year=yr, month=d.month, day=d.day, hour=12, minute=0, second=0))
-
-                                medRH.append(medv)
-                                #medRH =np.append(medRH, medv)
-                                # store the meanRH after the outliers are removed using simple median filter
-                                meanRHtoday = np.mean(good)
-
-                                stdRHtoday = np.std(good)
-                                #meanRH =np.append(meanRH, meanRHtoday)
-                                #
-                                # july 7, 2022
-                                meanRH.append(meanRHtoday)
-                                #meanAmp = np.append(meanAmp, np.mean(goodAmp))
-                                # updated this to include mean amplitude 2021 november 8
-                                meanAmp.append(np.mean(goodAmp))
-                                newl = [yr, doy, meanRHtoday, len(rh), d.month, d.day, stdRHtoday, np.mean(goodAmp)]
-                                # a new variable is not really needed - but I did not want to oerwrite working code
-                                newl_plus_median = [yr, doy, meanRHtoday, len(rh), d.month, d.day, stdRHtoday, np.mean(goodAmp),medv]
-
-                                # maybe this is slow??
-                                #tv = np.append(tv, [newl],axis=0)
-                                #tv_median = np.append(tv_median, [newl_plus_median],axis=0)
-                                # see if this works
-                                tv_list.append(newl)
-                                tv_median_list.append(newl_plus_median)
-
-                                k += 1
-                            else:
-                                NotEnough = NotEnough + 1
-                    except:
-                        okok = 1;
-            #ax.plot(test_alltimes,test_good,'b.')
-        else:
-            abc = 0; # dummy line
-    #meanRH = np.asarray(meanRH)
+        if not os.path.isdir(direc):
+            continue
+        # the daily files of the requested days, from the results store when it is current
+        mjd0 = g.ydoy2mjd(yr, 1) - 1
+        d1 = 1 if mjd1 is None else int(max(1, np.ceil(mjd1 - mjd0)))
+        d2 = 366 if mjd2 is None else int(min(366, np.floor(mjd2 - mjd0)))
+        year_results = results_store.read_results(direc, d1, d2)
+        # file names must have 7 characters in them
+        for f in os.listdir(direc):
+            if len(f) != 7:
+                continue
+            if (f[-3::] == 'txt') and f[0:3].isdigit():
+                mjd = mjd0 + int(f[0:3])
+                if ((mjd1 is not None) and (mjd < mjd1)) or ((mjd2 is not None) and (mjd > mjd2)):
+                    continue
+            NumFiles += 1
+
+        for d in sorted(year_results):
+            rh = year_results[d]
+            # one RH is read as a vector
+            if (rh.ndim != 2) or (rh.shape[1] < 14):
+                continue
+            ii = (rh[:,5] > azim1) & (rh[:,5] < azim2)
+            if ii.any():
+                blocks.append(rh[ii,0:14])
+
+    if len(blocks) == 0:
+        return np.empty(shape=[0, 14]), np.empty(0, dtype=int), NumFiles
+    day = np.repeat(np.arange(len(blocks)), [len(b) for b in blocks])
+    return np.vstack(blocks), day, NumFiles
+
+
+def daily_median_filter(a, day, howBig, ReqTracks, fr):
+    """
+    applies the median filter to the RH of each day and computes the daily averages,
+    for all the days at once
 
-    s2 = time.time()
-    #print(s2-s1, ' seconds')
-    if len(tv_median_list) == 0 :
-        print('No results fit your inputs. Exiting.'); sys.exit()
-    if len(tv_list) == 0 :
-        print('No results fit your inputs. Exiting.'); sys.exit()
-    tv = np.asarray(tv_list)
-    tv_median = np.asarray(tv_median_list)
+    Parameters
+    ----------
+    a : numpy array
+        RH file rows, as returned by read_daily_results
+    day : numpy array of int
+        index of the day of each row, starting at zero and increasing
+    howBig : float
+        how far in meters a RH can be from the median for that day
+    ReqTracks : int
+        number of RH required per day
+    fr : int
+        0 for all frequencies, otherwise the frequency that is used
+
+    Returns
+    -------
+    keep : numpy array of bool
+        rows that pass the median filter on days with at least ReqTracks of them
+    averaged : numpy array of bool
+        rows that pass the median filter on the days with a daily average
+    tv_median : numpy array
+        [year, doy, meanRH, len(rh), month, day, stdRH, averageAmplitude, medianRH]
+        for the days with a daily average
+    nsat : numpy array
+        number of GPS, Glonass, Galileo and Beidou RH in each daily average
+    NotEnough : int
+        number of days with fewer than ReqTracks RH
+
+    """
+    ndays = int(day[-1]) + 1 if len(day) else 0
+    first = np.searchsorted(day, np.arange(ndays))
+    n = np.bincount(day, minlength=ndays)
+    rh = a[:,2]
+
+    # the median of each day: sorted by day and then RH, as np.median
+    srh = rh[np.lexsort((rh, day))]
+    medv = (srh[first + (n-1)//2] + srh[first + n//2])/2
+    medv[np.bincount(day, weights=np.isnan(rh), minlength=ndays) > 0] = np.nan
+
+    with np.errstate(invalid='ignore'):
+        cc = (rh < (medv[day]+howBig)) & (rh > (medv[day]-howBig))
+    if fr != 0:
+        cc = cc & (a[:,10] == fr)
+    NG = np.bincount(day[cc], minlength=ndays)
+    enough = (NG >= ReqTracks)
+    keep = cc & enough[day]
+    # each RH is placed at its time of day for the plots, so days with
+    # an arc time outside the day (or none) are not averaged
+    with np.errstate(invalid='ignore'):
+        offday = keep & ~((a[:,4] >= 0) & (a[:,4] < 24))
+    good = enough & (np.bincount(day[offday], minlength=ndays) == 0)
+    averaged = keep & good[day]
+
+    kday = day[keep]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        meanRH = np.bincount(kday, weights=rh[keep], minlength=ndays)/NG
+        dev = rh[keep] - meanRH[kday]
+        stdRH = np.sqrt(np.bincount(kday, weights=dev*dev, minlength=ndays)/NG)
+        meanAmp = np.bincount(kday, weights=a[keep,6], minlength=ndays)/NG
+    sat = a[keep,3]
+    nsat = np.column_stack([np.bincount(kday[ijk], minlength=ndays) for ijk in
+                            [sat < 100, (sat > 100) & (sat < 200), (sat > 200) & (sat < 300), sat > 300]])
+
+    yr = np.trunc(a[first,0]); doy = np.trunc(a[first,1])
+    month, dom = _month_day(yr, doy)[1:]
+    tv_median = np.column_stack((yr, doy, meanRH, NG, month, dom, stdRH, meanAmp, medv))
+
+    return keep, averaged, tv_median[good], nsat[good], int(np.sum(~enough))
+
+
+def _month_day(year, doy):
+    """ dates (numpy datetime64), months and days of the month of years and days of year """
+    dates = (np.asarray(year, dtype=np.int64) - 1970).astype('datetime64[Y]').astype('datetime64[D]') \
+        + (np.asarray(doy, dtype=np.int64) - 1)
+    months = dates.astype('datetime64[M]')
+    return dates, months.astype(np.int64) % 12 + 1, (dates - months).astype(np.int64) + 1
+
+
+def plot_daily(station, subdir, tv_median, obstimes, allrh, averaged, raw, nsat, howBig, plot_limits, NumFiles,
+               test, csvformat=False):
+    """
+    plots of daily_avg: all the RH that were averaged with the daily medians,
+    the RH without QC, the daily averages and number of values, and the
+    LSP amplitudes by frequency
+
+    Parameters
+    ----------
+    station : str
+        4 ch station name
+    subdir : str
+        subdirectory for output files
+    tv_median : numpy array
+        [year, doy, meanRH, len(rh), month, day, stdRH, averageAmplitude, medianRH]
+    obstimes : list of datetime objects
+        times of the daily averages
+    allrh : numpy array
+        RH rows that pass the median filter, as in the allRH file
+    averaged : numpy array of bool
+        allrh rows of the days with a daily average
+    raw : numpy array
+        all the RH rows, no QC
+    nsat : numpy array
+        number of GPS, Glonass, Galileo and Beidou RH in each daily average
+    howBig : float
+        criterion of the median filter, meters
+    plot_limits : bool
+        whether the limits of the median filter are shown
+    NumFiles : int
+        number of daily files that were evaluated
+    test : bool
+
+    csvformat : bool, optional
+        whether the allRH file was written as csv
+
+    """
+    fs = 12
+    xdir = os.environ['REFL_CODE']
+    fig,ax=plt.subplots()
+    good = allrh[averaged]
+    # put in the real time (as opposed to just year,month day)
+    hrr = np.floor(good[:,10]); mm = np.trunc(60*(good[:,10] - hrr))
+    alltimes = _month_day(good[:,0], good[:,1])[0].astype('datetime64[m]') + (60*hrr + mm).astype(np.int64)
+    ax.plot(alltimes, good[:,2], 'b.')
 
-    # not sure you can sort obstimes
-    dumb_time = tv_median[:,0] + tv_median[:,1]/365.25
     # sort it ...
+    dumb_time = tv_median[:,0] + tv_median[:,1]/365.25
     ii = np.argsort(dumb_time)
-    tv_median = tv_median[ii,:]
-    # i have a function for this now - though it asks for MJD
-    for www in range(0,len(tv_median)):
-        filler = datetime.datetime(year=int(tv_median[www,0]), 
-                month=int(tv_median[www,4]), day=int(tv_median[www,5]), hour = 12, minute=0, second = 0)
-        tttimes.append(filler)
-
-    # plot the median 
-    #ax.plot(tttimes, tv_median[:,8],'k.',label='median value')
-    ax.plot(tttimes, tv_median[:,8],'ks',markerfacecolor='white',label='median value',markersize=4)
+    tvs = tv_median[ii,:]
+    tttimes = [datetime.datetime(year=int(t[0]), month=int(t[4]), day=int(t[5]), hour=12, minute=0, second=0) for t in tvs]
+
+    # plot the median
+    ax.plot(tttimes, tvs[:,8],'ks',markerfacecolor='white',label='median value',markersize=4)
     # if requested, also show the limits for the median filter
     if plot_limits:
-        ax.plot(tttimes, tv_median[:,8]+howBig,'-',color='gray',label='median+limit')
-        ax.plot(tttimes, tv_median[:,8]-howBig,'-',color='gray',label='median-limit')
+        ax.plot(tttimes, tvs[:,8]+howBig,'-',color='gray',label='median+limit')
+        ax.plot(tttimes, tvs[:,8]-howBig,'-',color='gray',label='median-limit')
 
     plt.ylabel('meters',fontsize=fs)
     plt.title('All Reflector Heights for ' + station.upper() + ' when QC is applied: ' ,fontsize=fs)
@@ -412,39 +468,32 @@ def readin_plot_daily(station,extension,year1,year2,fr,alldatafile,csvformat,
     plt.gca().invert_yaxis()
     # this command changes the x-axis
     fig.autofmt_xdate()
-    #plt.legend(loc="upper right")
     plt.legend(loc="best")
     plt.grid()
 
-    print('A total of ', NumFiles, ' days were evaluated.')
-    print( NotEnough, ' days did not meet the threshold set for a dependable daily average')
     if NumFiles > 1:
         pltname = xdir + '/Files/' + subdir + '/' + station + '_AllRH.png'
         print('All RH png file saved as: ', pltname)
         plt.savefig(pltname)
 
-
-    # close the all RH output files
-    allrh.close()
-    noqc.close()
-
     # quick plot of the results without QC
-    quick_raw(alldatafile2,xdir, station,subdir)
+    quick_raw(None, xdir, station, subdir, raw=raw)
 
     # plot the number of retrievals vs time
-    txtdir =  xdir + '/Files/' + subdir 
-    nr,nc = tv.shape
-    if (nr > 0) & (NumFiles > 1):
-        daily_avg_stat_plots(obstimes,meanRH,meanAmp, station,txtdir,tv,ngps,nglo,ngal,nbei,test)
+    txtdir =  xdir + '/Files/' + subdir
+    tv = tv_median[:,0:8]
+    if (len(tv) > 0) & (NumFiles > 1):
+        daily_avg_stat_plots(obstimes,tv[:,2],tv[:,7], station,txtdir,tv,nsat[:,0],nsat[:,1],nsat[:,2],nsat[:,3],test)
 
         # my new plot
         inputf= f"{txtdir}/{station}_allRH.txt" ; outputf = f"{txtdir}/{station}_LSPamp.png"
-        multi_freq_amp(station,inputf,outputf)
-
+        if csvformat:
+            multi_freq_amp(station,inputf,outputf)
+        else:
+            multi_freq_amp(station,inputf,outputf,tvall=allrh)
 
-    return tv, obstimes
 
-def quick_raw(alldatafile2,xdir,station,subdir):
+def quick_raw(alldatafile2,xdir,station,subdir,raw=None):
     """
     quick plot of the raw RH data.  No QC
 
@@ -458,33 +507,37 @@ def quick_raw(alldatafile2,xdir,station,subdir):
         4 ch station name
     subdir : str
         subdirectory name for results in xdir/Files
+    raw : numpy array, optional
+        the raw RH rows, so the file does not have to be read
 
     """
-    if os.path.exists(alldatafile2):
-       # turn off warning
-       with warnings.catch_warnings():
-           warnings.simplefilter("ignore")
-           raw = np.loadtxt(alldatafile2,comments='%')
-       if len(raw) == 0:
-           print('There are no RH data.  At all.  Exiting')
-           sys.exit()
-
-       ns= len(raw.shape)
-       if ns == 2:
-           nr,nc = raw.shape
-       elif ns == 1:
-           nr = 1
-
-       if ns > 0:
-           plt.figure()
-           plt.plot(raw[:,0] + raw[:,1]/365.25, raw[:,2], 'b.')
-           plt.grid()
-           plt.xlabel('year')
-           plt.ylabel('reflector height (m)')
-           plt.title(station + ': Completely raw RH data ... no QC applied ')
-           pltname = xdir + '/Files/' + subdir + '/' + station + '_AllRH_noQC.png'
-           plt.savefig(pltname)
-           print('All RH png file without QC saved as: ', pltname)
+    if raw is None:
+        if not os.path.exists(alldatafile2):
+            return
+        # turn off warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            raw = np.loadtxt(alldatafile2,comments='%')
+    if len(raw) == 0:
+        print('There are no RH data.  At all.  Exiting')
+        sys.exit()
+
+    ns= len(raw.shape)
+    if ns == 2:
+        nr,nc = raw.shape
+    elif ns == 1:
+        nr = 1
+
+    if ns > 0:
+        plt.figure()
+        plt.plot(raw[:,0] + raw[:,1]/365.25, raw[:,2], 'b.')
+        plt.grid()
+        plt.xlabel('year')
+        plt.ylabel('reflector height (m)')
+        plt.title(station + ': Completely raw RH data ... no QC applied ')
+        pltname = xdir + '/Files/' + subdir + '/' + station + '_AllRH_noQC.png'
+        plt.savefig(pltname)
+        print('All RH png file without QC saved as: ', pltname)
 
 
 def daily_avg_stat_plots(obstimes,meanRH,meanAmp, station,txtdir,tv,ngps,nglo,ngal,nbei,test):
@@ -742,7 +795,7 @@ def write_out_all(allrh, csvformat, NG, yr, doy, d, good, gazim, gfreq, gsat,gam
     return tvall
 
 
-def multi_freq_amp(station,inputf,pngname):
+def multi_freq_amp(station,inputf,pngname,tvall=None):
     """
 
     creates a time series plot of daily average LSP amplitude 
@@ -756,14 +809,17 @@ def multi_freq_amp(station,inputf,pngname):
         location of plain text file to be plotted
     pngname : str
         location of png file created 
+    tvall : numpy array, optional
+        contents of the input file, so it does not have to be read
 
     """
     fs = 10
-    if os.path.exists(inputf):
-        tvall = np.loadtxt(inputf,comments='%')
-    else:
-        print('LSP results file does not exist')
-        return
+    if tvall is None:
+        if os.path.exists(inputf):
+            tvall = np.loadtxt(inputf,comments='%')
+        else:
+            print('LSP results file does not exist')
+            return
 
     if (len(tvall) == 0):
         print('No LSP results, so no plot created  ', inputf)
@@ -772,12 +828,10 @@ def multi_freq_amp(station,inputf,pngname):
     freq = tvall[:,6]
     fr = np.unique(freq)
 
-# get mjd for each record
-    mjdall = []
-    for i in range(0,len(tvall)):
-        mjd = g.ydoy2mjd(int(tvall[i,0]),int(tvall[i,1]))
-        mjdall.append(mjd)
-    mjdall = np.asarray(mjdall)
+# get mjd for each record, from the mjd of the start of each year
+    years, iyear = np.unique(tvall[:,0].astype(int), return_inverse=True)
+    mjd0 = np.array([g.ydoy2mjd(int(y),1) - 1 for y in years])
+    mjdall = mjd0[iyear] + tvall[:,1].astype(int)
 
     fig,ax=plt.subplots(figsize=(10, 6))
 # look thru the frequencies
@@ -787,13 +841,8 @@ def multi_freq_amp(station,inputf,pngname):
         amplitude = tvall[index,8] #lsp amp 
 
         # for each mjd in this frequency
-        mi = []; mia = []
-        for m in np.unique(mjdf):
-            i = (mjdf == m )
-            mi.append(m)
-            mia.append(np.mean(amplitude[i]))
-        mi = np.asarray(mi)
-        mia = np.asarray(mia)
+        mi, i = np.unique(mjdf, return_inverse=True)
+        mia = np.bincount(i, weights=amplitude)/np.bincount(i)
         ax.plot(sd.mjd_to_obstimes(mi),mia,'.',label=str(int(f)))
 
 
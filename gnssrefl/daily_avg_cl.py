@@ -29,10 +29,11 @@ def parse_arguments():
     parser.add_argument("-plot_limits", default=None, type=str, help="add median value and limits to plot, default is False ")
     parser.add_argument("-date1", default=None, type=str, help="Optional beginning date, yyyymmdd")
     parser.add_argument("-date2", default=None, type=str, help="Optional ending date, yyyymmdd")
+    parser.add_argument("-plots", default=None, type=str, help="make the plots, default is True")
     args = parser.parse_args().__dict__
 
     # convert all expected boolean inputs from strings to booleans
-    boolean_args = ['plt', 'csv','test','plot_limits']
+    boolean_args = ['plt', 'csv','test','plot_limits','plots']
     args = str2bool(args, boolean_args)
 
     # only return a dictionary of arguments that were added from the user - all other defaults will be set in code below
@@ -42,7 +43,7 @@ def parse_arguments():
 def daily_avg(station: str , medfilter: float, ReqTracks: int, txtfile: str = None, plt: bool = True, 
         extension: str = '', year1: int = None, year2: int = None, fr: int = 0, csv: bool = False, 
         azim1: int = 0, azim2: int = 360, test: bool = False, subdir: str=None,plot_limits: bool=False, 
-              date1: str=None, date2: str=None):
+              date1: str=None, date2: str=None, plots: bool=True):
     """
     The goal of this code is to consolidate individual RH results into a single file consisting of 
     daily averaged RH without outliers. These daily average values are nominally associated 
@@ -98,6 +99,8 @@ def daily_avg(station: str , medfilter: float, ReqTracks: int, txtfile: str = No
         names are slightly different, daily_avg_medianfilter and dailyavg_reqtracks.
     daily_avg p041 0.5 50 -date1 20200501 -date2 20210601
         only uses data beteween May 1, 2020 and June 1, 2021
+    daily_avg p041 0.25 10 -plots F
+        only writes the files, no plots are made
 
     Parameters
     ----------
@@ -188,6 +191,9 @@ def daily_avg(station: str , medfilter: float, ReqTracks: int, txtfile: str = No
     date2: str, optional
         you only want data ending from this date, format yyyymmdd
         this will supercede year2
+    plots: bool, optional
+        whether the plots are made. Without them only the files are written.
+        default is True
 
     """
     if test:
@@ -271,11 +277,12 @@ def daily_avg(station: str , medfilter: float, ReqTracks: int, txtfile: str = No
             date2 = None
 
     tv, obstimes = da.readin_plot_daily(station, extension, year1, year2, fr, 
-            alldatafile, csv, medfilter, ReqTracks,azim1,azim2,test,subdir,plot_limits,date1=date1,date2=date2)
+            alldatafile, csv, medfilter, ReqTracks,azim1,azim2,test,subdir,plot_limits,date1=date1,date2=date2,
+            plots=plots)
 
     # default is to show the plots
     nr,nc = tv.shape
-    if plt2screen & (nr > 0):
+    if plt2screen & plots & (nr > 0):
         matplt.show()
 
 
@@ -20,7 +20,6 @@ import re
 import shutil
 import subprocess
 import tempfile
-import warnings
 from pathlib import Path
 from typing import List, Tuple, Optional, Dict, Any, Union
 
@@ -30,6 +29,8 @@ import pandas as pd
 from tqdm import tqdm
 
 import gnssrefl.gps as g
+import gnssrefl.results_store as results_store
+from gnssrefl.arc_batch import ArcBatch, DATA_KEYS, META_KEYS
 from gnssrefl.read_snr_files import read_snr
 from gnssrefl.utils import circular_mean_deg, circular_distance_deg, FileManagement
 from gnssrefl.gnss_frequencies import all_frequencies, get_snr_column, get_scale_factor, get_file_suffix, get_glonass_channel
@@ -84,12 +85,11 @@ def _load_result_file(path):
     """Load a gnssir/phase result file into a 2-D numpy array.
 
     Empty (header-only) files are valid gnssir output that acts as a
-    signpost that a day was processed but yielded zero rows. Suppress
-    loadtxt's 'input contained no data' UserWarning in that case.
+    signpost that a day was processed but yielded zero rows. Daily files
+    (ddd.txt) are read from the results store when it is current
+    (results_store.py).
     """
-    with warnings.catch_warnings():
-        warnings.filterwarnings('ignore', message='loadtxt: input contained no data')
-        data = np.loadtxt(path, comments='%')
+    data = results_store.read_result_file(path)
     if data.size == 0:
         return None
     if data.ndim == 1:
@@ -386,6 +386,198 @@ def apply_refraction(snr_array, station_config, year, doy, verbose=True):
     return snr_array[valid_mask]
 
 
+def load_station_snr(station, year, doy, snr_type=66, buffer_hours=2, station_config=None, gzip=True,
+                     screenstats=False, refraction_verbose=True, logid=None):
+    """
+    Reads the SNR data of a station/year/day, removes the excluded satellites
+    and applies the refraction correction.
+
+    Parameters
+    ----------
+    station : str
+        Station name (4 characters)
+    year : int
+        Full year
+    doy : int
+        Day of year
+    snr_type : int
+        SNR file type. Default: 66
+    buffer_hours : float
+        Hours of data from adjacent days. Default: 2
+    station_config : dict, optional
+        Station analysis parameters (exclude_satellites, refraction)
+    gzip : bool
+        If True, gzip the SNR file after reading. Default: True
+    screenstats : bool
+        Forwarded to ``read_snr()``. Default: False
+    refraction_verbose : bool
+        Forwarded as ``verbose`` to apply_refraction. Default: True
+    logid : file, optional
+        Open log file, forwarded to ``read_snr()``. Default: None
+
+    Returns
+    -------
+    np.ndarray or None
+        SNR data, None when the file has no usable data
+
+    Raises
+    ------
+    FileNotFoundError
+        If the SNR file does not exist and cannot be decompressed.
+    """
+    obsfile, snr_exists = FileManagement(station, 'snr_file', year, doy, snr_type=snr_type).find_snr_file(gzip=gzip)
+    if not snr_exists:
+        raise FileNotFoundError(
+            f"SNR file not found for station={station}, year={year}, "
+            f"doy={doy}, snr_type={snr_type}: {obsfile}"
+        )
+
+    allGood, snr_array, _, _ = read_snr(
+        obsfile, buffer_hours=buffer_hours, screenstats=screenstats, logid=logid,
+    )
+    if not allGood:
+        print(f'No usable SNR data for {station} {year} {doy}, skipping')
+        return None
+
+    # testing, KL, allow removal of GEO Beidou , testing on ALTG data ...
+    if 'exclude_satellites' in station_config:
+        satlist = station_config['exclude_satellites']
+        if len(satlist) > 0:
+            for sat in satlist:
+                j= (snr_array[:,0] == sat)
+                snr_array = np.delete(snr_array, j, axis=0)
+
+    # Apply refraction correction
+    if station_config is not None and station_config.get('refraction', False):
+        snr_array = apply_refraction(snr_array, station_config, year, doy, verbose=refraction_verbose)
+
+    return snr_array
+
+
+class DaySweep:
+    """
+    SNR data and arcs of one day, shared by the configurations of a sweep
+    (several gnssir analysis settings run on the same day, see
+    gnssir_v2.gnssir_sweep_v2).
+
+    The SNR file is read and refraction corrected once for all the
+    configurations with the same SNR_KEYS settings. The configurations whose
+    extract_arcs settings only differ in the elevation angles (e1, e2, ellist)
+    and the azimuth regions (azlist) share one extract_arcs call: it is made
+    with the elevation angle pairs of all of them and no azimuth regions, and
+    each configuration gets the arcs of its own pairs and regions, in the order
+    extract_arcs would return them.
+
+    Parameters
+    ----------
+    settings : list of dict
+        extract_arcs keyword arguments of each configuration of the sweep
+    """
+    # station_config entries that change the SNR data after load_station_snr
+    SNR_KEYS = ('exclude_satellites', 'refraction', 'refr_model', 'lat', 'lon', 'ht', 'apriori_rh')
+    # extract_arcs keyword arguments handled by select_arcs
+    SELECT_KEYS = ('e1', 'e2', 'ellist', 'azlist', 'screenstats')
+    # the same for all the configurations of the day
+    DAY_KEYS = ('year', 'doy')
+
+    def __init__(self, settings=()):
+        self.snr = {}
+        self._arcs = {}
+        self._pairs = {}
+        for kwargs in settings:
+            pairs = self._pairs.setdefault(self.share_key(kwargs), [])
+            for pair in _parse_elevation_list(kwargs.get('e1', 5.0), kwargs.get('e2', 25.0), kwargs.get('ellist')):
+                if pair not in pairs:
+                    pairs.append(pair)
+
+    @classmethod
+    def load_key(cls, snr_type, buffer_hours, station_config):
+        """Key of the SNR data of a configuration."""
+        config = {k: (station_config or {}).get(k) for k in cls.SNR_KEYS}
+        return json.dumps([snr_type, buffer_hours, config], sort_keys=True, default=str)
+
+    @classmethod
+    def share_key(cls, kwargs):
+        """Key of the extract_arcs settings of a configuration, but those of select_arcs."""
+        settings = {k: v for k, v in kwargs.items() if k not in cls.SELECT_KEYS + cls.DAY_KEYS}
+        if settings.get('pele') is None:
+            settings['pele'] = [kwargs.get('e1', 5.0), kwargs.get('e2', 25.0)]
+        return json.dumps(settings, sort_keys=True, default=str)
+
+    def extract_arcs(self, load_key, **kwargs):
+        """
+        Arcs of a configuration, from the SNR data stored under load_key.
+
+        Parameters
+        ----------
+        load_key : str
+            key of the SNR data in self.snr, see load_key
+        **kwargs
+            extract_arcs keyword arguments of the configuration
+
+        Returns
+        -------
+        ArcBatch
+            the arcs extract_arcs returns for these settings
+        """
+        e1 = kwargs.get('e1', 5.0); e2 = kwargs.get('e2', 25.0)
+        pairs = _parse_elevation_list(e1, e2, kwargs.get('ellist'))
+        share_key = self.share_key(kwargs)
+        all_pairs = self._pairs.get(share_key, [])
+        if not set(pairs) <= set(all_pairs):
+            # not a configuration of the sweep
+            all_pairs = list(dict.fromkeys(all_pairs + pairs))
+            self._pairs[share_key] = all_pairs
+            self._arcs.pop((load_key, share_key), None)
+        if (load_key, share_key) not in self._arcs:
+            settings = {k: v for k, v in kwargs.items() if k not in self.SELECT_KEYS}
+            if settings.get('pele') is None:
+                settings['pele'] = [e1, e2]
+            flat = [e for pair in all_pairs for e in pair]
+            self._arcs[(load_key, share_key)] = extract_arcs(
+                self.snr[load_key], e1=flat[0], e2=flat[1], ellist=flat,
+                azlist=[0, 360], screenstats=kwargs.get('screenstats', False), **settings,
+            )
+        return select_arcs(self._arcs[(load_key, share_key)], pairs, kwargs.get('azlist') or [0, 360])
+
+
+def select_arcs(arcs, pairs, azlist):
+    """
+    Arcs of some elevation angle pairs and azimuth regions.
+
+    Parameters
+    ----------
+    arcs : ArcBatch
+        from extract_arcs, with these pairs (and maybe others) and no azimuth regions
+    pairs : list of (float, float)
+        elevation angle pairs, in the order of the configuration
+    azlist : list of float
+        azimuth regions as pairs, see check_azimuth_compliance
+
+    Returns
+    -------
+    ArcBatch
+        in the order extract_arcs returns them for pairs and azlist: by
+        frequency and satellite, then by elevation angle pair.
+    """
+    meta = arcs.meta
+    # extract_arcs loops over the frequencies and satellites, then the pairs:
+    # the arcs of a frequency and satellite are one block
+    block = np.cumsum(np.r_[True, (meta['freq'][1:] != meta['freq'][:-1]) | (meta['sat'][1:] != meta['sat'][:-1])])
+    az_ok = np.zeros(len(meta), dtype=bool)
+    for a in range(len(azlist) // 2):
+        az_ok |= (meta['az_avg'] >= azlist[2*a]) & (meta['az_avg'] <= azlist[2*a + 1])
+    index = [np.empty(0, dtype=np.int64)]
+    pair_no = [np.empty(0, dtype=np.int64)]
+    for n, (e1, e2) in enumerate(pairs):
+        i = np.flatnonzero((meta['e1'] == e1) & (meta['e2'] == e2) & az_ok)
+        index.append(i)
+        pair_no.append(np.full(len(i), n))
+    index = np.concatenate(index)
+    pair_no = np.concatenate(pair_no)
+    return arcs.take(index[np.lexsort((index, pair_no, block[index]))])
+
+
 def extract_arcs_from_station(
     station: str,
     year: int,
@@ -401,8 +593,10 @@ def extract_arcs_from_station(
     track_cache: Optional[Dict[str, Any]] = None,
     tag_with_legacy_apriori: bool = False,
     refraction_verbose: bool = True,
+    logid=None,
+    sweep: Optional['DaySweep'] = None,
     **kwargs,
-) -> List[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+) -> ArcBatch:
     """
     Extract satellite arcs for a station/year/day.
 
@@ -455,12 +649,18 @@ def extract_arcs_from_station(
     refraction_verbose : bool
         Forwarded as ``verbose`` to apply_refraction so batch callers can
         silence the per-day refraction prints. Default: True.
+    logid : file, optional
+        Open log file, forwarded to ``read_snr()`` which records the number
+        of bytes read from each SNR file. Default: None
+    sweep : DaySweep, optional
+        SNR data and arcs of the day shared with the other configurations of
+        a sweep (see ``DaySweep``). Default: None
     **kwargs
         Additional keyword arguments passed to ``extract_arcs()``
 
     Returns
     -------
-    list of (metadata, data) tuples
+    ArcBatch
         See ``extract_arcs()`` for format details.
 
     Raises
@@ -483,34 +683,27 @@ def extract_arcs_from_station(
             f"Run vwc_input (default path) or build_tracks before tagging arcs."
         )
 
-    obsfile, snr_exists = FileManagement(station, 'snr_file', year, doy, snr_type=snr_type).find_snr_file(gzip=gzip)
-    if not snr_exists:
-        raise FileNotFoundError(
-            f"SNR file not found for station={station}, year={year}, "
-            f"doy={doy}, snr_type={snr_type}: {obsfile}"
-        )
-
     screenstats = kwargs.get('screenstats', False)
-    allGood, snr_array, _, _ = read_snr(
-        obsfile, buffer_hours=buffer_hours, screenstats=screenstats,
-    )
-    if not allGood:
-        print(f'No usable SNR data for {station} {year} {doy}, skipping')
-        return []
-
-    # testing, KL, allow removal of GEO Beidou , testing on ALTG data ...
-    if 'exclude_satellites' in station_config:
-        satlist = station_config['exclude_satellites']
-        if len(satlist) > 0:
-            for sat in satlist:
-                j= (snr_array[:,0] == sat)
-                snr_array = np.delete(snr_array, j, axis=0)
-
-    # Apply refraction correction
-    if station_config is not None and station_config.get('refraction', False):
-        snr_array = apply_refraction(snr_array, station_config, year, doy, verbose=refraction_verbose)
-
-    arcs = extract_arcs(snr_array, freq=freq, year=year, doy=doy, **kwargs)
+    if sweep is None:
+        snr_array = load_station_snr(
+            station, year, doy, snr_type=snr_type, buffer_hours=buffer_hours,
+            station_config=station_config, gzip=gzip, screenstats=screenstats,
+            refraction_verbose=refraction_verbose, logid=logid,
+        )
+        if snr_array is None:
+            return ArcBatch.from_arcs([])
+        arcs = extract_arcs(snr_array, freq=freq, year=year, doy=doy, **kwargs)
+    else:
+        load_key = sweep.load_key(snr_type, buffer_hours, station_config)
+        if load_key not in sweep.snr:
+            sweep.snr[load_key] = load_station_snr(
+                station, year, doy, snr_type=snr_type, buffer_hours=buffer_hours,
+                station_config=station_config, gzip=gzip, screenstats=screenstats,
+                refraction_verbose=refraction_verbose, logid=logid,
+            )
+        if sweep.snr[load_key] is None:
+            return ArcBatch.from_arcs([])
+        arcs = sweep.extract_arcs(load_key, freq=freq, year=year, doy=doy, **kwargs)
 
     if track_file is not None:
         attach_track_id(arcs, track_file, year, doy, track_cache=track_cache)
@@ -563,7 +756,7 @@ def extract_arcs_from_file(
     freq: Optional[Union[int, List[int]]] = None,
     buffer_hours: float = 2,
     **kwargs,
-) -> List[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+) -> ArcBatch:
     """
     Extract satellite arcs from an SNR file.
 
@@ -582,7 +775,7 @@ def extract_arcs_from_file(
 
     Returns
     -------
-    list of (metadata, data) tuples
+    ArcBatch
         See ``extract_arcs()`` for format details.
 
     Raises
@@ -621,7 +814,7 @@ def extract_arcs(
     year: Optional[int] = None,
     doy: Optional[int] = None,
     dec: int = 1,
-) -> List[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+) -> ArcBatch:
     """
     Extract satellite arcs from SNR data array.
 
@@ -666,11 +859,13 @@ def extract_arcs(
 
     Returns
     -------
-    list of (metadata, data) tuples
-        Each arc is represented as:
+    ArcBatch
+        The arcs (see arc_batch.py), a sequence of (metadata, data) tuples:
         - metadata: dict with keys: sat, freq, arc_num, arc_type, ele_start, ele_end,
-          az_min_ele, az_avg, time_start, time_end, arc_timestamp, num_pts, delT, edot_factor, cf
+          az_min_ele, az_avg, time_start, time_end, arc_timestamp, num_pts, delT, edot_factor, cf, e1, e2
         - data: dict with keys: ele, azi, snr, seconds, edot (all np.ndarray)
+        The metadata is also held as columns (``meta``) and the samples of
+        all arcs as concatenated arrays (``data``, ``offsets``).
     """
     if azlist is None:
         azlist = [0, 360]
@@ -711,7 +906,9 @@ def extract_arcs(
         l2c_sats = set(int(s) for s in l2c_arr)
         l5_sats = set(int(s) for s in l5_arr)
 
-    all_arcs = []
+    # metadata row and samples of each arc, see arc_batch.py
+    rows = []
+    samples = {k: [] for k in DATA_KEYS}
 
     # Pre-extract column-independent arrays once (not per-column)
     sats = snr_array[:, 0].astype(int)
@@ -778,39 +975,45 @@ def extract_arcs(
             sat_edot = edot_all[sat_indices]
             sat_snr = snr_all[sat_indices]
 
-            for pair_e1, pair_e2 in elev_pairs:
-                if split_arcs:
-                    arc_boundaries = _detect_arc_boundaries(
-                        sat_ele, sat_azi, sat_seconds,
-                        pair_e1, pair_e2, sat,
-                        min_pts=min_pts,
-                    )
-                else:
-                    arc_boundaries = [(0, len(sat_ele), sat, 1)]
-
-                for sind, eind, sat_num, arc_num in arc_boundaries:
-                    # Use views (not copies) — nonzero_mask indexing below creates new arrays
-                    arc_ele = sat_ele[sind:eind]
-                    arc_azi = sat_azi[sind:eind]
-                    arc_seconds = sat_seconds[sind:eind]
-                    arc_edot = sat_edot[sind:eind]
-                    arc_snr = sat_snr[sind:eind]
-
-                    nonzero_mask = arc_snr > 1
-                    if np.count_nonzero(nonzero_mask) < min_pts:
-                        if screenstats:
-                            print(f"No useful data on frequency {sat_freq} / sat {sat}: all zeros")
-                        continue
+            # the arc boundaries and the detrended SNR do not depend on the
+            # elevation angle pair, so they are computed once for all the pairs
+            if split_arcs:
+                arc_boundaries = _detect_arc_boundaries(
+                    sat_ele, sat_azi, sat_seconds,
+                    e1, e2, sat,
+                    min_pts=min_pts,
+                )
+            else:
+                arc_boundaries = [(0, len(sat_ele), sat, 1)]
 
-                    arc_ele = arc_ele[nonzero_mask]
-                    arc_azi = arc_azi[nonzero_mask]
-                    arc_seconds = arc_seconds[nonzero_mask]
-                    arc_edot = arc_edot[nonzero_mask]
-                    arc_snr = arc_snr[nonzero_mask]
+            sat_arcs = []
+            for sind, eind, sat_num, arc_num in arc_boundaries:
+                # Use views (not copies) — nonzero_mask indexing below creates new arrays
+                arc_snr = sat_snr[sind:eind]
 
-                    reqN = 20
-                    if len(arc_ele) <= reqN:
-                        continue
+                nonzero_mask = arc_snr > 1
+                if np.count_nonzero(nonzero_mask) < min_pts:
+                    if screenstats:
+                        print(f"No useful data on frequency {sat_freq} / sat {sat}: all zeros")
+                    continue
+
+                reqN = 20
+                if np.count_nonzero(nonzero_mask) <= reqN:
+                    continue
+
+                sat_arcs.append([
+                    arc_num,
+                    sat_ele[sind:eind][nonzero_mask],
+                    sat_azi[sind:eind][nonzero_mask],
+                    sat_seconds[sind:eind][nonzero_mask],
+                    sat_edot[sind:eind][nonzero_mask],
+                    arc_snr[nonzero_mask],
+                    None,
+                ])
+
+            for pair_e1, pair_e2 in elev_pairs:
+                for sat_arc in sat_arcs:
+                    arc_num, arc_ele, arc_azi, arc_seconds, arc_edot, arc_snr, dt_snr = sat_arc
 
                     if split_arcs:
                         e_mask = (arc_ele > pair_e1) & (arc_ele <= pair_e2)
@@ -854,27 +1057,23 @@ def extract_arcs(
                         pair_e1, pair_e2,
                         az_avg=precomputed_az_avg, cf=cf,
                     )
+                    if filter_to_day and not 0 <= metadata['arc_timestamp'] < 24:
+                        continue
 
-                    # Detrend and apply e_mask in one step
-                    if detrend:
-                        dt_snr = remove_dc_component(arc_ele, arc_snr, polyV, dbhz, pele)
-                    else:
-                        dt_snr = arc_snr.copy() if dbhz else np.power(10, arc_snr / 20)
+                    # Detrend once per arc, then apply e_mask
+                    if dt_snr is None:
+                        if detrend:
+                            dt_snr = remove_dc_component(arc_ele, arc_snr, polyV, dbhz, pele)
+                        else:
+                            dt_snr = arc_snr.copy() if dbhz else np.power(10, arc_snr / 20)
+                        sat_arc[-1] = dt_snr
                     final_snr = dt_snr[e_mask] if e_mask is not None else dt_snr
 
-                    all_arcs.append((metadata, {
-                        'ele': final_ele, 'azi': final_azi,
-                        'snr': final_snr, 'seconds': final_seconds,
-                        'edot': final_edot,
-                    }))
-
-    if filter_to_day:
-        all_arcs = [
-            (meta, data) for meta, data in all_arcs
-            if 0 <= meta['arc_timestamp'] < 24
-        ]
+                    rows.append(tuple(metadata[k] for k in META_KEYS))
+                    for k, a in zip(DATA_KEYS, (final_ele, final_azi, final_snr, final_seconds, final_edot)):
+                        samples[k].append(a)
 
-    return all_arcs
+    return ArcBatch.from_rows(rows, samples)
 
 def _parse_elevation_list(
     e1: float,
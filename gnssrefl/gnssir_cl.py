@@ -13,9 +13,11 @@ from tqdm import tqdm
 #import gnssrefl.gnssir as guts
 import gnssrefl.gnssir_v2 as guts2
 import gnssrefl.gps as g
+import gnssrefl.manifest as manifest
 import gnssrefl.refraction as refr
+import gnssrefl.results_store as results_store
 
-from gnssrefl.utils import str2bool, expand_amplitudes
+from gnssrefl.utils import str2bool, expand_amplitudes, FileManagement
 
 
 def parse_arguments():
@@ -48,11 +50,18 @@ def parse_arguments():
     parser.add_argument("-dec", default=1, type=int, help="decimate SNR file to this sampling rate before computing periodograms")
     parser.add_argument("-savearcs", default=None, type=str, help="boolean, save individual arcs. default is false.")
     parser.add_argument("-savearcs_format", default=None, type=str, help="format of saved arcs (txt or pickle). default is txt")
-    parser.add_argument("-par", default=None, type=int, help="Number of processes to spawn (up to 10)")
+    parser.add_argument("-par", default=None, type=int, help="Number of processes to spawn (up to the number of cores)")
     parser.add_argument("-debug", default=None, type=str, help="remove try/except so that error messages are provided. Parallel processing turned off")
     parser.add_argument("-midnite", default=None, type=str, help="allow midnite crossings (default is true)")
     parser.add_argument("-dbhz", default=None, type=str, help="whether to keep SNR in db-hz (default is false)")
-    parser.add_argument("-lsp_method", default=None, type=str, help="LSP backend: fast (default, astropy NFFT) or scipy (original)")
+    parser.add_argument("-arc_par", default=None, type=int, help="Number of processes for the periodograms of one day (up to the number of cores)")
+    parser.add_argument("-lsp_method", default=None, type=str, help="LSP backend: fast (default, astropy NFFT), scipy (original), batch (all arcs of a day at once), or grid (batch, only minH to maxH)")
+    parser.add_argument("-incremental", default=None, type=str, help="only analyze days whose SNR files or settings changed since their results were written (default is false)")
+    parser.add_argument("-reqc", default=None, type=str, help="apply the QC settings to the periodogram peaks stored by an earlier run instead of reading the SNR files (default is false)")
+    parser.add_argument("-savepeaks", default=None, type=str, help="keep the periodogram peaks of all arcs for later -reqc T runs (default is false)")
+    parser.add_argument("-PkNoise", default=None, type=float, help="peak to noise ratio required for QC, overrides the json")
+    parser.add_argument("-ediff", default=None, type=float, help="allowed elevation angle difference (deg) between arc and e1/e2 for QC, overrides the json")
+    parser.add_argument("-sweep", default=None, nargs="*", type=str, help="more extensions (json files) analyzed in the same pass over the SNR files as -extension")
 
     g.print_version_to_screen()
     #print (sys.version)
@@ -60,7 +69,7 @@ def parse_arguments():
     args = parser.parse_args().__dict__
 
     # convert all expected boolean inputs from strings to booleans
-    boolean_args = ['plt', 'nooverwrite', 'compress', 'mmdd','gzip','savearcs','debug','screenstats','midnite','dbhz']
+    boolean_args = ['plt', 'nooverwrite', 'compress', 'mmdd','gzip','savearcs','debug','screenstats','midnite','dbhz','incremental','reqc','savepeaks']
     args = str2bool(args, boolean_args)
 
     # only return a dictionary of arguments that were added from the user - all other defaults will be set in code below
@@ -72,7 +81,9 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
         azim2: int = 360, nooverwrite: bool = False, extension: str = '', compress: bool = False, 
         screenstats: bool = True, delTmax: int = None, e1: float = None, e2: float = None, 
            mmdd: bool = False, gzip: bool = None, dec : int = 1, savearcs : bool = False, savearcs_format: str='txt',
-           par : int = None, debug : bool=False, midnite : bool=True, dbhz : bool=False, lsp_method : str='fast'):
+           par : int = None, debug : bool=False, midnite : bool=True, dbhz : bool=False, lsp_method : str='fast',
+           arc_par : int = None, incremental : bool = False, reqc : bool = False, PkNoise : float = None,
+           ediff : float = None, sweep : list = None, savepeaks : bool = None):
     """
     gnssir is the main driver for estimating reflector heights. The user is required to 
     have set up an analysis strategy using gnssir_input. 
@@ -84,8 +95,9 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
 
     "secret limits" : arcs must be at least one degree long (in elevation angle).  I can change that - but just a warning.
 
-    Parallel processing is now available. If you set -par to an integer between 2 and 10,
-    it should substantially speed up your processing. Big thank you to AaryanRampal for getting this up and running.
+    Parallel processing is now available. If you set -par to an integer between 2 and the number
+    of cores, it should substantially speed up your processing. The worker processes are started once;
+    each one keeps the station settings and refraction grid, and is sent blocks of consecutive days. Big thank you to AaryanRampal for getting this up and running.
     If you are using the docker, you will need to experiment about how to use this - as they have 
     requirements for multiple processes that I do not know about.
 
@@ -109,6 +121,8 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
         prints out individual arcs to $REFL_CODE/2021/arcs/p041/015
     gnssir p041 2021 1 -doy_end 100 -par 10
         analyze 100 days of data - but spawn 10 processes at a time. Big cpu time savings.
+    gnssir p041 2021 15 -arc_par 4
+        one day of data, with the periodograms computed by 4 processes.
     gnssir p041 2021 15  -snr 99
         uses SNR files with a 99 suffix
     gnssir p041 2021 15  -plt T
@@ -117,8 +131,19 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
         sends more information to the screen
     gnssir p041 2021 15  -nooverwrite T 
         only runs gnssir if there isn't a previous solution
+    gnssir p041 2015 1 -year_end 2024 -doy_end 365 -incremental T
+        only analyzes the days whose SNR files, json settings or gnssrefl version changed
+        since their results were written
+    gnssir p041 2021 1 -doy_end 365 -savepeaks T
+        also keeps the periodogram peaks of all arcs
+    gnssir p041 2021 1 -doy_end 365 -reqc T -PkNoise 3.5 -ampl 8
+        results with other QC settings, from the periodogram peaks stored when the year was
+        analyzed with -savepeaks T. The SNR files are not read
     gnssir p041 2021 15  -extension strategy1
         runs gnssir using json file called p041.strategy1.json
+    gnssir p041 2021 1 -doy_end 365 -sweep strategy1 strategy2
+        results of the json files of no extension, strategy1 and strategy2, each in its own
+        results directory. The SNR files are read once for all three
     gnssir p041 2021 15  -doy_end 20 
         Analyzes data from day of year 15 to day of year 20
     gnssir p041 2021 15 -dec 5
@@ -211,7 +236,7 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
     savearcs_format : str, optional
         format of saved arc files, txt or pickle. default is txt
     par : int, optional
-        number of parallel processing jobs. 
+        number of parallel processing jobs, at most the number of cores.
     debug : bool, optional
         remove the primary call from try/except so that you have a better idea of why the code
         might be crashing. No parallel processing in this mode
@@ -219,6 +244,42 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
         whether arcs can cross midnite
     dbhz : bool
         whether to keep SNR data in db-hz. default (false) is to convert to linear scale
+    lsp_method : str
+        periodogram backend. fast (default) uses the astropy NFFT, scipy the original
+        SciPy code, and batch (lsp_batch.py) computes the periodograms of all arcs
+        of a day together, which is several times faster. grid is batch evaluated
+        only for reflector heights between minH and maxH, useful when minH is large
+    arc_par : int, optional
+        number of processes used for the periodograms within one day. Meant for single
+        days (e.g. near real-time stations); it cannot be combined with -par.
+        The results are the same, in the same order, as without it.
+    incremental : bool, optional
+        skip the days whose results were made from the same inputs: SNR files (with the
+        adjacent days when midnite is set), refraction file, json settings and overrides, and
+        gnssrefl version. These are kept in a manifest next to the result files, which is
+        only written by -incremental T runs. The version is that of the installed package, so
+        code changes that keep the version number are not detected. Default is False (every
+        day is analyzed).
+    reqc : bool, optional
+        apply the QC settings of this run (PkNoise, reqAmp, ediff and delTmax) to the periodogram
+        peaks stored by an earlier -savepeaks T (or -reqc T) run and write the result and failQC
+        files again, without reading the SNR files. Days without stored peaks, analyzed with other
+        settings, or with arcs that now pass ediff/delTmax but had no periodogram, are analyzed as
+        usual, and their peaks are stored. Not used with savearcs. Default is False.
+    PkNoise : float, optional
+        required peak to noise ratio, overrides the json
+    ediff : float, optional
+        QC of the elevation angle range of an arc (deg), overrides the json
+    sweep : list of str, optional
+        more extensions to analyze with the extension of the run. Each one uses its own json,
+        with the command line settings of this run, and writes its results to its own directory.
+        The SNR file of a day is read and refraction corrected once for all of them, and the
+        json files that only differ in the elevation angles or azimuth regions share their arcs.
+        The results are those of separate runs. Default is None.
+    savepeaks : bool, optional
+        keep the periodogram peak, amplitude and noise of every arc of a day, including the ones
+        that fail QC, in results/ssss/peaks/ddd.npz, for later -reqc T runs. Can also be set with
+        savepeaks in the json. Default is False.
 
     """
     vers = 'gnssrefl version ' + str(g.version('gnssrefl'))
@@ -276,6 +337,10 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
 
     if delTmax is not None:
         station_config['delTmax'] = delTmax
+    if PkNoise is not None:
+        station_config['PkNoise'] = PkNoise
+    if ediff is not None:
+        station_config['ediff'] = ediff
 
     if ((station_config['maxH'] - station_config['minH']) < 5):
         print('Requested reflector heights (', station_config['minH'], ',', station_config['maxH'], ') are too close together. Exiting.')
@@ -315,6 +380,12 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
         sys.exit()
 
     station_config['nooverwrite'] = nooverwrite
+    station_config['incremental'] = incremental
+    station_config['reqc'] = reqc
+    if savepeaks is not None:
+        station_config['savepeaks'] = savepeaks
+    elif 'savepeaks' not in station_config:
+        station_config['savepeaks'] = False
 
     if e1 is not None:
         station_config['e1'] = e1
@@ -336,24 +407,7 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
     if setA == 2:
         station_config['azval2'] = [azim1,  azim2]
 
-    # this is for when you want to run the code with just a single frequency, i.e. input at the console
-    # rather than using the input restrictions
-
-    if len(fr) > 0:
-        original_freqs = station_config['freqs']
-        original_reqAmp = station_config['reqAmp']
-        missing = [f for f in fr if f not in original_freqs]
-        station_config['freqs'] = fr
-        if ampl is None:
-            if missing:
-                print(f'Note: -fr requested {missing}, not in your json, so no reqAmp is listed for them.')
-                print(f'  Using the json default {original_reqAmp[0]} for those; pass -ampl to set it yourself.')
-            # keep each in-json frequency's configured threshold; missing frequencies fall back to the first value
-            station_config['reqAmp'] = [original_reqAmp[original_freqs.index(f)] if f in original_freqs else original_reqAmp[0] for f in fr]
-
-    amps = expand_amplitudes(ampl, station_config['freqs'])
-    if amps is not None:
-        station_config['reqAmp'] = amps   # per-run only; never written to the json
+    set_frequencies(station_config, fr, ampl)
 
     if sat is not None:
         station_config['onesat'] = [sat]
@@ -422,6 +476,19 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
     # should make sure there are directories for the results ... 
     g.checkFiles(station.lower(), extension)
 
+    # the results stores are rewritten before the days are analyzed, see results_store.py
+    for ext in [extension] + (sweep or []):
+        for y in range(year, year_end + 1):
+            for filetype in ['gnssir_result', 'gnssir_failqc_result']:
+                result_file = FileManagement(station.lower(), filetype, y, 1, extension=ext).get_file_path(ensure_directory=False)
+                results_store.compact_store(result_file.parent)
+
+    # one line per day in the manifests, before the workers append to them
+    if incremental:
+        for ext in [extension] + (sweep or []):
+            for y in range(year, year_end + 1):
+                manifest.compact_manifest(manifest.manifest_name(station.lower(), y, 'results', ext))
+
     print('Requested frequencies ', station_config['freqs'])
 
 
@@ -434,14 +501,58 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
             print('You are analyzing only one day of data - no reason to submit multiple processes')
             par = None
 
+    if arc_par is not None and arc_par > 1:
+        ncores = multiprocessing.cpu_count()
+        if par:
+            print('-arc_par cannot be used together with -par. Periodograms will be computed in each day process.')
+            arc_par = None
+        elif arc_par > ncores:
+            print('You asked for', arc_par, 'processes but this machine has', ncores, 'cores. Submit again. Exiting.')
+            sys.exit()
+    station_config['arc_par'] = arc_par
+
+    # the other configurations of a sweep: their json with the command line settings of this run
+    if sweep:
+        # the settings gnssir always takes from the command line
+        overrides = {k: station_config[k] for k in ['midnite', 'plt_screen', 'wantCompression', 'screenstats',
+                                                    'dec', 'dbhz', 'nooverwrite', 'incremental', 'reqc', 'mmdd',
+                                                    'savearcs', 'savearcs_format', 'arc_par']}
+        # and the ones the user set
+        for k, v in [('delTmax', delTmax), ('PkNoise', PkNoise), ('ediff', ediff), ('e1', e1), ('e2', e2),
+                     ('lsp_method', lsp_method), ('gzip', gzip), ('savepeaks', savepeaks)]:
+            if v is not None:
+                overrides[k] = v
+        if setA == 2:
+            overrides['azval2'] = [azim1, azim2]
+        if sat is not None:
+            overrides['onesat'] = [sat]
+        args['sweep'] = []
+        for ext in sweep:
+            sweep_config = guts2.read_json_file(station, ext)
+            if 'azval2' not in sweep_config:
+                print('An azval2 variable was not found in the json of extension', ext, '. Exiting')
+                sys.exit()
+            sweep_config.update(overrides)
+            set_frequencies(sweep_config, fr, ampl)
+            if gzip is None:
+                guts2.gzip_migration(sweep_config, station, ext)
+            sweep_config.setdefault('savepeaks', False)
+            sweep_config.setdefault('refr_model', 1)
+            sweep_config.setdefault('lsp_method', 'fast')
+            args['sweep'].append((ext, sweep_config))
+            for y in range(year, year_end + 1):
+                g.result_directories(station, y, ext)
+            g.checkFiles(station.lower(), ext)
+
     if not par:
         print('Parallel processing not requested\n')
         additional_args = { "args": args }
         process_year(year,year_end,doy,doy_end, **additional_args)
 
     else:
-        if par > 10:
-            print('For now we will only allow ten simultaneous processes. Submit again. Exiting.')
+        ncores = multiprocessing.cpu_count()
+        if par > ncores:
+            print('You asked for', par, 'processes but this machine has', ncores, 'cores. Submit again. Exiting.')
             sys.exit()
 
         print('Per-day output suppressed in parallel mode. Run without -par to see detailed output.')
@@ -456,11 +567,12 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
 
         manager = multiprocessing.Manager()
         error_queue = manager.Queue()
-        pool = multiprocessing.Pool(processes=par)
+        # the settings go to each worker once; the tasks are just (year, doy)
+        years = sorted(set(y for y, d in day_list))
+        pool = multiprocessing.Pool(processes=par, initializer=init_day_worker, initargs=(args, error_queue, years))
 
-        worker_args = [(y, d, args, error_queue) for y, d in day_list]
         total_arcs = 0
-        with tqdm(pool.imap_unordered(process_day_worker, worker_args),
+        with tqdm(pool.imap_unordered(process_day_worker, day_list, chunksize=day_chunksize(len(day_list), par)),
                   total=len(day_list),
                   desc=f"gnssir {station}",
                   unit="day") as pbar:
@@ -492,6 +604,52 @@ def gnssir(station: str, year: int, doy: int, snr: int = 66, plt: bool = False,
         print(f'Processed {ndays} days in {elapsed} s ({round(elapsed/ndays, 2)} s/day)')
 
 
+def set_frequencies(station_config, fr, ampl):
+    """
+    Applies the -fr and -ampl command line settings to station_config.
+
+    Parameters
+    ----------
+    station_config : dict
+        station analysis parameters from the json
+    fr : list of int
+        frequencies to analyze, empty for those of the json
+    ampl : list of float
+        required periodogram amplitudes, None for those of the json
+    """
+    # this is for when you want to run the code with just a single frequency, i.e. input at the console
+    # rather than using the input restrictions
+
+    if len(fr) > 0:
+        original_freqs = station_config['freqs']
+        original_reqAmp = station_config['reqAmp']
+        missing = [f for f in fr if f not in original_freqs]
+        station_config['freqs'] = fr
+        if ampl is None:
+            if missing:
+                print(f'Note: -fr requested {missing}, not in your json, so no reqAmp is listed for them.')
+                print(f'  Using the json default {original_reqAmp[0]} for those; pass -ampl to set it yourself.')
+            # keep each in-json frequency's configured threshold; missing frequencies fall back to the first value
+            station_config['reqAmp'] = [original_reqAmp[original_freqs.index(f)] if f in original_freqs else original_reqAmp[0] for f in fr]
+
+    amps = expand_amplitudes(ampl, station_config['freqs'])
+    if amps is not None:
+        station_config['reqAmp'] = amps   # per-run only; never written to the json
+
+
+def analyze_day(args):
+    """
+    gnssir_guts_v2 for one day, or gnssir_sweep_v2 when args has the other
+    configurations of a sweep.
+    """
+    if args.get('sweep'):
+        configs = [(args['extension'], args['station_config'])] + args['sweep']
+        guts2.gnssir_sweep_v2(args['station'], args['year'], args['doy'], args['snr_type'], configs, args['debug'],
+                              setup=args.get('setup', True))
+    else:
+        guts2.gnssir_guts_v2(**{k: v for k, v in args.items() if k != 'sweep'})
+
+
 def count_result_arcs(result_path):
     """Count non-comment lines in a result file."""
     try:
@@ -512,10 +670,10 @@ def process_year(year, year_end, doy, doy_end, args):
         args['year'] = y
         args['doy'] = d
         if debug:
-            guts2.gnssir_guts_v2(**args)
+            analyze_day(args)
         else:
             try:
-                guts2.gnssir_guts_v2(**args)
+                analyze_day(args)
             except:
                 print('***********************************************************************')
                 print('Try using -debug T to get better information about why the code crashed:  ',y,d)
@@ -524,24 +682,84 @@ def process_year(year, year_end, doy, doy_end, args):
     return
 
 
-def process_day_worker(worker_args):
-    """Worker for parallel gnssir processing. Returns arc count for progress bar."""
-    year, doy, args, error_queue = worker_args
+# settings of a gnssir worker process, set once by init_day_worker
+_worker = {}
+
+
+def day_chunksize(ndays, par):
+    """
+    Number of consecutive days sent to a worker at a time.
+
+    Aims for about four blocks per worker, so the pool stays balanced when some
+    days take longer than others, and a block is never more than a month.
+
+    Parameters
+    ----------
+    ndays : int
+        number of days to analyze
+    par : int
+        number of worker processes
+
+    Returns
+    -------
+    chunksize : int
+    """
+    return int(max(1, min(31, ndays // (4*par))))
+
+
+def init_day_worker(args, error_queue, years):
+    """
+    Initializer for the gnssir worker processes.
+
+    Keeps the gnssir_guts_v2 inputs and the error queue, reads the refraction
+    grid and opens /dev/null for the per-day output once per process. The
+    environment variables and the Files, orbit and result directories of all
+    the years of the run are checked here, so the days skip that (setup=False).
+
+    Parameters
+    ----------
+    args : dict
+        gnssir_guts_v2 inputs (analyze_day), without year and doy
+    error_queue : multiprocessing queue
+        for the exceptions of the days
+    years : list of int
+        years of the days of the run
+    """
+    station = args['station']
+    g.check_environ_variables()
+    g.checkFiles(station, '')
+    extensions = [args['extension']] + [extension for extension, config in args.get('sweep') or []]
+    for year in years:
+        g.make_nav_dirs(year)
+        for extension in extensions:
+            g.result_directories(station, year, extension)
+
+    _worker['args'] = dict(args, setup=False)
+    _worker['error_queue'] = error_queue
+    _worker['devnull'] = open(os.devnull, 'w')
+    _worker['xdir'] = str(os.environ['REFL_CODE'])
+    station_config = args['station_config']
+    if station_config.get('refraction', False):
+        refr.read_4by5(station_config['station'], station_config['lat'], station_config['lon'], station_config['ht'])
+
+
+def process_day_worker(day):
+    """Worker for parallel gnssir processing of one (year, doy). Returns arc count for progress bar."""
+    year, doy = day
     try:
-        args = dict(args)
+        args = dict(_worker['args'])
         args['year'] = year
         args['doy'] = doy
-        with contextlib.redirect_stdout(open(os.devnull, 'w')):
-            guts2.gnssir_guts_v2(**args)
-        xdir = str(os.environ['REFL_CODE'])
+        with contextlib.redirect_stdout(_worker['devnull']):
+            analyze_day(args)
         station = args['station']
-        result_path = os.path.join(xdir, str(year), 'results', station, f'{doy:03d}.txt')
+        result_path = os.path.join(_worker['xdir'], str(year), 'results', station, f'{doy:03d}.txt')
         return count_result_arcs(result_path)
     except Exception as e:
         print('***********************************************************************')
         print('Try using -debug T to get better information about why the code crashed: ',year,doy)
         print('***********************************************************************')
-        error_queue.put(e)
+        _worker['error_queue'].put(e)
         return 0
 
 
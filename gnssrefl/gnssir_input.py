@@ -62,13 +62,14 @@ def parse_arguments():
     parser.add_argument("-archive", default=None, type=str, help="optional archive value used when creating SNR files")
     parser.add_argument("-Hdates", nargs="*", type=str, help="dates of Hortho values(testing)")
     parser.add_argument("-gzip", default=None, type=str, help="Re-gzip SNR files after gnssir reads them, default is T")
+    parser.add_argument("-refine_peak", default=None, type=str, help="Set to T for a coarse periodogram plus a local refinement of the peak, default is F")
 
     args = parser.parse_args().__dict__
 
     g.print_version_to_screen()
 
     # convert all expected boolean inputs from strings to booleans
-    boolean_args = ['allfreq', 'l1', 'l2c', 'l5', 'xyz', 'refraction','subdaily_alt_sigma', 'gzip']
+    boolean_args = ['allfreq', 'l1', 'l2c', 'l5', 'xyz', 'refraction','subdaily_alt_sigma', 'gzip', 'refine_peak']
     args = str2bool(args, boolean_args)
 
     # only return a dictionary of arguments that were added from the user - all other defaults will be set in code below
@@ -87,7 +88,7 @@ def make_gnssir_input(station: str, lat: float=0, lon: float=0, height: float=0,
                       subdaily_knots : int=None, subdaily_sigma: float=None, subdaily_subdir: str=None, 
                       subdaily_spline_outlier1: float=None, subdaily_spline_outlier2: float=None, snr: int=None, 
                       stream: str=None , samplerate: int=None, dec: int=None, orb: str=None, archive: str=None,
-                      Hdates: str=None, gzip: bool=True):
+                      Hdates: str=None, gzip: bool=True, refine_peak: bool=False):
 
     """
     This new script sets the Lomb Scargle analysis strategy you will use in gnssir. It saves your inputs 
@@ -330,6 +331,10 @@ def make_gnssir_input(station: str, lat: float=0, lon: float=0, height: float=0,
         happen if you moved your GNSS antenna vertical between installations.
         Uses format of 2024-11-01 15:22
         You must include all of these values in this format (i.e. you cannot leave off HH:MM)
+    refine_peak : bool, optional
+        gnssir computes a coarse periodogram and refines only the highest peaks,
+        with a parabola through the fine samples. Fewer frequencies are evaluated and
+        the RH is not limited to the desiredP grid. default is False
 
 
     """
@@ -467,7 +472,7 @@ def make_gnssir_input(station: str, lat: float=0, lon: float=0, height: float=0,
 
     station_config['ediff'] = ediff # degrees
     station_config['desiredP'] = 0.005 # precision of RH in meters
-    station_config['lsp_method'] = 'fast' # LSP backend: 'fast' (astropy NFFT) or 'scipy'
+    station_config['lsp_method'] = 'fast' # LSP backend: 'fast' (astropy NFFT), 'scipy', 'batch' or 'grid'
     # azimuth regions in degrees (in pairs)
     # you can of course have more subdivisions here
     #if (az_list[0]) == 0 & (az_list[-1] == 360):
@@ -535,6 +540,9 @@ def make_gnssir_input(station: str, lat: float=0, lon: float=0, height: float=0,
     # gzip SNR files after running the code
     station_config['gzip'] = gzip
 
+    # coarse periodogram plus a local refinement of the peak (see lsp_batch.refine_peaks)
+    station_config['refine_peak'] = refine_peak
+
     # for people that don't know how to input pairs of angles
     if ( (len(ellist) % 2) != 0):
         print('You input an illegal list of elevation angles. There must be an even number of elevation angle values.')
@@ -13,12 +13,14 @@ import warnings
 
 from importlib.metadata import version
 
+import gnssrefl.arc_peaks as arc_peaks
 import gnssrefl.gps as g
+import gnssrefl.manifest as manifest
 import gnssrefl.retrieve_rh as r
 from gnssrefl.gnss_frequencies import get_sat_list, get_display_label, get_scale_factor, is_valid_frequency
 from gnssrefl.utils import FileManagement, FileTypes
 
-def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debug):
+def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debug, sweep=None, setup=True):
     """
 
     Computes lomb scargle periodograms for a given station, year, day of year etc.
@@ -83,17 +85,35 @@ def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debu
             whether midnite arcs are alloweed 
         dbhz : bool
             whether db-hz (True) or volts/volts (False) are used for SNR data
+        incremental : bool
+            if true, the day is skipped when the result file exists and its inputs and
+            settings did not change since it was written (see manifest.py)
+        reqc : bool
+            if true, the QC settings (PkNoise, reqAmp, ediff, delTmax) are applied to the
+            periodogram peaks stored by an earlier run (see arc_peaks.py) instead of
+            analyzing the SNR files. Not used with savearcs
+        savepeaks : bool
+            if true (or with reqc), the periodogram peaks of all arcs are written for
+            later reqc runs
         
     debug : bool
         debugging value to help track down bugs
+    sweep : extract_arcs.DaySweep, optional
+        SNR data and arcs of the day shared with the other configurations of a
+        sweep, see gnssir_sweep_v2
+    setup : bool, optional
+        check the environment variables and make the Files, orbit and result
+        directories. False when that was done already for all the days of a run
+        (the gnssir worker processes, see gnssir_cl.init_day_worker)
 
     """
 
-    #   make sure environment variables exist.  set to current directory if not
-    g.check_environ_variables()
+    if setup:
+        #   make sure environment variables exist.  set to current directory if not
+        g.check_environ_variables()
 
-    # make sure REFL_CODE/Files/station directory exists ...
-    g.checkFiles(station, '')
+        # make sure REFL_CODE/Files/station directory exists ...
+        g.checkFiles(station, '')
     midnite = station_config['midnite']
 
     if 'ellist' in station_config.keys():
@@ -112,14 +132,11 @@ def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debu
         print('They must be at least 5 meters apart - and preferably further than that.')
         return
 
-    e1=station_config['e1']; e2=station_config['e2']
     azvalues = rewrite_azel(station_config.get('azval2'))
     if not azvalues:
         print('This module requires azval2 to be set in gnssir_input. This record is not present in your json.')
         sys.exit()
 
-    pele = station_config['pele']
-
     freqs = station_config['freqs'] ; reqAmp = station_config['reqAmp']
 
     ok = all(is_valid_frequency(f) for f in freqs)
@@ -139,8 +156,9 @@ def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debu
     if dec != 1:
         print('Using decimation value: ', dec)
 
-    ann = g.make_nav_dirs(year) # make sure directories are there for orbits
-    g.result_directories(station,year,extension) # make directories for the LSP results
+    if setup:
+        g.make_nav_dirs(year) # make sure directories are there for orbits
+        g.result_directories(station,year,extension) # make directories for the LSP results
 
     fname, resultExist = g.LSPresult_name(station,year,doy,extension)
     if screenstats:
@@ -153,6 +171,41 @@ def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debu
         print('>>>>> The result file already exists for this day and you have selected the do not overwrite option')
         return
 
+    if 'exclude_satellites' not in station_config:
+        station_config['exclude_satellites'] = []
+
+    # inputs and settings of this day, see manifest.py
+    incremental = station_config.get('incremental', False)
+    manifest_file = manifest.manifest_name(station, year, 'results', extension)
+    settings_key = manifest.settings_key(station_config, snr_type=snr_type)
+    if incremental and resultExist:
+        inputs = manifest.snr_inputs(station, year, doy, snr_type, station_config)
+        if manifest.is_current(manifest_file, doy, settings_key, inputs, fname):
+            print('>>>>> The inputs and settings of this day did not change since the result file was written')
+            return
+
+    # the periodogram peaks of all arcs, see arc_peaks.py
+    peaks_file = arc_peaks.peaks_name(station, year, doy, extension)
+    peaks_key = arc_peaks.peaks_key(station_config, snr_type)
+    if station_config.get('reqc', False) and not station_config.get('savearcs', False):
+        peaks = arc_peaks.read_peaks(peaks_file, peaks_key)
+        reqc = None if peaks is None else arc_peaks.reqc_day(peaks, station_config)
+        if reqc is None:
+            print('>>>>> The stored periodogram peaks cannot be used for this day, so it is analyzed again')
+        else:
+            all_lsp, all_failqc, qc_lines = reqc
+            print('QC applied to the stored periodogram peaks. LSP Results will be written to:', fname)
+            r.write_results(station, year, doy, extension, all_lsp, all_failqc, station_config['mmdd'])
+            if qc_lines:
+                print('\n'.join(qc_lines) + '\n')
+            if logid is not None:
+                logid.write('QC applied to the stored periodogram peaks (gnssir -reqc)\n' + '\n'.join(qc_lines) + '\n')
+                logid.close()
+            # the same inputs, other QC settings
+            if incremental:
+                manifest.rekey(manifest_file, doy, settings_key, fname)
+            return
+
     print('LSP Results will be written to:', fname)
     irefr = station_config.get('refr_model', 1) if station_config.get('refraction', False) else 0
 
@@ -161,25 +214,84 @@ def gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debu
         print('Midnite option enabled: loading +/- 2 hours from adjacent days')
 
     from gnssrefl.extract_arcs import extract_arcs_from_station
-    if 'exclude_satellites' not in station_config:
-        station_config['exclude_satellites'] = []
-
 
     try:
         arcs = extract_arcs_from_station(
-            station, year, doy, freq=freqs, snr_type=snr_type,
-            buffer_hours=buffer_hours, dec=dec,
-            e1=e1, e2=e2, ellist=ellist, azlist=azvalues,
-            polyV=station_config['polyV'], pele=pele, dbhz=station_config['dbhz'],
-            extension=extension,
+            station, year, doy, snr_type=snr_type,
+            buffer_hours=buffer_hours, extension=extension,
             gzip=gzip, station_config=station_config,
-            sat_list=station_config['onesat'],
+            logid=logid, sweep=sweep, **arc_settings(station_config),
         )
     except FileNotFoundError as e:
         print(str(e))
         return
 
-    r.retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats, irefr, logid, logfilename, station_config['dbhz'])
+    all_peaks = r.retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats, irefr, logid, logfilename, station_config['dbhz'])
+    if station_config.get('savepeaks', False) or station_config.get('reqc', False):
+        arc_peaks.write_peaks(peaks_file, all_peaks, peaks_key, 22 if station_config['mmdd'] else 17)
+    # after the run: the SNR file may have been compressed meanwhile
+    if incremental:
+        manifest.record(manifest_file, doy, settings_key, manifest.snr_inputs(station, year, doy, snr_type, station_config), fname)
+
+
+
+def arc_settings(station_config):
+    """
+    extract_arcs keyword arguments of the analysis settings of a station.
+
+    Parameters
+    ----------
+    station_config : dict
+        station analysis parameters, see gnssir_guts_v2
+
+    Returns
+    -------
+    dict
+        freq, dec, e1, e2, ellist, azlist, polyV, pele, dbhz and sat_list
+    """
+    return {'freq': station_config['freqs'], 'dec': int(station_config.get('dec', 1)),
+            'e1': station_config['e1'], 'e2': station_config['e2'],
+            'ellist': station_config.get('ellist', []),
+            'azlist': rewrite_azel(station_config.get('azval2')),
+            'polyV': station_config['polyV'], 'pele': station_config['pele'],
+            'dbhz': station_config['dbhz'], 'sat_list': station_config['onesat']}
+
+
+def gnssir_sweep_v2(station, year, doy, snr_type, configs, debug, setup=True):
+    """
+    Runs gnssir_guts_v2 with several analysis settings on one day, e.g. the
+    json files of several extensions.
+
+    The SNR file is read and refraction corrected once for all of them, and
+    the settings that only differ in the elevation angles (e1, e2, ellist) or
+    the azimuth regions (azval2) share their arcs (see extract_arcs.DaySweep).
+    The results of each configuration are written to its own extension
+    directory, the files a gnssir_guts_v2 run with those settings writes.
+
+    Parameters
+    ----------
+    station : str
+        4 character station name
+    year : int
+        full year
+    doy : int
+        day of year
+    snr_type : int
+        snr file type
+    configs : list of (str, dict)
+        extension and station_config of each configuration
+    debug : bool
+        debugging value to help track down bugs
+    setup : bool, optional
+        see gnssir_guts_v2
+
+    """
+    from gnssrefl.extract_arcs import DaySweep
+
+    sweep = DaySweep([arc_settings(station_config) for extension, station_config in configs])
+    for extension, station_config in configs:
+        gnssir_guts_v2(station, year, doy, snr_type, extension, station_config, debug, sweep=sweep, setup=setup)
+
 
 def local_update_plot(x,y,px,pz,ax1, ax2,failure):
     """
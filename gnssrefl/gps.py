@@ -45,6 +45,9 @@ import gnssrefl.EGM96 as EGM96
 import gnssrefl.rinex2snr as rnx
 import gnssrefl.sd_libs as sd
 import gnssrefl.kelly as kelly
+import gnssrefl.orbit_cache as orbit_cache
+import gnssrefl.hatanaka as hatanaka
+import gnssrefl.compression as compression
 import gnssrefl.utils as u
 from gnssrefl.gnss_frequencies import is_valid_frequency, get_scale_factor, get_display_label, CONSTELLATIONS
 
@@ -1367,7 +1370,7 @@ def get_ofac_hifac(elevAngles, cf, maxH, desiredPrec):
 
     return ofac, hifac
 
-def strip_compute(x,y,cf,maxH,desiredP,minH,lsp_method='fast'):
+def strip_compute(x,y,cf,maxH,desiredP,minH,lsp_method='fast',refine=False):
     """
     strips snr data
 
@@ -1386,7 +1389,12 @@ def strip_compute(x,y,cf,maxH,desiredP,minH,lsp_method='fast'):
     minH : float
         minimum reflector height in meters
     lsp_method : str
-        'fast' for AstroPy NFFT (default), 'scipy' for original SciPy
+        'fast' for AstroPy NFFT (default), 'scipy' for original SciPy,
+        'batch' for the engine in lsp_batch (meant for many arcs at once),
+        'grid' for the same engine evaluated only for RH between minH and maxH
+    refine : bool
+        coarse periodogram plus a local refinement of the best peak
+        (lsp_batch.refine_peaks). lsp_method is then not used.
 
     Returns
     -------
@@ -1405,6 +1413,10 @@ def strip_compute(x,y,cf,maxH,desiredP,minH,lsp_method='fast'):
     pz : numpy array
         periodogram, y-axis, volts/volts
     """
+    if refine or lsp_method in ['batch', 'grid']:
+        from gnssrefl.lsp_batch import strip_compute_batch
+        return strip_compute_batch([(x, y, cf)], maxH, desiredP, minH, lsp_method, refine=refine)[0]
+
     ofac,hifac = get_ofac_hifac(x,cf,maxH,desiredP)
     if np.isnan(ofac):
         print("WARNING - bad ofac")
@@ -3639,7 +3651,7 @@ def teqc_version():
 def snr_exist(station,year,doy,snrEnd):
     """
     check to see if the SNR file already exists
-    uncompresses if necessary (gz or xz)
+    uncompresses if necessary (xz). gzip and zstd files are left compressed
 
     Parameters
     ----------
@@ -3664,7 +3676,6 @@ def snr_exist(station,year,doy,snrEnd):
     f= station + cdoy + '0.' + cyy + '.snr' + snrEnd
     fname = xdir + '/' + cyyyy + '/snr/' + station + '/' + f
     fname2 = xdir + '/' + cyyyy + '/snr/' + station + '/' + f  + '.xz'
-    fname3 = xdir + '/' + cyyyy + '/snr/' + station + '/' + f  + '.gz'
     snre = False
     # check for both
     if os.path.isfile(fname):
@@ -3672,10 +3683,9 @@ def snr_exist(station,year,doy,snrEnd):
     if os.path.isfile(fname2) and (not snre):
         snre = True # but needs to be uncompressed
         subprocess.call(['unxz', fname2])
-    if os.path.isfile(fname3) and (not snre):
-        snre = True # but needs to be ungzipped 
-        #subprocess.call(['gunzip', fname3])
-        #TS - Removed this line Aug 2023 to stop unecessary decompression in nmea2snr
+    if any(os.path.isfile(f3) for f3 in compression.compressed_versions(fname)) and (not snre):
+        snre = True # compressed (gz or zst), readers decompress it in memory
+        #TS - Removed gunzip Aug 2023 to stop unecessary decompression in nmea2snr
 
     return snre 
 
@@ -4003,6 +4013,9 @@ def read_sp3file(file_path):
     It is for the python only version of the translator, which 
     should be deprecated
 
+    The parsed file is kept in the orbit cache (orbit_cache.py), so an
+    orbit file used for many stations is only parsed once.
+
     Returns
     -------
     sp3 : ndarray
@@ -4011,6 +4024,13 @@ def read_sp3file(file_path):
     satnum has 0, 100, 200, 300 added for gps, glonass, galileo,beidou,
     respectively.  all other satellites are ignored
 
+    """
+    return orbit_cache.read_sp3(file_path, _parse_sp3file)
+
+
+def _parse_sp3file(file_path):
+    """
+    parses an sp3 file, see read_sp3file
     """
     ignorePoint = False
     max_sat = 150 # not used
@@ -7413,7 +7433,14 @@ def crx2rnx(crnx_filename):
     # name of the "rnx" file
     rnx_filename = crnx_filename[0:-3] + 'rnx'
     # hatanaka 
-    subprocess.call([crnxpath, crnx_filename])
+    if os.path.exists(crnxpath):
+        subprocess.call([crnxpath, crnx_filename])
+    else:
+        # no executable, use the python decoder
+        try:
+            hatanaka.crx2rnx(crnx_filename, rnx_filename)
+        except (hatanaka.CompactRinexError, OSError, ValueError) as error:
+            print(error)
     if os.path.isfile(rnx_filename):
         print('successful conversion from crnx to rnx, so removing crnx file now')
         subprocess.call(['rm', crnx_filename])
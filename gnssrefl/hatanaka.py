@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Hatanaka (Compact RINEX) decompression without the CRX2RNX executable.
+
+This is a port of CRX2RNX ver. 4.1.0 by Y. Hatanaka (vendor/crx2rnx.c) for
+Compact RINEX 1.0 (RINEX 2) and 3.0 (RINEX 3 and 4) files. crx2rnx_lines
+decodes a stream of lines and yields the RINEX lines as it goes, so a
+Hatanaka file can be read by rinpy.streamrinexfile directly, without writing
+the RINEX file to disk or starting a process. The output is the same, byte for
+byte, as that of CRX2RNX.
+
+Every data field of a Compact RINEX file is the n-th order difference of the
+observable along its arc, so it can only be recovered epoch by epoch. Fields
+of observables that are not wanted (keep_obs) are skipped rather than
+recovered, and written as blank fields.
+"""
+import gzip
+import itertools
+import os
+
+# maximum order of difference (MAX_DIFF_ORDER in crx2rnx.c)
+MAX_DIFF_ORDER = 5
+
+
+class CompactRinexError(Exception):
+    pass
+
+
+def is_crinex(line):
+    """
+    Whether a line is the first line of a Compact RINEX file.
+
+    Parameters
+    ----------
+    line : str
+        first line of the file
+
+    Returns
+    -------
+    bool
+    """
+    return line[60:80].startswith('CRINEX VERS   / TYPE')
+
+
+def _fixed(value, width, decimals):
+    """ value/10**decimals as Fw.d, without the leading zero of |x| < 1 (as CRX2RNX) """
+    ip, fp = divmod(-value if value < 0 else value, 10**decimals)
+    text = '.%0*d' % (decimals, fp)
+    if ip:
+        text = str(ip) + text
+    if value < 0:
+        text = '-' + text
+    return text.rjust(width)
+
+
+def _repair(old, diff):
+    """ Applies a difference string to a text: blank keeps the old character, & is a space """
+    if not diff:
+        return old
+    n = len(old)
+    if len(diff) >= n and ' ' not in diff:
+        return diff.replace('&', ' ')
+    out = [o if d == ' ' else d for o, d in zip(old, diff)]
+    out.append(diff[n:])
+    out.append(old[len(diff):])
+    return ''.join(out).replace('&', ' ')
+
+
+def _epoch_ok(line, offset):
+    """ the checks CRX2RNX makes on a recovered epoch line """
+    p = offset
+    return len(line) >= 26 + offset and line[p+23] == ' ' and line[p+24] == ' ' and line[p+25].isdigit()
+
+
+def _initialized_epoch(dline, ep_top_from, offset):
+    """ whether a line starts a new (initialized) epoch, see skip_to_next in crx2rnx.c """
+    p = offset
+    return (dline[:1] == ep_top_from and len(dline) >= 29 and dline[p] == ' ' and dline[p+3] == ' '
+            and dline[p+6] == ' ' and dline[p+9] == ' ' and dline[p+12] == ' ' and dline[p+23] == ' '
+            and dline[p+24] == ' ' and dline[p+25:p+26].isdigit())
+
+
+def _kept(observables, keep_obs):
+    """ indices of the observables that are recovered """
+    return [k for k, obs in enumerate(observables) if keep_obs is None or obs.startswith(keep_obs)]
+
+
+def crx2rnx_lines(lines, keep_obs=None):
+    """
+    Decompresses a Compact RINEX file.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        the lines of a Compact RINEX 1.0 or 3.0 file, e.g. an open file
+    keep_obs : str or tuple of str, optional
+        only recover the observables whose names start with this (as rinpy
+        keep_obs). The fields of the other observables are written blank.
+        Default is all observables, which gives the same file as CRX2RNX.
+
+    Returns
+    -------
+    generator of str
+        the lines of the RINEX file, each ending with a newline
+    """
+    lines = iter(lines)
+    nl_count = 0
+
+    def readline():
+        nonlocal nl_count
+        nl_count += 1
+        line = next(lines, None)
+        if line is None:
+            return None
+        return line.rstrip('\n').rstrip('\r')
+
+    def fail(message, line=''):
+        raise CompactRinexError('line {0:d} : {1:s}  start>{2:s}<end'.format(nl_count, message, line))
+
+    # ---- header ----
+    line = readline()
+    if line is None or not is_crinex(line) or line[0:3] not in ('1.0', '3.0'):
+        fail('the file is not Compact RINEX 1.0 or 3.0', line or '')
+    crinex_version = int(line[0])
+    if readline() is None:
+        fail('the file seems to be truncated in the middle')
+    line = readline()
+    if line is None:
+        fail('the file seems to be truncated in the middle')
+    line = line.rstrip(' ')
+    if line[60:80] != 'RINEX VERSION / TYPE' or line[5:6] not in ('2', '3', '4'):
+        fail('the RINEX version of the file is not 2.x, 3.x or 4.x', line)
+    rinex_version = int(line[5])
+    yield line + '\n'
+
+    ntype = 0
+    ntype_gnss = {}
+    observables = []
+    obs_gnss = {}
+    system = ''
+
+    def header_record(line):
+        nonlocal ntype, system
+        label = line[60:80]
+        if label.startswith('# / TYPES OF OBSERV'):
+            if line[5] != ' ':
+                ntype = int(line[0:6])
+                observables.clear()
+            observables.extend(line[6:60].split())
+        elif label.startswith('SYS / # / OBS TYPES'):
+            if line[0] != ' ':
+                system = line[0]
+                ntype_gnss[system] = int(line[3:6])
+                obs_gnss[system] = []
+            obs_gnss.setdefault(system, []).extend(line[7:60].split())
+
+    while True:
+        line = readline()
+        if line is None:
+            fail('the file seems to be truncated in the middle')
+        line = line.rstrip(' ')
+        yield line + '\n'
+        header_record(line)
+        if line[60:73] == 'END OF HEADER':
+            break
+
+    if rinex_version == 2:
+        ep_top_from = '&'; ep_top_to = ' '
+        i_event = 28; i_nsat = 29; i_satlst = 32; shift_clk = 1; offset = 3
+    else:
+        ep_top_from = '>'; ep_top_to = '>'
+        i_event = 31; i_nsat = 32; i_satlst = 41; shift_clk = 4; offset = 6
+    clk_width = 3 + shift_clk + 8
+    clk_decimals = shift_clk + 8
+    skipped = ['{0:s}{1:{2}d}{3:3d}\n'.format('' if rinex_version == 2 else '>', 4, 29 if rinex_version == 2 else 31, 1),
+               '{0:<60s}COMMENT\n'.format('  *** Some epochs are skipped by CRX2RNX ***')]
+    blank = ' '*16
+
+    def recovered_fields():
+        """ which fields are recovered, by system letter (for RINEX 2 only the key '') """
+        if rinex_version == 2:
+            return {'': _kept(observables, keep_obs)}
+        return {s: _kept(obs, keep_obs) for s, obs in obs_gnss.items()}
+
+    kept = recovered_fields()
+
+    # state of the previous epoch
+    epoch_line = ''
+    sat_old = {}           # satellite -> index at the previous epoch
+    flags_old = []         # LLI and signal strength flags, by satellite index
+    data_old = []          # per satellite and field: (arc order, differences), None when blank
+    clk_old = []
+    clk_order = 0; clk_arc_order = 0
+
+    pending = None
+    while True:
+        if pending is None:
+            dline = readline()
+            if dline is None:
+                return
+        else:
+            dline = pending
+            pending = None
+        if crinex_version == 3:
+            # escape lines of Compact RINEX 3
+            while dline[:1] == '&':
+                dline = readline()
+                if dline is None:
+                    return
+        if dline[:1] == ep_top_from:
+            dline = ep_top_to + dline[1:]
+            if dline[i_event:i_event+1] not in ('0', '1'):
+                # special event: its records are copied as they are
+                while True:
+                    dline = (ep_top_to + dline[1:]).rstrip(' ')
+                    yield dline + '\n'
+                    if len(dline) > 29:
+                        n = int(dline[i_event+1:i_event+4] or 0)
+                        for i in range(n):
+                            record = readline()
+                            if record is None:
+                                fail('the file seems to be truncated in the middle')
+                            record = record.rstrip(' ')
+                            yield record + '\n'
+                            header_record(record)
+                        kept = recovered_fields()
+                    while True:
+                        dline = readline()
+                        if dline is None:
+                            return
+                        if not (crinex_version >= 3 and dline[:1] == '&'):
+                            break
+                    if dline[:1] != ep_top_from or len(dline) < 29 or not dline[i_event].isdigit():
+                        fail('the epoch should be initialized, but not', dline)
+                    if dline[i_event] in ('0', '1'):
+                        break
+                pending = dline
+                continue
+            epoch_line = ''
+            sat_old = {}
+        elif dline[:1] == '\032':
+            return  # DOS EOF
+
+        epoch_line = _repair(epoch_line, dline)
+        if epoch_line[:1] != ep_top_to or not _epoch_ok(epoch_line, offset):
+            # skip until an initialized epoch is found
+            while True:
+                dline = readline()
+                if dline is None:
+                    yield from skipped
+                    return
+                if _initialized_epoch(dline, ep_top_from, offset):
+                    break
+            yield from skipped
+            pending = dline
+            continue
+        epoch_line = epoch_line.rstrip(' ')
+
+        nsat = int(epoch_line[i_nsat:i_nsat+3])
+        sats = [epoch_line[i_satlst+3*i:i_satlst+3*i+3] for i in range(nsat)]
+        try:
+            ntypes = [ntype]*nsat if rinex_version == 2 else [ntype_gnss[sat[0]] for sat in sats]
+            kept_sat = [kept['']]*nsat if rinex_version == 2 else [kept[sat[0]] for sat in sats]
+        except KeyError:
+            fail('a GNSS type not defined in the header is found', epoch_line[i_satlst:])
+
+        # receiver clock offset
+        cline = readline()
+        if cline is None:
+            fail('the file seems to be truncated in the middle')
+        clk = None
+        if cline == '':
+            clk_order = -1
+        else:
+            if cline[1:2] == '&':
+                clk_arc_order = int(cline[0])
+                if clk_arc_order > MAX_DIFF_ORDER:
+                    fail('exceed maximum order of difference', cline)
+                clk_order = -1
+                cline = cline[2:]
+            clk = [int(cline) if cline not in ('', '-') else 0]
+            if clk_order < clk_arc_order:
+                clk_order += 1
+                for k in range(clk_order):
+                    clk.append(clk[k] + clk_old[k])
+            else:
+                for k in range(clk_order):
+                    clk.append(clk[k] + clk_old[k+1])
+
+        if rinex_version == 2:
+            if clk_order >= 0:
+                yield epoch_line[:68].ljust(68) + _fixed(clk[clk_order], clk_width, clk_decimals) + '\n'
+            else:
+                yield epoch_line[:68] + '\n'
+            for k in range(68, 68 + 36*((nsat - 1)//12), 36):
+                yield ' '*32 + epoch_line[k:k+36] + '\n'
+        else:
+            if clk_order >= 0:
+                yield epoch_line[:41] + _fixed(clk[clk_order], clk_width, clk_decimals) + '\n'
+            else:
+                yield epoch_line[:41].rstrip(' ') + '\n'
+
+        # the data records, one per satellite
+        data = []
+        flags = []
+        for i in range(nsat):
+            nt = ntypes[i]
+            nl_count += 1
+            record = next(lines, None)
+            if record is None:
+                fail('the file seems to be truncated in the middle')
+            fields = record.rstrip('\n').rstrip('\r').split(' ', nt)
+            if len(fields) <= nt:
+                fields.extend(['']*(nt + 1 - len(fields)))
+            i0 = sat_old.get(sats[i], -1)
+
+            # the LLI and signal strength flags
+            dflag = fields[nt]
+            if i0 >= 0:
+                flag = flags_old[i0]
+                if dflag:
+                    flag = _repair(flag, dflag)
+            else:
+                flag = _repair(dflag.ljust(2*nt) if rinex_version == 2 else '', dflag)
+            if len(flag) < 2*nt:
+                flag = flag.ljust(2*nt)
+
+            old = data_old[i0] if i0 >= 0 else None
+            sat_data = [None]*nt
+            text = [blank]*nt
+            for j in kept_sat[i]:
+                field = fields[j]
+                if not field:
+                    if crinex_version == 1:
+                        # Compact RINEX 1 assumes that flags are blank if the field is blank
+                        flag = flag[:2*j] + '  ' + flag[2*j+2:]
+                    else:
+                        text[j] = '              ' + flag[2*j:2*j+2]
+                    continue
+                if field[1:2] == '&':
+                    # a new arc
+                    arc_order = int(field[0])
+                    if arc_order > MAX_DIFF_ORDER:
+                        fail('exceed maximum order of difference', record.rstrip())
+                    y = [int(field[2:]) if field[2:] not in ('', '-') else 0]
+                else:
+                    if i0 < 0:
+                        fail('new satellite, but data arc is not initialized', record.rstrip())
+                    if old[j] is None:
+                        fail('the data field in previous epoch is blank, but the arc is not initialized', record.rstrip())
+                    arc_order, y0 = old[j]
+                    order = len(y0) - 1
+                    y = [int(field) if field != '-' else 0]
+                    if order < arc_order:
+                        for k in range(order + 1):
+                            y.append(y[k] + y0[k])
+                    else:
+                        for k in range(order):
+                            y.append(y[k] + y0[k+1])
+                sat_data[j] = (arc_order, y)
+                v = y[-1]
+                if v >= 1000:
+                    text[j] = '%14s' % ('%d.%03d' % divmod(v, 1000)) + flag[2*j:2*j+2]
+                else:
+                    text[j] = _fixed(v, 14, 3) + flag[2*j:2*j+2]
+            data.append(sat_data)
+            flags.append(flag)
+            if rinex_version == 2:
+                for k in range(0, nt, 5):
+                    yield ''.join(text[k:k+5]).rstrip(' ') + '\n'
+            else:
+                yield (sats[i] + ''.join(text)).rstrip(' ') + '\n'
+
+        # ---- save the current epoch ----
+        sat_old = {}
+        for i, sat in enumerate(sats):
+            sat_old.setdefault(sat, i)
+        if clk is not None:
+            clk_old = clk
+        flags_old = [flag[:2*nt] for flag, nt in zip(flags, ntypes)]
+        data_old = data
+
+
+def _open(filename):
+    return gzip.open(filename, 'rt') if filename.endswith('.gz') else open(filename, 'r')
+
+
+def crx2rnx(crxfile, rnxfile=None, keep_obs=None):
+    """
+    Decompresses a Compact RINEX file to a RINEX file, in place of CRX2RNX.
+
+    Parameters
+    ----------
+    crxfile : str
+        Compact RINEX file, may be gzipped. The usual names are
+        ssssDDDf.YYd and ..._MO.crx
+    rnxfile : str, optional
+        RINEX filename. By default the name CRX2RNX uses: the d of a
+        RINEX 2 name becomes o and crx becomes rnx (after removing .gz)
+    keep_obs : str or tuple of str, optional
+        only recover these observables, see crx2rnx_lines
+
+    Returns
+    -------
+    rnxfile : str
+        name of the RINEX file
+    """
+    if rnxfile is None:
+        rnxfile = crxfile[:-3] if crxfile.endswith('.gz') else crxfile
+        if rnxfile[-1] in 'dD':
+            rnxfile = rnxfile[:-1] + ('o' if rnxfile[-1] == 'd' else 'O')
+        elif rnxfile[-3:] in ('crx', 'CRX'):
+            rnxfile = rnxfile[:-3] + ('rnx' if rnxfile[-3:] == 'crx' else 'RNX')
+        else:
+            rnxfile = rnxfile + '.rnx'
+    tmpfile = rnxfile + '.part'
+    try:
+        with _open(crxfile) as fin, open(tmpfile, 'w') as fout:
+            fout.writelines(crx2rnx_lines(fin, keep_obs))
+        os.replace(tmpfile, rnxfile)
+    finally:
+        if os.path.isfile(tmpfile):
+            os.remove(tmpfile)
+    return rnxfile
+
+
+def open_lines(filename, keep_obs=None):
+    """
+    The lines of a RINEX observation file, decompressed if it is a Compact RINEX file.
+
+    Parameters
+    ----------
+    filename : str or iterable of str
+        RINEX or Compact RINEX file (a name ending in .gz is read with gzip),
+        or its lines
+    keep_obs : str or tuple of str, optional
+        for Compact RINEX, only recover these observables, see crx2rnx_lines
+
+    Returns
+    -------
+    iterable of str
+    """
+    lines = iter(_open(filename) if isinstance(filename, str) else filename)
+    first = next(lines, '')
+    lines = itertools.chain([first], lines)
+    if is_crinex(first):
+        return crx2rnx_lines(lines, keep_obs)
+    return lines
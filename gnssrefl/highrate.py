@@ -5,8 +5,48 @@ import time
 import wget
 
 import gnssrefl.gps as g
+import gnssrefl.hatanaka as hatanaka
+import gnssrefl.rinpy as rinpy
 
-def cddis_highrate(station, year, month, day,stream,dec_rate):
+
+def merge_chunk(merge, *filenames):
+    """
+    reads a downloaded high-rate RINEX file into an in-process merge
+    (rinpy.RinexMerge) and removes it. Plain, gzipped and Compact RINEX
+    files are read directly; Unix compressed (.Z) files are uncompressed first.
+
+    Parameters
+    ----------
+    merge : rinpy.RinexMerge
+        the merge of the day
+    filenames : str
+        names the file can have, the first one that exists is read
+
+    Returns
+    -------
+    bool
+        whether a file was read
+
+    """
+    for filename in filenames:
+        if os.path.isfile(filename):
+            break
+    else:
+        return False
+    if filename.endswith('.Z'):
+        subprocess.call(['uncompress',filename])
+        filename = filename[:-2]
+    try:
+        merge.add(filename)
+        ok = True
+    except (rinpy.RinexError, hatanaka.CompactRinexError, OSError, EOFError, ValueError) as e:
+        print('Could not read ', filename, e)
+        ok = False
+    subprocess.call(['rm','-f',filename])
+    return ok
+
+
+def cddis_highrate(station, year, month, day,stream,dec_rate,merge=None):
     """
     picks up highrate RINEX files from CDDIS
     and merges them
@@ -26,11 +66,14 @@ def cddis_highrate(station, year, month, day,stream,dec_rate):
         rinex3 ID, S or R
     dec_rate : int
         decimation rate, seconds
+    merge : rinpy.RinexMerge, optional
+        if given, each file is read into it as it is downloaded, see merge_chunk.
+        There is no merged file, and neither hatanaka code nor gfzrnx is needed
 
     Returns
     -------
     rinexname : str
-        name of the merged/uncompressed outputfile
+        name of the merged/uncompressed outputfile ('' if merge is given)
     fexist : bool
         whether the Rinex file was successfully retrieved
 
@@ -51,7 +94,7 @@ def cddis_highrate(station, year, month, day,stream,dec_rate):
         month = d.month; day = d.day
     doy,cdoy,cyyyy,cyy = g.ymd2doy(year,month,day); 
 
-    if not os.path.isfile(gfzpath):
+    if merge is None and not os.path.isfile(gfzpath):
         print('You need to install gfzrnx to use high-rate RINEX data in my code.')
         return
 
@@ -79,6 +122,20 @@ def cddis_highrate(station, year, month, day,stream,dec_rate):
 
             new_way_dir = '/gnss/data/highrate/' + cyyyy + '/' + cdoy + '/' + cyy + 'd/' + ch + '/'
             #print(new_way_dir)
+            if merge is not None:
+                # read as it arrives, it is never uncompressed to disk
+                names = [oname, file_name] + ([file_name2] if version == 2 else [])
+                if not any(os.path.isfile(f) for f in names):
+                    print('Looking for:', new_way_dir,file_name)
+                    try:
+                        g.cddis_download_2022B(file_name,new_way_dir)
+                        if (version == 2) and not os.path.isfile(file_name):
+                            g.cddis_download_2022B(file_name2,new_way_dir)
+                    except:
+                        subprocess.call(['rm','-f',file_name])
+                if merge_chunk(merge, *names):
+                    fileF = fileF + 1
+                continue
             if os.path.isfile(oname):
                 print('Found it:', new_way_dir,file_name)
                 fileF = fileF + 1
@@ -114,6 +171,10 @@ def cddis_highrate(station, year, month, day,stream,dec_rate):
                 if os.path.isfile(oname):
                     fileF = fileF + 1
                     print(' >>>  and found it')
+    if merge is not None:
+        s2=time.time()
+        print('Read ', fileF, ' files. That download/merge experience took ', int(s2-s1), ' seconds.')
+        return '', fileF > 0
     if version == 2:
         searchpath = station + cdoy + '*.' + cyy + 'o'
         rinexname = station + cdoy + '0.' + cyy + 'o'
@@ -232,16 +293,21 @@ def bkg_highrate(station, year, month, day,stream,dec_rate,bkg,**kwargs):
         decimation rate in seconds
     bkg : str
         file directory at BKG (igs or euref)
+    kwargs : optional
+        timeout (seconds) and merge (rinpy.RinexMerge): if given, each file
+        is read into it as it is downloaded, see merge_chunk. There is no
+        merged file, and neither hatanaka code nor gfzrnx is needed
 
     Returns
     -------
     file_name24 : str
-        name of merged rinex file
+        name of merged rinex file ('' if merge is given)
     fexist : boolean
         whether file exists
 
     """
     timeout = kwargs.get('timeout',0)
+    merge = kwargs.get('merge',None)
     if (timeout > 0) :
         print('timeout parameter has been set')
 
@@ -257,10 +323,10 @@ def bkg_highrate(station, year, month, day,stream,dec_rate,bkg,**kwargs):
         month = d.month; day = d.day
     doy,cdoy,cyyyy,cyy = g.ymd2doy(year,month,day); 
 
-    if not os.path.isfile(crnxpath):
+    if merge is None and not os.path.isfile(crnxpath):
         g.hatanaka_warning(); return
 
-    if not os.path.isfile(gexe):
+    if merge is None and not os.path.isfile(gexe):
         print('You need to install gfzrnx to use high-rate RINEX data in my code.')
         return '', fexist
 
@@ -286,7 +352,18 @@ def bkg_highrate(station, year, month, day,stream,dec_rate,bkg,**kwargs):
             crnx_name = file_name[:-3] 
             oname = file_name[:-6] + 'rnx'
 
-            if os.path.isfile(oname):
+            if merge is not None:
+                # read as it arrives, it is never uncompressed to disk
+                if not os.path.isfile(oname) and not os.path.isfile(file_name):
+                    try:
+                        g.replace_wget(dirname+file_name, file_name,timeout=timeout)
+                    except:
+                        print('Could not find ', file_name, ' at BKG')
+                if merge_chunk(merge, oname, file_name):
+                    fileF = fileF + 1
+                else:
+                    print('Unsuccessful download ', oname)
+            elif os.path.isfile(oname):
                 fileF = fileF + 1
                 print('You already have ', oname, ' so no need to download')
             else:
@@ -310,6 +387,10 @@ def bkg_highrate(station, year, month, day,stream,dec_rate,bkg,**kwargs):
 
     searchP = station.upper() + streamID + cyyyy + cdoy + '*15M*MO.rnx'
     print('Found ', fileF,' 15 minute files')
+    if merge is not None:
+        s2=time.time()
+        print('That download and merging experience took ', int(s2-s1), ' seconds.')
+        return '', fileF > 0
 
     outfile = station.upper() + cyyyy + cdoy + '.tmp'
     crate = '{:02d}'.format(dec_rate)
@@ -333,7 +414,7 @@ def bkg_highrate(station, year, month, day,stream,dec_rate,bkg,**kwargs):
     return file_name24,  fexist
 
 
-def esp_highrate(station, year, month, day,stream,dec_rate):
+def esp_highrate(station, year, month, day,stream,dec_rate,merge=None):
     """
     picks up a highrate RINEX 3 file from Spanish Geodeic Center, merges and decimates it.
     requires gfzrnx
@@ -352,11 +433,14 @@ def esp_highrate(station, year, month, day,stream,dec_rate):
         R or S
     dec_rate : integer
         decimation rate in seconds
+    merge : rinpy.RinexMerge, optional
+        if given, each file is read into it as it comes, see merge_chunk.
+        There is no merged file, and gfzrnx is not needed
 
     Returns
     -------
     file_name24 : str
-        name of merged rinex file
+        name of merged rinex file ('' if merge is given)
     fexist : boolean
         whether file exists
 
@@ -372,10 +456,10 @@ def esp_highrate(station, year, month, day,stream,dec_rate):
         month = d.month; day = d.day
     doy,cdoy,cyyyy,cyy = g.ymd2doy(year,month,day); 
 
-    if not os.path.isfile(crnxpath):
+    if merge is None and not os.path.isfile(crnxpath):
         g.hatanaka_warning(); return
 
-    if not os.path.isfile(gexe):
+    if merge is None and not os.path.isfile(gexe):
         print('You need to install gfzrnx to use high-rate RINEX data in my code.')
         return '', fexist
 
@@ -401,7 +485,18 @@ def esp_highrate(station, year, month, day,stream,dec_rate):
         #print('looking for', dirname + file_name)
         crnx_name = file_name[:-3] 
         oname = file_name[:-6] + 'rnx'
-        if os.path.isfile(oname):
+        if merge is not None:
+            # read as it arrives, it is never uncompressed to disk
+            if not os.path.isfile(oname) and not os.path.isfile(file_name):
+                try:
+                    g.replace_wget(dirname+file_name,file_name)
+                except:
+                    okok = 1
+            if merge_chunk(merge, oname, file_name):
+                fileF = fileF + 1
+            else:
+                print('Unsuccessful download ', oname)
+        elif os.path.isfile(oname):
             fileF = fileF + 1
             print('already have ', oname)
         else:
@@ -421,6 +516,10 @@ def esp_highrate(station, year, month, day,stream,dec_rate):
     searchP = station.upper() + streamID + cyyyy + cdoy + '*01H*MO.rnx'
     print(searchP)
     print('Found ', fileF,' one hour files')
+    if merge is not None:
+        s2=time.time()
+        print('That download and merging experience took ', int(s2-s1), ' seconds.')
+        return '', fileF > 0
 
     outfile = station.upper() + '.tmp'
     crate = '{:02d}'.format(dec_rate)
@@ -445,7 +544,7 @@ def esp_highrate(station, year, month, day,stream,dec_rate):
     return file_name24,  fexist
 
 
-def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
+def cddis_highrate_tar(station, year, month, day,stream,dec_rate,merge=None):
     """
     picks up a tar'ed highrate RINEX files from CDDIS, untars it, and merges.
 
@@ -467,11 +566,14 @@ def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
         rinex3 ID, S or R
     dec_rate : int
         decimation rate, seconds
+    merge : rinpy.RinexMerge, optional
+        if given, each untarred file is read into it, see merge_chunk.
+        There is no merged file, and neither hatanaka code nor gfzrnx is needed
 
     Returns
     -------
     rinexname : str
-        name of the merged/uncompressed outputfile
+        name of the merged/uncompressed outputfile ('' if merge is given)
     fexist : bool
         whether the Rinex file was successfully retrieved
 
@@ -490,7 +592,7 @@ def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
         month = d.month; day = d.day
     doy,cdoy,cyyyy,cyy = g.ymd2doy(year,month,day); 
 
-    if not os.path.isfile(gfzpath):
+    if merge is None and not os.path.isfile(gfzpath):
         print('You need to install gfzrnx to use high-rate RINEX data in gnssrefl.')
         return
 
@@ -539,7 +641,12 @@ def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
             file_name = station.upper() + streamID + cyyyy + cdoy + ch + e + '_15M_01S_MO.crx.gz'
             crnx_name = file_name[:-3] 
             oname = station.upper() + streamID + cyyyy + cdoy + ch + e + '_15M_01S_MO.rnx' # do we need this?
-            if os.path.isfile(new_way_dir + oname):
+            if merge is not None:
+                if merge_chunk(merge, new_way_dir + oname, new_way_dir + file_name):
+                    fileF = fileF + 1
+                else:
+                    print('did not find  file:', new_way_dir,file_name)
+            elif os.path.isfile(new_way_dir + oname):
                 #print('Found rnx file', oname)
                 subprocess.call(['mv',new_way_dir + oname, 'gnss/data'])
                 fileF = fileF + 1
@@ -559,8 +666,13 @@ def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
     rinexname = station.upper() + streamID + cyyyy + cdoy + '0000_01D_01S_MO.rnx'
     tmpname = rinexname + 'tmp'
 
-    print('Attempt to merge the 15 minute files using gfzrnx and move to ', rinexname)
-    if (fileF > 0): # files exist
+    if merge is not None:
+        # already read, nothing to merge
+        rinexname = ''
+        fexist = fileF > 0
+    else:
+        print('Attempt to merge the 15 minute files using gfzrnx and move to ', rinexname)
+    if (fileF > 0) and (merge is None): # files exist
         if (dec_rate == 1):
             subprocess.call([gfzpath,'-finp', searchpath, '-fout', tmpname, '-vo',str(version),'-f','-q'])
         else:
@@ -576,6 +688,8 @@ def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
             print('File created ', rinexname)
             fexist = True
 
+    if (fileF > 0): # files exist
+
         # remove unneeded 15 minute files
         #new_way_dir = 'gnss/data/highrate/' + cyyyy + '/' + cdoy + '/' + cyy + 'd/' + ch + '/'
         new_dir =      'gnss/data/highrate/' + cyyyy + '/' + cdoy + '/' + cyy + 'd/*'
@@ -601,7 +715,7 @@ def cddis_highrate_tar(station, year, month, day,stream,dec_rate):
     print('That download/merge experience took ', int(s2-s1), ' seconds.')
     return rinexname,  fexist
 
-def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg):
+def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg,merge=None):
     """
     picks up a highrate RINEX 3 file from BKG, merges and decimates it.
     requires gfzrnx
@@ -622,11 +736,14 @@ def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg):
         decimation rate in seconds
     bkg : str
         file directory at BKG (igs or euref)
+    merge : rinpy.RinexMerge, optional
+        if given, each file is read into it as it comes, see merge_chunk.
+        There is no merged file, and neither hatanaka code nor gfzrnx is needed
 
     Returns
     -------
     file_name24 : str
-        name of merged rinex file
+        name of merged rinex file ('' if merge is given)
     fexist : boolean
         whether file exists
 
@@ -643,10 +760,10 @@ def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg):
         month = d.month; day = d.day
     doy,cdoy,cyyyy,cyy = g.ymd2doy(year,month,day); 
 
-    if not os.path.isfile(crnxpath):
+    if merge is None and not os.path.isfile(crnxpath):
         g.hatanaka_warning(); return
 
-    if not os.path.isfile(gexe):
+    if merge is None and not os.path.isfile(gexe):
         print('You need to install gfzrnx to use high-rate RINEX data in my code.')
         return '', fexist
 
@@ -683,7 +800,12 @@ def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg):
             oname = crnx_name[:-3] + 'rnx'
             print(oname)
 
-            if os.path.isfile(oname):
+            if merge is not None:
+                if merge_chunk(merge, oname, crnx_name):
+                    fileF = fileF + 1
+                else:
+                    print('File does not exist', oname)
+            elif os.path.isfile(oname):
                 fileF = fileF + 1
                 print('You already have ', oname, ' so no need to make it ')
                 if os.path.isfile(crnx_name):
@@ -699,6 +821,9 @@ def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg):
 
     searchP = station.upper() + streamID + cyyyy + cdoy + '*15M*MO.rnx'
     print('Found ', fileF,' 15 minute files')
+    if merge is not None:
+        subprocess.call(['rm', file_name+'.tar'])
+        return '', fileF > 0
 
 
     outfile = station.upper() + streamID + cyyyy + cdoy + '.tmp'
@@ -731,7 +856,7 @@ def bkg_highrate_tar(station, year, month, day,stream,dec_rate,bkg):
     return file_name24,  fexist
 
 
-def kadaster_highrate(station, year, doy,stream,dec_rate):
+def kadaster_highrate(station, year, doy,stream,dec_rate,merge=None):
     """
     picks up a highrate RINEX 3 file from Dutch archive, merges and decimates it.
     requires gfzrnx. Someone should add regular 30 second downloads - but it is not 
@@ -749,11 +874,14 @@ def kadaster_highrate(station, year, doy,stream,dec_rate):
         R or S
     dec_rate : int
         decimation rate in seconds
+    merge : rinpy.RinexMerge, optional
+        if given, each file is read into it as it comes, see merge_chunk.
+        There is no merged file, and neither hatanaka code nor gfzrnx is needed
 
     Returns
     -------
     file_name24 : str
-        name of merged rinex file
+        name of merged rinex file ('' if merge is given)
     fexist : boolean
         whether the new merged file exists
 
@@ -770,10 +898,10 @@ def kadaster_highrate(station, year, doy,stream,dec_rate):
 
     doy,cdoy,cyyyy,cyy = g.ymd2doy(year,month,day); 
 
-    if not os.path.isfile(crnxpath):
+    if merge is None and not os.path.isfile(crnxpath):
         g.hatanaka_warning(); return
 
-    if not os.path.isfile(gexe):
+    if merge is None and not os.path.isfile(gexe):
         print('You need to install gfzrnx to use high-rate RINEX data in my code.')
         return '', fexist
 
@@ -795,7 +923,18 @@ def kadaster_highrate(station, year, doy,stream,dec_rate):
             crnx_name = file_name[:-3] 
             oname = file_name[:-6] + 'rnx'
 
-            if os.path.isfile(oname):
+            if merge is not None:
+                # read as it arrives, it is never uncompressed to disk
+                if not os.path.isfile(oname) and not os.path.isfile(file_name):
+                    try:
+                        g.replace_wget(dirname+file_name,file_name)
+                    except:
+                        okok = 1
+                if merge_chunk(merge, oname, file_name):
+                    fileF = fileF + 1
+                else:
+                    print('did not find rnx ', oname)
+            elif os.path.isfile(oname):
                 fileF = fileF + 1
                 print('You already have ', oname, ' so no need to download and uncompress')
             else:
@@ -821,6 +960,8 @@ def kadaster_highrate(station, year, doy,stream,dec_rate):
 
     searchP = station.upper() + streamID + cyyyy + cdoy + '*15M*MO.rnx'
     print('Found ', fileF,' 15 minute files')
+    if merge is not None:
+        return '', fileF > 0
 
     outfile = station.upper() + cyyyy + cdoy + '.tmp'
     crate = '{:02d}'.format(dec_rate)
@@ -687,7 +687,7 @@ def gsi_data(station,year,doy):
     g.rinex_jp(station, year, month, day)
 
 
-def rinex2_highrate(station, year, doy,archive,strip_snr):
+def rinex2_highrate(station, year, doy,archive,strip_snr,merge=None):
     """
     kluge to download highrate data since i have revamped the rinex2 code
     strip_snr is boolean as to whether you want to strip out the non-SNR data
@@ -707,6 +707,16 @@ def rinex2_highrate(station, year, doy,archive,strip_snr):
         name of GNSS archive
     strip_snr : bool
         whether you want to strip out the observables (leaving only SNR)
+    merge : rinpy.RinexMerge, optional
+        for cddis, the 15 minute files are read into it as they are downloaded
+        (see highrate.merge_chunk) and no RINEX file is written
+
+    Returns
+    -------
+    rinexfile : str
+        name of the RINEX file
+    foundit : bool
+        whether the RINEX file exists (or the merge has data)
 
     """
     foundit = False
@@ -724,6 +734,9 @@ def rinex2_highrate(station, year, doy,archive,strip_snr):
         if (archive == 'cddis') :
             stream = 'R'
             srate = 1 # one second
+            if merge is not None:
+                name, foundit = ch.cddis_highrate(station, year, month, day,stream,srate,merge=merge)
+                return rinexfile, foundit
             ch.cddis_highrate(station, year, month, day,stream,srate)
     #if not os.path.isfile(rinexfile):
     #    if not os.path.isfile(rinexfile):
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+Batched Lomb-Scargle periodograms for many arcs at once.
+
+strip_compute in gps.py computes one periodogram per call. A day of data for
+four constellations and ten frequencies has thousands of arcs, and the set up
+cost of each call (a LombScargle object, a frequency grid, output arrays) is
+a good part of the run time. This module computes the periodograms of all arcs
+of a day together.
+
+The frequency (reflector height) grid made by gps.freq_out is uniform, from
+desiredP to maxH in steps of desiredP, for every arc. For a uniform grid
+f_j = f0 + j*df with j = a*B + b, the trigonometric sums
+
+    sum_n  g_n exp(2 pi i f_j x_n)
+
+factor into  sum_n [g_n exp(2 pi i (f0 + a*B*df) x_n)] * exp(2 pi i b*df x_n),
+which is a (A x N) by (N x B) matrix product. Arcs are grouped by length and
+evaluated with one batched numpy matmul per group. The exponentials are
+built by repeated multiplication, so there are only three sine/cosine
+evaluations per point instead of F, and the sums are done by BLAS. The sums are exact (no interpolation onto a grid), so the result
+is the floating mean Lomb-Scargle periodogram (Zechmeister and Kurster, 2009)
+that astropy computes, with the same psd normalization strip_compute uses.
+
+lsp_method 'batch' in the gnssir json selects this engine. The per-arc 'fast'
+(astropy) and 'scipy' methods remain the reference.
+
+lsp_method 'grid' uses the same engine but only evaluates the reflector heights
+gnssir keeps, i.e. the part of the grid between minH and maxH. Everything below
+minH is skipped instead of being computed and then thrown away, which matters
+for stations with a large minH.
+
+With refine (refine_peak in the gnssir json) the periodogram is first computed
+on a coarse grid, a few times finer than the width of the periodogram peak.
+Then only the best candidate peaks are evaluated at desiredP spacing, and the
+peak is placed with a parabola through the three highest points. That uses a
+fraction of the frequencies and gives a reflector height at least as precise
+as the full desiredP grid.
+
+strip_compute_many runs any of the methods for a list of arcs, optionally
+split over a pool of processes (arc_par in the gnssir json), so that a single
+day can use more than one core. The arcs are split into contiguous blocks
+and the results come back in the order of the input. The 'fast' and 'scipy'
+results are identical to those of a single process; the batch methods group
+the arcs differently, which changes only the rounding of the amplitudes.
+"""
+import multiprocessing
+
+import numpy as np
+
+import gnssrefl.gps as g
+
+# maximum number of complex values held in the work arrays of one batch
+MAX_BATCH_ELEMENTS = 4000000
+
+# refine: coarse grid spacing is the peak width divided by this, the most
+# coarse peaks that are refined, and how close to the highest coarse peak
+# (as a fraction of its amplitude) a peak must be to be refined. With 8 points
+# per peak width a coarse sample is never more than a few percent below the
+# top of its peak.
+COARSE_PER_PEAK = 8
+NCANDIDATES = 3
+CANDIDATE_FRACTION = 0.9
+
+
+def prepare_arc(x, y, cf, maxH, desiredP, minH=None):
+    """
+    Sets up one arc for the periodogram, exactly as strip_compute does.
+
+    Parameters
+    ----------
+    x : numpy array
+        elevation angles in degrees
+    y : numpy array
+        SNR data
+    cf : float
+        scale factor for given frequency
+    maxH : float
+        maximum reflector height in meters
+    desiredP : float
+        precision of Lomb Scargle in meters
+    minH : float, optional
+        if given, the grid only keeps reflector heights above minH
+
+    Returns
+    -------
+    arc : dict or None
+        sx (sine of elevation angle over cf, sorted), y (sorted SNR), px
+        (reflector height grid), eminObs, emaxObs, riseSet.
+        None if the ofac/hifac values are not usable.
+    """
+    ofac, hifac = g.get_ofac_hifac(x, cf, maxH, desiredP)
+    if np.isnan(ofac) or ofac == 0:
+        print("WARNING - bad ofac")
+        return None
+
+    eminObs = min(x); emaxObs = max(x)
+    if x[0] > x[1]:
+        riseSet = -1
+    else:
+        riseSet = 1
+
+    ij = np.argsort(x)
+    sx = np.sin(x[ij]*np.pi/180)/cf
+    px = np.asarray(g.freq_out(sx, ofac, hifac))
+    if minH is not None:
+        px = px[px > minH]
+    return {'sx': sx, 'y': y[ij], 'px': px, 'eminObs': eminObs,
+            'emaxObs': emaxObs, 'riseSet': riseSet}
+
+
+def _powers(z, n):
+    """
+    z**0 ... z**(n-1) for each element of z (K, N), returned as (K, n, N).
+    """
+    K, N = z.shape
+    zp = np.empty((K, n, N), dtype=complex)
+    zp[:, 0, :] = 1
+    if n > 1:
+        zp[:, 1:, :] = np.cumprod(np.broadcast_to(z[:, None, :], (K, n-1, N)), axis=1)
+    return zp
+
+
+def _uniform_trig_sums(x, wts, f0, df, nf):
+    """
+    sum_n wts[k,m,n] exp(2 pi i (f0[k] + j df[k]) x[k,n]) for j < nf.
+
+    Parameters
+    ----------
+    x : numpy array (K, N)
+        abscissas, padded with anything where wts is zero
+    wts : numpy array (K, M, N)
+        M sets of weights per arc
+    f0 : numpy array (K,)
+        first frequency of each arc
+    df : numpy array (K,)
+        frequency step of each arc
+    nf : int
+        number of frequencies
+
+    Returns
+    -------
+    sums : complex numpy array (K, M, nf)
+    """
+    K, M, N = wts.shape
+    B = max(1, int(np.ceil(np.sqrt(nf))))
+    A = int(np.ceil(nf/B))
+    twopi_x = 2*np.pi*x
+    # powers of exp(2 pi i df x) by repeated multiplication, which is much
+    # cheaper than sin/cos and loses only about B*A ulps
+    zb = _powers(np.exp(1j*df[:, None]*twopi_x), B)                 # exp(2 pi i b df x), b < B
+    za = _powers(np.exp(1j*B*df[:, None]*twopi_x), A)               # exp(2 pi i a B df x), a < A
+    za *= np.exp(1j*f0[:, None]*twopi_x)[:, None, :]                # times exp(2 pi i f0 x)
+    left = (wts[:, :, None, :]*za[:, None, :, :]).reshape(K, M*A, N)
+    sums = np.matmul(left, zb.transpose(0, 2, 1))
+    return sums.reshape(K, M, A*B)[:, :, 0:nf]
+
+
+def _batch_power(arcs):
+    """
+    psd normalized floating mean Lomb-Scargle power for arcs of one batch.
+
+    Parameters
+    ----------
+    arcs : list of dict
+        from prepare_arc
+
+    Returns
+    -------
+    powers : list of numpy arrays
+        power on each arc's px grid
+    """
+    K = len(arcs)
+    N = max(len(a['sx']) for a in arcs)
+    nf = max(len(a['px']) for a in arcs)
+    x = np.zeros((K, N)); y = np.zeros((K, N)); w = np.zeros((K, N))
+    f0 = np.zeros(K); df = np.zeros(K); npts = np.zeros(K)
+    for k, a in enumerate(arcs):
+        n = len(a['sx'])
+        x[k, 0:n] = a['sx']
+        w[k, 0:n] = 1/n
+        y[k, 0:n] = a['y'] - np.mean(a['y'])
+        px = a['px']
+        f0[k] = px[0]
+        if len(px) > 1:
+            df[k] = (px[-1] - px[0])/(len(px) - 1)
+        npts[k] = n
+
+    # sum w y exp(i wt), sum w exp(i wt) and sum w exp(2 i wt)
+    sums = _uniform_trig_sums(x, np.stack((w*y, w), axis=1), f0, df, nf)
+    sums2 = _uniform_trig_sums(2*x, w[:, None, :], f0, df, nf)
+    YC = sums[:, 0].real; YS = sums[:, 0].imag
+    C = sums[:, 1].real; S = sums[:, 1].imag
+    C2 = sums2[:, 0].real; S2 = sums2[:, 0].imag
+
+    CC = 0.5*(1 + C2) - C*C
+    SS = 0.5*(1 - C2) - S*S
+    CS = 0.5*S2 - C*S
+    D = CC*SS - CS*CS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = (YC*YC*SS + YS*YS*CC - 2*YC*YS*CS)/D
+    p = p*0.5*npts[:, None]
+    return [p[k, 0:len(a['px'])] for k, a in enumerate(arcs)]
+
+
+def batch_power(arcs):
+    """
+    Lomb-Scargle power for many arcs, grouped by length into batches.
+
+    Parameters
+    ----------
+    arcs : list of dict
+        from prepare_arc
+
+    Returns
+    -------
+    powers : list of numpy arrays
+        psd normalized power on each arc's px grid, in the order of arcs
+    """
+    powers = [np.empty(0)]*len(arcs)
+    # arcs without a frequency grid keep an empty periodogram
+    order = sorted([i for i in range(len(arcs)) if len(arcs[i]['px']) > 0],
+                   key=lambda i: len(arcs[i]['sx']))
+    batch = []; nf = 0
+    for i in order + [None]:
+        if i is not None:
+            a = arcs[i]
+            N = len(a['sx'])
+            trial_nf = max(nf, len(a['px']))
+            # work arrays are about 5 sqrt(nf) by N complex values per arc
+            if (len(batch) == 0) or ((len(batch) + 1)*5*np.sqrt(trial_nf)*N <= MAX_BATCH_ELEMENTS):
+                batch.append(i); nf = trial_nf
+                continue
+        if len(batch) == 0:
+            break
+        for j, p in zip(batch, _batch_power([arcs[j] for j in batch])):
+            powers[j] = p
+        if i is not None:
+            batch = [i]; nf = len(arcs[i]['px'])
+    return powers
+
+
+def strip_compute_batch(arclist, maxH, desiredP, minH, lsp_method='batch', refine=False):
+    """
+    Batched version of gps.strip_compute.
+
+    Parameters
+    ----------
+    arclist : list of tuples
+        (x, y, cf) for each arc: elevation angles (deg), SNR data and the
+        scale factor for the frequency
+    maxH : float
+        maximum reflector height in meters
+    desiredP : float
+        precision of Lomb Scargle in meters
+    minH : float
+        minimum reflector height in meters
+    lsp_method : str
+        'batch' computes the whole freq_out grid, 'grid' only the part
+        above minH. The results are the same.
+    refine : bool
+        use the coarse to fine peak search (see refine_peaks). px and pz are
+        then the coarse periodogram. default is False
+
+    Returns
+    -------
+    results : list of tuples
+        (maxF, maxAmp, eminObs, emaxObs, riseSet, px, pz) for each arc,
+        as returned by strip_compute
+    """
+    results = [(0, 0, 0, 0, 0, 0, 0)]*len(arclist)
+    prepared = []
+    index = []
+    for i, (x, y, cf) in enumerate(arclist):
+        a = prepare_arc(x, y, cf, maxH, desiredP, minH if lsp_method == 'grid' else None)
+        if a is not None:
+            prepared.append(a)
+            index.append(i)
+
+    if refine:
+        for i, r in zip(index, refine_peaks(prepared, maxH, desiredP, minH)):
+            results[i] = r
+        return results
+
+    powers = batch_power(prepared)
+    for i, a, lsp_power in zip(index, prepared, powers):
+        px = a['px']
+        pz = 2*np.sqrt(lsp_power/len(a['sx']))
+        keep = px > minH
+        px = px[keep]
+        pz = pz[keep]
+        if len(pz) == 0:
+            print('invalid LSP, no data returned. If this is pervasive, check your inputs')
+            maxF = 0; maxAmp = 0
+        else:
+            ij = np.argmax(pz)
+            maxF = px[ij]
+            maxAmp = np.max(pz)
+        results[i] = (maxF, maxAmp, a['eminObs'], a['emaxObs'], a['riseSet'], px, pz)
+
+    return results
+
+
+def _parabola_peak(xs, ys, j):
+    """
+    Vertex of the parabola through points j-1, j, j+1 of a uniform grid.
+
+    Returns xs[j], ys[j] if j is at either end or the points are not concave.
+    """
+    if j == 0 or j == len(ys) - 1:
+        return xs[j], ys[j]
+    y0, y1, y2 = ys[j-1], ys[j], ys[j+1]
+    denom = y0 - 2*y1 + y2
+    if denom >= 0:
+        return xs[j], ys[j]
+    delta = 0.5*(y0 - y2)/denom
+    return xs[j] + delta*(xs[j+1] - xs[j]), y1 - 0.25*(y0 - y2)*delta
+
+
+def refine_peaks(prepared, maxH, desiredP, minH):
+    """
+    Coarse to fine periodogram peak search.
+
+    The coarse grid spacing is the characteristic peak width of the arc
+    (1/span of sin(elevation)/cf) over COARSE_PER_PEAK, but never finer than
+    desiredP. The highest local maxima of the coarse periodogram (at most
+    NCANDIDATES, and within CANDIDATE_FRACTION of the highest) are evaluated
+    again at desiredP spacing within one coarse step, and the best one is
+    refined with a parabola.
+
+    Parameters
+    ----------
+    prepared : list of dict
+        from prepare_arc
+    maxH : float
+        maximum reflector height in meters
+    desiredP : float
+        precision of Lomb Scargle in meters
+    minH : float
+        minimum reflector height in meters
+
+    Returns
+    -------
+    results : list of tuples
+        (maxF, maxAmp, eminObs, emaxObs, riseSet, px, pz), where px and pz
+        are the coarse periodogram above minH
+    """
+    coarse = []
+    for a in prepared:
+        W = a['sx'][-1] - a['sx'][0]
+        step = max(desiredP, 1/(COARSE_PER_PEAK*W))
+        # start where the desiredP grid starts, so edge peaks are the same
+        above = a['px'][a['px'] > minH]
+        if len(above) == 0:
+            coarse.append(dict(a, px=above, step=step, h0=minH))
+            continue
+        h0 = above[0]
+        nstep = int(np.floor((maxH - h0)/step))
+        px = h0 + step*np.arange(0, nstep + 1)
+        coarse.append(dict(a, px=px, step=step, h0=h0))
+
+    coarse_pz = [2*np.sqrt(p/len(a['sx'])) for a, p in zip(coarse, batch_power(coarse))]
+
+    # fine grids around the best coarse peaks
+    fine = []; owner = []
+    for k, (a, pz) in enumerate(zip(coarse, coarse_pz)):
+        if len(pz) == 0:
+            continue
+        local = np.r_[True, pz[1:] >= pz[:-1]] & np.r_[pz[:-1] >= pz[1:], True]
+        peaks = np.flatnonzero(local)
+        peaks = peaks[np.argsort(pz[peaks])[::-1][0:NCANDIDATES]]
+        peaks = peaks[pz[peaks] >= CANDIDATE_FRACTION*pz[peaks[0]]]
+        for j in peaks:
+            lo = max(a['px'][j] - a['step'], a['h0'])
+            hi = min(a['px'][j] + a['step'], maxH)
+            n = int(np.floor((hi - lo)/desiredP))
+            fpx = lo + desiredP*np.arange(n + 1)
+            if len(fpx) > 0:
+                fine.append(dict(a, px=fpx))
+                owner.append(k)
+
+    best = [None]*len(coarse)
+    for k, f, p in zip(owner, fine, batch_power(fine)):
+        fpz = 2*np.sqrt(p/len(f['sx']))
+        j = int(np.argmax(fpz))
+        peak = _parabola_peak(f['px'], fpz, j)
+        if best[k] is None or peak[1] > best[k][1]:
+            best[k] = peak
+
+    results = []
+    for a, pz, b in zip(coarse, coarse_pz, best):
+        if b is None:
+            print('invalid LSP, no data returned. If this is pervasive, check your inputs')
+            maxF = 0; maxAmp = 0
+        else:
+            maxF, maxAmp = b
+        results.append((maxF, maxAmp, a['eminObs'], a['emaxObs'], a['riseSet'], a['px'], pz))
+    return results
+
+
+def _strip_compute_block(task):
+    """Periodograms of one block of arcs, for strip_compute_many."""
+    arclist, maxH, desiredP, minH, lsp_method, refine = task
+    if refine or lsp_method in ['batch', 'grid']:
+        return strip_compute_batch(arclist, maxH, desiredP, minH, lsp_method, refine=refine)
+    return [g.strip_compute(x, y, cf, maxH, desiredP, minH, lsp_method) for x, y, cf in arclist]
+
+
+def strip_compute_many(arclist, maxH, desiredP, minH, lsp_method='fast', refine=False, processes=1):
+    """
+    gps.strip_compute for a list of arcs, with any lsp_method, optionally
+    using a pool of processes.
+
+    Parameters
+    ----------
+    arclist : list of tuples
+        (x, y, cf) for each arc: elevation angles (deg), SNR data and the
+        scale factor for the frequency
+    maxH : float
+        maximum reflector height in meters
+    desiredP : float
+        precision of Lomb Scargle in meters
+    minH : float
+        minimum reflector height in meters
+    lsp_method : str
+        'fast', 'scipy', 'batch' or 'grid'
+    refine : bool
+        coarse to fine peak search (see refine_peaks)
+    processes : int
+        number of processes. With more than one, the arcs are split into
+        contiguous blocks (one per process for the batch methods, four per
+        process otherwise) that are computed in a multiprocessing pool.
+        default is 1
+
+    Returns
+    -------
+    results : list of tuples
+        (maxF, maxAmp, eminObs, emaxObs, riseSet, px, pz) for each arc, in
+        the order of arclist
+    """
+    if processes is None or processes <= 1 or len(arclist) < 2:
+        return _strip_compute_block((arclist, maxH, desiredP, minH, lsp_method, refine))
+
+    nblocks = processes if (refine or lsp_method in ['batch', 'grid']) else 4*processes
+    edges = np.linspace(0, len(arclist), min(nblocks, len(arclist)) + 1).astype(int)
+    tasks = [(arclist[i0:i1], maxH, desiredP, minH, lsp_method, refine) for i0, i1 in zip(edges[:-1], edges[1:])]
+    with multiprocessing.Pool(processes=processes) as pool:
+        blocks = pool.map(_strip_compute_block, tasks)
+    return [r for block in blocks for r in block]
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+Manifest of the inputs of the daily gnssir and phase results.
+
+gnssir and phase write one result file per day. With -incremental T they
+only recompute a day when its inputs changed since the result file was
+written: the SNR files read for the day (the adjacent days too when arcs may
+cross midnight), the station refraction file, the vwc tracks or apriori
+files and gnssir results read by phase, the analysis settings and the
+gnssrefl version. The manifest is only written by -incremental T runs. Each
+station, year and extension has a manifest next to the result files::
+
+    {REFL_CODE}/{year}/results/{station}/{extension}/manifest.jsonl
+    {REFL_CODE}/{year}/phase/{station}/{extension}/manifest.jsonl
+
+Every line is one computed day: its doy, the settings key, the size,
+modification time and sha1 of each input file (paths relative to REFL_CODE,
+None for a file that did not exist) and the size and modification time of the
+result file. The last line of a day is the one that counts; a result file
+written again by a run without -incremental T no longer matches it.
+
+The settings key includes the version of the installed gnssrefl package, not
+a revision of the code: changes to the code that keep the version number
+(e.g. an editable install of a git checkout) are not detected. Run without
+-incremental T after such changes. A file is only hashed again when its size or modification time
+changed, so checking an unchanged day costs a few stat calls; a file that was
+rewritten with the same contents (e.g. an SNR file made again from the same
+RINEX file) still matches by its sha1.
+
+Lines are appended with a single write, so the worker processes of -par can
+share a manifest. compact_manifest (run before the workers start) keeps the
+last line of each day. The daily_avg and subdaily readers only pick up the
+ddd.txt result files, so the manifest does not get in their way.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from importlib.metadata import version
+
+from gnssrefl.utils import FileManagement
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.jsonl'
+# station_config entries that change how a run looks or where files go, not the results
+RUNTIME_KEYS = ('plt_screen', 'screenstats', 'nooverwrite', 'incremental', 'reqc', 'arc_par', 'wantCompression', 'gzip',
+                'savepeaks')
+
+
+def manifest_name(station, year, product='results', extension=''):
+    """
+    Name of the manifest of a station and year.
+
+    Parameters
+    ----------
+    station : str
+        4 character station name
+    year : int
+        full year
+    product : str
+        results (gnssir) or phase
+    extension : str
+        analysis extension, '' for none
+
+    Returns
+    -------
+    str
+        manifest filename
+    """
+    xdir = os.path.join(os.environ['REFL_CODE'], str(year), product, station)
+    if extension:
+        xdir = os.path.join(xdir, extension)
+    return os.path.join(xdir, MANIFEST_NAME)
+
+
+def file_sha1(filename):
+    """ sha1 of the contents of a file """
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _relname(filename):
+    """ filename relative to REFL_CODE when it is below it """
+    path = os.path.abspath(str(filename))
+    rel = os.path.relpath(path, os.path.abspath(os.environ['REFL_CODE']))
+    return path if rel.startswith('..') else rel
+
+
+def file_state(filename, known=None):
+    """
+    Size, modification time and sha1 of an input file.
+
+    Parameters
+    ----------
+    filename : str or Path
+        input file
+    known : dict, optional
+        state recorded before. Its sha1 is used when size and modification
+        time did not change
+
+    Returns
+    -------
+    dict or None
+        size, mtime_ns and sha1. None when the file does not exist
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    state = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if known and known.get('size') == st.st_size and known.get('mtime_ns') == st.st_mtime_ns:
+        state['sha1'] = known['sha1']
+    else:
+        state['sha1'] = file_sha1(filename)
+    return state
+
+
+def settings_key(station_config, **extra):
+    """
+    Key of the analysis settings of a day.
+
+    Parameters
+    ----------
+    station_config : dict
+        station analysis parameters, with the command line overrides. The
+        RUNTIME_KEYS entries are left out
+    **extra
+        other settings that change the results (snr_type, frequencies, ...)
+
+    Returns
+    -------
+    str
+        sha1 of the settings, the gnssrefl version and FORMAT_VERSION. The
+        version is that of the installed package (importlib.metadata), so
+        code changes within a release give the same key
+    """
+    settings = {k: v for k, v in station_config.items() if k not in RUNTIME_KEYS}
+    settings.update(extra)
+    settings['gnssrefl_version'] = version('gnssrefl')
+    settings['manifest_format'] = FORMAT_VERSION
+    text = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def snr_inputs(station, year, doy, snr_type, station_config):
+    """
+    SNR and refraction files read for the arcs of a day.
+
+    Parameters
+    ----------
+    station : str
+        4 character station name
+    year : int
+        full year
+    doy : int
+        day of year
+    snr_type : int
+        SNR file type
+    station_config : dict
+        station analysis parameters (midnite and refraction are used)
+
+    Returns
+    -------
+    list of str
+        filenames. Missing files are included, so that a file that shows
+        up later (e.g. the SNR file of the next day) changes the key
+    """
+    days = [(year, doy)]
+    if station_config.get('midnite', False):
+        from gnssrefl.read_snr_files import _get_adjacent_doy
+        days = [_get_adjacent_doy(year, doy, -1), (year, doy), _get_adjacent_doy(year, doy, +1)]
+    files = []
+    for y, d in days:
+        snrfile, found = FileManagement(station, 'snr_file', y, d, snr_type=snr_type).find_snr_file()
+        files.append(str(snrfile))
+    if station_config.get('refraction', False):
+        files.append(os.path.join(os.environ['REFL_CODE'], 'input', station + '_refr.txt'))
+    return files
+
+
+def read_manifest(fname):
+    """
+    Entries of a manifest.
+
+    Parameters
+    ----------
+    fname : str
+        manifest filename
+
+    Returns
+    -------
+    dict
+        the last entry of each doy. Lines that cannot be read (e.g. one that
+        is being written) are ignored
+    """
+    entries = {}
+    if not os.path.isfile(fname):
+        return entries
+    with open(fname) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                entries[int(entry['doy'])] = entry
+            except (ValueError, KeyError, TypeError):
+                continue
+    return entries
+
+
+def _append(fname, entry):
+    """ appends an entry with one write, so concurrent writers do not mix lines """
+    os.makedirs(os.path.dirname(fname), exist_ok=True)
+    line = (json.dumps(entry, sort_keys=True) + '\n').encode('utf-8')
+    fd = os.open(fname, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def _output_state(output):
+    """ size and modification time of a result file, None when it does not exist """
+    try:
+        st = os.stat(output)
+    except (OSError, TypeError):
+        return None
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _entry(doy, key, files, known=None):
+    known = known or {}
+    inputs = {}
+    for name in files:
+        rel = _relname(name)
+        inputs[rel] = file_state(name, known.get(rel))
+    return {'doy': int(doy), 'key': key, 'inputs': inputs}
+
+
+def is_current(fname, doy, key, files, output=None):
+    """
+    Whether a day was computed with these settings and input files.
+
+    Input files whose size or modification time changed are hashed again; when
+    their contents are the same the entry is refreshed with the new states.
+
+    Parameters
+    ----------
+    fname : str
+        manifest filename
+    doy : int
+        day of year
+    key : str
+        settings key (settings_key)
+    files : list of str
+        input files of the day
+    output : str or Path, optional
+        result file of the day. It must be the one written when the day was
+        recorded
+
+    Returns
+    -------
+    bool
+    """
+    old = read_manifest(fname).get(int(doy))
+    if old is None or old.get('key') != key:
+        return False
+    if output is not None and old.get('output') != _output_state(output):
+        return False
+    known = old.get('inputs', {})
+    if set(known) != {_relname(name) for name in files}:
+        return False
+    new = _entry(doy, key, files, known)
+    new['output'] = old.get('output')
+    for rel, state in new['inputs'].items():
+        before = known[rel]
+        if (state is None) != (before is None):
+            return False
+        if state is not None and state['sha1'] != before['sha1']:
+            return False
+    if new['inputs'] != known:
+        _append(fname, new)
+    return True
+
+
+def record(fname, doy, key, files, output=None):
+    """
+    Records that a day was computed with these settings and input files.
+
+    Call it after the result file was written, since the input files can be
+    compressed while a day is processed.
+
+    Parameters
+    ----------
+    fname : str
+        manifest filename
+    doy : int
+        day of year
+    key : str
+        settings key (settings_key)
+    files : list of str
+        input files of the day
+    output : str or Path, optional
+        result file of the day
+    """
+    old = read_manifest(fname).get(int(doy))
+    known = old.get('inputs') if old and old.get('key') == key else None
+    entry = _entry(doy, key, files, known)
+    entry['output'] = _output_state(output)
+    _append(fname, entry)
+
+
+def rekey(fname, doy, key, output=None):
+    """
+    Records that a day was computed again from the same input files with
+    other settings (gnssir -reqc). The input files are not read.
+
+    Parameters
+    ----------
+    fname : str
+        manifest filename
+    doy : int
+        day of year
+    key : str
+        settings key (settings_key)
+    output : str or Path, optional
+        result file of the day, written again
+    """
+    old = read_manifest(fname).get(int(doy))
+    if old is not None:
+        _append(fname, {'doy': int(doy), 'key': key, 'inputs': old.get('inputs', {}), 'output': _output_state(output)})
+
+
+def compact_manifest(fname):
+    """
+    Keeps the last line of each day of a manifest.
+
+    Only call it when no other process writes to the manifest.
+
+    Parameters
+    ----------
+    fname : str
+        manifest filename
+    """
+    if not os.path.isfile(fname):
+        return
+    with open(fname) as f:
+        nlines = sum(1 for line in f)
+    entries = read_manifest(fname)
+    if nlines == len(entries):
+        return
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fname), prefix='.manifest.')
+    with os.fdopen(fd, 'w') as f:
+        for doy in sorted(entries):
+            f.write(json.dumps(entries[doy], sort_keys=True) + '\n')
+    os.replace(tmp, fname)
@@ -2,13 +2,19 @@
 from __future__ import division
 import json
 import numpy as np 
-import os, datetime, traceback, gzip
+import io
+import os, datetime, traceback
 import subprocess
 import sys
 import tempfile
-from scipy.interpolate import interp1d, CubicSpline
+from scipy.interpolate import interp1d
 
 import gnssrefl.gps as g
+import gnssrefl.orbit_cache as orbit_cache
+import gnssrefl.snr_store as snr_store
+import gnssrefl.snr_format as snr_format
+import gnssrefl.compression as compression
+import gnssrefl.nmea_reader as nmea_reader
 from gnssrefl.snrfile_functions import constants, elev_limits as snr_elev_limits, propagate_and_azel_sp3
 
 def nmea_apriori_coords(station,llh,sp3):
@@ -79,7 +85,8 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
     fname : str
         NMEA filename 
     snrfile : str
-        name of output file for SNR data
+        name of output file for SNR data, written compressed if it ends in
+        .gz or .zst (see compression)
     csnr : str
         snr option, i.e. '66' or '99'
     dec : int
@@ -93,8 +100,8 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
     sp3 : bool
         whether you use multi-GNSS sp3 file to do azimuth elevation angle calculations
     gzip: bool
-        gzip compress snrfiles. No idea if it is used here ...
-        as this compression should happen in the calling function, not here
+        compress snrfiles. Not used here: the calling function chooses
+        the name of snrfile, and so whether it is compressed
     orb : str
         requested orbit source
     hour : int
@@ -181,43 +188,32 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
             print('Out of luck - could not find a good orbit file for you')
             return
 
-    #check whether the input file is a uncompressed or compressed     
-    tmpobj = tempfile.TemporaryDirectory()
-    tmpdir = tmpobj.name
-    tmpfpath = os.path.join(tmpdir,fname)
+    #check whether the input file is a uncompressed or compressed
+    # plain and gzipped files are read as they are (see nmea_reader)
     fpath = os.path.join(locdir,fname)
-    print('tmpfpath: ', tmpfpath)
     print('fpath: ', fpath)
-
+    tmpobj = None
     if os.path.exists(fpath):
-        subprocess.call(['cp', '-f',fpath,tmpdir])
+        readpath = fpath
     elif os.path.exists(fpath+'.gz'):
-        subprocess.call(['cp', '-f',fpath+'.gz',tmpdir])
-        subprocess.call(['gunzip', '-f', tmpfpath+'.gz'])
+        readpath = fpath + '.gz'
     elif os.path.exists(fpath+'.Z'):
+        tmpobj = tempfile.TemporaryDirectory()
+        tmpdir = tmpobj.name
+        readpath = os.path.join(tmpdir,fname)
+        print('tmpfpath: ', readpath)
         subprocess.call(['cp', '-f',fpath+'.Z',tmpdir])
-        subprocess.call(['uncompress', tmpfpath+'.Z'])
+        subprocess.call(['uncompress', readpath+'.Z'])
     else:
         print('File not found: ', fpath); return
-    t, prn, az, elv, snr, freq = read_nmea(tmpfpath) #read nmea files
-    subprocess.call(['rm',tmpfpath])
-    tmpobj.cleanup()
-    
-    #print('Number of t values ', len(t))
-    # why is there all this going back and forth between lists and np arrays?
+    t, prn, az, elv, snr, freq = nmea_reader.read_nmea_arrays(readpath) #read nmea files
+    if tmpobj is not None:
+        tmpobj.cleanup()
 
-    t = np.array(t);az = np.array(az);elv = np.array(elv);snr = np.array(snr);prn = np.array(prn); freq=np.array(freq)
-    #remove empty records
+    #remove empty records (nan, or -1 for the frequency)
     if (station != 'argt'):
-        #????
-        t = t[az !=''];snr = snr[az !=''];prn = prn[az !=''];elv = elv[az !=''];freq = freq[az != ''];az = az[az !=''];
-        t = t[elv !=''];az = az[elv !=''];snr = snr[elv !=''];prn = prn[elv !=''];freq = freq[elv != ''];elv = elv[elv !='']
-        t = t[snr !=''];az = az[snr !=''];prn = prn[snr !=''];elv = elv[snr !=''];freq = freq[snr != ''];snr = snr[snr !='']
-        t = t[prn !=''];az = az[prn !=''];elv = elv[prn !=''];snr = snr[prn !=''];freq = freq[prn != ''];prn = prn[prn !=''] 
-        t = t[freq !=''];az = az[freq !=''];elv = elv[freq !=''];snr = snr[freq !=''];prn = prn[freq !='']; freq = freq[freq != '']
-    
-    snr = snr.astype(float)
-    prn = prn.astype(int)
+        keep = ~np.isnan(az) & ~np.isnan(elv) & ~np.isnan(snr) & (freq >= 0)
+        t = t[keep]; az = az[keep]; elv = elv[keep]; snr = snr[keep]; prn = prn[keep]; freq = freq[keep]
 
     # SP3 path: skip fix_angle_azimuth (az/el come from orbits) and use
     # vectorized grouping instead of per-epoch Python loops.
@@ -245,8 +241,8 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
         s1_arr = np.zeros(n); s2_arr = np.zeros(n); s5_arr = np.zeros(n)
         s6_arr = np.zeros(n); s7_arr = np.zeros(n); s8_arr = np.zeros(n)
 
-        f1 = (freq_dec == '1'); f2 = (freq_dec == '2'); f5 = (freq_dec == '5')
-        f6 = (freq_dec == '6'); f7 = (freq_dec == '7'); f8 = (freq_dec == '8')
+        f1 = (freq_dec == 1); f2 = (freq_dec == 2); f5 = (freq_dec == 5)
+        f6 = (freq_dec == 6); f7 = (freq_dec == 7); f8 = (freq_dec == 8)
         # scatter in reverse so first observation wins on duplicate (time, sat, freq)
         s1_arr[inverse[f1][::-1]] = snr_dec[f1][::-1]
         s2_arr[inverse[f2][::-1]] = snr_dec[f2][::-1]
@@ -266,30 +262,9 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
             orbfile, snrfile, csnr)
         return
 
-    az = az.astype(float)
-    elv = elv.astype(float)
-
-    prn_unique = np.unique(prn)
-    #print(prn_unique)
-
-    T = []; PRN = []; AZ = []; ELV = []; SNR = []; FREQ = []
-    for i_prn in prn_unique:
-        # the original code added 100 - but did not take into account the
-        # satellite numbers have been shifted for glonass.
-        # also there is an illegal signal at satellite "48"
-        # i do not know what that is, but i am ignoring it.
-        #if (i_prn > 32):
-        #    print(i_prn, 'looks like an illegal satellite number')
-        time = t[prn == i_prn];angle = elv[prn == i_prn];azimuth = az[prn == i_prn]; frequency = freq[prn == i_prn]
-        Snr = snr[prn == i_prn];Prn = prn[prn == i_prn]
-
-        angle_fixed, azim_fixed = fix_angle_azimuth(time, angle, azimuth)#fix the angles
-        if (len(angle_fixed) == 0 and len(azim_fixed) == 0):
-            continue
-
-        T.extend(time);AZ.extend(azim_fixed);ELV.extend(angle_fixed);SNR.extend(Snr);PRN.extend(Prn); FREQ.extend(frequency)
-
-        del  time, angle, azimuth, Snr, Prn, angle_fixed, azim_fixed, frequency
+    # fix the angles of all the satellites at once (see fix_angle_azimuth)
+    index, ELV, AZ = fix_angle_azimuth_all(prn, t, elv, az)
+    T = t[index]; PRN = prn[index]; SNR = snr[index]; FREQ = freq[index]
 
     # It is easier for the sp3 option to write out the time, satellite, and SNR data into a plain file.
     # then Python can compute azel from the SP3 file and write out a new
@@ -301,13 +276,11 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
     
     inx = np.argsort(T)  #Sort data by time
     
-    T = np.array(T);PRN = np.array(PRN);ELV = np.array(ELV);SNR = np.array(SNR);AZ = np.array(AZ); FREQ=np.array(FREQ)
-    
     T = T[inx];PRN = PRN[inx];ELV = ELV[inx];SNR = SNR[inx];AZ = AZ[inx]; FREQ=FREQ[inx]
                                
     emin,emax = snr_elev_limits(int(csnr))#select snr option 50, 66, 88, 99
     #write to an output file 
-    with open(snrfile, 'w') as fout:
+    with io.TextIOWrapper(compression.open_write(snrfile)) as fout:
         for i in range(len(T)):
             if (float(ELV[i]) >= emin) and (float(ELV[i]) <= emax):
                 
@@ -363,17 +336,17 @@ def nmea_translate(locdir, fname, snrfile, csnr, dec, year, doy, recv, sp3, gzip
                 f_store = FREQ[i]
                 # this will create extremely large files ...
                 #print(t[i], f_store, SNR[i])
-                if f_store == '1':
+                if f_store == 1:
                     l1 = float(SNR[i])
-                elif f_store == '2':
+                elif f_store == 2:
                     l2 = float(SNR[i])
-                elif f_store == '5':
+                elif f_store == 5:
                     l5 = float(SNR[i])
-                elif f_store == '6':
+                elif f_store == 6:
                     l6 = float(SNR[i])
-                elif f_store == '7':
+                elif f_store == 7:
                     l7 = float(SNR[i])
-                elif f_store == '8':
+                elif f_store == 8:
                     l8 = float(SNR[i])
 
                 #NOTE -- All satellites have a 'mixed/undefined' frequency 0 for
@@ -408,7 +381,7 @@ def nmea_sp3_azel(recv, year, month, day, tod, prn, s1, s2, s5, s6, s7, s8,
     orbfile : str
         path to SP3 orbit file
     snrfile : str
-        path to output SNR file
+        path to output SNR file (compressed if it ends in .gz or .zst)
     csnr : str
         SNR option ('66', '99', etc.)
     """
@@ -423,11 +396,8 @@ def nmea_sp3_azel(recv, year, month, day, tod, prn, s1, s2, s5, s6, s7, s8,
     if sp3.size == 0:
         print('SP3 file is empty or unreadable'); return
 
-    # pre-index SP3 data by satellite number
-    sp3_index = {}
-    for sat_id in np.unique(sp3[:, 0]).astype(int):
-        m = sp3[:, 0] == sat_id
-        sp3_index[sat_id] = (sp3[m, 2], sp3[m, 3], sp3[m, 4], sp3[m, 5])
+    # orbit splines by satellite number, fit once per orbit file (orbit_cache)
+    splines = orbit_cache.sp3_splines(orbfile, sp3)
 
     oE = constants.omegaEarth
     clight = constants.c
@@ -436,15 +406,9 @@ def nmea_sp3_azel(recv, year, month, day, tod, prn, s1, s2, s5, s6, s7, s8,
     out_blocks = []
     unique_sats = np.unique(prn)
     for sat_id in unique_sats:
-        if sat_id not in sp3_index:
-            continue
-        sp3_sec, x, y, z = sp3_index[sat_id]
-        if len(x) == 0:
+        if sat_id not in splines:
             continue
-
-        iX = CubicSpline(sp3_sec, x, extrapolate=True)
-        iY = CubicSpline(sp3_sec, y, extrapolate=True)
-        iZ = CubicSpline(sp3_sec, z, extrapolate=True)
+        iX, iY, iZ = splines[sat_id]
 
         mask = (prn == sat_id)
         t_sat = obs_sow[mask]
@@ -494,19 +458,14 @@ def nmea_sp3_azel(recv, year, month, day, tod, prn, s1, s2, s5, s6, s7, s8,
 
     if not out_blocks:
         print('No observations survived orbit computation')
-        open(snrfile, 'w').close()
+        compression.open_write(snrfile).close()
         return
 
     all_data = np.vstack(out_blocks)
     sort_idx = np.lexsort((all_data[:, 1], all_data[:, 0]))
     all_data = all_data[sort_idx]
 
-    fmt = "%3.0f%10.4f%10.4f%10.1f%10.6f%7.2f%7.2f%7.2f%7.2f%7.2f%7.2f\n"
-    rows = all_data[:, 1:].tolist()
-    with open(snrfile, 'w') as f:
-        write = f.write
-        for row in rows:
-            write(fmt % tuple(row))
+    snr_format.write_rows(snrfile, all_data[:, 1:], snr_format.SNR_FORMAT)
 
 
 def read_nmea(fname):
@@ -869,6 +828,118 @@ def azimuth_mean(azim1, azim2):
 
     return azim
 
+def interp1d_segments(seg, x, bseg, bx, by):
+    """
+    Linear interpolation (and extrapolation) within segments, for all the
+    segments at once. Gives the same values as interp1d(..., kind='linear',
+    fill_value='extrapolate') built on the points of each segment.
+
+    Parameters
+    ----------
+    seg : numpy array of int
+        segment of each value to interpolate
+    x : numpy array of floats
+        where to interpolate
+    bseg : numpy array of int
+        segment of each point; every segment of seg needs at least two
+    bx : numpy array of floats
+        x of the points, in any order
+    by : numpy array of floats
+        y of the points
+
+    Returns
+    -------
+    y : numpy array of floats
+        interpolated values
+
+    """
+    # x as ranks among the x of the points: a point is below a value (searchsorted,
+    # side left) if it is of an earlier segment or of the same one with a lower rank
+    ux = np.unique(bx)
+    nx = len(ux) + 1
+    bkey = bseg*nx + np.searchsorted(ux, bx)
+    key = seg*nx + np.searchsorted(ux, x)
+    # points sorted by x within a segment, ties kept in order (interp1d uses a mergesort)
+    order = np.argsort(bkey, kind='stable')
+    bseg = bseg[order]; bx = bx[order]; by = by[order]
+    nseg = max(seg.max(), bseg.max()) + 1
+    npts = np.bincount(bseg, minlength=nseg)
+    first = np.concatenate(([0], np.cumsum(npts)[:-1]))
+    count = np.searchsorted(bkey[order], key)
+    hi = first[seg] + np.clip(count - first[seg], 1, npts[seg] - 1)
+    lo = hi - 1
+    slope = (by[hi] - by[lo]) / (bx[hi] - bx[lo])
+    return slope*(x - bx[lo]) + by[lo]
+
+def fix_angle_azimuth_all(sat, time, angle, azimuth):
+    """
+    fix_angle_azimuth for all the satellites at once: the observations are
+    grouped by satellite and the elevation angle and azimuth changes, the
+    midpoints and the interpolation are done for all the satellites together.
+    The values are the same as fix_angle_azimuth gives for each satellite.
+
+    Parameters
+    ----------
+    sat : numpy array of int
+        satellite numbers
+    time : numpy array of floats
+        seconds of the day
+    angle : numpy array of floats
+        elevation angles (degrees)
+    azimuth : numpy array of floats
+        azimuth angles (degrees)
+
+    Returns
+    -------
+    index : numpy array of int
+        observations that are kept, by satellite (increasing), and in their
+        order for each satellite. A satellite whose elevation angle or azimuth
+        changes less than twice is left out, as are nan values
+    angle_fixed : numpy array of floats
+        interpolated elevation angles of these observations
+    azim_fixed : numpy array of floats
+        interpolated azimuth angles of these observations
+
+    """
+    ok = np.flatnonzero(~np.isnan(angle) & ~np.isnan(azimuth) & ~np.isnan(time))
+    key = sat[ok]
+    if len(key) and key.min() >= 0 and key.max() < 2**15:
+        key = key.astype(np.int16)   # a stable sort of int16 is a radix sort
+    index = ok[np.argsort(key, kind='stable')]
+    sat = sat[index]; time = time[index]; angle = angle[index]; azimuth = azimuth[index]
+    if len(index) == 0:
+        return index, np.zeros(0), np.zeros(0)
+    seg = np.concatenate(([0], np.cumsum(sat[1:] != sat[:-1])))
+    nseg = seg[-1] + 1
+
+    # changes between successive observations of a satellite
+    same = seg[1:] == seg[:-1]
+    ind1 = np.flatnonzero(same & (np.diff(angle) != 0))
+    ind3 = np.flatnonzero(same & (azimuth_diff2(azimuth[1:], azimuth[:-1]) != 0))
+    good = (np.bincount(seg[ind1], minlength=nseg) > 1) & (np.bincount(seg[ind3], minlength=nseg) > 1)
+    ind1 = ind1[good[seg[ind1]]]
+    ind3 = ind3[good[seg[ind3]]]
+
+    time_angle0 = (time[ind1] + time[ind1 + 1])/2.0
+    angle0 = (angle[ind1] + angle[ind1 + 1])/2.0
+    time_azim0 = (time[ind3] + time[ind3 + 1])/2.0
+    # azimuth_mean: the mean of the azimuths if none is negative, else the circular mean
+    negative = np.bincount(seg[ind3], weights=(azimuth[ind3] < 0) | (azimuth[ind3 + 1] < 0), minlength=nseg) > 0
+    azim0 = (angle_range_positive(azimuth[ind3]) + angle_range_positive(azimuth[ind3 + 1]))/2.0
+    circular = negative[seg[ind3]]
+    azim1 = azimuth[ind3][circular]; azim2 = azimuth[ind3 + 1][circular]
+    x = (np.sin(azim1*np.pi/180) + np.sin(azim2*np.pi/180))/2.0
+    y = (np.cos(azim1*np.pi/180) + np.cos(azim2*np.pi/180))/2.0
+    azim0[circular] = 180/np.pi * np.arctan2(x, y)
+
+    # interpolate at the mean values
+    keep = good[seg]
+    if not keep.any():
+        return index[keep], np.zeros(0), np.zeros(0)
+    angle_fixed = interp1d_segments(seg[keep], time[keep], seg[ind1], time_angle0, angle0)
+    azim_fixed = interp1d_segments(seg[keep], time[keep], seg[ind3], time_azim0, azim0)
+    return index[keep], angle_fixed, azim_fixed
+
 def quickname(station,year,cyy, cdoy, csnr):
     """
     Creates a full name of the snr file name (i.e. including the path) 
@@ -910,7 +981,7 @@ def quickname(station,year,cyy, cdoy, csnr):
 
     return fname
 
-def run_nmea2snr(station, year, doy, isnr, overwrite, dec, llh, recv, sp3, gzip,orb,hour):
+def run_nmea2snr(station, year, doy, isnr, overwrite, dec, llh, recv, sp3, gzip,orb,hour,binary=False):
     """
     runs the nmea2snr conversion code 
 
@@ -946,11 +1017,14 @@ def run_nmea2snr(station, year, doy, isnr, overwrite, dec, llh, recv, sp3, gzip,
     sp3 : bool
         whether you want to use GFZ rapid sp3 file for the orbits
     gzip : bool
-        whether snrfiles are gzipped after creation
+        whether snrfiles are compressed as they are written (gzip, unless
+        configured otherwise, see compression)
     orb : str
         requested orbit source
     hour : int
         requested hour for ultrarapid orbit
+    binary : bool, optional
+        also write the binary (.npz) version of the SNR file. default is False
 
     """
     # avoiding makan's loops - but using True to avoid re-indenting
@@ -965,12 +1039,10 @@ def run_nmea2snr(station, year, doy, isnr, overwrite, dec, llh, recv, sp3, gzip,
                 if overwrite:
                     print('SNR file exists, but you requested it be overwritten')
                     # just in case you have a previously gunzipped version
-                    if os.path.exists(snrfile):
-                        subprocess.call(['rm', snrfile])
-                        snre = False
-                    if os.path.exists(snrfile + '.gz'):
-                        subprocess.call(['rm', snrfile + '.gz'])
-                        snre = False
+                    for oldfile in [snrfile] + compression.compressed_versions(snrfile):
+                        if os.path.exists(oldfile):
+                            os.remove(oldfile)
+                            snre = False
                 else:
                     print('SNR file already exists', snrfile)
         
@@ -981,12 +1053,13 @@ def run_nmea2snr(station, year, doy, isnr, overwrite, dec, llh, recv, sp3, gzip,
             if (not illegal_day) and (not snre):
                 r =  station + cdoy + '0.' + cyy + '.A'# nmea file name example:  WESL2120.21.A 
                 if os.path.exists(locdir+r) or os.path.exists(locdir+r+'.gz') or os.path.exists(locdir+r+'.Z') or (station == 'argt'):
+                    # written compressed straight away, no gzip afterwards
+                    if gzip:
+                        snrfile = compression.compressed_name(snrfile)
                     nmea_translate(locdir, r, snrfile, csnr, dec, year, doy, recv, sp3, gzip,orb,hour)
                     if os.path.isfile(snrfile):
                         print('SUCCESS: SNR file created', snrfile)
-                    if gzip:
-                        if not snrfile.endswith('.gz'):
-                            subprocess.call(['gzip', snrfile])
-                            #print('SNR file gzip compressed')
+                        if binary:
+                            snr_store.text2binary(snrfile)
                 else:
                     print('NMEA file '+ locdir + r +' does not exist')
@@ -37,13 +37,14 @@ def parse_arguments():
     parser.add_argument("-orb", default=None, help="request specific orbit source", type=str)
     parser.add_argument("-hour", default=None, help="request hour for ultra orbit", type=int)
     parser.add_argument("-debug", default=None, help="Allow error messages to the screen", type=str)
+    parser.add_argument("-binary", default=None, help="set to T to also write binary (.npz) SNR files", type=str)
 
     g.print_version_to_screen()
 
     args = parser.parse_args().__dict__
 
     # convert all expected boolean inputs from strings to booleans
-    boolean_args = ['risky', 'gzip', 'overwrite','debug']
+    boolean_args = ['risky', 'gzip', 'overwrite','debug','binary']
     args = str2bool(args, boolean_args)
 
     # only return a dictionary of arguments that were added from the user - all other defaults will be set in code below
@@ -52,7 +53,7 @@ def parse_arguments():
 def nmea2snr( station: str, year: int, doy: int, snr: int = 66, year_end: int=None, doy_end: int=None, 
              overwrite : bool=False, dec : int=1, lat : float = None, lon : float=None, 
              height : float = None, risky : bool=False, gzip : bool = True, par:int = None, 
-             orb:str = None, hour:int =0, debug: bool=None):
+             orb:str = None, hour:int =0, debug: bool=None, binary: bool=False):
     """
     This code creates SNR files from NMEA files.  
 
@@ -128,6 +129,10 @@ def nmea2snr( station: str, year: int, doy: int, snr: int = 66, year_end: int=No
         you will get uglier error messages, which can be helpful in figuring out
         why the code did not work.
 
+    binary : bool
+        also write a binary (.npz) version of each SNR file, which gnssir reads
+        much faster than the text file. Default is False.
+
     Examples
     --------
     nmea2snr wesl 2023 8 -dec 5
@@ -199,7 +204,7 @@ def nmea2snr( station: str, year: int, doy: int, snr: int = 66, year_end: int=No
 
     #def run_nmea2snr(station, year, doy, isnr, overwrite, dec, llh, sp3, gzip):
     # calling cartesian coordinates llh is so wrong
-    args = {'station': station, 'isnr': snr,  'overwrite': overwrite, 'dec':dec, 'llh': llh, 'recv': recv, 'sp3': sp3, 'gzip': gzip, 'orb': orb, 'hour': hour}
+    args = {'station': station, 'isnr': snr,  'overwrite': overwrite, 'dec':dec, 'llh': llh, 'recv': recv, 'sp3': sp3, 'gzip': gzip, 'orb': orb, 'hour': hour, 'binary': binary}
 
     # first get it working without parallel processing
     if not par:
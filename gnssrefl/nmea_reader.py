@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+Fast reading of the satellites in view (GSV sentences) of NMEA files.
+
+nmea2snr.read_nmea goes through a file one line at a time, splitting and
+decoding every line in python. read_nmea_arrays gives the same result as
+numpy arrays, but reads the file in large blocks and looks at all the lines
+of a block at once with numpy byte operations: where each line starts and
+ends, how many '$', '*' and ',' it has, and which sentence types (RMC, GGA,
+GSV) and talkers (GPGSV, GLGSV, ...) it contains. The RMC and GGA lines set
+the time of the GSV lines that follow them: their time fields are converted
+all at once and carried forward to the GSV lines. Only the lines up to the
+first RMC date are gone through one at a time, as read_nmea does. The
+satellite fields of the GSV lines are located from the comma positions and
+converted to numbers column by column. Fields that are not plain digits
+(rare) are converted by python.
+
+Gzipped (and zstd, see compression) files are decompressed as they are read.
+"""
+import datetime
+
+import numpy as np
+
+from gnssrefl import compression
+
+# bytes read at a time
+BLOCK_SIZE = 1024*1024
+
+# field counts of the GSV sentences that are used; the odd ones end with a signal ID
+GSV_FIELDS = (21, 20, 17, 16, 13, 12, 9, 8)
+
+# talkers in the order read_nmea looks for them, with the number added to the
+# satellite number and the signal ID table they use
+TALKERS = ((b'GP', 0, 0), (b'GL', 100, 1), (b'GA', 200, 2), (b'BD', 300, 3), (b'GB', 300, 3))
+
+# NMEA 4.11 signal IDs to frequencies, per constellation (GPS, GLONASS, Galileo, BeiDou)
+SIGNALS = ({'0': 1, '1': 1, '2': 1, '3': 1, '5': 2, '6': 2, '7': 5, '8': 5},
+           {'0': 1, '1': 1, '2': 1, '3': 2, '4': 2},
+           {'6': 1, '7': 1, '1': 5, '2': 7, '3': 8, '4': 6, '5': 6},
+           {'3': 1, '4': 1, '0': 2, '1': 2, '2': 2, '5': 5, '6': 7, 'B': 7, 'C': 7, '7': 8, '8': 6, '9': 6,
+            'A': 6})
+# frequencies that nmea2snr writes out
+FREQUENCIES = (1, 2, 5, 6, 7, 8)
+
+
+def _signal_tables():
+    """frequency for each byte value of a one character signal ID, one row per constellation"""
+    tables = np.zeros((len(SIGNALS), 256), dtype=np.int64)
+    for f in FREQUENCIES:
+        # an ID that is not in the table is kept as it is
+        tables[:, ord(str(f))] = f
+    for i, signals in enumerate(SIGNALS):
+        for sig, f in signals.items():
+            tables[i, ord(sig)] = f
+    return tables
+
+
+_TABLES = _signal_tables()
+
+
+def _match(b, positions, pattern):
+    """positions where b holds pattern"""
+    positions = positions[positions + len(pattern) <= len(b)]
+    for k in range(1, len(pattern)):
+        positions = positions[b[positions + k] == pattern[k]]
+    return positions
+
+
+def _numbers(data, b, start, end, integer=False):
+    """
+    Values of the fields data[start:end].
+
+    Returns
+    -------
+    value : numpy array of float
+        nan for an empty field or one that is not a number
+    ok : numpy array of bool
+        whether the field is a number (int() or float() would take it)
+
+    """
+    length = end - start
+    # up to three digits (all the numbers of GSV sentences)
+    value = np.zeros(len(start), dtype=np.int32)
+    digits = (length >= 1) & (length <= 3)
+    for k in range(3):
+        d = np.take(b, start + k, mode='clip') - np.uint8(48)
+        inside = k < length
+        digits &= ~inside | (d <= 9)
+        value = np.where(inside, value*10 + d, value)
+    value = value.astype(float)
+    ok = digits.copy()
+    value[~digits] = np.nan
+    # anything else is left to python
+    for i in np.flatnonzero(~digits & (length > 0)):
+        try:
+            value[i] = int(data[start[i]:end[i]]) if integer else float(data[start[i]:end[i]])
+            ok[i] = True
+        except ValueError:
+            pass
+    return value, ok
+
+
+def _seconds(field):
+    """seconds of the day of a hhmmss.ss time field, as read_nmea reads it (None if it is not one)"""
+    try:
+        return int(field[0:2])*3600 + int(field[2:4])*60 + float(field[4:8])
+    except ValueError:
+        return None
+
+
+def _clock(data, b, start, end):
+    """
+    Seconds of the day of the time fields data[start:end] (hhmmss, hhmmss. or
+    hhmmss.s...), nan where there is no time. Other forms are left to python.
+    """
+    length = end - start
+    d = np.take(b, start[:, None] + np.arange(8), mode='clip').astype(np.int64) - 48
+    digit = (d >= 0) & (d <= 9)
+    simple = (length >= 6) & digit[:, :6].all(axis=1)
+    tenth = np.where((length >= 8) & digit[:, 7], d[:, 7], 0)
+    simple &= (length == 6) | ((d[:, 6] == -2) & ((length == 7) | digit[:, 7]))
+    # float('ss.s') is the same as (10*ss + s)/10, both correctly rounded
+    t = (d[:, 0]*36000 + d[:, 1]*3600 + d[:, 2]*600 + d[:, 3]*60).astype(float) \
+        + (d[:, 4]*100 + d[:, 5]*10 + tenth)/10
+    t[~simple] = np.nan
+    for i in np.flatnonzero(~simple):
+        value = _seconds(data[start[i]:end[i]].decode('utf-8', errors='replace'))
+        if value is not None:
+            t[i] = value
+    return t
+
+
+class _Reader:
+    """
+    The time state of read_nmea (date seen, time of the last RMC/GGA line),
+    carried from block to block, and the satellites found so far.
+    """
+
+    def __init__(self):
+        self.dated = False
+        self.t_sec = np.nan
+        self.nlines = 0
+        self.undefined = 0
+        self.out = []
+
+    def undated(self, data, starts, stops, timing, rmc, gga):
+        """
+        Goes through the RMC and GGA lines one at a time, as read_nmea does,
+        until an RMC line gives a date.
+
+        Returns
+        -------
+        k : int
+            line of the first date, -1 if there is none
+
+        """
+        for k in timing:
+            row = data[starts[k]:stops[k]].decode('utf-8', errors='replace').split(',')
+            if rmc[k]:
+                try:
+                    datetime.datetime(int(row[9][4:6])+2000, int(row[9][2:4]), int(row[9][0:2]))
+                    self.dated = True
+                except (IndexError, ValueError):
+                    pass
+                t = _seconds(row[1]) if len(row) > 1 else None
+                if t is not None:
+                    self.t_sec = 86400 if (self.nlines + k > 100 and t == 0) else t
+            if self.dated:
+                if gga[k]:
+                    t = _seconds(row[1]) if len(row) > 1 else None
+                    self.t_sec = np.nan if t is None else (86400 if (self.nlines + k > 100 and t == 0) else t)
+                return k
+        return -1
+
+    def block(self, data, newline=True):
+        """
+        Reads the lines of a block of the file.
+
+        Parameters
+        ----------
+        data : bytes
+            whole lines, each ending with a newline
+        newline : bool
+            False if the last line had no newline in the file (the end of it)
+
+        """
+        b = np.frombuffer(data, dtype=np.uint8)
+        # commas and newlines, in order: the commas of line k are commas[cfirst[k]:cfirst[k + 1]]
+        marks = np.flatnonzero((b == 44) | (b == 10))
+        is_end = b[marks] == 10
+        ends = marks[is_end]
+        nlines = len(ends)
+        # (and one past the end, so that there is always one to take)
+        commas = np.append(marks[~is_end], len(b))
+        cfirst = np.zeros(nlines + 1, dtype=np.int64)
+        cfirst[1:] = np.flatnonzero(is_end) + 1 - np.arange(1, nlines + 1)
+        ncommas = np.diff(cfirst)
+
+        def lineof(positions):
+            return np.searchsorted(ends, positions)
+
+        starts = np.empty(nlines, dtype=np.int64)
+        starts[:1] = 0
+        starts[1:] = ends[:-1] + 1
+        # read_nmea keeps the newline at the end of a line
+        stops = ends + 1
+        if not newline:
+            stops[-1] -= 1
+
+        # read_nmea skips lines with a '$' after the first character (not counting the
+        # last one), more than one '*', or not starting with $G
+        dollars = np.flatnonzero(b == 36)
+        dline = lineof(dollars)
+        dollars = dollars[(dollars > starts[dline]) & (dollars < stops[dline] - 1)]
+        stars = np.flatnonzero(b == 42)
+        sline = lineof(stars)
+        nstars = np.bincount(sline, minlength=nlines)
+        valid = (nstars <= 1) & (np.bincount(lineof(dollars), minlength=nlines) == 0)
+        valid &= (b[starts] == 36) & (b[np.minimum(starts + 1, len(b) - 1)] == 71) & (stops - starts >= 2)
+
+        # sentence types found anywhere in a line
+        g = np.flatnonzero(b == 71)
+        gsv = _match(b, g, b'GSV')
+        gga = np.zeros(nlines, dtype=bool)
+        gga[lineof(_match(b, g, b'GGA'))] = True
+        rmc = np.zeros(nlines, dtype=bool)
+        rmc[lineof(_match(b, np.flatnonzero(b == 82), b'RMC'))] = True
+        gsvline = lineof(gsv)
+        # talker: the first of GPGSV, GLGSV, ... in read_nmea's order found in the line
+        talker = np.full(nlines, len(TALKERS), dtype=np.int64)
+        before = gsv - 2
+        inline = before >= starts[gsvline]
+        for code in range(len(TALKERS)):
+            name = TALKERS[code][0]
+            here = inline & (b[np.maximum(before, 0)] == name[0]) & (b[np.maximum(before + 1, 0)] == name[1])
+            talker[gsvline[here]] = np.minimum(talker[gsvline[here]], code)
+        has_gsv = np.zeros(nlines, dtype=bool)
+        has_gsv[gsvline] = True
+
+        nfields = ncommas + 1
+        use = valid & has_gsv & ~gga & np.isin(nfields, GSV_FIELDS)
+
+        # time of the lines: the RMC and GGA lines set it (GGA lines without a
+        # time clear it), the GSV lines take the last one
+        timing = np.flatnonzero(valid & (rmc | gga))
+        t_first = self.t_sec
+        if not self.dated:
+            k = self.undated(data, starts, stops, timing, rmc, gga)
+            if k < 0:
+                use[:] = False
+            else:
+                use[:k] = False
+                t_first = self.t_sec
+                timing = timing[timing > k]
+        s = np.where(ncommas[timing] > 0, np.take(commas, cfirst[timing], mode='clip') + 1, stops[timing])
+        e = np.where(ncommas[timing] > 1, np.take(commas, cfirst[timing] + 1, mode='clip'), stops[timing])
+        t = _clock(data, b, s, e)
+        t[((self.nlines + timing) > 100) & (t == 0)] = 86400
+        # an RMC line without a time leaves it as it is
+        change = gga[timing] | ~np.isnan(t)
+        timing, t = timing[change], t[change]
+        if len(timing):
+            self.t_sec = t[-1]
+
+        lines = np.flatnonzero(use)
+        last = np.searchsorted(timing, lines, side='right') - 1
+        t_line = np.where(last >= 0, t[np.maximum(last, 0)] if len(t) else t_first, t_first)
+        keep = ~np.isnan(t_line)
+        self.undefined += np.count_nonzero(keep & (talker[lines] == len(TALKERS)))
+        keep &= talker[lines] < len(TALKERS)
+        lines, t_line = lines[keep], t_line[keep]
+        self.nlines += nlines
+        if len(lines) == 0:
+            return
+        n = nfields[lines]
+        code = talker[lines]
+        star = np.full(nlines, np.iinfo(np.int64).max, dtype=np.int64)
+        star[sline] = stars
+        star = star[lines]
+
+        # field j of a line is between after[:, j - 1] + 1 and after[:, j], the
+        # commas that follow it or the end of the line for the last one
+        m = len(lines)
+        after = np.take(commas, cfirst[lines][:, None] + np.arange(max(GSV_FIELDS)), mode='clip')
+        after[np.arange(m), n - 1] = stops[lines]
+
+        # signal ID at the end of the line, cut at the '*' (and so are the SNR fields)
+        with_signal = (n % 2) == 1
+        s = after[np.arange(m), n - 2] + 1
+        e = np.where((star >= s) & (star < stops[lines]), star, stops[lines])
+        offset = np.array([t[1] for t in TALKERS])[code]
+        table = np.array([t[2] for t in TALKERS])[code]
+        freq = np.where(e - s == 1, _TABLES[table, b[s]], 0)
+        freq[e == s] = -1
+        freq[~with_signal] = 1
+        nsat = (n - with_signal - 4) // 4
+
+        # up to four satellites a line, in fields 4-7, 8-11, ...
+        slot = np.arange(4) < nsat[:, None]
+        sat = np.nonzero(slot)[0]
+        s = after[:, 3:19].reshape(m, 4, 4)[slot] + 1
+        e = after[:, 4:20].reshape(m, 4, 4)[slot]
+        e[:, 3] = np.where((star[sat] >= s[:, 3]) & (star[sat] < e[:, 3]), star[sat], e[:, 3])
+        prn, ok = _numbers(data, b, s[:, 0], e[:, 0], integer=True)
+        values = _numbers(data, b, s[ok, 1:].ravel(), e[ok, 1:].ravel())[0].reshape(-1, 3)
+        sat = sat[ok]
+        self.out.append([t_line[sat], prn[ok] + offset[sat], values[:, 1], values[:, 0], values[:, 2], freq[sat]])
+
+
+def read_nmea_arrays(fname, blocksize=BLOCK_SIZE):
+    """
+    Reads the satellites in view of a NMEA file, the same as nmea2snr.read_nmea.
+
+    Parameters
+    ----------
+    fname : str
+        NMEA filename, plain or gzipped
+    blocksize : int, optional
+        bytes read at a time
+
+    Returns
+    -------
+    t : numpy array of float
+        seconds of the day (of the RMC/GGA time tags)
+    prn : numpy array of int
+        satellite numbers (100 added for Glonass, 200 for Galileo, 300 for Beidou)
+    az : numpy array of float
+        azimuths (degrees), nan where the field is empty
+    elv : numpy array of float
+        elevation angles (degrees), nan where the field is empty
+    snr : numpy array of float
+        SNR values (dB-Hz), nan where the field is empty
+    freq : numpy array of int
+        frequency (1, 2, 5, 6, 7, 8), 0 for other signals, -1 where the
+        signal ID is empty
+
+    """
+    reader = _Reader()
+    with compression.open_read(fname) as f:
+        rest = b''
+        while True:
+            data = f.read(blocksize)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b'\n') + 1
+            rest = data[cut:]
+            if cut > 0:
+                reader.block(data[:cut])
+        if rest:
+            reader.block(rest + b'\n', newline=False)
+    if reader.undefined:
+        print('Undefined constellation in {0:d} GSV sentences, skipped'.format(reader.undefined))
+    if not reader.out:
+        return (np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0), np.zeros(0),
+                np.zeros(0, dtype=np.int64))
+    t, prn, az, elv, snr, freq = [np.concatenate([o[c] for o in reader.out]) for c in range(6)]
+    return t, prn.astype(np.int64), az, elv, snr, freq.astype(np.int64)
@@ -6,6 +6,7 @@ from matplotlib.figure import Figure
 
 
 import gnssrefl.gps as g
+import gnssrefl.orbit_cache as orbit_cache
 import gnssrefl.refl_zones as rz
 
 def pickup_files_nyquist(station,recv,obsfile,constel,e1,e2,reqsamplerate,hires_figs):
@@ -175,8 +176,7 @@ def read_the_orbits(obsfile,constel):
     constel : int
         which constellation (1-4), 1 for gps, 2 for glonass etc
     """
-    f = np.loadtxt(obsfile,comments='%')
-    #f = np.genfromtxt(obsfile,comments='%')
+    f = orbit_cache.read_table(obsfile)
     if (constel == 4):
         #print('found beidou')
         i = (f[:,0] < 38) | (f[:,0] > 40)
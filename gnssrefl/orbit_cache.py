@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Cache of parsed orbit files.
+
+The same orbit file is used for every station of a day, but rinex2snr and
+nmea2snr parse the SP3 text and fit the cubic splines of each satellite again
+for every station. This module keeps the parsed results, so each orbit file is
+parsed (and splined) once::
+
+    {REFL_CODE}/Files/orbit_cache/{orbit file name}.{path key}.{kind}.{file key}.npz
+
+The path key is made from the absolute path of the orbit file and the file key
+from its modification time and size, so an orbit file that is downloaded again
+gets a new entry (older entries of the same file are removed). Three kinds of
+entries exist:
+
+    sp3 : the array returned by gps.read_sp3file
+    splines : the CubicSpline coefficients of every satellite in an SP3 file
+        (sat_ids, offsets, breakpoints, coefficients)
+    table : a plain text orbit file read with np.genfromtxt (refl_zones)
+
+Entries are uncompressed numpy archives written to a temporary name and then
+renamed, so concurrent readers (e.g. rinex2snr -par workers) never see a half
+written file. Results are also kept in memory for the few most recent files.
+Without REFL_CODE, or when the cache directory cannot be written, orbit files
+are simply parsed every time.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+from scipy.interpolate import CubicSpline
+
+FORMAT_VERSION = 1
+# results kept in memory, by (kind, path, file key)
+_memory = {}
+MEMORY_ENTRIES = 8
+
+
+def cache_dir():
+    """
+    Directory of the orbit cache.
+
+    Returns
+    -------
+    str or None
+        {REFL_CODE}/Files/orbit_cache, None when REFL_CODE is not set
+    """
+    if 'REFL_CODE' not in os.environ:
+        return None
+    return os.path.join(os.environ['REFL_CODE'], 'Files', 'orbit_cache')
+
+
+def _keys(orbfile):
+    """ absolute path, path key and file key (modification time and size) of an orbit file """
+    path = os.path.abspath(orbfile)
+    st = os.stat(path)
+    pathkey = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+    filekey = hashlib.sha1('{0:d} {1:d} {2:d}'.format(st.st_mtime_ns, st.st_size, FORMAT_VERSION).encode()).hexdigest()[:12]
+    return path, pathkey, filekey
+
+
+def cache_name(orbfile, kind):
+    """
+    Name of the cache entry of an orbit file.
+
+    Parameters
+    ----------
+    orbfile : str
+        orbit filename
+    kind : str
+        sp3, splines or table
+
+    Returns
+    -------
+    str or None
+        cache filename, None if there is no cache directory
+    """
+    xdir = cache_dir()
+    if xdir is None:
+        return None
+    path, pathkey, filekey = _keys(orbfile)
+    return os.path.join(xdir, '{0:s}.{1:s}.{2:s}.{3:s}.npz'.format(os.path.basename(path), pathkey, kind, filekey))
+
+
+def _remember(key, value):
+    if len(_memory) >= MEMORY_ENTRIES:
+        _memory.pop(next(iter(_memory)))
+    _memory[key] = value
+    return value
+
+
+def _load(orbfile, kind, compute):
+    """
+    Arrays of a cache entry, computed and stored when the entry does not exist.
+
+    Parameters
+    ----------
+    orbfile : str
+        orbit filename
+    kind : str
+        kind of entry
+    compute : function
+        called with orbfile, returns a dict of numpy arrays
+
+    Returns
+    -------
+    dict of numpy arrays
+    """
+    path, pathkey, filekey = _keys(orbfile)
+    memkey = (kind, path, filekey)
+    if memkey in _memory:
+        return _memory[memkey]
+
+    cachefile = cache_name(orbfile, kind)
+    if cachefile is not None and os.path.isfile(cachefile):
+        try:
+            with np.load(cachefile) as z:
+                return _remember(memkey, {name: z[name] for name in z.files})
+        except (OSError, ValueError, EOFError):
+            pass  # unreadable entry, it is replaced below
+
+    arrays = compute(orbfile)
+    if cachefile is not None:
+        try:
+            os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+            # write to a temporary name first so a reader never sees a half written file
+            fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(cachefile), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fout:
+                np.savez(fout, **arrays)
+            os.replace(tmpfile, cachefile)
+            stale = glob.glob(cachefile.replace('.' + filekey + '.npz', '.*.npz'))
+            for f in stale:
+                if f != cachefile:
+                    try:
+                        os.remove(f)
+                    except OSError:
+                        pass
+        except OSError:
+            pass  # read only cache, just use the arrays
+    return _remember(memkey, arrays)
+
+
+def build_splines(sp3):
+    """
+    Cubic splines of the satellite positions in an SP3 array.
+
+    Parameters
+    ----------
+    sp3 : numpy array
+        as returned by gps.read_sp3file (satnum, week, sow, x, y, z)
+
+    Returns
+    -------
+    dict
+        sat_ids (int), offsets (int), breakpoints and coefficients. The
+        splines of sat_ids[i] use breakpoints[offsets[i]:offsets[i+1]] and
+        coefficients[:, offsets[i]-i:offsets[i+1]-i-1, :] (x, y, z in the last axis)
+    """
+    sat_ids = []; breakpoints = []; coefficients = []; offsets = [0]
+    for sat_id in np.unique(sp3[:, 0]).astype(int):
+        m = sp3[:, 0] == sat_id
+        sec = sp3[m, 2]
+        if len(sec) < 2:
+            continue
+        c = [CubicSpline(sec, sp3[m, col], extrapolate=True).c for col in [3, 4, 5]]
+        sat_ids.append(sat_id)
+        breakpoints.append(sec)
+        coefficients.append(np.stack(c, axis=-1))
+        offsets.append(offsets[-1] + len(sec))
+    if len(sat_ids) == 0:
+        return {'sat_ids': np.zeros(0, dtype=int), 'offsets': np.zeros(1, dtype=int),
+                'breakpoints': np.zeros(0), 'coefficients': np.zeros((4, 0, 3))}
+    return {'sat_ids': np.array(sat_ids), 'offsets': np.array(offsets),
+            'breakpoints': np.concatenate(breakpoints), 'coefficients': np.concatenate(coefficients, axis=1)}
+
+
+def splines_from_arrays(arrays):
+    """
+    The CubicSpline objects of arrays made by build_splines.
+
+    Returns
+    -------
+    dict
+        (iX, iY, iZ) by satellite number, the same splines as
+        CubicSpline(sow, x, extrapolate=True) etc.
+    """
+    splines = {}
+    offsets = arrays['offsets']
+    for i, sat_id in enumerate(arrays['sat_ids']):
+        x = arrays['breakpoints'][offsets[i]:offsets[i+1]]
+        c = arrays['coefficients'][:, offsets[i]-i:offsets[i+1]-i-1, :]
+        splines[int(sat_id)] = tuple(CubicSpline.construct_fast(np.ascontiguousarray(c[:, :, k]), x, extrapolate=True)
+                                     for k in range(3))
+    return splines
+
+
+def read_sp3(orbfile, parse):
+    """
+    SP3 array of an orbit file, from the cache.
+
+    Parameters
+    ----------
+    orbfile : str
+        SP3 filename
+    parse : function
+        the SP3 parser, called with orbfile on a cache miss
+
+    Returns
+    -------
+    sp3 : numpy array
+        satnum, week, sow, x, y, z
+    """
+    return _load(orbfile, 'sp3', lambda f: {'sp3': parse(f)})['sp3'].copy()
+
+
+def sp3_splines(orbfile, sp3=None):
+    """
+    Cubic splines of the satellite positions in an SP3 file, from the cache.
+
+    Parameters
+    ----------
+    orbfile : str
+        SP3 filename
+    sp3 : numpy array, optional
+        the parsed file, if the caller already has it
+
+    Returns
+    -------
+    dict
+        (iX, iY, iZ) by satellite number (0, 100, 200, 300 added for
+        gps, glonass, galileo and beidou, as in gps.read_sp3file)
+    """
+    import gnssrefl.gps as g
+    if sp3 is None:
+        compute = lambda f: build_splines(g.read_sp3file(f))
+    else:
+        compute = lambda f: build_splines(sp3)
+    return splines_from_arrays(_load(orbfile, 'splines', compute))
+
+
+def read_table(orbfile):
+    """
+    Plain text orbit file (e.g. the refl_zones orbits), from the cache.
+
+    Returns
+    -------
+    numpy array
+        np.genfromtxt(orbfile, comments='%')
+    """
+    return _load(orbfile, 'table', lambda f: {'table': np.genfromtxt(f, comments='%')})['table'].copy()
@@ -8,6 +8,7 @@ import sys
 
 
 import gnssrefl.gps as g
+import gnssrefl.manifest as manifest
 from gnssrefl.utils import FileManagement, FileTypes, pre_check_arc, check_arc_quality, format_qc_summary
 import gnssrefl.daily_avg_cl as da
 import gnssrefl.gnssir_v2 as gnssir
@@ -15,7 +16,7 @@ from gnssrefl.extract_arcs import extract_arcs_from_station, move_arc_to_failqc
 from functools import partial
 from scipy import optimize
 from scipy.interpolate import interp1d
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
 from gnssrefl.utils import str2bool, read_files_in_dir
@@ -239,8 +240,6 @@ def subdaily_phase_plot(station, fr, vxyz, outdir, hires_figs, bin_hours=24, bin
         whether to display plot to screen (default: True)
 
     """
-    from datetime import datetime, timedelta
-
     # Calculate averaged phase (no duplication!)
     avg_phase = calculate_avg_phase(vxyz, bin_hours, bin_offset, minvalperbin)
 
@@ -877,6 +876,15 @@ def phase_tracks(station, year, doy, snr_type, fr_list, station_config,
             vwc_tracks_path = FileManagement(station, 'vwc_tracks_file', extension=extension).get_file_path(ensure_directory=False)
             tagging_kwargs = {'track_file': vwc_tracks_path}
 
+        # inputs and settings of this day, see manifest.py
+        manifest_file = manifest.manifest_name(station, year, 'phase', extension)
+        settings_key = manifest.settings_key(station_config, snr_type=snr_type, fr_list=list(fr_list), legacy=legacy)
+        if station_config.get('incremental', False) and output_path.exists():
+            inputs = phase_inputs(station, year, doy, snr_type, fr_list, station_config, extension, legacy)
+            if manifest.is_current(manifest_file, doy, settings_key, inputs, output_path):
+                print('The inputs and settings of this day did not change since the phase file was written.')
+                return
+
         print(f"Saving phase file to: {output_path}")
         with open(output_path, 'w') as my_file:
             np.savetxt(my_file, [], header=header, comments='%')
@@ -1013,6 +1021,56 @@ def phase_tracks(station, year, doy, snr_type, fr_list, station_config,
             if qc_lines:
                 print('\n'.join(qc_lines) + '\n')
 
+        if station_config.get('incremental', False):
+            manifest.record(manifest_file, doy, settings_key,
+                            phase_inputs(station, year, doy, snr_type, fr_list, station_config, extension, legacy),
+                            output_path)
+
+
+def phase_inputs(station, year, doy, snr_type, fr_list, station_config, extension='', legacy=False):
+    """
+    Files read by phase_tracks for one day, for the manifest (see manifest.py).
+
+    These are the SNR and refraction files, vwc_tracks.json (or the legacy
+    apriori RH files of each frequency) and, unless the periodograms are
+    recomputed, the gnssir results of the day.
+
+    Parameters
+    ----------
+    station : str
+        4 char id, lowercase
+    year : int
+        calendar year
+    doy : int
+        day of year
+    snr_type : int
+        SNR file extension
+    fr_list : list of integers
+        frequencies to process
+    station_config : dict
+        station analysis parameters
+    extension : str, optional
+        analysis extension. Default is ''.
+    legacy : bool, optional
+        legacy apriori RH files instead of vwc_tracks.json. Default is False.
+
+    Returns
+    -------
+    list of str
+        filenames
+    """
+    files = manifest.snr_inputs(station, year, doy, snr_type, station_config)
+    if legacy:
+        for fr in fr_list:
+            apriori_path, format_type = FileManagement(station, 'apriori_rh_file', frequency=fr, extension=extension).find_apriori_rh_file()
+            files.append(str(apriori_path))
+    else:
+        files.append(str(FileManagement(station, 'vwc_tracks_file', extension=extension).get_file_path(ensure_directory=False)))
+    if not station_config.get('recompute_lsp', False):
+        for ftype in ['gnssir_result', 'gnssir_failqc_result']:
+            files.append(str(FileManagement(station, ftype, year, doy, extension=extension).get_file_path(ensure_directory=False)))
+    return files
+
 
 def low_pct(amp, basepercent):
     """
@@ -1221,7 +1279,6 @@ def plot_baseline_leveling(station, years, doys, vwc_values, new_level, nodes, p
     Plot baseline leveling results - before/after style like vegetation correction
     """
     import matplotlib.pyplot as plt
-    from datetime import datetime
 
     # Convert to fractional years for calculations
     t = years + doys/365.25
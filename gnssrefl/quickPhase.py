@@ -11,6 +11,7 @@ from tqdm import tqdm
 
 import gnssrefl.gps as g
 import gnssrefl.gnssir_v2 as guts2
+import gnssrefl.manifest as manifest
 import gnssrefl.phase_functions as qp
 from gnssrefl.tracks import warn_legacy_apriori_and_exit
 from gnssrefl.utils import FileManagement, str2bool, expand_amplitudes
@@ -47,13 +48,14 @@ def parse_arguments():
     parser.add_argument("-legacy", default=None, type=str,
                         help="use the legacy GPS-only apriori_RH flow (default False). "
                              "Deprecated; may be removed after 2027-01-01.")
+    parser.add_argument("-incremental", default=None, type=str, help="only analyze days whose inputs or settings changed since their phase files were written (default is false)")
 
     g.print_version_to_screen()
 
     args = parser.parse_args().__dict__
 
     # convert all expected boolean inputs from strings to booleans
-    boolean_args = ['plt', 'screenstats', 'gzip', 'midnite', 'savearcs', 'dbhz', 'recompute_lsp', 'legacy']
+    boolean_args = ['plt', 'screenstats', 'gzip', 'midnite', 'savearcs', 'dbhz', 'recompute_lsp', 'legacy', 'incremental']
     args = str2bool(args, boolean_args)
 
     # only return a dictionary of arguments that were added from the user - all other defaults will be set in code below
@@ -62,7 +64,7 @@ def parse_arguments():
 
 def quickphase(station: str, year: int, doy: int, year_end: int = None, doy_end: int = None, snr: int = 66,
         fr=None, e1: float = None, e2: float = None, plt: bool = False, screenstats: bool = False, gzip: bool = None, extension: str = '', par: int = None, midnite: bool = True, ampl: float = None, savearcs: bool = False, savearcs_format: str = None, dec: int = None, dbhz: bool = None, recompute_lsp: bool = False,
-        legacy: bool = False):
+        legacy: bool = False, incremental: bool = False):
     """
     quickphase computes phase, which are subsequently used in vwc. The command line call is phase
     (which maybe we should change).
@@ -83,6 +85,9 @@ def quickphase(station: str, year: int, doy: int, year_end: int = None, doy_end:
     phase p038 2021 1 -doy_end 365 -par 5
         analyzes data for the whole year using 5 parallel processes
 
+    phase p038 2021 1 -doy_end 365 -incremental T
+        only analyzes the days whose inputs (SNR files, vwc tracks, gnssir results) or settings changed
+
     Parameters
     ----------
     station: str
@@ -129,6 +134,9 @@ def quickphase(station: str, year: int, doy: int, year_end: int = None, doy_end:
         Number of parallel processes to spawn (up to 10). Default is 1 (single process).
     midnite : bool, optional
         Allow midnight crossings. When True, loads +/- 2 hours from adjacent days. Default is True.
+    incremental : bool, optional
+        Skip the days whose phase files were made from the same inputs and settings. These are
+        kept in a manifest next to the phase files (see manifest.py). Default is False.
 
     Returns
     -------
@@ -223,6 +231,12 @@ def quickphase(station: str, year: int, doy: int, year_end: int = None, doy_end:
     if dbhz is not None:
         station_config['dbhz'] = dbhz
     station_config['recompute_lsp'] = recompute_lsp
+    station_config['incremental'] = incremental
+
+    # one line per day in the manifests, before the workers append to them
+    if incremental:
+        for y in range(year, year_end + 1):
+            manifest.compact_manifest(manifest.manifest_name(station, y, 'phase', extension))
 
     # Set up timing and parallel processing
     t1 = time.time()
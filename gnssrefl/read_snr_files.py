@@ -1,12 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import datetime
-import gzip
 import numpy as np
 import os
 
 from io import BytesIO
+from gnssrefl import compression
 from gnssrefl.utils import FileManagement
+from gnssrefl.snr_store import preferred_snr_file, is_binary_snr, read_snr_binary, read_snr_binary_window
 
 
 def _parse_snr_filename(obsfile):
@@ -15,6 +16,7 @@ def _parse_snr_filename(obsfile):
 
     Path format: {REFL_CODE}/{yyyy}/snr/{station}/{station}{doy}0.{yy}.snr{type}
     Example: /home/user/.../2024/snr/alby/alby1000.24.snr66
+    A .gz, .zst or .npz (binary sidecar) ending is allowed.
 
     Parameters
     ----------
@@ -37,7 +39,7 @@ def _parse_snr_filename(obsfile):
     doy = int(basename[4:7])               # 100
     yy = int(basename[9:11])               # 24
     year = 2000 + yy if yy < 80 else 1900 + yy
-    snr_type = int(basename.split('.snr')[1].replace('.gz', ''))  # 66
+    snr_type = int(basename.split('.snr')[1].split('.')[0])  # 66
     return station, year, doy, snr_type
 
 
@@ -68,34 +70,39 @@ def _get_adjacent_doy(year, doy, offset):
     return new_year, new_doy
 
 
-def load_snr_time_filtered(obsfile, sec_min=None, sec_max=None):
+def load_snr_time_filtered(obsfile, sec_min=None, sec_max=None, stats=None):
     """Load an SNR file, parsing only rows within a seconds-of-day window.
 
-    Decompresses the full file (unavoidable for gzip), but only passes the
+    Decompresses the full file in memory (unavoidable for gzip and zstd), but only passes the
     matching rows to np.loadtxt, which is where most of the time is spent.
+    If a current binary sidecar exists (see snr_store) it is memory mapped
+    instead and only the hours overlapping the window are read.
 
     Parameters
     ----------
     obsfile : str or Path
-        Path to SNR file (plain text or .gz)
+        Path to SNR file (plain text, .gz or .zst)
     sec_min : float or None
         Keep rows with seconds > sec_min. None means no lower bound.
     sec_max : float or None
         Keep rows with seconds < sec_max. None means no upper bound.
+    stats : dict, optional
+        if given, stats['bytes'] is increased by the number of bytes read
 
     Returns
     -------
     data : numpy array (N x cols) or None if no matching rows
     """
-    obsfile = str(obsfile)
-    is_gz = obsfile.endswith('.gz')
+    obsfile = preferred_snr_file(obsfile)
+    if is_binary_snr(obsfile):
+        data, nbytes = read_snr_binary_window(obsfile, sec_min=sec_min, sec_max=sec_max)
+        if stats is not None:
+            stats['bytes'] = stats.get('bytes', 0) + nbytes
+        return data
 
-    if is_gz:
-        with gzip.open(obsfile, 'rb') as f:
-            raw = f.read()
-    else:
-        with open(obsfile, 'rb') as f:
-            raw = f.read()
+    if stats is not None:
+        stats['bytes'] = stats.get('bytes', 0) + os.path.getsize(obsfile)
+    raw = compression.read_bytes(obsfile)
 
     lines = raw.split(b'\n')
     data_lines = [l for l in lines if l and not l.startswith(b'%')]
@@ -139,7 +146,7 @@ def load_snr_time_filtered(obsfile, sec_min=None, sec_max=None):
     return np.loadtxt(BytesIO(subset))
 
 
-def read_snr(obsfile, buffer_hours=0, screenstats=False):
+def read_snr(obsfile, buffer_hours=0, screenstats=False, logid=None):
     """
     Load the contents of a SNR file into a numpy array, optionally including
     data from adjacent days.
@@ -147,7 +154,8 @@ def read_snr(obsfile, buffer_hours=0, screenstats=False):
     Parameters
     ----------
     obsfile : str
-        name of the snrfile
+        name of the snrfile. If a current binary sidecar (ssssDDD0.YY.snrNN.npz,
+        see snr_store) exists, it is read instead of the text file.
     buffer_hours : float, optional
         hours of data to include from adjacent days. If > 0, reads last
         buffer_hours from previous day and first buffer_hours from next day.
@@ -155,6 +163,8 @@ def read_snr(obsfile, buffer_hours=0, screenstats=False):
         uses seconds > 86400. Default is 0 (single day only).
     screenstats : bool, optional
         print verbose information about buffer data loading. Default is False.
+    logid : file, optional
+        open log file. the number of bytes read from each SNR file is written to it
 
     Returns
     -------
@@ -171,7 +181,16 @@ def read_snr(obsfile, buffer_hours=0, screenstats=False):
     """
     allGood = 1
     if os.path.isfile(obsfile):
-        f = np.loadtxt(obsfile,comments='%')
+        readfile = preferred_snr_file(obsfile)
+        if is_binary_snr(readfile):
+            f = read_snr_binary(readfile)
+            main_bytes = f.nbytes
+        else:
+            with compression.open_read(readfile) as fid:
+                f = np.loadtxt(fid,comments='%')
+            main_bytes = os.path.getsize(readfile)
+        if logid is not None:
+            logid.write('SNR bytes read {0:s} {1:d} \n'.format(os.path.basename(readfile), main_bytes))
     else:
         print('No SNR file found')
         allGood = 0
@@ -197,13 +216,14 @@ def read_snr(obsfile, buffer_hours=0, screenstats=False):
         arrays_to_stack = []
         main_cols = c
         prev_loaded, next_loaded = False, False
+        prev_stats, next_stats = {'bytes': 0}, {'bytes': 0}
 
         # Get previous day data (last buffer_hours only)
         prev_year, prev_doy = _get_adjacent_doy(year, doy, -1)
-        prev_obsfile, prev_snre = FileManagement(station, 'snr_file', prev_year, prev_doy, snr_type=snr_type).find_snr_file()
+        prev_obsfile, prev_snre = FileManagement(station, 'snr_file', prev_year, prev_doy, snr_type=snr_type).find_snr_file(binary=True)
         if prev_snre:
             threshold = 86400 - buffer_seconds
-            prev_data = load_snr_time_filtered(prev_obsfile, sec_min=threshold)
+            prev_data = load_snr_time_filtered(prev_obsfile, sec_min=threshold, stats=prev_stats)
             if prev_data is not None:
                 if prev_data.ndim == 1:
                     prev_data = prev_data.reshape(1, -1)
@@ -226,9 +246,9 @@ def read_snr(obsfile, buffer_hours=0, screenstats=False):
 
         # Get next day data (first buffer_hours only)
         next_year, next_doy = _get_adjacent_doy(year, doy, +1)
-        next_obsfile, next_snre = FileManagement(station, 'snr_file', next_year, next_doy, snr_type=snr_type).find_snr_file()
+        next_obsfile, next_snre = FileManagement(station, 'snr_file', next_year, next_doy, snr_type=snr_type).find_snr_file(binary=True)
         if next_snre:
-            next_data = load_snr_time_filtered(next_obsfile, sec_max=buffer_seconds)
+            next_data = load_snr_time_filtered(next_obsfile, sec_max=buffer_seconds, stats=next_stats)
             if next_data is not None:
                 if next_data.ndim == 1:
                     next_data = next_data.reshape(1, -1)
@@ -246,6 +266,10 @@ def read_snr(obsfile, buffer_hours=0, screenstats=False):
             print(f'Warning: no SNR file for next day ({next_year}/{next_doy:03d}), '
                   f'midnight arcs near 24h may be incomplete')
 
+        if logid is not None:
+            logid.write('SNR bytes read for the buffer: previous day {0:d} next day {1:d} \n'.format(
+                prev_stats['bytes'], next_stats['bytes']))
+
         # Log buffer loading status
         if screenstats:
             status = []
@@ -8,6 +8,7 @@ import time
 import wget
 
 import gnssrefl.gps as g
+import gnssrefl.orbit_cache as orbit_cache
 from gnssrefl.gnss_frequencies import get_wavelength
 
 import simplekml
@@ -317,8 +318,8 @@ def rising_setting_new(recv,el_range,obsfile):
     lat, lon, nelev = g.xyz2llhd(recv)
     # calculate unit vectors
     u, East,North = g.up(np.pi*lat/180,np.pi*lon/180)
-    # load the cartesian satellite positions
-    f = np.genfromtxt(obsfile,comments='%')
+    # load the cartesian satellite positions (parsed once, see orbit_cache)
+    f = orbit_cache.read_table(obsfile)
     r,c = f.shape
     # print('Number of rows:', r, ' Number of columns:',c)
 #   reassign the columns to make it less confusing
@@ -15,6 +15,10 @@ from scipy.interpolate import interp1d
 
 import gnssrefl.gps as g
 
+# grids already read by read_4by5, by station refraction file. The value is
+# (modification time of the file, grids)
+_grid_cache = {}
+
 
 def read_4by5(station, dlat,dlon,hell):
     """
@@ -60,7 +64,8 @@ def read_4by5(station, dlat,dlon,hell):
     Tmgrid : 4 by 5 numpy array
         mean temperature of the water vapor in degrees Kelvin 
 
-    requires that an environment variable exists for REFL_CODE
+    requires that an environment variable exists for REFL_CODE.
+    The grids are read once per process and kept until the file changes.
     """
 #
     xdir = str(os.environ['REFL_CODE'])
@@ -70,6 +75,9 @@ def read_4by5(station, dlat,dlon,hell):
 
     # input file should be written here
     obsfile = inputpath + station + '_refr.txt'
+    mtime = os.path.getmtime(obsfile)
+    if obsfile in _grid_cache and _grid_cache[obsfile][0] == mtime:
+        return _grid_cache[obsfile][1]
     #print('reading from station refraction file: ', obsfile)
     x = np.genfromtxt(obsfile,comments='%')
     max_ind = 4
@@ -99,7 +107,9 @@ def read_4by5(station, dlat,dlon,hell):
             Tmgrid[n,ij] = x[m,11] 
             ij +=1
 
-    return pgrid, Tgrid, Qgrid, dTgrid, u, Hs, ahgrid, awgrid, lagrid, Tmgrid
+    grids = pgrid, Tgrid, Qgrid, dTgrid, u, Hs, ahgrid, awgrid, lagrid, Tmgrid
+    _grid_cache[obsfile] = (mtime, grids)
+    return grids
 #
 def gpt2_1w (station, dmjd,dlat,dlon,hell,it):
     """
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Binary store of the daily result files.
+
+daily_avg, subdaily, the tracks fast path and the gnssir results attached
+to arcs read the daily result files (ddd.txt) with
+np.loadtxt, thousands of small text files for a long time series. Next to
+the text files of each directory (one station, year and extension, and its
+failQC subdirectory) this module keeps one append-only binary file::
+
+    {REFL_CODE}/{yyyy}/results/{ssss}/{extension}/rh_store.bin
+    {REFL_CODE}/{yyyy}/results/{ssss}/{extension}/failQC/rh_store.bin
+
+The file is a sequence of row groups, one per write of a day. Each starts with
+seven int64 values
+
+    MAGIC, FORMAT_VERSION, doy, nrows, ncols, text file size, text file mtime (ns)
+
+followed by the nrows x ncols float64 values of the day, row by row: the same
+numbers np.loadtxt gives for the text file. The index (doy to row group, the
+last group of a day wins) is made by walking the group headers, and is kept
+in memory with the file contents for the few most recent stores.
+
+The text files stay the reference product. A row group is only used when the
+size and modification time of its text file did not change, so a text file
+that was written by something else (or removed) is never shadowed; those days
+are read from the text file and appended to the store. retrieve_rh writes the
+text file and its row group together (write_result_file). Groups are appended
+with one write, so -par workers and readers can share a store. The readers
+never rewrite it: gnssir calls compact_store before its days are analyzed,
+which rewrites a store when most of it is groups that were replaced. Since
+the store is only a copy, a row group lost to a concurrent append during that
+rewrite just means that day is read from its text file once more.
+
+rh_plot still reads the text files, and the index is by day of year within
+the store of each year.
+"""
+import io
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MAGIC = 0x52485354  # RHST
+STORE_NAME = 'rh_store.bin'
+HEADER_SIZE = 7
+# stores kept in memory, by filename
+_memory = {}
+MEMORY_ENTRIES = 4
+
+
+def store_name(directory):
+    """
+    Name of the store of a directory of result files.
+
+    Parameters
+    ----------
+    directory : str or Path
+        directory with the ddd.txt files
+
+    Returns
+    -------
+    str
+        store filename
+    """
+    return os.path.join(str(directory), STORE_NAME)
+
+
+def _text_doy(filename):
+    """ day of year of a ddd.txt filename, None for other names """
+    base = os.path.basename(str(filename))
+    if len(base) == 7 and base.endswith('.txt') and base[0:3].isdigit():
+        return int(base[0:3])
+    return None
+
+
+def _loadtxt_shape(rows):
+    """ rows shaped as np.loadtxt returns them: 1-d for one row, empty 1-d for none """
+    if rows.shape[0] == 0:
+        return np.empty(0)
+    if rows.shape[0] == 1:
+        return rows[0].copy()
+    return rows
+
+
+def _as_rows(a):
+    """ np.loadtxt output as a 2-d array """
+    a = np.asarray(a, dtype=float)
+    if a.size == 0:
+        return np.empty((0, 0))
+    if a.ndim == 1:
+        return a.reshape(1, -1)
+    return a
+
+
+def _group_bytes(doy, rows, st):
+    header = np.array([MAGIC, FORMAT_VERSION, doy, rows.shape[0], rows.shape[1], st.st_size, st.st_mtime_ns],
+                      dtype=np.int64)
+    return header.tobytes() + np.ascontiguousarray(rows, dtype=np.float64).tobytes()
+
+
+def _index(buf, pos=0, index=None):
+    """ walks the group headers of buf from pos; returns the index (doy : (offset, nrows, ncols, text size, text mtime)) """
+    index = {} if index is None else index
+    hsize = HEADER_SIZE * 8
+    while pos + hsize <= len(buf):
+        magic, version, doy, nrows, ncols, tsize, tmtime = np.frombuffer(buf, np.int64, HEADER_SIZE, pos)
+        nbytes = int(nrows) * int(ncols) * 8
+        if magic != MAGIC or version != FORMAT_VERSION or nrows < 0 or ncols < 0 or pos + hsize + nbytes > len(buf):
+            break      # a group being written, or not a store
+        index[int(doy)] = (pos + hsize, int(nrows), int(ncols), int(tsize), int(tmtime))
+        pos += hsize + nbytes
+    return index
+
+
+def _remember(storefile, buf, index):
+    st = os.stat(storefile)
+    _memory.pop(storefile, None)
+    if len(_memory) >= MEMORY_ENTRIES:
+        _memory.pop(next(iter(_memory)))
+    _memory[storefile] = ((st.st_size, st.st_mtime_ns), buf, index)
+
+
+def _load(storefile):
+    """
+    Contents and index of a store.
+
+    Returns
+    -------
+    buf : bytes
+        store contents
+    index : dict
+        doy : (offset of the values, nrows, ncols, text size, text mtime_ns)
+    """
+    try:
+        st = os.stat(storefile)
+    except OSError:
+        return b'', {}
+    if storefile in _memory and _memory[storefile][0] == (st.st_size, st.st_mtime_ns):
+        return _memory[storefile][1:]
+    with open(storefile, 'rb') as f:
+        buf = f.read()
+    index = _index(buf)
+    _remember(storefile, buf, index)
+    return buf, index
+
+
+def _rows(buf, entry):
+    offset, nrows, ncols = entry[0:3]
+    return np.frombuffer(buf, np.float64, nrows*ncols, offset).reshape(nrows, ncols).copy()
+
+
+def _append(storefile, groups):
+    """ appends row groups with one write, and to the store kept in memory """
+    if not groups:
+        return
+    data = b''.join(groups)
+    try:
+        fd = os.open(storefile, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        if storefile in _memory:
+            buf = _memory[storefile][1]
+            _remember(storefile, buf + data, _index(buf + data, len(buf), dict(_memory[storefile][2])))
+    except OSError:
+        pass       # e.g. a read-only archive: the text files are read every time
+
+
+def compact_store(directory):
+    """
+    Rewrites the store of a directory when most of it is groups that were
+    replaced (or a group that was never finished).
+
+    Only call it when no other process writes result files to the directory.
+
+    Parameters
+    ----------
+    directory : str or Path
+        directory with the ddd.txt files
+    """
+    storefile = store_name(directory)
+    buf, index = _load(storefile)
+    hsize = HEADER_SIZE * 8
+    live = sum(hsize + entry[1]*entry[2]*8 for entry in index.values())
+    if len(buf) <= 2*live + (1 << 20):
+        return
+    try:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(storefile), prefix='.rh_store.')
+        with os.fdopen(fd, 'wb') as f:
+            for doy in sorted(index):
+                offset, nrows, ncols = index[doy][0:3]
+                f.write(buf[offset - hsize:offset + nrows*ncols*8])
+        os.replace(tmp, storefile)
+    except OSError:
+        pass
+
+
+def _read_text(filename):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return np.loadtxt(filename, comments='%')
+
+
+def _cached(buf, index, doy, st):
+    entry = index.get(doy)
+    if entry is not None and entry[3] == st.st_size and entry[4] == st.st_mtime_ns:
+        return _rows(buf, entry)
+    return None
+
+
+def write_result_file(filename, rows, fmt, header):
+    """
+    Writes a daily result file and its row group in the store.
+
+    The text is the one np.savetxt(filename, rows, fmt=fmt, delimiter=' ',
+    newline='\\n', header=header, comments='%') writes.
+
+    Parameters
+    ----------
+    filename : str or Path
+        result filename, ddd.txt
+    rows : numpy array
+        results, one row per arc
+    fmt : str
+        format of a row
+    header : str
+        header lines
+    """
+    text = io.StringIO()
+    np.savetxt(text, rows, fmt=fmt, delimiter=' ', newline='\n', header=header, comments='%')
+    text = text.getvalue()
+    with open(filename, 'w') as f:
+        f.write(text)
+    doy = _text_doy(filename)
+    if doy is None:
+        return
+    # the values of the text, as np.loadtxt reads them
+    body = [line for line in text.split('\n') if line and not line.startswith('%')]
+    values = np.array(' '.join(body).split(), dtype=float)
+    rows = values.reshape(len(body), -1) if body else np.empty((0, 0))
+    _append(store_name(os.path.dirname(str(filename))), [_group_bytes(doy, rows, os.stat(filename))])
+
+
+def read_result_file(filename, update=True):
+    """
+    Contents of a daily result file, from the store when it is current.
+
+    Parameters
+    ----------
+    filename : str or Path
+        result filename. Files not named ddd.txt are read with np.loadtxt
+    update : bool, optional
+        append the day to the store when it was read from the text file. Default is True
+
+    Returns
+    -------
+    numpy array
+        the array np.loadtxt(filename, comments='%') returns
+
+    Raises
+    ------
+    OSError or ValueError
+        as np.loadtxt, e.g. when the file does not exist
+    """
+    doy = _text_doy(filename)
+    if doy is None:
+        return _read_text(filename)
+    st = os.stat(filename)
+    storefile = store_name(os.path.dirname(str(filename)))
+    buf, index = _load(storefile)
+    rows = _cached(buf, index, doy, st)
+    if rows is not None:
+        return _loadtxt_shape(rows)
+    a = _read_text(filename)
+    if update:
+        _append(storefile, [_group_bytes(doy, _as_rows(a), st)])
+    return a
+
+
+def read_results(directory, doy1=1, doy2=366, update=True):
+    """
+    Daily result files of a directory within a range of days.
+
+    Parameters
+    ----------
+    directory : str or Path
+        directory with the ddd.txt files of a station and year
+    doy1 : int, optional
+        first day of year. Default is 1
+    doy2 : int, optional
+        last day of year. Default is 366
+    update : bool, optional
+        append the days read from text files to the store. Default is True
+
+    Returns
+    -------
+    dict
+        doy : the array np.loadtxt(filename, comments='%') returns, for the
+        files that exist and can be read
+    """
+    directory = str(directory)
+    if not os.path.isdir(directory):
+        return {}
+    storefile = store_name(directory)
+    buf, index = _load(storefile)
+    results = {}
+    groups = []
+    for f in sorted(os.listdir(directory)):
+        doy = _text_doy(f)
+        if doy is None or doy < doy1 or doy > doy2:
+            continue
+        filename = os.path.join(directory, f)
+        try:
+            st = os.stat(filename)
+            rows = _cached(buf, index, doy, st)
+            if rows is not None:
+                results[doy] = _loadtxt_shape(rows)
+                continue
+            a = _read_text(filename)
+        except (OSError, ValueError):
+            continue
+        results[doy] = a
+        if update:
+            groups.append(_group_bytes(doy, _as_rows(a), st))
+    _append(storefile, groups)
+    return results
@@ -5,8 +5,11 @@ import os
 import subprocess
 import sys
 
+import gnssrefl.arc_peaks as arc_peaks
 import gnssrefl.gnssir_v2 as guts
 import gnssrefl.gps as g
+import gnssrefl.lsp_batch as lsp_batch
+import gnssrefl.results_store as results_store
 from gnssrefl.gnss_frequencies import get_display_label
 from gnssrefl.utils import FileManagement, pre_check_arc, check_arc_quality, format_qc_summary
 
@@ -27,7 +30,7 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
         strategy extension
     station_config : dict
         inputs to LSP analysis
-    arcs : list of (metadata, data) tuples
+    arcs : ArcBatch or list of (metadata, data) tuples
         pre-extracted satellite arcs from extract_arcs_from_station
     screenstats : bool
         whether you want stats to the screen
@@ -40,6 +43,11 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
     dbhz : bool
         keep dbhz units  (or not)
 
+    Returns
+    -------
+    all_peaks : list
+        periodogram peaks and QC inputs of every arc (arc_peaks.peak_row), for gnssir -reqc
+
     """
     fundy = False
     if station == 'bof3':
@@ -49,12 +57,15 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
     savearcs = station_config.get('savearcs', False)
     all_lsp = [] # variable to save the results so you can sort them
     all_failqc = []  # rejected arcs mirrored into the failQC/ artifact
+    all_peaks = []  # every arc with its periodogram peak, see arc_peaks.py
     d = g.doy2ymd(year,doy); month = d.month; day = d.day
 
     e1=station_config['e1']; e2=station_config['e2']; minH = station_config['minH']; maxH = station_config['maxH']
     NReg = station_config['NReg']
     plot_screen = station_config['plt_screen']
     PkNoise = station_config['PkNoise']; prec = station_config['desiredP']; lsp_method = station_config.get('lsp_method', 'fast')
+    refine = station_config.get('refine_peak', False)
+    arc_par = station_config.get('arc_par', 1) or 1
     freqs = station_config['freqs'] ; reqAmp = station_config['reqAmp']
     reqAmp_dict = {f: reqAmp[i] for i, f in enumerate(freqs)}
 
@@ -63,6 +74,15 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
     for meta, data in arcs:
         arcs_by_freq[meta['freq']].append((meta, data))
 
+    # periodograms of all arcs that pass the pre-check, computed together
+    # (batch methods) and/or in a pool of processes (arc_par)
+    precomputed = refine or lsp_method in ['batch', 'grid'] or arc_par > 1
+    if precomputed:
+        todo = [(f, i) for f in freqs for i, (meta, data) in enumerate(arcs_by_freq[f])
+                if pre_check_arc(meta, station_config)[0]]
+        arclist = [(arcs_by_freq[f][i][1]['ele'], arcs_by_freq[f][i][1]['snr'], arcs_by_freq[f][i][0]['cf']) for f, i in todo]
+        all_periodograms = dict(zip(todo, lsp_batch.strip_compute_many(arclist, maxH, prec, minH, lsp_method, refine, arc_par)))
+
     qc_lines = []
     # Process each frequency
     for f in freqs:
@@ -116,17 +136,30 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
                     if station_config['mmdd']:
                         row += [pc_dt.month, pc_dt.day, pc_dt.hour, pc_dt.minute, pc_dt.second]
                     all_failqc.append(row)
+                    all_peaks.append(arc_peaks.peak_row(row, meta, np.nan, False))
                     continue
 
                 # LSP computation
                 MJD = g.getMJD(year,month,day, meanTime)
-                maxF, maxAmp, eminObs, emaxObs,riseSet,px,pz = g.strip_compute(x,y,cf,maxH,prec,minH,lsp_method)
+                if precomputed:
+                    maxF, maxAmp, eminObs, emaxObs,riseSet,px,pz = all_periodograms[(f, arc_number)]
+                else:
+                    maxF, maxAmp, eminObs, emaxObs,riseSet,px,pz = g.strip_compute(x,y,cf,maxH,prec,minH,lsp_method)
 
                 nij = pz[(px > NReg[0]) & (px < NReg[1])]
                 Noise = np.mean(nij) if len(nij) > 0 else 0
 
                 iAzim = int(az_min_ele)
 
+                # the row of the arc when it passes, with what the QC needs
+                dt = g.mjd_to_datetime(MJD)
+                peak = [dt.year, dt.timetuple().tm_yday, maxF, satNu, dt.hour + dt.minute/60 + dt.second/3600,
+                        az_min_ele, maxAmp, eminObs, emaxObs, Nv, f, riseSet, Edot2,
+                        maxAmp/Noise if Noise > 0 else np.nan, delT, MJD, irefr]
+                if station_config['mmdd']:
+                    peak += [dt.month, dt.day, dt.hour, dt.minute, dt.second]
+                all_peaks.append(arc_peaks.peak_row(peak, meta, Noise, True))
+
                 passed, reason = check_arc_quality(meta, maxF, maxAmp, Noise, station_config)
                 if not passed:
                     qc_counts[reason] += 1
@@ -136,40 +169,21 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
                         logid.write('FAILED QC for Azimuth {0:.1f} Satellite {1:2.0f} UTC {2:5.2f} RH {3:5.2f} \n'.format(iAzim,satNu,UTCtime,maxF))
                         tooclose = reason == 'tooclose'
                         g.write_QC_fails(delT, station_config['delTmax'], eminObs, emaxObs, e1, e2, station_config['ediff'], maxAmp, Noise, PkNoise, reqAmp_dict[f], tooclose, logid)
-                    dt = g.mjd_to_datetime(MJD)
-                    xyear = dt.year; xmonth = dt.month; xday = dt.day
-                    xhr = dt.hour; xmin = dt.minute; xsec = dt.second
-                    xdoy = dt.timetuple().tm_yday
-                    betterUTC = xhr + xmin/60 + xsec/3600
-                    riseSet_f = 1 if meta['arc_type'] == 'rising' else -1
-                    noise_for_row = maxAmp/Noise if Noise > 0 else np.nan
-                    row = [xyear, xdoy, maxF, satNu, betterUTC, az_min_ele, maxAmp,
-                           eminObs, emaxObs, Nv, f, riseSet_f, Edot2,
-                           noise_for_row, delT, MJD, irefr]
-                    if station_config['mmdd']:
-                        row += [xmonth, xday, xhr, xmin, xsec]
-                    all_failqc.append(row)
+                    # the failQC file has the rising/setting flag of the arc, not of the periodogram
+                    all_failqc.append(peak[:11] + [1 if meta['arc_type'] == 'rising' else -1] + peak[12:])
                     if plot_screen:
                         failed = True
                         guts.local_update_plot(x,y,px,pz,ax1,ax2,failed)
                     continue
 
                 arc_passed = True
-                dt = g.mjd_to_datetime(MJD)
-                xyear = dt.year; xmonth = dt.month; xday = dt.day
-                xhr = dt.hour; xmin = dt.minute; xsec = dt.second
-                xdoy = dt.timetuple().tm_yday
-                betterUTC = xhr + xmin/60 + xsec/3600
-
-                if station_config['mmdd']:
-                    onelsp = [xyear,xdoy,maxF,satNu,betterUTC,az_min_ele,maxAmp,eminObs,emaxObs,Nv,f,riseSet,Edot2,maxAmp/Noise,delT,MJD,irefr,xmonth,xday,xhr,xmin,xsec]
-                else:
-                    onelsp = [xyear,xdoy,maxF,satNu,betterUTC,az_min_ele,maxAmp,eminObs,emaxObs,Nv,f,riseSet,Edot2,maxAmp/Noise,delT,MJD,irefr]
+                onelsp = peak
 
                 good_arcs += 1
                 all_lsp.append(onelsp)
 
                 if screenstats:
+                    betterUTC = dt.hour + dt.minute/60 + dt.second/3600
                     T = ' ' + g.nicerTime(betterUTC)
                     logid.write('SUCCESS Azimuth {0:3.0f} Sat {1:3.0f} RH {2:7.3f} m PkNoise {3:4.1f} Amp {4:4.1f} Fr{5:3.0f} UTC {6:6s} DT {7:3.0f} \n'.format(iAzim,satNu,maxF,maxAmp/Noise,maxAmp,f,T,round(delT)))
 
@@ -219,10 +233,40 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
         logid.close()
         print('Screen stat information printed to: ', logfilename)
 
+    write_results(station, year, doy, extension, all_lsp, all_failqc, station_config['mmdd'])
+
+    if qc_lines:
+        print('\n'.join(qc_lines) + '\n')
+
+    return all_peaks
+
+
+def write_results(station, year, doy, extension, all_lsp, all_failqc, longer_line):
+    """
+    writes the LSP results of a day, sorted by time, and the arcs that failed QC
+    (failQC directory). The result file is removed when no arc passed.
+
+    Parameters
+    ----------
+    station : str
+        name of station
+    year : int
+        calendar year
+    doy : int
+        day of year
+    extension : str
+        strategy extension
+    all_lsp : list
+        rows of the arcs that passed QC
+    all_failqc : list
+        rows of the arcs that failed QC
+    longer_line : bool
+        whether the rows have the month, day, hour, minute, second columns (mmdd)
+
+    """
     # look like someone asked me to sort the LSP results ...
     # convert to numpy array
     allL = np.asarray(all_lsp)
-    longer_line = station_config['mmdd']
     head = g.lsp_header(station, longer_line=longer_line)
     if longer_line:
         fmt = '%4.0f %3.0f %6.3f %3.0f %6.3f %6.2f %6.2f %6.2f %6.2f %4.0f  %3.0f  %2.0f %8.5f %6.2f %7.2f %12.6f %2.0f %2.0f %2.0f %2.0f %2.0f %2.0f '
@@ -237,7 +281,8 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
     # this is really just overwriting what I had before. However, This will be sorted.
         testfile = FileManagement(station, 'gnssir_result', year, doy, extension=extension).get_file_path()
         print('Writing sorted LSP results to : ', testfile)
-        np.savetxt(testfile, allL, fmt=fmt, delimiter=' ', newline='\n',header=head, comments='%')
+        # the text file and its copy in the results store (results_store.py)
+        results_store.write_result_file(testfile, allL, fmt, head)
     else:
         print('No good retrievals found so no LSP file should be created ')
         lspname = FileManagement(station, 'gnssir_result', year, doy, extension=extension).get_file_path(ensure_directory=False)
@@ -252,8 +297,4 @@ def retrieve_rh(station, year, doy, extension, station_config, arcs, screenstats
     if len(allF) > 0:
         jj = np.argsort(allF[:, 15])
         allF = allF[jj, :]
-    np.savetxt(failqc_path, allF, fmt=fmt, delimiter=' ', newline='\n',
-               header=head, comments='%')
-
-    if qc_lines:
-        print('\n'.join(qc_lines) + '\n')
+    results_store.write_result_file(failqc_path, allF, fmt, head)
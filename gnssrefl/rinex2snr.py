@@ -5,7 +5,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import os
 import re
-from scipy.interpolate import interp1d, CubicSpline
+from scipy.interpolate import interp1d
 import shutil
 import subprocess
 import sys
@@ -18,8 +18,14 @@ import gnssrefl.gps as g
 import gnssrefl.rinpy as rinpy
 import gnssrefl.karnak_libraries as k
 import gnssrefl.highrate as ch
+import gnssrefl.snr_store as snr_store
+import gnssrefl.orbit_cache as orbit_cache
+import gnssrefl.hatanaka as hatanaka
+import gnssrefl.snr_format as snr_format
+import gnssrefl.compression as compression
 
-from gnssrefl.snrfile_functions import constants, elev_limits, propagate_and_azel_sp3
+from gnssrefl.snrfile_functions import constants, elev_limits, propagate_and_azel_sp3, \
+    nav_ephem_index, propagate_and_azel_nav, sp3_trajectory, azel_from_trajectory
 
 #
 #
@@ -52,7 +58,7 @@ def quickname(station,year,cyy, cdoy, csnr):
     return fname
 
 def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol,overwrite,srate,
-                  mk, stream,strip,bkg,screenstats,gzip,timeout):
+                  mk, stream,strip,bkg,screenstats,gzip,timeout,binary=False):
     """
     main code to convert RINEX files into SNR files.
     It works on a single year and doy.
@@ -103,6 +109,8 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
     timeout : int
         optional parameter I am testing out for requests timeout parameter
         in seconds
+    binary : bool, optional
+        also write the binary (.npz) version of each SNR file. default is False
 
     """
     #
@@ -155,7 +163,7 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
             # now it unzips if that version exists
             snre = g.snr_exist(station,year,doy,csnr)
             if snre:
-                snr_on_disk = fname + '.gz' if os.path.isfile(fname + '.gz') else fname
+                snr_on_disk = next((n for n in compression.compressed_versions(fname) if os.path.isfile(n)), fname)
                 if overwrite:
                     print('SNR file exists/you requested overwriting, existing file will be deleted')
                     os.remove(snr_on_disk)
@@ -212,7 +220,7 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                             if strip:
                                 log.write('Testing out stripping the RINEX 2 file here\n')
                                 k.strip_rinexfile(r)
-                            conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,log,rinex2_filename=r,gzip=gzip)
+                            conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,log,rinex2_filename=r,gzip=gzip,binary=binary)
                         else:
                             print('You Chose the No Look Option, but did not provide the needed RINEX file.')
                     if version == 3:
@@ -269,7 +277,7 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
 
                             log.write('The RINEX 3 file exists locally {0:s} \n'.format( r3))
                             conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,
-                                     log, rinex3_filename=r3, gzip=gzip)
+                                     log, rinex3_filename=r3, gzip=gzip,binary=binary)
                         else:
                             print('You Chose the No Look Option, but did not provide the needed RINEX3 file ', r3)
                             print('I looked for files ending with rnx, rnx.gz, and crx.gz in the local directory')
@@ -283,7 +291,11 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                         print(station9ch, ' year:', year, ' doy:', doy, 'from: ', archive)
                         r2 = station + cdoy + '0.' + cyy + 'o'
                         rinex2exists = False; rinex3name = '';
+                        merge = None
                         if (rate == 'high'):
+                            # the 15 minute (or hourly) files are read as they are downloaded,
+                            # no merged RINEX file is written (see rinpy.RinexMerge)
+                            merge = rinpy.RinexMerge(keep_obs='S', dec_rate=dec_rate)
                             if archive == 'ga':
                                 deleteOld = True
                                 # ga_highrate returns a RINEX 2 file directly
@@ -291,7 +303,7 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                                 log.write('RINEX 2 file derived from the GA archive should now exist: {0:s} \n'.format(r2))
                                 if fexists:
                                     conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,
-                                             log,rinex2_filename=r2,gzip=gzip)
+                                             log,rinex2_filename=r2,gzip=gzip,binary=binary)
                                 rnx_filename = '' # already handled
                             if archive == 'gnet':
                                 crnxgz,foundit = g.greenland_rinex3(station9ch, year, doy,stream,srate)
@@ -300,14 +312,14 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                                     rnx_filename = g.crx2rnx(crnxgz) 
 
                             if archive == 'kadaster':
-                                rnx_filename,foundit = ch.kadaster_highrate(station9ch, year, doy,stream,dec_rate)
+                                rnx_filename,foundit = ch.kadaster_highrate(station9ch, year, doy,stream,dec_rate,merge=merge)
                             if archive == 'cddis':
                                 bad_day = g.cddis_restriction(year, doy,'cddis')
                                 if not bad_day:
-                                    rnx_filename,foundit = ch.cddis_highrate(station9ch, year, doy, 0,stream,dec_rate)
+                                    rnx_filename,foundit = ch.cddis_highrate(station9ch, year, doy, 0,stream,dec_rate,merge=merge)
                                 else:
                                     log.write('Will Check for the tar version')
-                                    rnx_filename,foundit = ch.cddis_highrate_tar(station9ch, year, doy, 0,stream,dec_rate)
+                                    rnx_filename,foundit = ch.cddis_highrate_tar(station9ch, year, doy, 0,stream,dec_rate,merge=merge)
                                     log.write('{0:s}  is returned from tar version \n'.format( rnx_filename))
                                 if not foundit:
                                     print('No high-rate RINEX data were found ')
@@ -315,15 +327,15 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                                 bad_day = g.cddis_restriction(year, doy,'bkg')
                                 if not bad_day:
                                     rnx_filename,foundit = ch.bkg_highrate(station9ch, year , doy,
-                                                                           0,stream,dec_rate,bkg,timeout=timeout)
+                                                                           0,stream,dec_rate,bkg,timeout=timeout,merge=merge)
                                 else:
                                     log.write('Will Check for the tar version')
                                     rnx_filename,foundit = ch.bkg_highrate_tar(station9ch, year, doy,
-                                                                               0,stream,dec_rate,bkg)
+                                                                               0,stream,dec_rate,bkg,merge=merge)
                             if archive == 'ignes':
                                 bad_day = g.cddis_restriction(year, doy,'bkg')
                                 if not bad_day:
-                                    rnx_filename,foundit = ch.esp_highrate(station9ch, year, doy, 0,stream,dec_rate)
+                                    rnx_filename,foundit = ch.esp_highrate(station9ch, year, doy, 0,stream,dec_rate,merge=merge)
                                 else:
                                     print('No high-rate RINEX data will be downloaded from IGN ES')
 
@@ -349,10 +361,14 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                                         rnx_filename = ''
 
                         # Process RINEX 3 file directly if we have one
-                        if rnx_filename and os.path.exists(rnx_filename):
+                        if merge is not None and merge.nfiles > 0:
+                            log.write('Processing the high-rate RINEX 3 files read while downloading \n')
+                            conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,
+                                     log,rinex3_merge=merge,gzip=gzip,binary=binary)
+                        elif rnx_filename and os.path.exists(rnx_filename):
                             log.write('Processing RINEX 3 file directly: {0:s} \n'.format(rnx_filename))
                             conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,
-                                     log,rinex3_filename=rnx_filename,gzip=gzip)
+                                     log,rinex3_filename=rnx_filename,gzip=gzip,binary=binary)
                             try:
                                 os.remove(rnx_filename)
                             except OSError:
@@ -364,7 +380,7 @@ def run_rinex2snr(station, year, doy,  isnr, orbtype, rate,dec_rate,archive, nol
                     else:
                         print(station, ' year:', year, ' doy:', doy, ' from: ', archive, ' rate:', rate, ' orb:', orbtype)
                         # for version 2, since i was using old code, the RINEX 2.11 searching goes on in conv2snr
-                        conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,log,gzip=gzip)
+                        conv2snr(year, doy, station, isnr, orbtype,rate,dec_rate,archive,log,gzip=gzip,binary=binary)
 
 
 def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,log,**kwargs):
@@ -397,11 +413,17 @@ def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,l
         external location (archive) of the rinex files
     log : fileid
         for screen messages
+    kwargs : optional
+        rinex2_filename, rinex3_filename, rinex3_merge (rinpy.RinexMerge of
+        the high-rate RINEX 3 files, read as they were downloaded), gzip
+        (default True) and binary (default False, also write the .npz version
+        of the SNR file)
 
     """
 
     r2_filename = kwargs.get('rinex2_filename','')
     r3_filename = kwargs.get('rinex3_filename','')
+    r3_merge = kwargs.get('rinex3_merge',None)
 
     xdir = os.environ['REFL_CODE']
 
@@ -437,33 +459,19 @@ def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,l
             oexist = os.path.isfile(orbfile)
 
             # RINEX 3 direct path — bypass gfzrnx conversion
-            if len(r3_filename) > 0 and oexist:
-                log.write('Processing RINEX 3 file directly: {0:s} \n'.format(r3_filename))
-                snrname = g.snr_name(station, year, month, day, option)
+            if (len(r3_filename) > 0 or r3_merge is not None) and oexist:
+                if r3_merge is not None:
+                    log.write('Processing {0:d} merged high-rate RINEX 3 files \n'.format(r3_merge.nfiles))
+                    r3_filename = r3_merge
+                else:
+                    log.write('Processing RINEX 3 file directly: {0:s} \n'.format(r3_filename))
+                snrname = snr_output_name(station, year, month, day, option, kwargs.get('gzip', True))
                 g.make_snrdir(year, station)
                 log.write('SNR file {0:50s} \n'.format(snrname))
                 rnx2snr_v3(r3_filename, orbfile, snrname, option, year, month, day, dec_rate, log)
 
                 if os.path.isfile(snrname):
-                    if (os.stat(snrname).st_size == 0):
-                        log.write('you created a zero file size which could mean a lot of things \n')
-                        log.write('bad exe, bad snr option, do not really have the orbit file \n')
-                        try:
-                            os.remove(snrname)
-                        except OSError:
-                            pass
-                    else:
-                        g.store_snrfile(snrname, year, station)
-                        if kwargs.get('gzip', True):
-                            with open(snrname_full, 'rb') as f_in:
-                                snr_data = f_in.read()
-                            with gzip_mod.open(snrname_full + '.gz', 'wb', compresslevel=6) as f_out:
-                                f_out.write(snr_data)
-                            os.remove(snrname_full)
-                            snrname_full = snrname_full + '.gz'
-                        log.write('A SNR file was created : {0:50s}  \n'.format(snrname_full))
-                        print('\nSUCCESS: SNR file was created')
-                        print(snrname_full + '\n')
+                    finish_snrfile(snrname, snrname_full, year, station, log, kwargs.get('gzip', True), kwargs.get('binary', False))
                 else:
                     print('No SNR file created - check error logs')
                 log.close()
@@ -471,6 +479,7 @@ def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,l
 
             # now you can look for a rinex file
             rinexfile,rinexfiled = g.rinex_name(station, year, month, day)
+            merged = None
             # This goes to find the rinex file. I am changing it to allow
             # an archive preference
             if len(r2_filename) > 0:
@@ -481,7 +490,11 @@ def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,l
                 print('the RINEX 2.11 file does not yet exist, so will look for it')
                 if receiverrate == 'high':
                     strip_snr = False # for now -
-                    file_name, foundit = k.rinex2_highrate(station, year, doy,archive,strip_snr)
+                    # 15 minute files are read as they are downloaded, without a merged RINEX file
+                    merged = rinpy.RinexMerge(keep_obs='S', dec_rate=dec_rate)
+                    file_name, foundit = k.rinex2_highrate(station, year, doy,archive,strip_snr,merge=merged)
+                    if merged.nfiles > 0:
+                        rinexfile = merged
                 else:
                 # added karnak librariies
                     if (archive == 'all'):
@@ -497,42 +510,24 @@ def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,l
                         rinexfile, foundit2 = k.make_rinex2_ofiles(file_name) # translate
 
 #           define booleans for various files
-            rexist = os.path.isfile(rinexfile) == True
+            rexist = (rinexfile is merged) or os.path.isfile(rinexfile)
             # if orbits and rinexfile exist
             if (oexist) and (rexist):
-                snrname = g.snr_name(station, year,month,day,option)
+                snrname = snr_output_name(station, year, month, day, option, kwargs.get('gzip', True))
                 g.make_snrdir(year,station) # make sure output directory exists
                 log.write('SNR file {0:50s} \n'.format( snrname))
                 rnx2snr(rinexfile, orbfile,snrname,option,year,month,day,dec_rate,log)
 
                 # remove the rinex file
                 try:
-                    os.remove(rinexfile)
+                    if rinexfile is not merged:
+                        os.remove(rinexfile)
                 except FileNotFoundError:
                     pass
 
                 if os.path.isfile(snrname):
 #                make sure it exists and is non-zero size before moving it
-                    if (os.stat(snrname).st_size == 0):
-                        log.write('you created a zero file size which could mean a lot of things \n')
-                        log.write('bad exe, bad snr option, do not really have the orbit file \n')
-                        try:
-                            os.remove(snrname)
-                        except OSError:
-                            pass
-                    else:
-                        g.store_snrfile(snrname, year, station)
-                        if kwargs.get('gzip', True):
-                            with open(snrname_full, 'rb') as f_in:
-                                snr_data = f_in.read()
-                            with gzip_mod.open(snrname_full + '.gz', 'wb', compresslevel=6) as f_out:
-                                f_out.write(snr_data)
-                            os.remove(snrname_full)
-                            snrname_full = snrname_full + '.gz'
-                        log.write('A SNR file was created : {0:50s}  \n'.format(snrname_full))
-                        print('\nSUCCESS: SNR file was created')
-                        print(snrname_full + '\n')
-
+                    finish_snrfile(snrname, snrname_full, year, station, log, kwargs.get('gzip', True), kwargs.get('binary', False))
                 else:
                     # not sure why this is made here??? wasn't it created earlier?
                     print('No SNR file created - check error logs - locations were printed to screen')
@@ -547,6 +542,89 @@ def conv2snr(year, doy, station, option, orbtype,receiverrate,dec_rate,archive,l
 
     return True
 
+def finish_snrfile(snrname, snrname_full, year, station, log, gzip=True, binary=False):
+    """
+    Moves a newly written SNR file to its place in REFL_CODE, compresses it if
+    it was not written compressed, and writes the binary version if requested.
+    Empty files are removed.
+
+    Parameters
+    ----------
+    snrname : str
+        SNR file as written by the translation, plain or compressed (.gz, .zst)
+    snrname_full : str
+        name of the uncompressed SNR file in REFL_CODE (see quickname)
+    year : int
+        full year
+    station : str
+        4 character station name
+    log : fileid
+        for screen messages
+    gzip : bool
+        whether the SNR file is compressed (see compression for the codec)
+    binary : bool
+        whether the binary (.npz) SNR file is also written
+
+    """
+    if compression.is_empty(snrname):
+        log.write('you created a zero file size which could mean a lot of things \n')
+        log.write('bad exe, bad snr option, do not really have the orbit file \n')
+        try:
+            os.remove(snrname)
+        except OSError:
+            pass
+        return
+    g.store_snrfile(snrname, year, station)
+    stored = os.path.join(os.path.dirname(snrname_full), os.path.basename(snrname))
+    # older versions of this SNR file, plain or compressed otherwise
+    for name in [snrname_full] + compression.compressed_versions(snrname_full):
+        if name != stored and os.path.isfile(name):
+            os.remove(name)
+    if gzip and compression.codec_of(stored) is None:
+        stored = compression.compress_file(stored)
+    elif not gzip and compression.codec_of(stored) is not None:
+        stored = compression.decompress_file(stored)
+    snrname_full = stored
+    if binary:
+        snr_store.text2binary(snrname_full)
+        log.write('Binary SNR file: {0:s} \n'.format(snr_store.binary_snr_name(snrname_full)))
+    log.write('A SNR file was created : {0:50s}  \n'.format(snrname_full))
+    print('\nSUCCESS: SNR file was created')
+    print(snrname_full + '\n')
+
+
+def snr_output_name(station, year, month, day, option, gzip=True):
+    """
+    Name of the SNR file written by the translation, before finish_snrfile
+    moves it to REFL_CODE. Compressed files are written compressed straight
+    away (see compression), so they are never rewritten.
+
+    Parameters
+    ----------
+    station : str
+        4 character station name
+    year : int
+        full year
+    month : int
+        month
+    day : int
+        day of the month
+    option : int
+        snr file type, e.g. 66
+    gzip : bool
+        whether the SNR file is compressed
+
+    Returns
+    -------
+    str
+        SNR filename
+
+    """
+    snrname = g.snr_name(station, year, month, day, option)
+    if gzip:
+        snrname = compression.compressed_name(snrname)
+    return snrname
+
 def satorb(week, sec_of_week, ephem):
     """
     Calculate GPS satellite orbits
@@ -610,6 +688,31 @@ def satorb(week, sec_of_week, ephem):
     return np.array([xk, yk, zk])
 
 
+def read_snr_observables(obsfile, dec_rate):
+    """
+    Streams the SNR observables of a RINEX file (rinpy.streamrinexfile).
+
+    Parameters
+    ----------
+    obsfile : str, list of str or rinpy.RinexMerge
+        RINEX filename, consecutive RINEX files (e.g. 15 minute high-rate files)
+        or the merge the high-rate files were read into as they were downloaded
+    dec_rate : int
+        decimation rate in seconds (already set in a rinpy.RinexMerge)
+
+    Returns
+    -------
+    obsdata, systemsatlists, prntoidx, obstypes, header, obstimes, gpstime
+        as returned by rinpy.streamrinexfile
+
+    """
+    if isinstance(obsfile, rinpy.RinexMerge):
+        return obsfile.finish()
+    if isinstance(obsfile, list):
+        return rinpy.streamrinexfiles(obsfile, keep_obs='S', dec_rate=dec_rate)
+    return rinpy.streamrinexfile(obsfile, keep_obs='S', dec_rate=dec_rate)
+
+
 def rnx2snr(obsfile, navfile,snrfile,snroption,year,month,day,dec_rate,log):
     """
     Converts a rinex v2.11 obs file using Joakim's rinex reading code
@@ -617,7 +720,7 @@ def rnx2snr(obsfile, navfile,snrfile,snroption,year,month,day,dec_rate,log):
     Parameters
     ----------
     obsfile : str
-        RINEX 2.11 filename
+        RINEX 2.11 filename (or files, see read_snr_observables)
     navfile : str
         navigation file
 
@@ -637,7 +740,6 @@ def rnx2snr(obsfile, navfile,snrfile,snroption,year,month,day,dec_rate,log):
         decimation rate in seconds
 
     """
-    station = obsfile[0:4]
     #logname = 'logs/' + station + 'python.txt'
     #log = open(logname, 'w+')
     last3 = navfile[-3::]
@@ -651,8 +753,8 @@ def rnx2snr(obsfile, navfile,snrfile,snroption,year,month,day,dec_rate,log):
     emin,emax = elev_limits(snroption)
 
     exitQ = False
-    obsdata, systemsatlists, prntoidx, obstypes, header, obstimes,gpstime = rinpy.processrinexfile(obsfile)
-    obsdata = rinpy.separateobservables(obsdata, obstypes)
+    # only the SNR data are kept, and only at the decimation interval
+    obsdata, systemsatlists, prntoidx, obstypes, header, obstimes,gpstime = read_snr_observables(obsfile, dec_rate)
     obslist = obstypes['G'][:]
     # need to check to see what happens without coordinates
     key = 'APPROX POSITION XYZ'
@@ -692,7 +794,8 @@ def rnx2snr(obsfile, navfile,snrfile,snroption,year,month,day,dec_rate,log):
         write_snr_from_nav(navfile,obstimes,obsdata,obslist,prntoidx,gpssatlist,snrfile,s1exist,s2exist,s5exist,up,East,North,emin,emax,recv,dec_rate,log)
     else:
         log.write('Read the sp3 file \n'); sp3 = g.read_sp3file(navfile)
-        write_snr_from_sp3(gpstime,sp3,systemsatlists,obsdata,obstypes,prntoidx,year,month,day,emin,emax,snrfile,up,East,North,recv,dec_rate,log)
+        splines = orbit_cache.sp3_splines(navfile, sp3)
+        write_snr_from_sp3(gpstime,sp3,systemsatlists,obsdata,obstypes,prntoidx,year,month,day,emin,emax,snrfile,up,East,North,recv,dec_rate,log,splines=splines)
 
 def rnx2snr_v3(obsfile, navfile, snrfile, snroption, year, month, day, dec_rate, log):
     """
@@ -701,7 +804,7 @@ def rnx2snr_v3(obsfile, navfile, snrfile, snroption, year, month, day, dec_rate,
     Parameters
     ----------
     obsfile : str
-        RINEX 3 filename
+        RINEX 3 filename (or files, see read_snr_observables)
     navfile : str
         navigation/orbit file
     snrfile : str
@@ -727,8 +830,7 @@ def rnx2snr_v3(obsfile, navfile, snrfile, snroption, year, month, day, dec_rate,
     log.write("File name {0:50s} \n".format(navfile))
     emin, emax = elev_limits(snroption)
 
-    obsdata, systemsatlists, prntoidx, obstypes, header, obstimes, gpstime = rinpy.processrinexfile(obsfile)
-    obsdata = rinpy.separateobservables(obsdata, obstypes)
+    obsdata, systemsatlists, prntoidx, obstypes, header, obstimes, gpstime = read_snr_observables(obsfile, dec_rate)
     obsdata, obstypes = rinpy.collapse_rinex3_obs(obsdata, obstypes)
 
     key = 'APPROX POSITION XYZ'
@@ -762,7 +864,8 @@ def rnx2snr_v3(obsfile, navfile, snrfile, snroption, year, month, day, dec_rate,
         log.write('Read the sp3 file \n')
         sp3 = g.read_sp3file(navfile)
         write_snr_from_sp3(gpstime, sp3, systemsatlists, obsdata, obstypes, prntoidx, year, month, day,
-                           emin, emax, snrfile, up, East, North, recv, dec_rate, log)
+                           emin, emax, snrfile, up, East, North, recv, dec_rate, log,
+                           splines=orbit_cache.sp3_splines(navfile, sp3))
 
 
 def write_snr_from_nav(navfile,obstimes,observationdata,obslist,prntoidx,gpssatlist,snrfile,s1exist,s2exist,s5exist,up,East,North,emin,emax,recv,dec_rate,log):
@@ -798,6 +901,11 @@ def write_snr_from_nav(navfile,obstimes,observationdata,obslist,prntoidx,gpssatl
     various bits about SNR existence
     snrfile is output name
     log is for screen outputs - now going to a file
+
+    All epochs of a satellite are done at once: the ephemeris for each epoch
+    is found with searchsorted (same choice as g.myfindephem) and the orbits
+    are propagated with propagate_and_azel_nav (same steps as satorb_prop).
+    The output is the same as the epoch by epoch version.
     """
     log.write('reading the ephemeris data \n')
     ephemdata = g.myreadnav(navfile)
@@ -805,41 +913,74 @@ def write_snr_from_nav(navfile,obstimes,observationdata,obslist,prntoidx,gpssatl
         log.write("Empty ephemeris or the file does not exist \n")
         return
 
-    # change variable name to save typing
-    a=obstimes
-    if True:
-        log.write('Opening output file for the SNR data \n')
-        fout = open(snrfile, 'w+')
-        K=len(obstimes)
-        log.write('Number of epochs in the RINEX file {0:6.0f} \n '.format( K))
-        log.write('Decimation rate {0:3.0f} \n'.format(dec_rate))
-
-        for i in range(0,K):
-                if np.remainder(i,200) == 0:
-                    log.write('Epoch {0:6.0f} \n'.format( i))
-            # sod is seconds of the day
-                sod = 3600*a[i].hour + 60*a[i].minute + a[i].second
-                if dec_rate > 0:
-                    rem = sod % dec_rate
-                else:
-                    rem = 0
-                if (rem == 0):
-                    gweek, gpss = g.kgpsweek(a[i].year, a[i].month, a[i].day, a[i].hour, a[i].minute, a[i].second)
-                    for sat in gpssatlist:
-                        s1,s2,s5 = readSNRval(s1exist,s2exist,s5exist,observationdata,prntoidx,sat,i)
-                        if (s1 > 0):
-                            closest = g.myfindephem(gweek, gpss, ephemdata, sat)
-                            if len(closest) > 0:
-                                satv = satorb_prop(gweek, gpss, sat, recv, closest)
-                                r=np.subtract(satv,recv) # satellite minus receiver vector
-                                eleA = g.elev_angle(up, r)*180/np.pi
-                                azimA = g.azimuth_angle(r, East, North)
-                                if (eleA >= emin) and (eleA <= emax):
-                                    fout.write("{0:3.0f} {1:10.4f} {2:10.4f} {3:10.0f} {4:7.2f} {5:7.2f} {6:7.2f} {7:7.2f} {8:7.2f} \n".format(sat,eleA, azimA, sod,0, 0, s1,s2, s5))
-        fout.close()
+    log.write('Opening output file for the SNR data \n')
+    K=len(obstimes)
+    log.write('Number of epochs in the RINEX file {0:6.0f} \n '.format( K))
+    log.write('Decimation rate {0:3.0f} \n'.format(dec_rate))
+
+    # sod is seconds of the day. GPS week and seconds of the week as in g.kgpsweek
+    year = np.array([a.year for a in obstimes], dtype=int)
+    month = np.array([a.month for a in obstimes], dtype=int)
+    day = np.array([a.day for a in obstimes], dtype=int)
+    hour = np.array([a.hour for a in obstimes], dtype=int)
+    minute = np.array([a.minute for a in obstimes], dtype=int)
+    second = np.array([a.second for a in obstimes], dtype=int)
+    sod = 3600*hour + 60*minute + second
+    if dec_rate > 0:
+        keep = np.flatnonzero(np.remainder(sod, dec_rate) == 0)
     else:
-        log.write('There was some kind of problem with your file, exiting ...\n')
-        print('There was some kind of problem with your file, exiting ...')
+        keep = np.arange(K)
+    UT = hour[keep] + minute[keep]/60.0 + second[keep]/3600.
+    y = np.where(month[keep] > 2, year[keep], year[keep]-1)
+    m = np.where(month[keep] > 2, month[keep], month[keep]+12)
+    JD = np.floor(365.25*y) + np.floor(30.6001*(m+1)) + day[keep] + (UT/24.0) + 1720981.5
+    gweek = np.floor((JD-2444244.5)/7.0)
+    gpss = np.rint(((JD-2444244.5)/7 - gweek)*7*24*3600)
+    t = gweek*86400*7 + gpss
+
+    def snr_column(obs, exists, sat):
+        if not exists:
+            return np.zeros(len(keep))
+        s = observationdata['G'][obs][keep, prntoidx['G'][sat]]
+        return np.where(np.isnan(s), 0, s)
+
+    out_blocks = []
+    for isat, sat in enumerate(gpssatlist):
+        s1 = snr_column('S1', s1exist, sat)
+        ii = np.flatnonzero(s1 > 0)
+        if len(ii) == 0:
+            continue
+        prnephem = ephemdata[ephemdata[:, 0] == sat]
+        if len(prnephem) == 0:
+            print('no ephemeris for that PRN number')
+            continue
+        teph = prnephem[:, 24]*86400*7 + prnephem[:, 14]
+        closest = prnephem[nav_ephem_index(teph, t[ii])]
+        eleA, azimA = propagate_and_azel_nav(gpss[ii], closest, recv, up, East, North)
+        ok = (eleA >= emin) & (eleA <= emax)
+        ii = ii[ok]
+        block = np.empty((len(ii), 11))
+        block[:, 0] = ii
+        block[:, 1] = isat
+        block[:, 2] = sat
+        block[:, 3] = eleA[ok]
+        block[:, 4] = azimA[ok]
+        block[:, 5] = sod[keep[ii]]
+        block[:, 6] = 0
+        block[:, 7] = 0
+        block[:, 8] = s1[ii]
+        block[:, 9] = snr_column('S2', s2exist, sat)[ii]
+        block[:, 10] = snr_column('S5', s5exist, sat)[ii]
+        out_blocks.append(block)
+
+    # epoch by epoch, satellites in the order of gpssatlist
+    rows = np.zeros((0, 9))
+    if out_blocks:
+        all_data = np.vstack(out_blocks)
+        all_data = all_data[np.lexsort((all_data[:, 1], all_data[:, 0]))]
+        rows = all_data[:, 2:]
+    log.write('Number of SNR observations {0:8.0f} \n'.format(len(rows)))
+    snr_format.write_rows(snrfile, rows, snr_format.NAV_SNR_FORMAT)
 
 def readSNRval(s1exist,s2exist,s5exist,observationdata,prntoidx,sat,i):
     """
@@ -1006,87 +1147,129 @@ def extract_snr(prn, con, obslist,obsdata,prntoidx,not_ij,emp):
     return s2,s5,s6,s7,s8
 
 
-def write_snr_from_sp3(gpstime,sp3,systemsatlists,obsdata,obstypes,prntoidx,year,month,day, emin,emax,outputfile,up,East,North,recv,dec_rate,log):
+def sp3_snr_epochs(con, prn, obsdata, obstypes, prntoidx, gpstime, dec_rate):
+    """
+    Epochs with SNR data of one satellite, and the SNR data at those epochs
+
+    Parameters
+    ----------
+    con : str
+        constellation letter (G, E, R or C)
+    prn : int
+        satellite number within the constellation
+    obsdata, obstypes, prntoidx : dict
+        observations as returned by the rinpy readers
+    gpstime : numpy array
+        GPS week and seconds of the week of each epoch
+    dec_rate : int
+        decimation rate in seconds, 0 for none
+
+    Returns
+    -------
+    t : numpy array
+        seconds of the week of the epochs where ANY SNR channel has data
+        (matches Fortran behavior), after decimation
+    snr : numpy array
+        len(t) x 6, the S6, S1, S2, S5, S7 and S8 columns of the SNR file (0 if missing)
+    """
+    obslist = obstypes[con]
+    isat = prntoidx[con][prn]
+    columns = []
+    all_nan = np.ones(gpstime.shape[0], dtype=bool)
+    for skey in ['S6', 'S1', 'S2', 'S5', 'S7', 'S8']:
+        if skey in obslist:
+            s = obsdata[con][skey][:, isat]
+            all_nan = all_nan & np.isnan(s)
+            columns.append(s)
+        else:
+            columns.append(None)
+    keep = ~all_nan
+    t = gpstime[keep, 1] # only use the seconds of the week for now
+    snr = np.zeros((len(t), 6))
+    for j, s in enumerate(columns):
+        if s is not None:
+            s = s[keep]
+            snr[:, j] = np.where(np.isnan(s), 0, s)
+    if dec_rate > 0:
+        dec_mask = (t % dec_rate) == 0
+        t = t[dec_mask]; snr = snr[dec_mask]
+    return t, snr
+
+
+def sp3_snr_block(sat_id, t, eleA, azimA, edot, snr, gpssec0):
+    """
+    Rows of the SNR file for one satellite: time of day and satellite number
+    (for sorting) and then the SNR file columns
+    """
+    tod = t - gpssec0
+    block = np.empty((len(t), 12))
+    block[:, 0] = tod
+    block[:, 1] = sat_id
+    block[:, 2] = eleA
+    block[:, 3] = azimA
+    block[:, 4] = tod
+    block[:, 5] = edot
+    block[:, 6:] = snr
+    return block
+
+
+def write_sp3_snrfile(out_blocks, outputfile, log):
+    """
+    Sorts the SNR rows made by sp3_snr_block and writes the SNR file
+    """
+    if not out_blocks:
+        log.write('write SNR data to file \n')
+        open(outputfile, 'w').close()
+        return
+
+    # sort by time-of-day, then by satellite number (matching Fortran output order)
+    all_data = np.vstack(out_blocks)
+    sort_idx = np.lexsort((all_data[:, 1], all_data[:, 0]))
+    all_data = all_data[sort_idx]
+
+    log.write('write SNR data to file \n')
+    # Fortran-compatible format: i3, 2f10.4, f10.1, f10.6, f7.2, 5f7.2
+    snr_format.write_rows(outputfile, all_data[:, 1:], snr_format.SNR_FORMAT)
+
+
+def write_snr_from_sp3(gpstime,sp3,systemsatlists,obsdata,obstypes,prntoidx,year,month,day, emin,emax,outputfile,up,East,North,recv,dec_rate,log,splines=None):
     """
     inputs are gpstime( numpy array with week and sow)
     sp3 is what has been read from the sp3 file
     columsn are satNu, week, sow, x, y, z (in meters)
     log is for comments
+    splines are the orbit splines by satellite number (orbit_cache.sp3_splines).
+    if not given, they are fit to sp3 here
     """
-    checkD = False
     if dec_rate > 0:
-        checkD = True
         log.write('You are decimating \n')
     # epoch at the beginning of the day of your RINEX file
     gweek0, gpssec0 = g.kgpsweek(year, month,day,0,0,0 )
 
-    # pre-index SP3 data by satellite number (avoids repeated boolean scans)
-    sp3_index = {}
-    for sat_id in np.unique(sp3[:, 0]).astype(int):
-        m = sp3[:, 0] == sat_id
-        sp3_index[sat_id] = (sp3[m, 2], sp3[m, 3], sp3[m, 4], sp3[m, 5])  # sec, x, y, z
+    if splines is None:
+        splines = orbit_cache.splines_from_arrays(orbit_cache.build_splines(sp3))
 
     oE = constants.omegaEarth
     clight = constants.c
 
     # accumulate output as array blocks, then sort before writing
     out_blocks = []
-    NsatT = 0
-    # make a dictionary for constellation name
-    sname ={}; sname['G']='GPS' ; sname['R'] = 'GLONASS'; sname['E'] = 'GALILEO'; sname['C']='BEIDOU'
     for con in ['G','E','R','C']:
         if con in obstypes:
             log.write('Good news - found data for constellation {0:s} \n'.format( con))
-            obslist = obstypes[con][:]
             satlist = systemsatlists[con][:]
             for prn in satlist:
                     addon = g.findConstell(con) # 100,200,or 300 for R,E, and C
                     log.write('Constellation {0:1s} Satellite {1:2.0f}  Addon {2:3.0f} \n'.format( con, prn, addon))
                     sat_id = prn + addon
-                    if sat_id not in sp3_index:
+                    if sat_id not in splines:
                         log.write('This satellite is not in the orbit file. {0:3.0f} \n'.format(prn))
                         continue
-                    sp3_sec, x, y, z = sp3_index[sat_id]
-                    if len(x) == 0:
-                        log.write('This satellite is not in the orbit file. {0:3.0f} \n'.format(prn))
-                        continue
-                # fit the orbits for this satellite
-                    iX = CubicSpline(sp3_sec, x, extrapolate=True)
-                    iY = CubicSpline(sp3_sec, y, extrapolate=True)
-                    iZ = CubicSpline(sp3_sec, z, extrapolate=True)
-        # get the S1 data for this satellite
-                    if 'S1' in obslist:
-                        s1 = obsdata[con]['S1'][:, prntoidx[con][prn]]
-                    else:
-                        s1 = np.full(gpstime.shape[0], np.nan)
-
-        # keep epoch if ANY SNR channel has data (matches Fortran behavior)
-                    all_nan = np.isnan(s1)
-                    for skey in ['S2','S5','S6','S7','S8']:
-                        if skey in obslist:
-                            all_nan = all_nan & np.isnan(obsdata[con][skey][:, prntoidx[con][prn]])
-                    not_ij = ~all_nan
-                    Tp = gpstime[not_ij,1] # only use the seconds of the week for now
-                    s1 = s1[not_ij]; is1 = np.isnan(s1); s1[is1] = 0
-                    emp = np.zeros(len(s1),dtype=float)
-        # get the rest of the SNR data in a function
-                    s2,s5,s6,s7,s8 = extract_snr(prn, con, obslist,obsdata,prntoidx,not_ij,emp)
-
-                    nepochs = len(Tp)
-                    if nepochs == 0:
-                        continue
-
-                    # --- decimation filter (vectorized) ---
-                    if checkD:
-                        dec_mask = (Tp % dec_rate) == 0
-                    else:
-                        dec_mask = np.ones(nepochs, dtype=bool)
-
-                    t_all = Tp[dec_mask]
+                # the fitted orbits for this satellite
+                    iX, iY, iZ = splines[sat_id]
+                    t_all, snr = sp3_snr_epochs(con, prn, obsdata, obstypes, prntoidx, gpstime, dec_rate)
                     if len(t_all) == 0:
                         continue
-                    # indices into the original arrays for SNR lookup
-                    idx_all = np.where(dec_mask)[0]
 
                     # --- vectorized orbit propagation + geometry ---
                     eleA_all, azimA_all = propagate_and_azel_sp3(
@@ -1103,45 +1286,89 @@ def write_snr_from_sp3(gpstime,sp3,systemsatlists,obsdata,obstypes,prntoidx,year
                         iX, iY, iZ, t_pass + 0.5, recv, up, East, North, oE, clight)
                     edot_all = 2.0 * (elv_after - eleA_all[elev_mask])
 
-                    # --- accumulate as array block ---
-                    tod_pass = t_all[elev_mask] - gpssec0
-                    idx_pass = idx_all[elev_mask]
-                    n_pass = len(tod_pass)
-                    block = np.empty((n_pass, 12))
-                    block[:, 0] = tod_pass
-                    block[:, 1] = sat_id
-                    block[:, 2] = eleA_all[elev_mask]
-                    block[:, 3] = azimA_all[elev_mask]
-                    block[:, 4] = tod_pass
-                    block[:, 5] = edot_all
-                    block[:, 6] = s6[idx_pass]
-                    block[:, 7] = s1[idx_pass]
-                    block[:, 8] = s2[idx_pass]
-                    block[:, 9] = s5[idx_pass]
-                    block[:, 10] = s7[idx_pass]
-                    block[:, 11] = s8[idx_pass]
-                    out_blocks.append(block)
+                    out_blocks.append(sp3_snr_block(sat_id, t_pass, eleA_all[elev_mask], azimA_all[elev_mask],
+                                                    edot_all, snr[elev_mask], gpssec0))
         else:
             log.write('No data for constellation {0:1s} \n'.format(con))
 
-    if not out_blocks:
-        log.write('write SNR data to file \n')
-        open(outputfile, 'w').close()
-        return
+    write_sp3_snrfile(out_blocks, outputfile, log)
 
-    # sort by time-of-day, then by satellite number (matching Fortran output order)
-    all_data = np.vstack(out_blocks)
-    sort_idx = np.lexsort((all_data[:, 1], all_data[:, 0]))
-    all_data = all_data[sort_idx]
 
-    log.write('write SNR data to file \n')
-    # write using Fortran-compatible format: i3, 2f10.4, f10.1, f10.6, f7.2, 5f7.2
-    fmt = "%3.0f%10.4f%10.4f%10.1f%10.6f%7.2f%7.2f%7.2f%7.2f%7.2f%7.2f\n"
-    rows = all_data[:, 1:].tolist()
-    with open(outputfile, 'w') as f:
-        write = f.write
-        for row in rows:
-            write(fmt % tuple(row))
+def write_snr_batch_from_sp3(jobs, splines, year, month, day, emin, emax, dec_rate):
+    """
+    Writes the SNR files of several stations for the same day. The trajectory of
+    each satellite is computed once, at every epoch any of the stations needs
+    (sp3_trajectory); per station only the light time and the topocentric angles
+    are computed (azel_from_trajectory). The SNR files are the same as those of
+    write_snr_from_sp3, up to the last bits of rounding.
+
+    Parameters
+    ----------
+    jobs : list of dict
+        one per station, with the observations (gpstime, systemsatlists, obsdata,
+        obstypes, prntoidx), the receiver (recv, up, East, North), the name of the
+        SNR file (snrfile) and the log
+    splines : dict
+        orbit splines by satellite number (orbit_cache.sp3_splines)
+    year : int
+        full year
+    month : int
+        calendar month
+    day : int
+        calendar day
+    emin : float
+        minimum elevation angle (degrees)
+    emax : float
+        maximum elevation angle (degrees)
+    dec_rate : int
+        decimation rate in seconds
+    """
+    gweek0, gpssec0 = g.kgpsweek(year, month, day, 0, 0, 0)
+    oE = constants.omegaEarth
+    clight = constants.c
+    out_blocks = [[] for job in jobs]
+
+    for con in ['G','E','R','C']:
+        addon = g.findConstell(con)
+        prns = sorted(set(prn for job in jobs if con in job['obstypes'] for prn in job['systemsatlists'][con]))
+        for prn in prns:
+            sat_id = prn + addon
+            # epochs of every station that sees this satellite
+            epochs = []
+            for i, job in enumerate(jobs):
+                if con in job['obstypes'] and prn in job['prntoidx'][con]:
+                    t_all, snr = sp3_snr_epochs(con, prn, job['obsdata'], job['obstypes'], job['prntoidx'],
+                                                job['gpstime'], dec_rate)
+                    if len(t_all) > 0:
+                        epochs.append((i, t_all, snr))
+            if sat_id not in splines:
+                for i, t_all, snr in epochs:
+                    jobs[i]['log'].write('This satellite is not in the orbit file. {0:3.0f} \n'.format(prn))
+                continue
+            if len(epochs) == 0:
+                continue
+
+            # the satellite part of the orbit computation, once for all stations
+            grid = np.unique(np.concatenate([t_all for i, t_all, snr in epochs]))
+            traj = sp3_trajectory(*splines[sat_id], grid)
+
+            for i, t_all, snr in epochs:
+                job = jobs[i]
+                k = np.searchsorted(grid, t_all)
+                eleA_all, azimA_all = azel_from_trajectory(traj[:, :, k], 0.0, job['recv'], job['up'],
+                                                           job['East'], job['North'], oE, clight)
+                elev_mask = (eleA_all >= emin) & (eleA_all <= emax)
+                if not np.any(elev_mask):
+                    continue
+                # edot: forward difference at +0.5s, doubled to match central difference
+                elv_after, _ = azel_from_trajectory(traj[:, :, k[elev_mask]], 0.5, job['recv'], job['up'],
+                                                    job['East'], job['North'], oE, clight)
+                edot_all = 2.0 * (elv_after - eleA_all[elev_mask])
+                out_blocks[i].append(sp3_snr_block(sat_id, t_all[elev_mask], eleA_all[elev_mask],
+                                                   azimA_all[elev_mask], edot_all, snr[elev_mask], gpssec0))
+
+    for job, blocks in zip(jobs, out_blocks):
+        write_sp3_snrfile(blocks, job['snrfile'], job['log'])
 
 
 def the_makan_option(station,cyyyy,cyy,cdoy):
@@ -1299,6 +1526,31 @@ def makan_warning(missing, f):
 
     return
 
+def crx2rnx_in_process(crx, rnx):
+    """
+    Decompresses a Hatanaka file with the python decoder (gnssrefl.hatanaka),
+    used when the CRX2RNX executable is not installed.
+
+    Parameters
+    ----------
+    crx : str
+        name of the Hatanaka compressed file (may be gzipped)
+    rnx : str
+        name of the RINEX file to write
+
+    Returns
+    -------
+    rnx : str
+        name of the RINEX file, empty string if the decompression failed
+
+    """
+    try:
+        return hatanaka.crx2rnx(crx, rnx)
+    except (hatanaka.CompactRinexError, OSError, ValueError, UnicodeDecodeError) as error:
+        print('ERROR: I was not able to translate your Hatanaka compressed file: ', crx)
+        print(error)
+        return ''
+
 def go_from_crx_to_rnx(crx,deletecrx=True):
     """
     checks to see if crx rinex3 file exists, 
@@ -1328,11 +1580,11 @@ def go_from_crx_to_rnx(crx,deletecrx=True):
 
     # executable
     crnxpath = g.hatanaka_version()
-    if not os.path.exists(crnxpath):
-        g.hatanaka_warning()
-    else:
-        if os.path.exists(crx): # file exists
+    if os.path.exists(crx): # file exists
+        if os.path.exists(crnxpath):
             subprocess.call([crnxpath,crx])
+        else:
+            crx2rnx_in_process(crx, rnx)
     if os.path.exists(rnx): # file exists
         translated = True
         if deletecrx:
@@ -1372,11 +1624,11 @@ def go_from_crxgz_to_rnx(c3gz,deletecrx=True):
 
     # executable
     crnxpath = g.hatanaka_version()
-    if not os.path.exists(crnxpath):
-        g.hatanaka_warning()
-    else:
-        if os.path.exists(c3): # file exists
+    if os.path.exists(c3): # file exists
+        if os.path.exists(crnxpath):
             subprocess.call([crnxpath,c3])
+        else:
+            crx2rnx_in_process(c3, rnx)
     if os.path.exists(rnx): # file exists
         translated = True
         if deletecrx:
@@ -1652,7 +1904,79 @@ def identify_rinex_file(input_file):
 
     return station, year, doy, version
 
-def translate_rinex_file(input_file, station, year, doy, isnr, orbtype, dec_rate, overwrite, gzip):
+def prepare_rinex_file(input_file, workdir, log):
+    """
+    Copies a RINEX observation file provided by the user into a work directory
+    and decompresses it there (gzip, unix compress, Hatanaka).
+
+    Parameters
+    ----------
+    input_file : str
+        full name of the RINEX file
+    workdir : str
+        temporary directory, removed by the caller
+    log : fileid
+        for screen messages
+
+    Returns
+    -------
+    obsfile : str
+        name of the plain RINEX file, None if the decompression failed
+
+    """
+    obsfile = os.path.join(workdir, os.path.basename(input_file))
+    try:
+        if input_file.endswith('.gz'):
+            obsfile = obsfile[0:-3]
+            with gzip_mod.open(input_file, 'rb') as f_in:
+                rinex_data = f_in.read()
+            with open(obsfile, 'wb') as f_out:
+                f_out.write(rinex_data)
+        elif input_file.endswith('.Z'):
+            shutil.copy(input_file, obsfile)
+            subprocess.call(['uncompress', obsfile])
+            obsfile = obsfile[0:-2]
+        else:
+            shutil.copy(input_file, obsfile)
+    except (OSError, EOFError) as error:
+        print('ERROR: I was not able to decompress your input file: ', input_file)
+        print(error)
+        log.write('Decompression of {0:s} failed \n'.format(input_file))
+        return None
+
+    if not os.path.isfile(obsfile) or (os.path.getsize(obsfile) == 0):
+        print('ERROR: I was not able to decompress your input file: ', input_file)
+        log.write('Decompression of {0:s} failed \n'.format(input_file))
+        return None
+
+    with open(obsfile, 'r', errors='ignore') as fid:
+        first_line = fid.readline()
+    if 'CRINEX' in first_line[60:80]:
+        crnxpath = g.hatanaka_version()
+        hatanaka_out = ''
+        if not os.path.exists(crnxpath):
+            # no executable, so decompress it here
+            hatanaka_out = crx2rnx_in_process(obsfile, os.path.join(workdir, 'hatanaka_output.rnx'))
+        else:
+            # CRX2RNX only accepts crx and yyd endings, and it names its own output
+            hatanaka_in = os.path.join(workdir, 'hatanaka_input.crx')
+            os.rename(obsfile, hatanaka_in)
+            before = os.listdir(workdir)
+            subprocess.call([crnxpath, hatanaka_in])
+            new_files = [f for f in os.listdir(workdir) if f not in before]
+            if len(new_files) == 1:
+                hatanaka_out = os.path.join(workdir, new_files[0])
+                if os.path.getsize(hatanaka_out) == 0:
+                    hatanaka_out = ''
+        if not hatanaka_out:
+            print('ERROR: I was not able to translate your Hatanaka compressed file: ', input_file)
+            log.write('Hatanaka translation of {0:s} failed \n'.format(input_file))
+            return None
+        obsfile = hatanaka_out
+
+    return obsfile
+
+def translate_rinex_file(input_file, station, year, doy, isnr, orbtype, dec_rate, overwrite, gzip, binary=False, batch=None):
     """
     Translates a RINEX observation file provided by the user into an SNR file.
     The file is copied into a temporary directory and decompressed there, so the
@@ -1680,6 +2004,11 @@ def translate_rinex_file(input_file, station, year, doy, isnr, orbtype, dec_rate
         whether an existing SNR file is remade
     gzip : bool
         whether the SNR file is gzipped after creation
+    binary : bool, optional
+        also write the binary (.npz) version of the SNR file
+    batch : list, optional
+        when given, the file is not translated here but added to this list,
+        to be translated with the other files of its day by translate_rinex_batch
 
     """
     input_file = os.path.abspath(input_file)
@@ -1697,7 +2026,7 @@ def translate_rinex_file(input_file, station, year, doy, isnr, orbtype, dec_rate
     csnr = str(isnr)
     snrname_full = quickname(station, year, cyy, cdoy, csnr)
     if g.snr_exist(station, year, doy, csnr):
-        snr_on_disk = snrname_full + '.gz' if os.path.isfile(snrname_full + '.gz') else snrname_full
+        snr_on_disk = next((n for n in compression.compressed_versions(snrname_full) if os.path.isfile(n)), snrname_full)
         if overwrite:
             print('SNR file exists/you requested overwriting, existing file will be deleted')
             os.remove(snr_on_disk)
@@ -1705,6 +2034,11 @@ def translate_rinex_file(input_file, station, year, doy, isnr, orbtype, dec_rate
             print('SNR file already exists', snr_on_disk, '\n')
             return
 
+    if batch is not None:
+        batch.append({'input_file': input_file, 'station': station, 'year': year, 'doy': doy, 'version': version,
+                      'isnr': isnr, 'orbtype': orbtype, 'dec_rate': dec_rate, 'gzip': gzip, 'binary': binary})
+        return
+
     g.make_nav_dirs(year)
     log, gen_log = set_rinex2snr_logs(station, year, doy)
     print('General log: ', gen_log)
@@ -1713,61 +2047,139 @@ def translate_rinex_file(input_file, station, year, doy, isnr, orbtype, dec_rate
 
     workdir = tempfile.mkdtemp()
     try:
-        obsfile = os.path.join(workdir, os.path.basename(input_file))
-        try:
-            if input_file.endswith('.gz'):
-                obsfile = obsfile[0:-3]
-                with gzip_mod.open(input_file, 'rb') as f_in:
-                    rinex_data = f_in.read()
-                with open(obsfile, 'wb') as f_out:
-                    f_out.write(rinex_data)
-            elif input_file.endswith('.Z'):
-                shutil.copy(input_file, obsfile)
-                subprocess.call(['uncompress', obsfile])
-                obsfile = obsfile[0:-2]
-            else:
-                shutil.copy(input_file, obsfile)
-        except (OSError, EOFError) as error:
-            print('ERROR: I was not able to decompress your input file: ', input_file)
-            print(error)
-            log.write('Decompression of {0:s} failed \n'.format(input_file))
-            return
-
-        if not os.path.isfile(obsfile) or (os.path.getsize(obsfile) == 0):
-            print('ERROR: I was not able to decompress your input file: ', input_file)
-            log.write('Decompression of {0:s} failed \n'.format(input_file))
+        obsfile = prepare_rinex_file(input_file, workdir, log)
+        if obsfile is None:
             return
 
-        with open(obsfile, 'r', errors='ignore') as fid:
-            first_line = fid.readline()
-        if 'CRINEX' in first_line[60:80]:
-            crnxpath = g.hatanaka_version()
-            hatanaka_out = ''
-            if not os.path.exists(crnxpath):
-                g.hatanaka_warning()
-            else:
-                # CRX2RNX only accepts crx and yyd endings, and it names its own output
-                hatanaka_in = os.path.join(workdir, 'hatanaka_input.crx')
-                os.rename(obsfile, hatanaka_in)
-                before = os.listdir(workdir)
-                subprocess.call([crnxpath, hatanaka_in])
-                new_files = [f for f in os.listdir(workdir) if f not in before]
-                if len(new_files) == 1:
-                    hatanaka_out = os.path.join(workdir, new_files[0])
-                    if os.path.getsize(hatanaka_out) == 0:
-                        hatanaka_out = ''
-            if not hatanaka_out:
-                print('ERROR: I was not able to translate your Hatanaka compressed file: ', input_file)
-                log.write('Hatanaka translation of {0:s} failed \n'.format(input_file))
-                return
-            obsfile = hatanaka_out
-
+        outputs = {'gzip': gzip}
+        if binary:
+            outputs['binary'] = True
         if version >= 3:
-            conv2snr(year, doy, station, isnr, orbtype, 'local', dec_rate, 'local', log, rinex3_filename=obsfile, gzip=gzip)
+            conv2snr(year, doy, station, isnr, orbtype, 'local', dec_rate, 'local', log, rinex3_filename=obsfile, **outputs)
         else:
-            conv2snr(year, doy, station, isnr, orbtype, 'local', dec_rate, 'local', log, rinex2_filename=obsfile, gzip=gzip)
+            conv2snr(year, doy, station, isnr, orbtype, 'local', dec_rate, 'local', log, rinex2_filename=obsfile, **outputs)
     finally:
         if not log.closed:
             log.close()
         shutil.rmtree(workdir, ignore_errors=True)
 
+
+def read_rinex_for_snr(obsfile, version, log, dec_rate=0):
+    """
+    Reads the SNR observations and the receiver position of a RINEX file, as
+    rnx2snr and rnx2snr_v3 do.
+
+    Parameters
+    ----------
+    obsfile : str
+        RINEX 2.11 or RINEX 3 filename (or files, see read_snr_observables)
+    version : int
+        major RINEX version
+    log : fileid
+        for screen messages
+    dec_rate : int, optional
+        decimation rate in seconds, the other epochs are not read
+
+    Returns
+    -------
+    dict
+        gpstime, systemsatlists, obsdata, obstypes, prntoidx and the receiver
+        (recv, up, East, North), as used by write_snr_batch_from_sp3.
+        None if the file cannot be used.
+
+    """
+    obsdata, systemsatlists, prntoidx, obstypes, header, obstimes, gpstime = read_snr_observables(obsfile, dec_rate)
+    if version >= 3:
+        obsdata, obstypes = rinpy.collapse_rinex3_obs(obsdata, obstypes)
+    if 'APPROX POSITION XYZ' not in header:
+        log.write('RINEX file does not have station coordinates. Exiting \n')
+        print('RINEX file does not have station coordinates. This is illegal. Exiting')
+        return None
+    recv = np.array([float(i) for i in header['APPROX POSITION XYZ'].split()])
+    log.write("XYZ from header {0:15.5f} {1:15.5f} {2:15.5f} \n".format(recv[0], recv[1], recv[2]))
+    if np.sum(np.abs(recv)) < 5:
+        print('Your receiver coordinates are in the middle of the Earth. Exiting.')
+        return None
+    lat, lon, h = g.xyz2llh(recv, 1e-8)
+    up, East, North = g.up(lat, lon)
+    obslist = obstypes.get('G', [])
+    if ('S1' not in obslist) and ('S2' not in obslist):
+        log.write('There are no S1 and no S2 data - this file is not useful for reflectometry \n')
+        if version >= 3:
+            return None
+    return {'gpstime': gpstime, 'systemsatlists': systemsatlists, 'obsdata': obsdata, 'obstypes': obstypes,
+            'prntoidx': prntoidx, 'recv': recv, 'up': up, 'East': East, 'North': North}
+
+
+def translate_rinex_batch(files):
+    """
+    Translates RINEX observation files of many stations, collected with the batch
+    option of translate_rinex_file. Files of the same day, SNR type, orbit and
+    decimation share the orbit: it is looked up once, and the satellite positions
+    are computed once for all of the stations (write_snr_batch_from_sp3).
+    Broadcast orbits, and days with a single file, are translated one file at a time.
+
+    Parameters
+    ----------
+    files : list of dict
+        as collected by translate_rinex_file
+
+    """
+    groups = {}
+    for f in files:
+        groups.setdefault((f['year'], f['doy'], f['isnr'], f['orbtype'], f['dec_rate']), []).append(f)
+
+    for (year, doy, isnr, orbtype, dec_rate), group in groups.items():
+        d = g.doy2ymd(year, doy)
+        month = d.month; day = d.day
+        g.make_nav_dirs(year)
+        foundit, orbname, orbdir = g.get_orbits_setexe(year, month, day, orbtype)
+        orbfile = os.path.join(orbdir, orbname) if foundit else ''
+        sp3 = orbfile[-3:] in ('sp3', 'SP3') and os.path.isfile(orbfile)
+        if (len(group) == 1) or not sp3:
+            for f in group:
+                translate_rinex_file(f['input_file'], f['station'], year, doy, isnr, orbtype, dec_rate,
+                                     False, f['gzip'], f['binary'])
+            continue
+
+        print('Orbit file: ', orbfile)
+        print('Translating ', len(group), ' stations together for year:', year, ' doy:', doy)
+        emin, emax = elev_limits(isnr)
+        cyyyy, cyy, cdoy = g.ydoych(year, doy)
+        workdir = tempfile.mkdtemp()
+        jobs = []
+        try:
+            for i, f in enumerate(group):
+                log, gen_log = set_rinex2snr_logs(f['station'], year, doy)
+                log.write('Translating the RINEX file you provided: {0:s} \n'.format(f['input_file']))
+                log.write('RINEX version {0:1.0f} \n'.format(f['version']))
+                log.write('Translated with {0:d} other stations of the same day \n'.format(len(group) - 1))
+                log.write("Orbit type {0:4s} \n".format('sp3'))
+                log.write("File name {0:50s} \n".format(orbfile))
+                filedir = os.path.join(workdir, str(i))
+                os.mkdir(filedir)
+                obsfile = prepare_rinex_file(f['input_file'], filedir, log)
+                job = None if obsfile is None else read_rinex_for_snr(obsfile, f['version'], log, dec_rate)
+                shutil.rmtree(filedir, ignore_errors=True)
+                if job is None:
+                    log.close()
+                    continue
+                g.make_snrdir(year, f['station'])
+                job.update({'snrfile': snr_output_name(f['station'], year, month, day, isnr, f['gzip']), 'log': log, 'file': f})
+                jobs.append(job)
+
+            if jobs:
+                splines = orbit_cache.sp3_splines(orbfile)
+                write_snr_batch_from_sp3(jobs, splines, year, month, day, emin, emax, dec_rate)
+            for job in jobs:
+                f = job['file']
+                if os.path.isfile(job['snrfile']):
+                    finish_snrfile(job['snrfile'], quickname(f['station'], year, cyy, cdoy, str(isnr)), year,
+                                   f['station'], job['log'], f['gzip'], f['binary'])
+                else:
+                    print('No SNR file created - check error logs')
+        finally:
+            for job in jobs:
+                if not job['log'].closed:
+                    job['log'].close()
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -57,11 +57,13 @@ def parse_arguments():
     parser.add_argument("-timeout", default=None, help="timeout in secs, useful for some archives", type=int)
     parser.add_argument("-extension", default=None, help="optional extension to keep information like samplerate, snr, lat, lon etc", type=str)
     parser.add_argument("-debug", default=None, help="run without task queue", type=str)
+    parser.add_argument("-binary", default=None, help="set to T to also write binary (.npz) SNR files, which are much faster to read", type=str)
+    parser.add_argument("-batch", default=None, help="set to T to translate the files of one day in input_folder together, sharing the orbit computation", type=str)
 
     args = parser.parse_args().__dict__
 
     # convert all expected boolean inputs from strings to booleans
-    boolean_args = ['nolook', 'overwrite', 'mk', 'weekly','strip','screenstats','gzip','monthly','debug']
+    boolean_args = ['nolook', 'overwrite', 'mk', 'weekly','strip','screenstats','gzip','monthly','debug','binary','batch']
     args = str2bool(args, boolean_args)
 
     # only return a dictionary of arguments that were added from the user - all other defaults will be set in code below
@@ -74,7 +76,8 @@ def rinex2snr(station: str = None, year: int = None, doy: int = None, snr: str =
               stream: str = 'R', mk: bool = False, weekly: bool = False, strip: bool = False,
               screenstats : bool = False, gzip : bool = True, monthly : bool = False,
               par : int=None, timeout : int = 0, extension : str='', debug: bool = False,
-              input_file : str = None, input_folder : str = None):
+              input_file : str = None, input_folder : str = None, binary : bool = False,
+              batch : bool = False, batch_files : list = None):
     """
     Note: rinex2snr means rinex TO snr. It is not a tool that is only meant for version 2 rinex files.
 
@@ -417,6 +420,21 @@ def rinex2snr(station: str = None, year: int = None, doy: int = None, snr: str =
         year, and day of year cannot be given on the command line with this option. Set par to
         translate more than one file at a time.
 
+    binary : bool, optional
+        also write a binary (.npz) version of each SNR file next to the text file.
+        gnssir and the other SNR readers use it in place of the text file, which
+        is much faster to read. Default is False. Existing files can be converted with snr2bin.
+
+    batch : bool, optional
+        with input_folder, translate the files of each day together (e.g. a network of
+        stations). The orbit file is looked up once and the satellite positions are computed
+        once for all of the stations, which is much faster than one file at a time. Only
+        used with precise (sp3) orbits; par is ignored. Default is False.
+
+    batch_files : list, optional
+        used by the batch option of input_folder: the input_file is added to this
+        list instead of being translated
+
     """
 
     vers = 'gnssrefl version ' + str(g.version('gnssrefl'))
@@ -452,7 +470,7 @@ def rinex2snr(station: str = None, year: int = None, doy: int = None, snr: str =
         if (station is not None) or (year is not None) or (doy is not None):
             print('Station, year, and day of year cannot be used with input_folder, as every file in it has its own.')
             return
-        translate_folder(input_folder, snr, orb, dec, overwrite, gzip, extension, par if par else 1)
+        translate_folder(input_folder, snr, orb, dec, overwrite, gzip, extension, par if par else 1, binary, batch)
         return
 
     if input_file is not None:
@@ -629,7 +647,10 @@ def rinex2snr(station: str = None, year: int = None, doy: int = None, snr: str =
 
     # everything below here is about finding a file. You already have one
     if input_file is not None:
-        rnx.translate_rinex_file(input_file, station, year, doy, snr, orb, dec, overwrite, gzip)
+        if batch_files is not None:
+            rnx.translate_rinex_file(input_file, station, year, doy, snr, orb, dec, overwrite, gzip, binary, batch=batch_files)
+        else:
+            rnx.translate_rinex_file(input_file, station, year, doy, snr, orb, dec, overwrite, gzip, binary)
         return
 
     rate = rate.lower()
@@ -730,7 +751,7 @@ def rinex2snr(station: str = None, year: int = None, doy: int = None, snr: str =
     args = {'station': station, 'year':year, 'doy':doy, 'isnr': snr, 'orbtype': orb, 'rate': rate,
             'dec_rate': dec, 'archive': archive, 'nol': nolook, 'overwrite': overwrite,
             'srate': samplerate, 'mk': mk, 'stream': stream,
-            'strip': strip, 'bkg': bkg, 'screenstats': screenstats, 'gzip' : gzip, 'timeout' : timeout }
+            'strip': strip, 'bkg': bkg, 'screenstats': screenstats, 'gzip' : gzip, 'timeout' : timeout, 'binary' : binary }
     MJD1 = int(g.ydoy2mjd(year,doy))
     MJD2 = int(g.ydoy2mjd(year_end,doy_end))
 
@@ -813,7 +834,7 @@ def rinex2snr(station: str = None, year: int = None, doy: int = None, snr: str =
     print(summary)
 
 
-def translate_folder(folder, snr, orb, dec, overwrite, gzip, extension, par=1):
+def translate_folder(folder, snr, orb, dec, overwrite, gzip, extension, par=1, binary=False, batch=False):
     """
     Translates every RINEX observation file in a folder. Each file is identified on
     its own, so the folder may hold more than one station and more than one day.
@@ -838,6 +859,12 @@ def translate_folder(folder, snr, orb, dec, overwrite, gzip, extension, par=1):
         tells the code to use settings stored in the gnssir json for this extension
     par : int
         number of files translated at the same time, up to ten
+    binary : bool
+        whether binary (.npz) SNR files are also written
+    batch : bool
+        whether the files of each day are translated together (rnx.translate_rinex_batch).
+        The settings of each file are worked out as usual, then the files are translated
+        by day. par is not used.
 
     """
     rinex_files = []
@@ -861,7 +888,20 @@ def translate_folder(folder, snr, orb, dec, overwrite, gzip, extension, par=1):
     if not rinex_files:
         return
 
-    settings = {'snr': snr, 'orb': orb, 'dec': dec, 'overwrite': overwrite, 'gzip': gzip, 'extension': extension}
+    settings = {'snr': snr, 'orb': orb, 'dec': dec, 'overwrite': overwrite, 'gzip': gzip, 'extension': extension, 'binary': binary}
+
+    if batch:
+        batch_files = []
+        for path, station, year, doy in rinex_files:
+            try:
+                rinex2snr(station, year, doy, input_file=path, batch_files=batch_files, **settings)
+            except Exception as e:
+                print('Error of some kind translating ', path)
+                print(f"Error type: {type(e)}. Error message: {e}")
+        rnx.translate_rinex_batch(batch_files)
+        print('')
+        print('Finished the ', len(rinex_files), ' RINEX files in ', folder)
+        return
 
     if par <= 1:
         for path, station, year, doy in rinex_files:
@@ -1,13 +1,20 @@
 import numpy as np
 import re
 import datetime
+import gzip
+import string
 import struct
 
 import gnssrefl.gps as g
+from gnssrefl import hatanaka
 
 # Joakim Strandberg wrote this code originally-
 # I made some small changes ???  Kristine M. Larson
 
+# data records parsed at a time by streamrinexfile
+STREAM_CHUNK = 20000
+
+
 class RinexError(Exception):
     pass
 
@@ -41,7 +48,24 @@ def readheader(lines, rinexversion):
     return _readheader(lines, rinexversion)
 
 
-def _readheader(lines, rinexversion):
+def _decimation(dec_rate):
+    """ The decimation interval (seconds) applied while reading, 0 for none.
+
+    Only whole intervals that divide a day are applied, so that the epochs kept are the
+    same whether the seconds of the day (write_snr_from_nav) or of the GPS week
+    (write_snr_from_sp3) are used. Otherwise all epochs are read.
+    """
+    if dec_rate and dec_rate >= 1 and dec_rate == int(dec_rate) and 86400 % int(dec_rate) == 0:
+        return int(dec_rate)
+    return 0
+
+
+def _keep_epoch(hour, minute, second, dec_rate):
+    """ whether an epoch (strings from the epoch header) is on the decimation interval """
+    return (3600*int(hour) + 60*int(minute) + int(float(second))) % dec_rate == 0
+
+
+def _readheader(lines, rinexversion, dec_rate=0):
     """ Read and return header information for the RINEX file
 
     Parameters
@@ -52,6 +76,9 @@ def _readheader(lines, rinexversion):
     rinexversion : str
         Version number for the RINEX file
 
+    dec_rate : int, optional
+        Decimation interval in seconds, see _decimation. The other epochs are skipped.
+
     Returns
     -------
     header : dict
@@ -74,9 +101,9 @@ def _readheader(lines, rinexversion):
     """
     try:
         if '2.1' in rinexversion:
-            return _readheader_v21x(lines)
+            return _readheader_v21x(lines, dec_rate)
         elif '3' in rinexversion:
-            return _readheader_v3(lines)
+            return _readheader_v3(lines, dec_rate)
         else:
             raise RinexError('RINEX v%s is not supported.' % rinexversion)
 
@@ -84,9 +111,10 @@ def _readheader(lines, rinexversion):
         raise RinexError('Missing required header %s' % str(e))
 
 
-def _readheader_v21x(lines):
+def _readheader_v21x(lines, dec_rate=0):
     """ Read rinex version 2.10 and 2.11 
     """
+    dec_rate = _decimation(dec_rate)
 
     header = {}
     # Capture header info
@@ -128,9 +156,13 @@ def _readheader_v21x(lines):
             except IndexError:
                 break  # truncated epoch header, stop parsing
             if epochflag in (0, 1, 6):  # CHECK EPOCH FLAG  STATUS
-                headerlines.append(i)
                 year, month, day, hour = lines[i][1:3], lines[i][4:6], lines[i][7:9], lines[i][10:12]
                 minute, second = lines[i][13:15], lines[i][16:26]
+                numsats = int(lines[i][29:32])  # Number of visible satellites %i3
+                if dec_rate and not _keep_epoch(hour, minute, second, dec_rate):
+                    i += max(numsats-1, 0)//12 + numsats*rowpersat + 1
+                    continue
+                headerlines.append(i)
                 obstimes.append(datetime.datetime(year=century+int(year),
                                                   month=int(month),
                                                   day=int(day),
@@ -142,7 +174,6 @@ def _readheader_v21x(lines):
                 week, sow = g.kgpsweek(century+int(year), int(month), int(day), int(hour), int(minute), int(float(second)))
                 gpstime_list.append((week, sow))
 
-                numsats = int(lines[i][29:32])  # Number of visible satellites %i3
                 headerlengths.append(1 + (numsats-1)//12)  # number of lines in header, depends on how many svs on view
 
                 if numsats > 12:
@@ -174,8 +205,9 @@ def _readheader_v21x(lines):
     return header, headerlines, headerlengths, obstimes, epochsatlists, satset, gpstime
 
 
-def _readheader_v3(lines):
+def _readheader_v3(lines, dec_rate=0):
     """ Read rinex version 3 """
+    dec_rate = _decimation(dec_rate)
 
     header = {}
     # Capture header info
@@ -213,6 +245,10 @@ def _readheader_v3(lines):
                 if i + 1 + numsats > len(lines):
                     break  # truncated final epoch, drop it and stop
 
+                if dec_rate and not _keep_epoch(hour, minute, second, dec_rate):
+                    i += numsats+1
+                    continue
+
                 headerlines.append(i)
                 obstimes.append(datetime.datetime(year=int(year),
                                                   month=int(month),
@@ -256,7 +292,58 @@ def _converttofloat(numberstr):
         return np.nan
 
 
-def _readblocks(lines, rinexversion, header, headerlines, headerlengths, epochsatlists, satset):
+def _parsefields(fields):
+    """ Parse fixed-width numeric fields in bulk.
+
+    Parameters
+    ----------
+    fields : numpy array of uint8
+        nfields x width array with the ascii bytes of each field
+
+    Returns
+    -------
+    values : numpy array
+        float for each field, the same as _converttofloat gives (NaN for
+        blank or unreadable fields)
+    """
+    nfields, width = fields.shape
+    strings = np.ascontiguousarray(fields).view('S{0:d}'.format(width)).ravel().copy()
+    strings[(fields == 32).all(axis=1)] = b'nan'
+    try:
+        return strings.astype(np.float64)
+    except ValueError:
+        # something that is not a number, do these one at a time
+        return np.array([_converttofloat(f.decode('ascii', 'replace')) for f in strings])
+
+
+def _satcodes(sats):
+    """ System letter and PRN number of satellite codes, in bulk.
+
+    Parameters
+    ----------
+    sats : list[str]
+        Satellite codes as in the RINEX file, e.g. 'G05', 'G 5' or 'G5'
+
+    Returns
+    -------
+    codes : numpy array of uint8
+        nsats x 3 array with the ascii bytes of each code (the system letter is column 0)
+
+    prn : numpy array of int
+        PRN number, -1 where the code cannot be read (int(sat[1:]) would fail)
+    """
+    codes = np.array(sats, dtype='S3')
+    codes = codes.view(np.uint8).reshape(-1, 3) if len(codes) else np.zeros((0, 3), dtype=np.uint8)
+    codes = np.where(codes == 0, 32, codes)  # short codes are padded with zeros
+    digits = (codes[:, 1:] >= 48) & (codes[:, 1:] <= 57)
+    prn = np.where(digits.all(axis=1), 10*(codes[:, 1].astype(int) - 48) + codes[:, 2] - 48, -1)
+    # ' 5' and '5 ' style numbers
+    prn = np.where((codes[:, 1] == 32) & digits[:, 1], codes[:, 2].astype(int) - 48, prn)
+    prn = np.where((codes[:, 2] == 32) & digits[:, 0], codes[:, 1].astype(int) - 48, prn)
+    return codes, prn
+
+
+def _readblocks(lines, rinexversion, header, headerlines, headerlengths, epochsatlists, satset, keep_obs=None):
     """ Read and return information in the blocks for the RINEX file
 
     Parameters
@@ -282,6 +369,10 @@ def _readblocks(lines, rinexversion, header, headerlines, headerlengths, epochsa
     satset : set(str)
         Set containing all satellites in the data.
 
+    keep_obs : str or tuple of str, optional
+        Only keep the observables whose names start with this, e.g. 'S'.
+        Default is all observables.
+
     Returns
     -------
     observationdata : dict
@@ -298,9 +389,9 @@ def _readblocks(lines, rinexversion, header, headerlines, headerlengths, epochsa
     """
     try:
         if '2.1' in rinexversion:
-            return _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, satset)
+            return _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, satset, keep_obs)
         elif '3' in rinexversion:
-            return _readblocks_v3(lines, header, headerlines, epochsatlists, satset)
+            return _readblocks_v3(lines, header, headerlines, epochsatlists, satset, keep_obs)
         else:
             raise RinexError('RINEX v%s is not supported.' % rinexversion)
 
@@ -309,7 +400,7 @@ def _readblocks(lines, rinexversion, header, headerlines, headerlengths, epochsa
 
 
 
-def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, satset):
+def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, satset, keep_obs=None):
     """ Read the lines of data.
 
     Parameters
@@ -332,6 +423,10 @@ def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, sa
     satset : set(str)
         Set containing all satellites in the data.
 
+    keep_obs : str or tuple of str, optional
+        Only keep the observables whose names start with this, e.g. 'S'.
+        Default is all observables.
+
     Returns
     -------
     observationdata : dict
@@ -354,6 +449,8 @@ def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, sa
     nobstypes = len(observables)
     rowpersat = 1 + (nobstypes-1) // 5
     nepochs = len(headerlines)
+    # positions of the observables that are kept
+    columns = [k for k, obs in enumerate(observables) if keep_obs is None or obs.startswith(keep_obs)]
 
     systemletters = set([letter for letter in set(''.join(satset)) if letter.isalpha()])
     satlists = {letter: [] for letter in systemletters}
@@ -372,9 +469,9 @@ def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, sa
     for letter in systemletters:
         satlists[letter].sort()
         nsats = len(satlists[letter])
-        observationdata[letter] = np.nan * np.zeros((nepochs, nsats, nobstypes))
+        observationdata[letter] = np.nan * np.zeros((nepochs, nsats, len(columns)))
         prntoidx[letter] = {prn: idx for idx, prn in enumerate(satlists[letter])}
-        obstypes[letter] = observables  # Proofing for V3 functionality
+        obstypes[letter] = [observables[k] for k in columns]  # Proofing for V3 functionality
 
     fmt = '14s 2x '*nobstypes
     fieldstruct = struct.Struct(fmt)
@@ -408,7 +505,7 @@ def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, sa
 
             # List comprehension runs in optimized C bytecode vs explicit for loop
             observationdata[sat[0]][iepoch, prntoidx[sat[0]][int(sat[1:])], :] = \
-                [_float(f) if f != blank else _nan for f in fields[:nobstypes]]
+                [_float(fields[k]) if fields[k] != blank else _nan for k in columns]
 
     for letter in observationdata:
         kept_observables = [i for i in range(len(obstypes[letter])) if np.sum(~np.isnan(observationdata[letter][:,:,i]))>0]
@@ -418,7 +515,7 @@ def _readblocks_v21(lines, header, headerlines, headerlengths, epochsatlists, sa
     return observationdata, satlists, prntoidx, obstypes
 
 
-def _readblocks_v3(lines, header, headerlines, epochsatlists, satset):
+def _readblocks_v3(lines, header, headerlines, epochsatlists, satset, keep_obs=None):
     """ Read the lines of data for rinex 3 files.
 
     Parameters
@@ -438,6 +535,10 @@ def _readblocks_v3(lines, header, headerlines, epochsatlists, satset):
     satset : set(str)
         Set containing all satellites in the data.
 
+    keep_obs : str or tuple of str, optional
+        Only read the observables whose names start with this, e.g. 'S' for
+        the SNR data. Default is all observables.
+
     Returns
     -------
     observationdata : dict
@@ -452,6 +553,13 @@ def _readblocks_v3(lines, header, headerlines, epochsatlists, satset):
     obstypes : dict
         Dict with observation types.
 
+    Notes
+    -----
+    The data lines of a constellation are padded to the same width and turned
+    into one byte array, and each observable is a column slice of that array
+    (parsed by _parsefields). Only the observables that are kept are parsed and
+    stored.
+
     See also
     --------
     processrinexfile : The wrapper.
@@ -471,15 +579,20 @@ def _readblocks_v3(lines, header, headerlines, epochsatlists, satset):
     systemletters = [key for key in obstypes]
     satlists = {letter: [] for letter in systemletters}
 
+    # positions of the observables that are read
+    columns = {letter: [k for k, obs in enumerate(obstypes[letter]) if keep_obs is None or obs.startswith(keep_obs)]
+               for letter in systemletters}
+    for letter in systemletters:
+        obstypes[letter] = [obstypes[letter][k] for k in columns[letter]]
+
     observationdata = {}
     prntoidx = {}
-    parser = {}
 
     # skip malformed satellite entries from truncated epoch headers
     for sat in satset:
         try:
             satlists[sat[0]].append(int(sat[1:]))
-        except (IndexError, ValueError):
+        except (IndexError, ValueError, KeyError):
             continue
 
     for letter in systemletters:
@@ -489,35 +602,37 @@ def _readblocks_v3(lines, header, headerlines, epochsatlists, satset):
             satlists.pop(letter)
             continue
 
-        satlists[letter].sort()
+        # 'G 5' and 'G05' are the same satellite
+        satlists[letter] = sorted(set(satlists[letter]))
         nsats = len(satlists[letter])
-        nobstypes = len(obstypes[letter])
-        observationdata[letter] = np.nan * np.zeros((nepochs, nsats, nobstypes))
+        observationdata[letter] = np.full((nepochs, nsats, len(columns[letter])), np.nan)
         prntoidx[letter] = {prn: idx for idx, prn in enumerate(satlists[letter])}
 
-        fmt = '3x' + '14s 2x ' * (nobstypes-1) + '14s'
-        parser[letter] = struct.Struct(fmt)
-
-    # pre-compute required line width per constellation for padding short lines
-    parser_size = {letter: parser[letter].size for letter in parser}
-
-    for iepoch, (headerstart, satlist) in enumerate(zip(headerlines, epochsatlists)):
-        for i, sat in enumerate(satlist):
-            datastring = lines[headerstart+1+i]
-
-            systemletter = sat[0]
-            if systemletter not in parser:
-                continue
-            prn = int(sat[1:])
+    # line number, epoch and satellite code of every data line
+    nsat_epoch = np.array([len(satlist) for satlist in epochsatlists], dtype=int)
+    firstline = np.repeat(np.asarray(headerlines, dtype=int) + 1 - np.concatenate(([0], np.cumsum(nsat_epoch)[:-1])), nsat_epoch)
+    lineno = firstline + np.arange(int(nsat_epoch.sum()))
+    epoch = np.repeat(np.arange(nepochs), nsat_epoch)
+    codes, prn = _satcodes([sat for satlist in epochsatlists for sat in satlist])
 
-            try:
-                raw = datastring.rstrip('\n').ljust(parser_size[systemletter]).encode('ascii')
-                data = np.array([_converttofloat(number.decode('ascii'))
-                                 for number in parser[systemletter].unpack_from(raw)])
-
-                observationdata[systemletter][iepoch, prntoidx[systemletter][prn], :] = data
-            except struct.error:
-                continue
+    for letter in observationdata:
+        if len(columns[letter]) == 0:
+            continue
+        # satellite index for each PRN, -1 if not in the list
+        lookup = np.full(101, -1)
+        for p, i in prntoidx[letter].items():
+            if 0 <= p <= 100:
+                lookup[p] = i
+        k = np.flatnonzero((codes[:, 0] == ord(letter)) & (prn >= 0))
+        k = k[lookup[prn[k]] >= 0]
+        if len(k) == 0:
+            continue
+        rows = lineno[k]; iepoch = epoch[k]; isat = lookup[prn[k]]
+        width = 3 + 16*max(columns[letter]) + 14
+        text = ''.join([lines[n].rstrip('\r\n').ljust(width)[:width] for n in rows])
+        data = np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8).reshape(len(rows), width)
+        for j, c in enumerate(columns[letter]):
+            observationdata[letter][iepoch, isat, j] = _parsefields(data[:, 3+16*c:3+16*c+14])
 
     for letter in observationdata:
         kept_observables = [i for i in range(len(obstypes[letter])) if np.sum(~np.isnan(observationdata[letter][:,:,i]))>0]
@@ -527,7 +642,7 @@ def _readblocks_v3(lines, header, headerlines, epochsatlists, satset):
     return observationdata, satlists, prntoidx, obstypes
 
 
-def processrinexfile(filename, savefile=None):
+def processrinexfile(filename, savefile=None, keep_obs=None, dec_rate=0):
     """ Process a RINEX file into python format
 
     Parameters
@@ -538,6 +653,15 @@ def processrinexfile(filename, savefile=None):
     savefile : str, optional
         Name of file to save data to. If supplied the data is saved to a compressed npz file.
 
+    keep_obs : str or tuple of str, optional
+        Only read the observables whose names start with this. rinex2snr uses 'S',
+        as it only needs the SNR data. Default is all observables.
+
+    dec_rate : int, optional
+        Decimation interval in seconds. Epochs that are not on it are skipped when
+        their epoch header is read, before their data are parsed. Intervals that do
+        not divide a day are ignored (all epochs are read). Default is 0, every epoch.
+
     Returns
     -------
     observationdata : dict
@@ -570,9 +694,9 @@ def processrinexfile(filename, savefile=None):
     with open(filename, 'r') as f:
         lines = f.read().splitlines(True)
 
-    header, headerlines, headerlengths, obstimes, epochsatlists, satset,gpstime = _readheader(lines, rinexversion)
+    header, headerlines, headerlengths, obstimes, epochsatlists, satset,gpstime = _readheader(lines, rinexversion, dec_rate)
     observationdata, satlists, prntoidx, obstypes = _readblocks(lines, rinexversion, header, headerlines,
-                                                                headerlengths, epochsatlists, satset)
+                                                                headerlengths, epochsatlists, satset, keep_obs)
 
     if savefile is not None:
         saverinextonpz(savefile, observationdata, satlists, prntoidx, obstypes, header, obstimes)
@@ -580,6 +704,393 @@ def processrinexfile(filename, savefile=None):
     return observationdata, satlists, prntoidx, obstypes, header, obstimes, gpstime 
 
 
+class SatelliteObservable:
+    """ One observable of one constellation, kept per satellite.
+
+    streamrinexfile returns these instead of the nepochs x nsats arrays of
+    separateobservables. Only the epochs with data are stored. Indexing a column
+    works like the dense array: obs[:, idx] (or obs[rows, idx]) is the data of
+    satellite idx for all epochs, NaN where there is none.
+
+    Parameters
+    ----------
+    nepochs : int
+        number of epochs in the file
+
+    epochs : list of numpy arrays of int
+        for each satellite, the epochs with data
+
+    values : list of numpy arrays of float
+        for each satellite, the data at those epochs
+    """
+
+    def __init__(self, nepochs, epochs, values):
+        self.epochs = epochs
+        self.values = values
+        self.shape = (nepochs, len(epochs))
+
+    def column(self, idx):
+        col = np.full(self.shape[0], np.nan)
+        col[self.epochs[idx]] = self.values[idx]
+        return col
+
+    def hasdata(self, idx):
+        return len(self.values[idx]) > 0
+
+    def __getitem__(self, key):
+        rows, idx = key
+        return self.column(idx)[rows]
+
+
+class _StreamBuffers:
+    """ Growing per-satellite buffers of streamrinexfile and RinexMerge.
+
+    Data records are collected as text and parsed chunklines at a time (as in
+    _readblocks_v3). Only the records with any kept observable are stored. The
+    observables of a system are those of all the files read: a file can have
+    other observables than the one before it (see layout).
+
+    Parameters
+    ----------
+    chunklines : int
+        number of records parsed at a time
+    """
+
+    def __init__(self, chunklines):
+        self.chunklines = chunklines
+        self.columns = {}; self.slots = {}
+        self.obstypes = {}; self.seen = {}; self.data = {}
+        self.epoch = []; self.sats = []; self.text = []
+
+    def layout(self, columns, obstypes):
+        """ The records added from now on have the observables obstypes[letter] at the positions columns[letter] """
+        self.flush()
+        self.columns = columns
+        for letter in columns:
+            known = self.obstypes.setdefault(letter, [])
+            self.seen.setdefault(letter, set()); self.data.setdefault(letter, {})
+            known.extend([obs for obs in obstypes[letter] if obs not in known])
+            self.slots[letter] = [known.index(obs) for obs in obstypes[letter]]
+
+    def add(self, iepoch, sat, text):
+        """ Add the record of satellite sat, text is the data with field k at 16*k """
+        self.epoch.append(iepoch); self.sats.append(sat); self.text.append(text)
+        if len(self.epoch) >= self.chunklines:
+            self.flush()
+
+    def flush(self):
+        if len(self.epoch) == 0:
+            return
+        codes, prn = _satcodes(self.sats)
+        epoch = np.array(self.epoch, dtype=np.int32)
+        for letter, columns in self.columns.items():
+            k = np.flatnonzero((codes[:, 0] == ord(letter)) & (prn >= 0))
+            if len(k) == 0:
+                continue
+            self.seen[letter].update(np.unique(prn[k]).tolist())
+            if len(columns) == 0:
+                continue
+            width = 16*max(columns) + 14
+            text = ''.join([self.text[n].ljust(width)[:width] for n in k])
+            data = np.frombuffer(text.encode('ascii', 'replace'), dtype=np.uint8).reshape(len(k), width)
+            values = np.column_stack([_parsefields(data[:, 16*c:16*c+14]) for c in columns])
+            ok = ~np.isnan(values).all(axis=1)
+            k = k[ok]; values = values[ok]
+            if self.slots[letter] != list(range(len(self.obstypes[letter]))):
+                # observables in another order than in the files before
+                values = _widen(values, len(self.obstypes[letter]), self.slots[letter])
+            order = np.argsort(prn[k], kind='stable')
+            for rows in np.split(order, np.flatnonzero(np.diff(prn[k][order])) + 1):
+                if len(rows) > 0:
+                    self.data[letter].setdefault(int(prn[k[rows[0]]]), []).append((epoch[k[rows]], values[rows]))
+        self.epoch = []; self.sats = []; self.text = []
+
+    def finish(self, nepochs):
+        """ Observation data, satellite lists, prntoidx and obstypes as in processrinexfile """
+        self.flush()
+        observationdata = {}; satlists = {}; prntoidx = {}; keptobstypes = {}
+        for letter, obstypes in self.obstypes.items():
+            if len(self.seen[letter]) == 0:
+                continue
+            satlists[letter] = sorted(self.seen[letter])
+            prntoidx[letter] = {prn: idx for idx, prn in enumerate(satlists[letter])}
+            nobs = len(obstypes)
+            chunks = [self.data[letter].pop(prn, []) for prn in satlists[letter]]
+            epochs = [np.concatenate([e for e, v in c]) if c else np.zeros(0, dtype=np.int32) for c in chunks]
+            values = [np.concatenate([_widen(v, nobs) for e, v in c]) if c else np.zeros((0, nobs)) for c in chunks]
+            del chunks
+            observationdata[letter] = {}
+            keptobstypes[letter] = []
+            for j, obs in enumerate(obstypes):
+                ok = [~np.isnan(v[:, j]) for v in values]
+                if not any(o.any() for o in ok):
+                    continue
+                observationdata[letter][obs] = SatelliteObservable(nepochs, [e[o] for e, o in zip(epochs, ok)],
+                                                                   [v[o, j] for v, o in zip(values, ok)])
+                keptobstypes[letter].append(obs)
+        return observationdata, satlists, prntoidx, keptobstypes
+
+
+def _widen(values, nobs, slots=None):
+    """ values (nrecords x len(slots)) as nrecords x nobs, column k going to slots[k], NaN elsewhere """
+    if slots is None:
+        if values.shape[1] == nobs:
+            return values
+        slots = list(range(values.shape[1]))
+    out = np.full((len(values), nobs), np.nan)
+    out[:, slots] = values
+    return out
+
+
+def _epochtime(year, month, day, hour, minute, second):
+    """ datetime and (GPS week, second of week) of an epoch, second is the string from the file """
+    obstime = datetime.datetime(year=year, month=month, day=day, hour=hour, minute=minute,
+                                second=int(float(second)), microsecond=int(float(second) % 1 * 100000))
+    return obstime, g.kgpsweek(year, month, day, hour, minute, int(float(second)))
+
+
+def _stream_v21(f, header, keep_obs, buffers, obstimes, gpstime_list, dec_rate=0, after=None):
+    """ Data records of a RINEX 2.11 file, see RinexMerge.add """
+    dec_rate = _decimation(dec_rate)
+    observables = header['# / TYPES OF OBSERV'][6:].split()
+    rowpersat = 1 + (len(observables)-1) // 5
+    kept = [k for k, obs in enumerate(observables) if keep_obs is None or obs.startswith(keep_obs)]
+    columns = {letter: kept for letter in string.ascii_uppercase}
+    buffers.layout(columns, {letter: [observables[k] for k in kept] for letter in columns})
+    century = int(header['TIME OF FIRST OBS'].split()[0][:2]+'00')
+    pattern = re.compile(r'(\s{2}\d|\s\d{2}){2}')
+
+    satlist = []; numsats = 0; isat = 0; record = []; skip = 0
+    for line in f:
+        if skip > 0:
+            skip -= 1
+        elif len(satlist) < numsats:
+            # continuation line of the satellite list
+            satlist.extend([line[32+s*3:35+s*3] for s in range(min(12, numsats - len(satlist)))])
+        elif isat < numsats:
+            record.append(line.rstrip().ljust(80)[:80])
+            if len(record) == rowpersat:
+                sat = satlist[isat]
+                buffers.add(len(obstimes) - 1, 'G' + sat[1:] if sat[0] == ' ' else sat, ''.join(record))
+                record = []; isat += 1
+        elif pattern.match(line[:6]):  # then it's the first line in a header record
+            try:
+                epochflag = int(line[28])
+            except IndexError:
+                break  # truncated epoch header, stop parsing
+            if epochflag in (0, 1, 6):
+                numsats = int(line[29:32])
+                obstime = None
+                if not dec_rate or _keep_epoch(line[10:12], line[13:15], line[16:26], dec_rate):
+                    obstime, gpstime = _epochtime(century+int(line[1:3]), int(line[4:6]), int(line[7:9]),
+                                                  int(line[10:12]), int(line[13:15]), line[16:26])
+                if obstime is None or (after is not None and obstime <= after):
+                    # satellite list continuation lines and data records of the epoch
+                    skip = max(numsats-1, 0)//12 + numsats*rowpersat
+                    satlist = []; numsats = 0; isat = 0
+                    continue
+                obstimes.append(obstime); gpstime_list.append(gpstime)
+                satlist = [line[32+s*3:35+s*3] for s in range(min(12, numsats))]
+                isat = 0; record = []
+            else:  # there was a comment or some header info
+                skip = int(line[30:32])
+
+
+def _stream_v3(f, header, keep_obs, buffers, obstimes, gpstime_list, dec_rate=0, after=None):
+    """ Data records of a RINEX 3 file, see RinexMerge.add """
+    dec_rate = _decimation(dec_rate)
+    obstypes = {}
+    systemletter = ''
+    for line in header['SYS / # / OBS TYPES'].splitlines():
+        if line[0] != ' ':
+            systemletter = line[0]
+            obstypes[systemletter] = line[6:].split()
+        else:
+            obstypes[systemletter].extend(line[6:].split())
+    columns = {letter: [k for k, obs in enumerate(obstypes[letter]) if keep_obs is None or obs.startswith(keep_obs)]
+               for letter in obstypes}
+    buffers.layout(columns, {letter: [obstypes[letter][k] for k in columns[letter]] for letter in obstypes})
+
+    numsats = 0; pending = []; skip = 0
+    for line in f:
+        if skip > 0:
+            skip -= 1  # data record of an epoch that is not read
+            continue
+        if len(pending) < numsats:
+            pending.append(line)
+        elif line[0] == '>':  # then it's the first line in a header record
+            try:
+                epochflag = int(line[31])
+            except IndexError:
+                break  # truncated epoch header, stop parsing
+            if epochflag not in (0, 1, 6):
+                continue  # special event, its records are skipped as they do not start with >
+            obstime = None
+            if not dec_rate or _keep_epoch(line[13:15], line[16:18], line[19:30], dec_rate):
+                obstime, gpstime = _epochtime(int(line[2:6]), int(line[7:9]), int(line[10:12]),
+                                              int(line[13:15]), int(line[16:18]), line[19:30])
+            if obstime is None or (after is not None and obstime <= after):
+                skip = int(line[32:35]); numsats = 0; pending = []
+                continue
+            numsats = int(line[32:35]); pending = []
+        else:
+            continue
+        if len(pending) == numsats:
+            # the epoch is complete (a truncated final epoch is dropped)
+            for data in pending:
+                buffers.add(len(obstimes), data[:3], data[3:].rstrip('\r\n'))
+            obstimes.append(obstime); gpstime_list.append(gpstime)
+            numsats = 0; pending = []
+
+
+class RinexMerge:
+    """ Merge of consecutive RINEX observation files, read one at a time.
+
+    Meant for the high-rate archives, where a day comes as 96 files of 15 minutes
+    (or 24 of an hour): each file is streamed into the same per-satellite buffers
+    as soon as it is added, so the day is never written out as a merged RINEX
+    file and no merging program (gfzrnx, teqc) is needed. The files can be RINEX
+    2.11 or 3, plain, gzipped or Compact RINEX, as for streamrinexfile. They must
+    be added in time order: the epochs that are not later than the last epoch
+    of the files before (overlapping files) are skipped.
+
+    Parameters
+    ----------
+    keep_obs : str or tuple of str, optional
+        Observables to keep, see streamrinexfile. Default is 'S'.
+
+    chunklines : int, optional
+        Number of data records parsed at a time.
+
+    dec_rate : int, optional
+        Decimation interval in seconds, see streamrinexfile. Default is 0.
+    """
+
+    def __init__(self, keep_obs='S', chunklines=STREAM_CHUNK, dec_rate=0):
+        self.keep_obs = keep_obs
+        self.dec_rate = dec_rate
+        self.buffers = _StreamBuffers(chunklines)
+        self.header = {}
+        self.obstimes = []
+        self.gpstime = []
+        self.nfiles = 0
+
+    def add(self, filename):
+        """ Read the data records of one more file.
+
+        Parameters
+        ----------
+        filename : str or file object
+            RINEX observation file, see streamrinexfile. The header of the first
+            file is the header of the merge.
+        """
+        if isinstance(filename, str):
+            f = gzip.open(filename, 'rt') if filename.endswith('.gz') else open(filename, 'r')
+        else:
+            f = filename
+        try:
+            lines = hatanaka.open_lines(f, self.keep_obs)
+            header = {}
+            for line in lines:
+                if "END OF HEADER" in line:
+                    break
+                if line[60:80].strip() not in header:  # Header label
+                    header[line[60:80].strip()] = line[:60]
+                else:
+                    header[line[60:80].strip()] += "\n"+line[:60]
+
+            rinexversion = header.get('RINEX VERSION / TYPE', '')[:9].strip()
+            after = self.obstimes[-1] if self.obstimes else None
+            try:
+                if '2.1' in rinexversion:
+                    stream = _stream_v21
+                elif '3' in rinexversion:
+                    stream = _stream_v3
+                else:
+                    raise RinexError('RINEX v%s is not supported.' % rinexversion)
+                stream(lines, header, self.keep_obs, self.buffers, self.obstimes, self.gpstime, self.dec_rate, after)
+            except KeyError as e:
+                raise RinexError('Missing required header %s' % str(e))
+        finally:
+            if f is not filename:
+                f.close()
+        if self.nfiles == 0:
+            self.header = header
+        self.nfiles += 1
+
+    def finish(self):
+        """ The merged data, as returned by streamrinexfile. Call it once, after the last file. """
+        observationdata, satlists, prntoidx, obstypes = self.buffers.finish(len(self.obstimes))
+        gpstime = np.array(self.gpstime) if self.gpstime else np.empty(shape=[0, 2])
+        return observationdata, satlists, prntoidx, obstypes, self.header, self.obstimes, gpstime
+
+
+def streamrinexfile(filename, keep_obs='S', chunklines=STREAM_CHUNK, dec_rate=0):
+    """ Read a RINEX observation file epoch by epoch, keeping only some observables.
+
+    Unlike processrinexfile the file is never held in memory and there are no
+    nepochs x nsats arrays: the records are parsed chunklines at a time and only
+    the kept observables of the epochs with data are stored, per satellite. Peak
+    memory follows the amount of SNR data rather than the size of the file.
+
+    Parameters
+    ----------
+    filename : str or file object
+        RINEX 2.11 or 3 observation file. Names ending in .gz are read with gzip.
+        An open text file, or any iterable of lines (e.g. the output of a
+        decompression pipe), can be given instead. Compact RINEX (Hatanaka)
+        files are decompressed as they are read, see hatanaka.crx2rnx_lines.
+
+    keep_obs : str or tuple of str, optional
+        Keep the observables whose names start with this. Default is 'S', the
+        SNR data. None keeps all of them.
+
+    chunklines : int, optional
+        Number of data records parsed at a time.
+
+    dec_rate : int, optional
+        Decimation interval in seconds, as in processrinexfile: the records of the
+        other epochs are skipped without being parsed. Default is 0, every epoch.
+
+    Returns
+    -------
+    observationdata : dict
+        For each constellation, a dict with a SatelliteObservable for each observable
+        (what separateobservables gives for processrinexfile).
+
+    satlists, prntoidx, obstypes, header, obstimes, gpstime
+        As returned by processrinexfile.
+    """
+    merge = RinexMerge(keep_obs, chunklines, dec_rate)
+    merge.add(filename)
+    return merge.finish()
+
+
+def streamrinexfiles(filelist, keep_obs='S', chunklines=STREAM_CHUNK, dec_rate=0):
+    """ Read consecutive RINEX observation files as one, e.g. the 15 minute files of a day.
+
+    The files are streamed one after the other, see RinexMerge. Nothing is
+    written to disk.
+
+    Parameters
+    ----------
+    filelist : list of str
+        RINEX 2.11 or 3 observation files, in time order
+
+    keep_obs, chunklines, dec_rate
+        As in streamrinexfile.
+
+    Returns
+    -------
+    observationdata, satlists, prntoidx, obstypes, header, obstimes, gpstime
+        As returned by streamrinexfile, header is the one of the first file.
+    """
+    merge = RinexMerge(keep_obs, chunklines, dec_rate)
+    for filename in filelist:
+        merge.add(filename)
+    return merge.finish()
+
+
 def mergerinexfiles(filelist, savefile=None):
     """ Process several rinexfiles and merges them into one file.
 
@@ -588,6 +1099,8 @@ def mergerinexfiles(filelist, savefile=None):
 
     !!! Currently only functional for RINEX3. !!!
 
+    streamrinexfiles (RinexMerge) merges RINEX 2.11 and 3 files while reading
+    them, keeping only some observables.
 
     Parameters
     ----------
@@ -761,6 +1274,15 @@ def collapse_rinex3_obs(obsdata, obstypes):
             # Per-satellite selection: for each sat, use the highest-priority
             # candidate that has any data, matching gfzrnx behavior.
             shape = obsdata[con][matched[0]].shape  # (nepochs, nsats)
+            if isinstance(obsdata[con][matched[0]], SatelliteObservable):
+                # streamed data, pick the candidate per satellite without dense arrays
+                picked = [next((obsdata[con][c] for c in matched if obsdata[con][c].hasdata(i)), None)
+                          for i in range(shape[1])]
+                new_obsdata[con][band] = SatelliteObservable(
+                    shape[0], [np.zeros(0, dtype=np.int32) if p is None else p.epochs[i] for i, p in enumerate(picked)],
+                    [np.zeros(0) if p is None else p.values[i] for i, p in enumerate(picked)])
+                new_obstypes[con].append(band)
+                continue
             merged = np.full(shape, np.nan)
             for sat_idx in range(shape[1]):
                 for cand in matched:
@@ -6,6 +6,7 @@ import subprocess
 import sys
 
 import gnssrefl.gps as g
+import gnssrefl.snr_format as snr_format
 
 def main():
     """
@@ -74,15 +75,13 @@ def main():
             a=np.loadtxt(snrfile)
             i = (a[:,3] % dec) == 0 ; a=a[i,:]
             nr,nc = a.shape
-            fout = open(snrfilet, 'w+')
             if (nc == 11):
-                np.savetxt(fout, a, fmt="%3.0f %9.4f %9.4f %9.1f %11.6f %6.2f %6.2f %6.2f %6.2f %6.2f %6.2f")
+                snr_format.write_rows(snrfilet, a, "%3.0f %9.4f %9.4f %9.1f %11.6f %6.2f %6.2f %6.2f %6.2f %6.2f %6.2f\n")
             elif (nc == 9):
-                np.savetxt(fout, a, fmt="%3.0f %9.4f %9.4f %9.1f %11.6f %6.2f %6.2f %6.2f %6.2f")
+                snr_format.write_rows(snrfilet, a, "%3.0f %9.4f %9.4f %9.1f %11.6f %6.2f %6.2f %6.2f %6.2f\n")
             else:
                 print('Incorrect number of columns. Exiting without making new file')
                 sys.exit()
-            fout.close()
             print('new/decimated snrfile created')
             subprocess.call(['mv','-f',snrfilet,snrfile])
 
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Fixed-width text output of SNR files.
+
+The SNR files are written with printf formats such as
+
+    %3.0f%10.4f%10.4f%10.1f%10.6f%7.2f%7.2f%7.2f%7.2f%7.2f%7.2f
+
+Formatting every row in python (fmt % tuple(row), np.savetxt) costs a few
+microseconds per row, which adds up to seconds for a 1-Hz multi-GNSS day.
+format_rows renders whole columns at once with numpy: the values are rounded
+to integers (value * 10**decimals) and their digits are written into a byte
+array, one row per line. The result is the same, byte for byte, as the printf
+format. Values where that is not certain are formatted by python instead:
+values close to half way between two roundings (printf rounds the exact binary
+value), NaN and infinity, and rows with a value too wide for its field.
+
+Only formats made of %W.Df fields and literal text are supported.
+"""
+import re
+
+import numpy as np
+
+from gnssrefl import compression
+
+# rinex2snr (sp3 orbits) and nmea2snr, 11 columns
+SNR_FORMAT = "%3.0f%10.4f%10.4f%10.1f%10.6f%7.2f%7.2f%7.2f%7.2f%7.2f%7.2f\n"
+# rinex2snr with a broadcast orbit, 9 columns
+NAV_SNR_FORMAT = "%3.0f %10.4f %10.4f %10.0f %7.2f %7.2f %7.2f %7.2f %7.2f \n"
+
+# rows formatted at a time by write_rows
+CHUNK_ROWS = 100000
+
+_FIELD = re.compile(r'%(\d+)\.(\d+)f')
+
+
+def parse_format(fmt):
+    """
+    The fields of a printf format.
+
+    Parameters
+    ----------
+    fmt : str
+        e.g. SNR_FORMAT. Fields are %W.Df, everything else is literal text
+
+    Returns
+    -------
+    literals : list of str
+        the text before each field, and after the last one
+    fields : list of (int, int)
+        width and number of decimals of each field
+
+    """
+    literals = []
+    fields = []
+    start = 0
+    for m in _FIELD.finditer(fmt):
+        literals.append(fmt[start:m.start()])
+        fields.append((int(m.group(1)), int(m.group(2))))
+        start = m.end()
+    literals.append(fmt[start:])
+    if '%' in ''.join(literals).replace('%%', ''):
+        raise ValueError('only %W.Df fields are supported: ' + fmt)
+    return [text.replace('%%', '%') for text in literals], fields
+
+
+def _column(x, width, decimals, out, col0):
+    """
+    Writes the characters of x into out[col0:col0+width] (characters by rows,
+    values by columns, filled with spaces).
+
+    Returns
+    -------
+    hard : numpy array of bool
+        values that were not written (left to python)
+
+    """
+    neg = np.signbit(x)
+    scaled = np.abs(x) * 10.0**decimals
+    with np.errstate(invalid='ignore'):
+        n = np.floor(scaled + 0.5)
+        # half way cases are decided by the exact binary value, as printf does
+        hard = ~(np.abs(scaled - np.floor(scaled) - 0.5) > 1e-6 + scaled*2.0**-48)
+        # the integer digits that fit in the field (one less with a minus sign)
+        intdigits = width - (decimals + 1 if decimals > 0 else 0) - neg
+        hard |= (intdigits < 1) | ~(n < 10.0**intdigits * 10.0**decimals)
+    n = np.where(hard, 0, n)
+    q = n.astype(np.int64 if n.max(initial=0) >= 2**32 else np.uint32)
+
+    end = col0 + width
+    for k in range(decimals):
+        q, digit = np.divmod(q, 10)
+        out[end-1-k] = digit
+        out[end-1-k] += 48
+    if decimals > 0:
+        out[end-1-decimals] = 46   # .
+        end -= decimals + 1
+    # first integer digit, always there
+    q, digit = np.divmod(q, 10)
+    out[end-1] = digit
+    out[end-1] += 48
+    k = 1
+    while k < width and end - 1 - k >= col0 and q.any():
+        present = q > 0
+        q, digit = np.divmod(q, 10)
+        out[end-1-k] = np.where(present, digit + 48, 32)
+        k += 1
+    minus = np.flatnonzero(neg & ~hard)
+    if len(minus):
+        # a minus sign before the first digit
+        m = (n[minus] // 10.0**decimals).astype(np.int64)
+        ndigits = np.searchsorted(10**np.arange(1, 19, dtype=np.int64), m, side='right') + 1
+        out[end-1-ndigits, minus] = 45
+    return hard
+
+
+def format_rows(data, fmt):
+    """
+    Formats the rows of an array with a printf format.
+
+    Parameters
+    ----------
+    data : 2-d numpy array
+        one column per field of fmt
+    fmt : str
+        printf format of a row, %W.Df fields and literal text, e.g. SNR_FORMAT.
+        End it with a newline.
+
+    Returns
+    -------
+    bytes
+        the same as ''.join(fmt % tuple(row) for row in data).encode()
+
+    """
+    literals, fields = parse_format(fmt)
+    data = np.asarray(data, dtype=float)
+    if data.ndim != 2 or data.shape[1] != len(fields):
+        raise ValueError('data should have {0:d} columns'.format(len(fields)))
+    nrows = len(data)
+    if nrows == 0:
+        return b''
+    linewidth = sum(len(text) for text in literals) + sum(width for width, _ in fields)
+    # built by character columns, so each one is contiguous, and transposed at the end
+    out = np.full((linewidth, nrows), 32, dtype=np.uint8)
+    pos = 0
+    hard_rows = np.zeros(nrows, dtype=bool)
+    for j, (width, decimals) in enumerate(fields):
+        for c in literals[j].encode('ascii'):
+            out[pos] = c
+            pos += 1
+        x = data[:, j]
+        hard = _column(x, width, decimals, out, pos)
+        for i in np.flatnonzero(hard):
+            value = ('%*.*f' % (width, decimals, x[i])).encode('ascii')
+            if len(value) == width:
+                out[pos:pos+width, i] = np.frombuffer(value, dtype=np.uint8)
+            else:
+                hard_rows[i] = True
+        pos += width
+    for c in literals[-1].encode('ascii'):
+        out[pos] = c
+        pos += 1
+    out = np.ascontiguousarray(out.T)
+
+    if not hard_rows.any():
+        return out.tobytes()
+    # rows with a value wider than its field, in python
+    pieces = []
+    start = 0
+    for i in np.flatnonzero(hard_rows):
+        pieces.append(out[start:i].tobytes())
+        pieces.append((fmt % tuple(data[i])).encode('ascii'))
+        start = i + 1
+    pieces.append(out[start:].tobytes())
+    return b''.join(pieces)
+
+
+def write_rows(output, data, fmt, chunkrows=CHUNK_ROWS):
+    """
+    Writes the rows of an array with a printf format, see format_rows.
+
+    Parameters
+    ----------
+    output : str or binary file object
+        filename, compressed while it is written if it ends in .gz or .zst
+        (see compression.open_write), or an open binary file
+    data : 2-d numpy array
+        one column per field of fmt
+    fmt : str
+        printf format of a row
+    chunkrows : int, optional
+        rows formatted at a time
+
+    """
+    if isinstance(output, str):
+        with compression.open_write(output) as f:
+            write_rows(f, data, fmt, chunkrows)
+        return
+    for start in range(0, len(data), chunkrows):
+        output.write(format_rows(data[start:start+chunkrows], fmt))
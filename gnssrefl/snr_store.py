@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Binary columnar storage for SNR files.
+
+The text SNR files (ssssDDD0.YY.snrNN, optionally compressed) are re-parsed with
+np.loadtxt every time they are used, which dominates the run time when years of
+high-rate data are reprocessed. This module writes an optional binary sidecar
+next to the text file::
+
+    {REFL_CODE}/{yyyy}/snr/{ssss}/ssssDDD0.YY.snrNN.npz
+
+The sidecar is an uncompressed numpy archive with these members:
+
+    data : float64 (nrows, ncols), stored column by column (Fortran order)
+        the same values, in the same row order, that np.loadtxt returns for the
+        text file. Columns are sat, ele, azi, seconds, edot, then the SNR columns.
+    sat_list : int32 (nsat,)
+        satellite numbers present in the file, sorted
+    sat_order : int32 (nrows,)
+        row indices of data, grouped by satellite (time order within a satellite)
+    sat_offsets : int64 (nsat+1,)
+        rows sat_order[sat_offsets[i]:sat_offsets[i+1]] belong to sat_list[i]
+    hour_offsets : int64 (25,)
+        first row at or after each hour of the day, hour_offsets[24] is nrows.
+        Empty if the rows are not in time order (never the case for rinex2snr files).
+    format_version : int32 (1,)
+        FORMAT_VERSION, currently 2. Version 1 files have no hour_offsets member;
+        they are still read, and windows of time in them are read in full and
+        then filtered.
+
+Because the archive is not compressed, a window of time can be read with
+read_snr_binary_window by memory mapping the data member and only touching the
+rows between two hour offsets. This is what the midnite buffering uses for the
+adjacent days.
+
+The text file stays the reference product. Readers only use the sidecar when it
+is at least as new as the text file, so a remade text file is never shadowed by
+a stale binary one.
+"""
+import argparse
+import numpy as np
+import os
+import struct
+import zipfile
+
+from gnssrefl import compression
+from gnssrefl.utils import FileManagement, str2bool
+
+FORMAT_VERSION = 2
+BINARY_SUFFIX = '.npz'
+
+
+def binary_snr_name(snrfile):
+    """
+    Name of the binary sidecar for a text SNR file.
+
+    Parameters
+    ----------
+    snrfile : str or Path
+        text SNR filename, with or without the .gz or .zst ending
+
+    Returns
+    -------
+    str
+        sidecar filename, i.e. ssssDDD0.YY.snrNN.npz
+    """
+    snrfile = str(snrfile)
+    if snrfile.endswith(BINARY_SUFFIX):
+        return snrfile
+    return compression.plain_name(snrfile) + BINARY_SUFFIX
+
+
+def is_binary_snr(snrfile):
+    """True if snrfile is a binary SNR sidecar."""
+    return str(snrfile).endswith(BINARY_SUFFIX)
+
+
+def preferred_snr_file(snrfile):
+    """
+    Return the binary sidecar for snrfile if it exists and is current, else snrfile.
+
+    The sidecar is considered current when it is non-empty and not older than
+    the text file it was made from. A sidecar whose text file is gone is not used.
+
+    Parameters
+    ----------
+    snrfile : str or Path
+        text SNR filename (plain or compressed) or a sidecar name
+
+    Returns
+    -------
+    str
+        filename that should be read
+    """
+    snrfile = str(snrfile)
+    binfile = binary_snr_name(snrfile)
+    if not os.path.isfile(binfile) or os.path.getsize(binfile) == 0:
+        return snrfile
+    if binfile == snrfile:
+        return binfile
+    if not os.path.isfile(snrfile) or os.path.getmtime(snrfile) > os.path.getmtime(binfile):
+        return snrfile
+    return binfile
+
+
+def write_snr_binary(binfile, data):
+    """
+    Write SNR rows to a binary sidecar.
+
+    Parameters
+    ----------
+    binfile : str
+        output filename. the .npz ending is added if missing
+    data : numpy array
+        SNR rows, columns as in the text file (sat, ele, azi, seconds, edot, snr...)
+    """
+    data = np.asarray(data, dtype=float)
+    if data.ndim == 1:
+        data = data.reshape(1, -1)
+    sats = data[:, 0].astype(np.int32)
+    sat_order = np.argsort(sats, kind='stable').astype(np.int32)
+    sat_list, counts = np.unique(sats, return_counts=True)
+    sat_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+    hour_offsets = hour_index(data[:, 3])
+
+    binfile = str(binfile)
+    if not binfile.endswith(BINARY_SUFFIX):
+        binfile = binfile + BINARY_SUFFIX
+    # write to a temporary name first so a reader never sees a half written file
+    tmpfile = binfile + '.tmp'
+    with open(tmpfile, 'wb') as fout:
+        np.savez(fout, data=np.asfortranarray(data), sat_list=sat_list.astype(np.int32),
+                 sat_order=sat_order, sat_offsets=sat_offsets, hour_offsets=hour_offsets,
+                 format_version=np.array([FORMAT_VERSION], dtype=np.int32))
+    os.replace(tmpfile, binfile)
+
+
+def hour_index(seconds):
+    """
+    Row offsets of each hour of the day in a time ordered SNR file.
+
+    Parameters
+    ----------
+    seconds : numpy array
+        seconds of the day column of the SNR file
+
+    Returns
+    -------
+    hour_offsets : numpy array of int64
+        25 values; rows hour_offsets[h]:hour_offsets[h+1] are in hour h
+        (hour 0 includes anything before midnight, hour 23 anything after the end
+        of the day). Empty if seconds are not in time order.
+    """
+    n = len(seconds)
+    if n > 1 and np.any(np.diff(seconds) < 0):
+        return np.empty(0, dtype=np.int64)
+    hour_offsets = np.searchsorted(seconds, 3600.0*np.arange(25), side='left').astype(np.int64)
+    hour_offsets[0] = 0
+    hour_offsets[24] = n
+    return hour_offsets
+
+
+def text2binary(snrfile, binfile=None):
+    """
+    Make the binary sidecar for an existing text SNR file.
+
+    The values are parsed with np.loadtxt, so reading the sidecar gives exactly
+    the array you would have gotten from the text file.
+
+    Parameters
+    ----------
+    snrfile : str
+        text SNR file, plain or compressed (see compression)
+    binfile : str, optional
+        output name. default is binary_snr_name(snrfile)
+
+    Returns
+    -------
+    nrows : int
+        number of rows written, 0 if nothing was written
+    """
+    with compression.open_read(snrfile) as f:
+        data = np.loadtxt(f, comments='%', ndmin=2)
+    if data.size == 0:
+        return 0
+    if binfile is None:
+        binfile = binary_snr_name(snrfile)
+    write_snr_binary(binfile, data)
+    return data.shape[0]
+
+
+def read_snr_binary(binfile):
+    """
+    Read all rows of a binary SNR sidecar.
+
+    Parameters
+    ----------
+    binfile : str
+        sidecar filename
+
+    Returns
+    -------
+    data : numpy array (nrows x ncols)
+        same contents as np.loadtxt of the text SNR file
+    """
+    with np.load(binfile) as z:
+        return np.ascontiguousarray(z['data'])
+
+
+def _memmap_member(binfile, name):
+    """
+    Memory map an uncompressed member of a numpy .npz archive.
+
+    Parameters
+    ----------
+    binfile : str
+        sidecar filename
+    name : str
+        member name, e.g. 'data'
+
+    Returns
+    -------
+    numpy memmap or None
+        None if the member is missing or compressed
+    """
+    with zipfile.ZipFile(binfile) as z:
+        try:
+            info = z.getinfo(name + '.npy')
+        except KeyError:
+            return None
+        if info.compress_type != zipfile.ZIP_STORED:
+            return None
+    with open(binfile, 'rb') as f:
+        # the local file header is 30 bytes followed by the name and extra fields
+        f.seek(info.header_offset)
+        header = f.read(30)
+        nname, nextra = struct.unpack('<HH', header[26:30])
+        f.seek(info.header_offset + 30 + nname + nextra)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(binfile, dtype=dtype, mode='r', shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
+
+
+def read_snr_binary_window(binfile, sec_min=None, sec_max=None):
+    """
+    Read the rows of a binary SNR sidecar that fall in a window of time.
+
+    The data are memory mapped and only the hours that overlap the window are
+    read, so asking for the last two hours of a day costs about a twelfth of
+    reading the whole file.
+
+    Parameters
+    ----------
+    binfile : str
+        sidecar filename
+    sec_min : float or None
+        keep rows with seconds > sec_min. None means no lower bound.
+    sec_max : float or None
+        keep rows with seconds < sec_max. None means no upper bound.
+
+    Returns
+    -------
+    data : numpy array (N x cols) or None if no rows are in the window
+    nbytes : int
+        number of bytes of SNR data that were read
+    """
+    with np.load(binfile) as z:
+        hour_offsets = z['hour_offsets'] if 'hour_offsets' in z.files else np.empty(0)
+    mm = None
+    if len(hour_offsets) == 25:
+        mm = _memmap_member(binfile, 'data')
+
+    if mm is None:
+        # older or unsorted file: read everything
+        data = read_snr_binary(binfile)
+        nbytes = data.nbytes
+    else:
+        i1 = 0
+        i2 = int(hour_offsets[24])
+        if sec_min is not None:
+            i1 = int(hour_offsets[int(np.clip(np.floor(sec_min/3600), 0, 23))])
+        if sec_max is not None:
+            h = int(np.ceil(sec_max/3600))
+            if h < 24:
+                i2 = int(hour_offsets[max(h, 0)])
+        data = np.ascontiguousarray(mm[i1:max(i1, i2), :])
+        nbytes = data.nbytes
+        del mm
+
+    keep = np.ones(data.shape[0], dtype=bool)
+    if sec_min is not None:
+        keep &= data[:, 3] > sec_min
+    if sec_max is not None:
+        keep &= data[:, 3] < sec_max
+    if not keep.any():
+        return None, nbytes
+    return data[keep], nbytes
+
+
+def read_snr_binary_sat(binfile, sat):
+    """
+    Read the rows for one satellite from a binary SNR sidecar, using its
+    per-satellite index.
+
+    Parameters
+    ----------
+    binfile : str
+        sidecar filename
+    sat : int
+        satellite number (100 added for Glonass, etc)
+
+    Returns
+    -------
+    data : numpy array
+        rows for that satellite in time order. empty if the satellite is not there
+    """
+    with np.load(binfile) as z:
+        sat_list = z['sat_list']
+        i = np.searchsorted(sat_list, sat)
+        data = z['data']
+        if i == len(sat_list) or sat_list[i] != sat:
+            return np.empty((0, data.shape[1]))
+        offsets = z['sat_offsets']
+        rows = z['sat_order'][offsets[i]:offsets[i+1]]
+        return data[rows, :]
+
+
+def main():
+    """
+    Makes binary versions of existing SNR files. These are read in place of the
+    text files by gnssir and the other SNR readers, which is much faster.
+    The text files are not changed.
+
+    Examples
+    --------
+    snr2bin p041 2023 1
+        makes p0410010.23.snr66.npz from the 66 SNR file for day 1 of 2023
+
+    snr2bin p041 2020 1 -doy_end 366 -year_end 2023
+        converts four years of SNR files
+
+    snr2bin p041 2023 1 -snr 99 -overwrite T
+        remakes the binary files for the 99 SNR files
+
+    Parameters
+    ----------
+    station : str
+        4 character station name
+    year : int
+        full year
+    doy : int
+        day of year
+    -snr : int, optional
+        snr file type, default is 66
+    -doy_end : int, optional
+        last day of year
+    -year_end : int, optional
+        last year
+    -overwrite : bool, optional
+        remake binary files that are already current. default is False
+
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("station", help="4 ch station name", type=str)
+    parser.add_argument("year", help="year", type=int)
+    parser.add_argument("doy", help="day of year", type=int)
+    parser.add_argument("-snr", help="snr file type, default is 66", type=int, default=66)
+    parser.add_argument("-doy_end", help="end day of year", type=int, default=None)
+    parser.add_argument("-year_end", help="end year", type=int, default=None)
+    parser.add_argument("-overwrite", help="remake existing binary files (T/F)", type=str, default='F')
+
+    args = parser.parse_args()
+    args.__dict__ = str2bool(args.__dict__, ['overwrite'])
+    station = args.station
+    overwrite = args.overwrite
+    doy_end = args.doy if args.doy_end is None else args.doy_end
+    year_end = args.year if args.year_end is None else args.year_end
+
+    import gnssrefl.gps as g
+
+    nmade = 0; nskip = 0; nmissing = 0
+    for year in range(args.year, year_end + 1):
+        d1 = args.doy if year == args.year else 1
+        d2 = doy_end if year == year_end else g.dec31(year)
+        for doy in range(d1, d2 + 1):
+            snrfile, foundit = FileManagement(station, 'snr_file', year, doy, snr_type=args.snr).find_snr_file()
+            if not foundit:
+                nmissing += 1
+                continue
+            if (not overwrite) and is_binary_snr(preferred_snr_file(snrfile)):
+                nskip += 1
+                continue
+            nrows = text2binary(str(snrfile))
+            if nrows > 0:
+                print('Wrote ', binary_snr_name(snrfile), nrows, ' rows')
+                nmade += 1
+            else:
+                print('Empty SNR file, nothing written: ', snrfile)
+
+    print('Binary SNR files made: ', nmade, ' already current: ', nskip, ' no SNR file: ', nmissing)
+
+
+if __name__ == "__main__":
+    main()
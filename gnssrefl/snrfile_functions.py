@@ -85,3 +85,219 @@ def propagate_and_azel_sp3(iX, iY, iZ, t, recv, up, East, North, oE, clight):
     elv = (np.pi/2.0 - np.arccos(cos_zenith)) * 180.0/np.pi
     azm = np.arctan2(r_vec @ East, r_vec @ North) * 180.0/np.pi % 360.0
     return elv, azm
+
+
+def sp3_trajectory(iX, iY, iZ, t):
+    """
+    Satellite trajectory at epochs t, to be shared by several receivers
+    (see azel_from_trajectory).
+
+    Parameters
+    ----------
+    iX, iY, iZ : CubicSpline
+        interpolators for satellite ECEF coordinates
+    t : ndarray
+        epochs (GPS seconds of week), shape (N,)
+
+    Returns
+    -------
+    traj : ndarray, shape (3, 4, N)
+        for x, y and z: position, velocity, acceleration/2 and jerk/6 at each
+        epoch. The splines are cubic, so p[0] + h*(p[1] + h*(p[2] + h*p[3]))
+        with p = traj[k] is the spline at t + h as long as t + h is in the
+        same spline interval
+    """
+    traj = np.empty((3, 4, len(t)))
+    for k, spline in enumerate((iX, iY, iZ)):
+        for nu, scale in enumerate((1.0, 1.0, 0.5, 1.0/6.0)):
+            traj[k, nu] = spline(t, nu) * scale
+    return traj
+
+
+def azel_from_trajectory(traj, dt, recv, up, East, North, oE, clight):
+    """
+    propagate_and_azel_sp3 for one receiver at epochs t + dt, using the
+    trajectory computed once at epochs t by sp3_trajectory. Only the light
+    time and the topocentric angles are computed here.
+
+    Parameters
+    ----------
+    traj : ndarray, shape (3, 4, N)
+        from sp3_trajectory
+    dt : float
+        time offset from the trajectory epochs (seconds), e.g. 0.5 for edot
+    recv : ndarray
+        receiver ECEF position, shape (3,)
+    up, East, North : ndarray
+        unit vectors at receiver, shape (3,)
+    oE : float
+        Earth rotation rate (rad/s)
+    clight : float
+        speed of light (m/s)
+
+    Returns
+    -------
+    elv : ndarray, shape (N,)
+        elevation angles in degrees
+    azm : ndarray, shape (N,)
+        azimuth angles in degrees [0, 360)
+
+    Notes
+    -----
+    Differs from propagate_and_azel_sp3 only in rounding, and when
+    t + dt - tau falls in another spline interval than t. The splines have
+    continuous second derivatives, so that difference is far below a micrometer.
+    """
+    def position(h):
+        return [p[0] + h*(p[1] + h*(p[2] + h*p[3])) for p in traj]
+
+    rx, ry, rz = recv
+    # initial guess: 70 ms transmission time
+    x, y, z = position(dt - 0.07)
+    tau = np.sqrt((x - rx)**2 + (y - ry)**2 + (z - rz)**2) / clight
+
+    # two light-time iterations, as in propagate_and_azel_sp3
+    for _k in range(2):
+        x, y, z = position(dt - tau)
+        Th = -oE * tau
+        cosT = np.cos(Th); sinT = np.sin(Th)
+        x, y = x*cosT - y*sinT, x*sinT + y*cosT
+        tau = np.sqrt((x - rx)**2 + (y - ry)**2 + (z - rz)**2) / clight
+
+    dx = x - rx; dy = y - ry; dz = z - rz
+    r_norms = np.sqrt(dx**2 + dy**2 + dz**2)
+    cos_zenith = np.clip((dx*up[0] + dy*up[1] + dz*up[2]) / r_norms, -1.0, 1.0)
+    elv = (np.pi/2.0 - np.arccos(cos_zenith)) * 180.0/np.pi
+    azm = np.arctan2(dx*East[0] + dy*East[1] + dz*East[2], dx*North[0] + dy*North[1] + dz*North[2]) * 180.0/np.pi % 360.0
+    return elv, azm
+
+
+def nav_ephem_index(teph, t):
+    """
+    For each epoch, picks the broadcast ephemeris g.myfindephem would use:
+    the latest one with a reference time not after the epoch (the first one
+    in the file if several have that time), or the first one of the
+    satellite if they are all after the epoch.
+
+    Parameters
+    ----------
+    teph : ndarray
+        reference times (GPS week*604800 + Toe) of the ephemerides of one
+        satellite, in file order
+    t : ndarray
+        epochs, GPS week*604800 + seconds of the week
+
+    Returns
+    -------
+    idx : ndarray of int
+        row of teph for each epoch
+    """
+    order = np.argsort(teph, kind='stable')
+    ts = teph[order]
+    j = np.searchsorted(ts, t, side='right') - 1
+    # first of a group of equal reference times, as argmin does
+    first = np.searchsorted(ts, ts[np.maximum(j, 0)], side='left')
+    return np.where(j >= 0, order[first], 0)
+
+
+def satorb_nav(sec_of_week, ephem):
+    """
+    Vectorized version of rinex2snr.satorb: satellite positions from
+    broadcast ephemerides. As in satorb, the GPS week is the one of the
+    ephemeris.
+
+    Parameters
+    ----------
+    sec_of_week : ndarray
+        GPS seconds of the week, shape (N,)
+    ephem : ndarray
+        ephemeris block (as made by g.myreadnav) for each epoch, shape (N, 32)
+
+    Returns
+    -------
+    xyz : ndarray, shape (3, N)
+        Cartesian coordinates of the satellite in meters
+    """
+    (Crs, delta_n, M0, Cuc, ecc, Cus, sqrta, Toe, Cic, Loa, Cis, incl, Crc, perigee,
+     radot, idot) = ephem[:, 7:23].T
+    week = ephem[:, 24]
+    a = sqrta**2
+    t = week*7*86400+sec_of_week
+    tk = t-Toe
+    tk = (tk - 302400) % (302400*2) - 302400
+    n0 = np.sqrt(constants.mu/a**3)
+    n = n0 + delta_n
+    Mk = M0 + n*tk
+    # Kepler's equation, each epoch stops when satorb would
+    Ek = Mk.copy()
+    E0 = Mk + ecc*np.sin(Mk)
+    active = np.ones(len(Mk), dtype=bool)
+    i = 0
+    while True:
+        if i >= 3:
+            active &= np.abs(Ek-E0) > 1e-12
+        if not np.any(active):
+            break
+        i += 1
+        Ek[active] = Mk[active] + ecc[active]*np.sin(E0[active])
+        E0[active] = Mk[active] + ecc[active]*np.sin(Ek[active])
+    nuk = np.arctan2(np.sqrt(1-ecc**2)*np.sin(Ek), np.cos(Ek)-ecc)
+    Phik = nuk + perigee
+    duk = Cus*np.sin(2*Phik)+Cuc*np.cos(2*Phik)
+    drk = Crs*np.sin(2*Phik)+Crc*np.cos(2*Phik)
+    dik = Cis*np.sin(2*Phik)+Cic*np.cos(2*Phik)
+    uk = Phik + duk
+    rk = a*(1-ecc*np.cos(Ek))+drk
+
+    ik = incl+dik+idot*tk
+    xkp = rk*np.cos(uk)
+    ykp = rk*np.sin(uk)
+    Omegak = Loa + (radot-constants.omegaEarth)*tk - constants.omegaEarth*Toe
+    xk = xkp*np.cos(Omegak)-ykp*np.cos(ik)*np.sin(Omegak)
+    yk = xkp*np.sin(Omegak)+ykp*np.cos(ik)*np.cos(Omegak)
+    zk = ykp*np.sin(ik)
+    return np.array([xk, yk, zk])
+
+
+def propagate_and_azel_nav(sec_of_week, ephem, recv, up, East, North):
+    """
+    Vectorized broadcast orbit propagation with light-time iteration
+    (as rinex2snr.satorb_prop), then azimuth/elevation.
+
+    Parameters
+    ----------
+    sec_of_week : ndarray
+        GPS seconds of the week, shape (N,)
+    ephem : ndarray
+        ephemeris block for each epoch, shape (N, 32)
+    recv : ndarray
+        receiver ECEF position, shape (3,)
+    up, East, North : ndarray
+        unit vectors at receiver, shape (3,)
+
+    Returns
+    -------
+    elv : ndarray, shape (N,)
+        elevation angles in degrees
+    azm : ndarray, shape (N,)
+        azimuth angles in degrees [0, 360)
+    """
+    recv = np.asarray(recv).reshape(3, 1)
+    # start with 70 milliseconds
+    SatOrb = satorb_nav(sec_of_week-0.07, ephem)
+    deltaT = np.sqrt(np.sum((SatOrb - recv)**2, axis=0))/constants.c
+    for _k in range(2):
+        SatOrb = satorb_nav(sec_of_week-deltaT, ephem)
+        Th = -constants.omegaEarth * deltaT
+        xs = SatOrb[0]*np.cos(Th)-SatOrb[1]*np.sin(Th)
+        ys = SatOrb[0]*np.sin(Th)+SatOrb[1]*np.cos(Th)
+        SatOrbn = np.array([xs, ys, SatOrb[2]])
+        deltaT = np.sqrt(np.sum((SatOrbn - recv)**2, axis=0))/constants.c
+
+    r = SatOrbn - recv
+    rnorm = np.sqrt(np.sum(r**2, axis=0))
+    elv = (np.pi/2.0 - np.arccos((r[0]*up[0] + r[1]*up[1] + r[2]*up[2])/rnorm))*180/np.pi
+    azm = np.arctan2(East[0]*r[0] + East[1]*r[1] + East[2]*r[2],
+                     North[0]*r[0] + North[1]*r[1] + North[2]*r[2])*180/np.pi
+    azm = np.where(azm < 0, 360 + azm, azm)
+    return elv, azm
@@ -18,6 +18,8 @@ import time
 # my local functions
 import gnssrefl.gps as g
 import gnssrefl.refraction as refr
+import gnssrefl.snr_store as snr_store
+import gnssrefl.compression as compression
 from gnssrefl.gnss_frequencies import get_wavelength, get_glonass_wavelength, signal_label_to_freq
 
 
@@ -1297,7 +1299,12 @@ def loadsnrfile(snrfile, thedir):
 
     print('Reading file:', snrin)
     # this assumes someone has checked existence first
-    snrdata = np.loadtxt(snrin)
+    readfile = snr_store.preferred_snr_file(snrin)
+    if snr_store.is_binary_snr(readfile):
+        snrdata = snr_store.read_snr_binary(readfile)
+    else:
+        with compression.open_read(snrin) as fid:
+            snrdata = np.loadtxt(fid)
 
     stryear = str(int(snrfile[9:11]) + 2000)
     strdoy = snrfile[4:7]
@@ -18,6 +18,7 @@ import math
 # support code
 import gnssrefl.gnssir_v2 as guts2
 import gnssrefl.gps as g
+import gnssrefl.results_store as results_store
 import gnssrefl.sd_libs as sd
 
 
@@ -315,6 +316,8 @@ def readin_and_plot(station, year,d1,d2,plt2screen,extension,sigma,writecsv,azim
         icounter = 0
         if os.path.isdir(direc):
             all_files = os.listdir(direc)
+            # the daily files, from the results store when it is current
+            year_results = results_store.read_results(direc, d1, d2)
             for f in all_files:
             # only evaluate txt files
                 if (len(f) ==  7) and (f[4:7] == 'txt'):
@@ -324,7 +327,7 @@ def readin_and_plot(station, year,d1,d2,plt2screen,extension,sigma,writecsv,azim
                         try:
                             with warnings.catch_warnings():
                                 warnings.simplefilter("ignore")
-                                a = np.loadtxt(fname,comments='%')
+                                a = year_results[day]
                                 # skip empty files (header-only, no retrievals)
                                 if a.size == 0:
                                     continue                                    
@@ -214,18 +214,19 @@ def load_arcs(station, year, year_end, extension, snr_type=66, fast=False):
                     pbar.write(f'  warning {y}/{doy}: {type(exc).__name__}: {exc}')
                 continue
 
-            for meta, _data in arcs:
-                sat = int(meta['sat'])
-                if sat in BEIDOU_NON_MEO_SATS:
-                    continue
+            # the metadata columns of the ArcBatch, no per arc dicts
+            meta = arcs.meta[~np.isin(arcs.meta['sat'], list(BEIDOU_NON_MEO_SATS))]
+            for sat, freq, hours, azim, arc_type in zip(meta['sat'].tolist(), meta['freq'].tolist(),
+                                                        meta['arc_timestamp'].tolist(), meta['az_min_ele'].tolist(),
+                                                        meta['arc_type'].tolist()):
                 rows.append({
                     'year': y,
                     'doy':  doy,
                     'sat':  sat,
-                    'freq': int(meta['freq']),
-                    'mjd':  doy_hour_to_mjd(y, doy, meta['arc_timestamp']),
-                    'azim': float(meta['az_min_ele']),
-                    'rise': 1 if meta['arc_type'] == 'rising' else -1,
+                    'freq': freq,
+                    'mjd':  doy_hour_to_mjd(y, doy, hours),
+                    'azim': azim,
+                    'rise': 1 if arc_type == 'rising' else -1,
                 })
 
             n_processed += 1
@@ -696,7 +697,7 @@ def attach_track_id(arcs, track_file_path, year, doy, track_cache=None):
 
     Parameters
     ----------
-    arcs : list of (metadata, data) tuples
+    arcs : ArcBatch or list of (metadata, data) tuples
         Output of ``extract_arcs``, modified in place.
     track_file_path : path-like
         Path to a tracks-shaped JSON file (``tracks.json`` from
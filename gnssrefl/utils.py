@@ -2,13 +2,13 @@ import json
 import numpy as np
 import os
 import platform
-import subprocess
 import sys
 import warnings
 
 from enum import Enum
 from typing import get_type_hints
 from pathlib import Path
+from gnssrefl import compression
 from gnssrefl.gnss_frequencies import is_valid_frequency, all_frequencies, get_file_suffix
 
 
@@ -60,6 +60,7 @@ class FileTypes(str, Enum):
     volumetric_water_content = "volumetric_water_content"
     gnssir_result = "gnssir_result"
     gnssir_failqc_result = "gnssir_failqc_result"
+    gnssir_peaks = "gnssir_peaks"
     arcs_directory = "arcs_directory"
     individual_tracks = "individual_tracks"
     vwc_outputs = "vwc_outputs"
@@ -141,6 +142,7 @@ class FileManagement:
                     result_path = result_path / self.extension
                 files[FileTypes.gnssir_result] = result_path / f'{self.doy:03d}.txt'
                 files[FileTypes.gnssir_failqc_result] = result_path / 'failQC' / f'{self.doy:03d}.txt'
+                files[FileTypes.gnssir_peaks] = result_path / 'peaks' / f'{self.doy:03d}.npz'
 
             file_path = files[self.file_type]
             
@@ -512,23 +514,29 @@ class FileManagement:
         filename = f'{sta}{cdoy}0.{cyy}.snr{self.snr_type}'
         return self.xdir / cyyyy / 'snr' / sta / filename
 
-    def find_snr_file(self, gzip=None):
+    def find_snr_file(self, gzip=None, binary=False):
         """
         Find an SNR file, optionally converting to match the desired storage format.
 
-        A .gz is considered trustworthy only when it is non-empty and the
-        uncompressed sibling is absent. A zero-byte .gz, or coexistence of
-        .gz and the uncompressed original, indicates an interrupted gzip
-        run (successful gzip removes the original on completion). In that
-        case the corpse is unlinked and the uncompressed copy is treated
-        as authoritative.
+        Compressed files are .gz or .zst (see compression); conversions are
+        done in-process. A compressed file is considered trustworthy only when
+        it is non-empty and the uncompressed sibling is absent. A zero-byte
+        compressed file, or coexistence of it and the uncompressed original,
+        indicates an interrupted compression run (successful compression
+        removes the original on completion). In that case the corpse is
+        unlinked and the uncompressed copy is treated as authoritative.
 
         Parameters
         ----------
         gzip : bool or None
             If None (default): find whatever exists, no conversion.
-            If True: prefer .gz. Compress uncompressed files.
-            If False: prefer uncompressed. Decompress .gz files.
+            If True: prefer compressed. Compress uncompressed files with the
+            codec of compression.settings (gzip unless configured otherwise).
+            If False: prefer uncompressed. Decompress compressed files.
+        binary : bool
+            If True, return the binary sidecar (.npz, see snr_store) when it
+            exists and is not older than the text file. Only use this if the
+            caller reads the file with read_snr. Default is False.
 
         Returns
         -------
@@ -536,32 +544,42 @@ class FileManagement:
         """
         for uppercase in [False, True]:
             base = self._get_snr_path(uppercase=uppercase)
-            gz_path = Path(str(base) + '.gz')
-
-            gz_valid = gz_path.exists() and gz_path.stat().st_size > 0 and not base.exists()
-            if gz_path.exists() and not gz_valid:
-                print(f'Removing interrupted-gzip corpse: {gz_path}')
-                gz_path.unlink()
-
-            if gzip is None:
-                if gz_valid:
-                    return gz_path, True
-                if base.exists():
-                    return base, True
-            elif gzip:
-                if gz_valid:
-                    return gz_path, True
-                if base.exists():
-                    subprocess.call(['gzip', str(base)])
-                    if gz_path.exists() and gz_path.stat().st_size > 0:
+            gz_path = None
+            for name in compression.compressed_versions(base):
+                path = Path(name)
+                if not path.exists():
+                    continue
+                if path.stat().st_size == 0 or base.exists():
+                    print(f'Removing interrupted-compression corpse: {path}')
+                    path.unlink()
+                elif gz_path is None:
+                    gz_path = path
+            gz_valid = gz_path is not None
+
+            if binary and (gz_valid or base.exists()):
+                from gnssrefl.snr_store import preferred_snr_file, is_binary_snr
+                preferred = preferred_snr_file(gz_path if gz_valid else base)
+                if is_binary_snr(preferred):
+                    return Path(preferred), True
+
+            try:
+                if gzip is None:
+                    if gz_valid:
                         return gz_path, True
-            else:
-                if base.exists():
-                    return base, True
-                if gz_valid:
-                    subprocess.call(['gunzip', str(gz_path)])
                     if base.exists():
                         return base, True
+                elif gzip:
+                    if gz_valid:
+                        return gz_path, True
+                    if base.exists():
+                        return Path(compression.compress_file(str(base))), True
+                else:
+                    if base.exists():
+                        return base, True
+                    if gz_valid:
+                        return Path(compression.decompress_file(str(gz_path))), True
+            except (OSError, EOFError) as e:
+                print(f'Problem converting the SNR file {base}: {e}')
 
         return self._get_snr_path(), False
 
@@ -0,0 +1,85 @@
+"""
+Benchmark: the arcs of a day as an ArcBatch and as the list of
+(metadata, data) tuples extract_arcs returned before. The arcs of the mchl
+test days (all frequencies, three elevation angle pairs) are extracted, then
+both representations are pickled (what a worker process gets), scanned for
+their metadata (as tracks.load_arcs does) and looped over (as retrieve_rh
+does).
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_arc_batch.py [REPEAT]
+"""
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from gnssrefl.extract_arcs import extract_arcs
+from gnssrefl.read_snr_files import read_snr
+
+SNR_DIR = Path(__file__).parent / 'data' / 'refl_code' / '2025' / 'snr' / 'mchl'
+FREQS = [1, 20, 5, 101, 102, 201, 205, 206, 207, 208]
+
+
+def timed(f, repeat):
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        out = f()
+    return (time.perf_counter() - t0)/repeat, out
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    days = []
+    for f in sorted(SNR_DIR.glob('*.snr66.gz')):
+        _, snr_array, _, _ = read_snr(str(f), buffer_hours=0)
+        days.append(snr_array)
+
+    def extract():
+        return [extract_arcs(s, freq=FREQS, e1=5.0, e2=25.0, ellist=[5, 15, 10, 25, 5, 25], polyV=4, pele=[5, 30],
+                             year=2025, doy=10 + i) for i, s in enumerate(days)]
+    t_extract, batches = timed(extract, repeat)
+    # the representation of before: a dict and five arrays per arc
+    lists = [[(dict(m), {k: v.copy() for k, v in d.items()}) for m, d in b] for b in batches]
+    narcs = sum(len(b) for b in batches)
+    print('{0:d} days, {1:d} arcs, {2:d} samples'.format(len(days), narcs, sum(int(b.offsets[-1]) for b in batches)))
+    print('extract_arcs (s/day)                {0:8.4f}'.format(t_extract/len(days)))
+
+    print('                                   list of tuples    ArcBatch')
+    t_list, p_list = timed(lambda: [pickle.dumps(a) for a in lists], repeat)
+    t_batch, p_batch = timed(lambda: [pickle.dumps(b) for b in batches], repeat)
+    print('pickle (MB)                         {0:8.2f}        {1:8.2f}'.format(
+        sum(map(len, p_list))/1e6, sum(map(len, p_batch))/1e6))
+    print('pickle + unpickle (ms/day)          {0:8.2f}        {1:8.2f}'.format(
+        1000*(t_list + timed(lambda: [pickle.loads(p) for p in p_list], repeat)[0])/len(days),
+        1000*(t_batch + timed(lambda: [pickle.loads(p) for p in p_batch], repeat)[0])/len(days)))
+
+    def scan_list():
+        return [[(m['sat'], m['freq'], m['arc_timestamp'], m['az_min_ele']) for m, d in a] for a in lists]
+
+    def scan_batch():
+        return [list(zip(b.meta['sat'].tolist(), b.meta['freq'].tolist(), b.meta['arc_timestamp'].tolist(),
+                         b.meta['az_min_ele'].tolist())) for b in batches]
+    t_list, s_list = timed(scan_list, repeat)
+    t_batch, s_batch = timed(scan_batch, repeat)
+    assert s_list == s_batch
+    print('metadata scan (ms/day)              {0:8.2f}        {1:8.2f}'.format(
+        1000*t_list/len(days), 1000*t_batch/len(days)))
+
+    t_list, n_list = timed(lambda: sum(len(d['snr']) for a in lists for m, d in a), repeat)
+    t_batch, n_batch = timed(lambda: sum(len(d['snr']) for b in batches for m, d in b), repeat)
+    assert n_list == n_batch
+    print('loop over the arcs (ms/day)         {0:8.2f}        {1:8.2f}'.format(
+        1000*t_list/len(days), 1000*t_batch/len(days)))
+    t_batch, some = timed(lambda: [b.take(b.meta['freq'] == 1) for b in batches], repeat)
+    t_list, some_list = timed(lambda: [[(m, d) for m, d in a if m['freq'] == 1] for a in lists], repeat)
+    assert [len(s) for s in some] == [len(s) for s in some_list]
+    print('arcs of one frequency (ms/day)      {0:8.2f}        {1:8.2f}'.format(
+        1000*t_list/len(days), 1000*t_batch/len(days)))
+
+
+if __name__ == "__main__":
+    main()
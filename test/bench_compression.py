@@ -0,0 +1,72 @@
+"""
+Benchmark: producing a compressed SNR file. The old way wrote the text file,
+read it back and gzipped it (level 6, finish_snrfile), or ran gzip on it
+(find_snr_file, nmea2snr). Now the rows go straight into the compressor
+(snr_format.write_rows into a .gz or .zst file, see gnssrefl.compression),
+with one or more threads. The rows are synthetic SNR file rows (see
+bench_snr_format.py). Sizes are in MB.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_compression.py [NROWS] [THREADS]
+
+NROWS defaults to 1000000 and THREADS to the number of CPUs.
+"""
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from gnssrefl import compression
+from gnssrefl import snr_format
+
+from bench_snr_format import snr_rows
+
+
+def main():
+    nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    data = snr_rows(nrows)
+    text = snr_format.format_rows(data, snr_format.SNR_FORMAT)
+    with tempfile.TemporaryDirectory() as tmp:
+        def timed(name, run, output):
+            t0 = time.perf_counter()
+            run()
+            dt = time.perf_counter() - t0
+            assert compression.read_bytes(output) == text
+            print('{0:40s}: {1:6.2f} s  {2:6.1f} MB'.format(name, dt, os.path.getsize(output)/1e6))
+
+        plain = os.path.join(tmp, 'old.snr66')
+
+        def rewrite():
+            snr_format.write_rows(plain, data, snr_format.SNR_FORMAT)
+            with open(plain, 'rb') as f_in:
+                snr = f_in.read()
+            with gzip.open(plain + '.gz', 'wb', compresslevel=6) as f_out:
+                f_out.write(snr)
+            os.remove(plain)
+        print('rows {0:d}, text {1:.1f} MB'.format(nrows, len(text)/1e6))
+        timed('write text, read it back, gzip -6', rewrite, plain + '.gz')
+
+        if shutil.which('gzip'):
+            def gzip_command():
+                snr_format.write_rows(plain, data, snr_format.SNR_FORMAT)
+                subprocess.call(['gzip', '-f', plain])
+            timed('write text, gzip command', gzip_command, plain + '.gz')
+
+        cases = [('gzip', 6, 1), ('gzip', 1, 1), ('gzip', 6, threads)]
+        if compression.zstd_available():
+            cases += [('zstd', 3, 1), ('zstd', 3, threads)]
+        for codec, level, nthreads in cases:
+            output = os.path.join(tmp, 'new.snr66' + compression.SUFFIXES[codec])
+            spec = '{0:s}:{1:d}:{2:d}'.format(codec, level, nthreads)
+            os.environ[compression.ENVIRONMENT] = spec
+            timed('write_rows into {0:s}'.format(spec),
+                  lambda: snr_format.write_rows(output, data, snr_format.SNR_FORMAT), output)
+
+
+if __name__ == "__main__":
+    main()
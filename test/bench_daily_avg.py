@@ -0,0 +1,101 @@
+"""
+Benchmark: daily_avg without plots. The RH files are synthetic (NYEARS years,
+about 60 arcs a day, in the results store). They are processed day by day,
+as readin_plot_daily did before (median filter and averages of each day, one
+formatted line per RH), and with the engine of readin_plot_daily, all days
+at once, which must write the same files.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_daily_avg.py [NYEARS]
+
+NYEARS defaults to 5.
+"""
+import contextlib
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import daily_avg as da
+from gnssrefl import results_store
+
+FMT = '%4.0f %3.0f %6.3f %3.0f %6.3f %6.2f %6.2f %6.2f %6.2f %4.0f  %3.0f  %2.0f %8.5f %6.2f %7.2f %12.6f %2.0f'
+LINE = " {0:4.0f}   {1:3.0f} {2:7.3f} {3:2.0f} {4:2.0f} {5:6.1f} {6:4.0f} {7:4.0f} {8:6.2f} {9:6.2f} {10:6.2f}\n"
+
+
+def write_years(root, nyears, narcs=60):
+    rng = np.random.default_rng(0)
+    for year in range(2015, 2015 + nyears):
+        direc = os.path.join(root, str(year), 'results', 'test')
+        os.makedirs(direc)
+        for doy in range(1, 366):
+            rows = np.zeros((narcs, 17))
+            rows[:, 0] = year
+            rows[:, 1] = doy
+            rows[:, 2] = 5 + rng.normal(0, 0.1, narcs)
+            rows[:, 3] = rng.integers(1, 330, narcs)
+            rows[:, 4] = rng.uniform(0, 23.9, narcs)
+            rows[:, 5] = rng.uniform(1, 359, narcs)
+            rows[:, 6] = rng.uniform(5, 20, narcs)
+            rows[:, 10] = rng.choice([1, 20, 5, 101, 201], narcs)
+            rows[:, 13] = rng.uniform(2.7, 5, narcs)
+            results_store.write_result_file(os.path.join(direc, '{0:03d}.txt'.format(doy)), rows, FMT, 'test')
+    os.makedirs(os.path.join(root, 'Files', 'test'))
+
+
+def day_by_day(root, nyears, howBig, ReqTracks):
+    noqc = []; allrh = []; tv = []
+    for year in range(2015, 2015 + nyears):
+        results = results_store.read_results(os.path.join(root, str(year), 'results', 'test'))
+        for doy in sorted(results):
+            a = results[doy]
+            y = int(a[0, 0]); d = datetime.date(y, 1, 1) + datetime.timedelta(doy - 1)
+            rh = a[:, 2]
+            medv = np.median(rh)
+            cc = (rh < (medv + howBig)) & (rh > (medv - howBig))
+            for r in a:
+                noqc.append(LINE.format(y, doy, r[2], d.month, d.day, r[5], r[10], r[3], r[6], r[13], r[4]))
+            if cc.sum() >= ReqTracks:
+                for r in a[cc]:
+                    allrh.append(LINE.format(y, doy, r[2], d.month, d.day, r[5], r[10], r[3], r[6], r[13], r[4]))
+                    datetime.datetime(y, d.month, d.day, int(np.floor(r[4])), int(60*(r[4] - np.floor(r[4]))))
+                good = rh[cc]
+                tv.append([y, doy, np.mean(good), len(good), d.month, d.day, np.std(good), np.mean(a[cc, 6])])
+    return ''.join(noqc), ''.join(allrh), np.array(tv)
+
+
+def main():
+    nyears = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        write_years(tmp, nyears)
+        alldatafile = os.path.join(tmp, 'Files', 'test', 'test_allRH.txt')
+        results_store._memory.clear()
+        da.read_daily_results('test', '', 2015, 2015 + nyears - 1, 0, 360)
+
+        t0 = time.perf_counter()
+        noqc, allrh, tv_old = day_by_day(tmp, nyears, 0.25, 10)
+        t_old = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            tv, obstimes = da.readin_plot_daily('test', '', 2015, 2015 + nyears - 1, 0, alldatafile, False, 0.25, 10,
+                                                0, 360, False, 'test', False, plots=False)
+        t_new = time.perf_counter() - t0
+
+        with open(alldatafile + '.noqc') as f:
+            assert ''.join(f.readlines()[3:]) == noqc
+        with open(alldatafile) as f:
+            assert ''.join(f.readlines()[2:]) == allrh
+        np.testing.assert_allclose(tv, tv_old, rtol=1e-12)
+        print('{0:d} years, {1:d} RH'.format(nyears, len(noqc.splitlines())))
+        print('day by day (s)        : {0:7.2f}'.format(t_old))
+        print('all days at once (s)  : {0:7.2f}   {1:6.1f}x'.format(t_new, t_old/t_new))
+
+
+if __name__ == "__main__":
+    main()
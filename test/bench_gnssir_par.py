@@ -0,0 +1,64 @@
+"""
+Benchmark: gnssir -par scaling. The three mchl test days are copied to make a
+longer run (NDAYS days), which is analyzed sequentially and with the worker
+pool for -par 2, 4, 8, ... up to the number of cores.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_gnssir_par.py [NDAYS]
+"""
+import contextlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from gnssrefl import gnssir_cl
+
+FIXTURE_DIR = Path(__file__).parent / 'data' / 'refl_code'
+
+
+def make_refl_code(root, ndays):
+    """REFL_CODE tree with ndays of mchl SNR files, starting on 2025 doy 10."""
+    snrdir = root / '2025' / 'snr' / 'mchl'
+    snrdir.mkdir(parents=True)
+    (root / 'input' / 'mchl').mkdir(parents=True)
+    (root / 'Files').mkdir()
+    (root / 'logs').mkdir()
+    days = sorted((FIXTURE_DIR / '2025' / 'snr' / 'mchl').glob('*.snr66.gz'))
+    for i in range(ndays):
+        shutil.copy(days[i % len(days)], snrdir / 'mchl{0:03d}0.25.snr66.gz'.format(10 + i))
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl' / 'mchl.json', root / 'input' / 'mchl')
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl_refr.txt', root / 'input')
+    (root / 'input' / 'gpt_1wA.pickle').touch()
+
+
+def run(ndays, par):
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=10 + ndays - 1, gzip=False, par=par)
+    return time.perf_counter() - t0
+
+
+def main():
+    ndays = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    ncores = multiprocessing.cpu_count()
+    pars = [None] + [p for p in [2, 4, 8, 16, 32, 64] if p <= ncores]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        make_refl_code(Path(tmp), ndays)
+        print('days: {0:d}  cores: {1:d}'.format(ndays, ncores))
+        t1 = None
+        for par in pars:
+            dt = run(ndays, par)
+            t1 = t1 or dt
+            n = par or 1
+            print('  -par {0:>4s}  {1:7.2f} s  {2:6.3f} s/day  speedup {3:5.2f}  efficiency {4:4.0%}'.format(
+                str(par), dt, dt/ndays, t1/dt, t1/dt/n))
+
+
+if __name__ == "__main__":
+    main()
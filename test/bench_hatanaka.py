@@ -0,0 +1,69 @@
+"""
+Benchmark: reading the SNR data of a Hatanaka (Compact RINEX) file, by running
+CRX2RNX, writing the RINEX file and reading it with rinpy.streamrinexfile, and
+by streaming the Compact RINEX file through the python decoder
+(gnssrefl.hatanaka), which only recovers the SNR fields. The RINEX 3 file is
+synthetic (see bench_rinpy.py). The RNX2CRX and CRX2RNX executables are
+needed, give their directory (default: $EXE).
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_hatanaka.py [HOURS] [RATE] [EXEDIR]
+
+HOURS defaults to 24 and RATE (seconds) to 30.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import hatanaka
+from gnssrefl import rinpy
+
+from bench_rinpy import write_rinex3
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    exedir = sys.argv[3] if len(sys.argv) > 3 else os.environ.get('EXE', '.')
+    with tempfile.TemporaryDirectory() as tmp:
+        rnx = os.path.join(tmp, 'TEST00XXX_R_20250210000_01D_30S_MO.rnx')
+        write_rinex3(rnx, hours=hours, rate=rate)
+        subprocess.run([os.path.join(exedir, 'RNX2CRX'), rnx, '-f'], check=True)
+        crx = rnx[:-3] + 'crx'
+        os.remove(rnx)
+
+        t0 = time.perf_counter()
+        work = os.path.join(tmp, 'work.crx')
+        shutil.copy(crx, work)
+        subprocess.run([os.path.join(exedir, 'CRX2RNX'), work, '-f'], check=True)
+        a = rinpy.streamrinexfile(work[:-3] + 'rnx')
+        t_exe = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        b = rinpy.streamrinexfile(crx)
+        t_python = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with open(crx) as f:
+            for line in hatanaka.crx2rnx_lines(f):
+                pass
+        t_all = time.perf_counter() - t0
+
+        for con in a[0]:
+            for obs in a[0][con]:
+                for idx in range(a[0][con][obs].shape[1]):
+                    np.testing.assert_array_equal(a[0][con][obs].column(idx), b[0][con][obs].column(idx))
+        print('hours {0:.1f}, {1:d} s data, Compact RINEX file {2:.1f} MB'.format(hours, rate, os.path.getsize(crx)/1e6))
+        print('CRX2RNX, RINEX file, streamrinexfile (s) : {0:6.2f}'.format(t_exe))
+        print('streamrinexfile of the crx file (s)      : {0:6.2f}'.format(t_python))
+        print('python decoder, all observables (s)      : {0:6.2f}'.format(t_all))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: periodograms of one day of arcs with lsp_method 'fast' (astropy),
+'scipy', 'batch' and 'grid' (lsp_batch) and the coarse to fine peak search
+(refine), in ms per arc, and how well they agree.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_lsp_batch.py
+"""
+import os
+import time
+
+import numpy as np
+
+import gnssrefl.gps as g
+from gnssrefl import lsp_batch
+from gnssrefl.extract_arcs import extract_arcs_from_file
+
+SNRFILE = os.path.join(os.path.dirname(__file__), 'data', 'refl_code', '2025', 'snr', 'mchl',
+                       'mchl0110.25.snr66.gz')
+FREQS = [1, 20, 5, 101, 102, 201, 205, 207, 208, 302, 306]
+MAXH = 8; PREC = 0.005
+
+
+def run(arclist, minH):
+    results = {}
+    print('minH {0:.1f} m, maxH {1:.1f} m'.format(minH, MAXH))
+    for method in ['scipy', 'fast']:
+        t0 = time.perf_counter()
+        results[method] = [g.strip_compute(x, y, cf, MAXH, PREC, minH, method) for x, y, cf in arclist]
+        dt = time.perf_counter() - t0
+        print('  {0:6s} {1:7.2f} ms/arc'.format(method, 1000*dt/len(arclist)))
+
+    for method in ['batch', 'grid']:
+        t0 = time.perf_counter()
+        results[method] = lsp_batch.strip_compute_batch(arclist, MAXH, PREC, minH, method)
+        dt = time.perf_counter() - t0
+        print('  {0:6s} {1:7.2f} ms/arc'.format(method, 1000*dt/len(arclist)))
+
+    t0 = time.perf_counter()
+    results['refine'] = lsp_batch.strip_compute_batch(arclist, MAXH, PREC, minH, 'grid', refine=True)
+    dt = time.perf_counter() - t0
+    print('  {0:6s} {1:7.2f} ms/arc, median coarse points {2:.0f} (grid {3:.0f})'.format(
+        'refine', 1000*dt/len(arclist), np.median([len(r[5]) for r in results['refine']]),
+        np.median([len(r[5]) for r in results['grid']])))
+
+    # scipy is the fixed mean periodogram, so it differs from the others
+    for m1, m2 in [('batch', 'fast'), ('grid', 'fast'), ('refine', 'grid'), ('fast', 'scipy')]:
+        dRH = np.array([abs(b[0] - r[0]) for b, r in zip(results[m1], results[m2])])
+        dA = np.array([abs(b[1] - r[1])/r[1] for b, r in zip(results[m1], results[m2]) if r[1] > 0])
+        print('  {0:5s} vs {1:5s}: max |dRH| {2:.4f} m, different peaks {3:d}, max rel. amplitude diff {4:.1e}'.format(
+            m1, m2, dRH.max(), int(np.sum(dRH > 0)), dA.max()))
+
+
+def main():
+    arcs = extract_arcs_from_file(SNRFILE, freq=FREQS, buffer_hours=0, e1=5, e2=25)
+    arclist = [(d['ele'], d['snr'], m['cf']) for m, d in arcs]
+    npts = [len(d['ele']) for m, d in arcs]
+    print('arcs: {0:d}  median points per arc: {1:.0f}'.format(len(arcs), np.median(npts)))
+    for minH in [0.5, 2.0]:
+        run(arclist, minH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark: gnssir -incremental. NDAYS days (copies of the three mchl test
+days) are analyzed, then again with -incremental T when nothing changed, when
+the SNR file of one day changed and when a json setting changed.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_manifest.py [NDAYS]
+"""
+import contextlib
+import gzip
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from gnssrefl import gnssir_cl
+
+from bench_gnssir_par import make_refl_code
+
+
+def run(ndays, **kwargs):
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=10 + ndays - 1, gzip=True, **kwargs)
+    return time.perf_counter() - t0
+
+
+def main():
+    ndays = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        make_refl_code(Path(tmp), ndays)
+        print('days: {0:d}'.format(ndays))
+        print('  all days                      {0:7.2f} s'.format(run(ndays)))
+        print('  -incremental T, no change     {0:7.2f} s'.format(run(ndays, incremental=True)))
+        snrfile = Path(tmp) / '2025' / 'snr' / 'mchl' / 'mchl0200.25.snr66.gz'
+        with gzip.open(snrfile, 'rt') as f:
+            lines = f.readlines()
+        with gzip.open(snrfile, 'wt') as f:
+            f.writelines(lines[:-1000])
+        print('  -incremental T, one SNR file  {0:7.2f} s'.format(run(ndays, incremental=True)))
+        print('  -incremental T, e2 changed    {0:7.2f} s'.format(run(ndays, incremental=True, e2=20)))
+
+
+if __name__ == "__main__":
+    main()
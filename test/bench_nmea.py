@@ -0,0 +1,108 @@
+"""
+Benchmark: reading the satellites in view of a NMEA file with
+nmea2snr.read_nmea (line by line) and nmea_reader.read_nmea_arrays (numpy,
+in blocks), plain and gzipped. The file is synthetic: a 1-Hz multi-GNSS
+receiver giving RMC, GGA and GSV sentences with signal IDs (NMEA 4.11) for
+GPS, Glonass, Galileo and Beidou, about 50 satellite signals per second.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_nmea.py [HOURS]
+
+HOURS defaults to 6.
+"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import nmea2snr
+from gnssrefl import nmea_reader
+
+# talker, number of satellites, signal IDs (one GSV group per signal)
+TALKERS = (('GP', 11, ('1', '6')), ('GL', 7, ('1', '3')), ('GA', 9, ('7', '2')), ('GB', 10, ('1', 'B')))
+
+
+def sentence(body):
+    checksum = 0
+    for c in body.encode('ascii'):
+        checksum ^= c
+    return '${0:s}*{1:02X}\r\n'.format(body, checksum)
+
+
+def write_nmea(filename, hours=6, rate=1, seed=0):
+    """
+    Writes a synthetic NMEA file: satellites rise and set (integer degrees, as
+    NMEA gives them), some SNR fields are empty.
+    """
+    rng = np.random.default_rng(seed)
+    sats = []
+    for talker, nsat, signals in TALKERS:
+        for i in range(nsat):
+            sats.append((talker, i + 1, rng.uniform(0, 2*np.pi), rng.uniform(0, 360), rng.uniform(-0.5, 0.5)))
+    with open(filename, 'w', newline='') as f:
+        for sec in range(0, int(hours*3600), rate):
+            hms = '{0:02d}{1:02d}{2:02d}.00'.format(sec // 3600, (sec // 60) % 60, sec % 60)
+            out = [sentence('GPRMC,{0:s},A,4000.0000,N,10500.0000,W,0.0,0.0,210125,,,A'.format(hms)),
+                   sentence('GPGGA,{0:s},4000.0000,N,10500.0000,W,1,12,1.0,1600.0,M,-20.0,M,,'.format(hms))]
+            for talker, nsat, signals in TALKERS:
+                view = []
+                for t, prn, phase, az0, drift in sats:
+                    if t != talker:
+                        continue
+                    elev = 70*np.sin(2*np.pi*sec/43080 + phase)
+                    if elev < 0:
+                        continue
+                    az = (az0 + drift*sec/60) % 360
+                    view.append((prn, int(elev), int(az), 30 + int(elev/4)))
+                for sig in signals:
+                    for m in range(0, len(view), 4):
+                        fields = [talker + 'GSV', str((len(view) + 3)//4), str(m//4 + 1), '{0:02d}'.format(len(view))]
+                        for prn, elev, az, snr in view[m:m+4]:
+                            csnr = '' if (prn + sec) % 97 == 0 else '{0:02d}'.format(snr)
+                            fields += ['{0:02d}'.format(prn), '{0:02d}'.format(elev), '{0:03d}'.format(az), csnr]
+                        fields.append(sig)
+                        out.append(sentence(','.join(fields)))
+            f.write(''.join(out))
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 6
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, 'test0210.25.A')
+        write_nmea(fname, hours)
+        with open(fname, 'rb') as f_in, gzip.open(fname + '.gz', 'wb', compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+
+        t0 = time.perf_counter()
+        old = nmea2snr.read_nmea(fname)
+        t_old = time.perf_counter() - t0
+        # and to arrays, as nmea_translate did: strings, empty ones removed, then numbers
+        t0 = time.perf_counter()
+        t, prn, az, elv, snr, freq = [np.array(x) for x in old]
+        keep = (az != '') & (elv != '') & (snr != '') & (freq != '')
+        t, prn, az, elv, snr = t[keep], prn[keep].astype(int), az[keep].astype(float), elv[keep].astype(float), \
+            snr[keep].astype(float)
+        t_arrays = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        new = nmea_reader.read_nmea_arrays(fname)
+        t_new = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        nmea_reader.read_nmea_arrays(fname + '.gz')
+        t_gz = time.perf_counter() - t0
+
+        assert len(old[0]) == len(new[0])
+        np.testing.assert_array_equal(np.array(old[1], dtype=int), new[1])
+        print('hours {0:.1f}, {1:.1f} MB, {2:d} satellite signals'.format(hours, os.path.getsize(fname)/1e6, len(new[0])))
+        print('read_nmea (s)                 : {0:6.2f}'.format(t_old))
+        print('read_nmea, then arrays (s)    : {0:6.2f}'.format(t_old + t_arrays))
+        print('read_nmea_arrays (s)          : {0:6.2f}   {1:5.1f}x'.format(t_new, (t_old + t_arrays)/t_new))
+        print('read_nmea_arrays, gzipped (s) : {0:6.2f}'.format(t_gz))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: interpolating the integer degree elevation angles and azimuths
+of NMEA observations, one satellite at a time with
+nmea2snr.fix_angle_azimuth (as nmea2snr did) and for all satellites at once
+with nmea2snr.fix_angle_azimuth_all. The observations are those of the
+synthetic NMEA file of bench_nmea.py.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_nmea_angles.py [HOURS]
+
+HOURS defaults to 6.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import nmea2snr
+from gnssrefl import nmea_reader
+
+from bench_nmea import write_nmea
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 6
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, 'test0210.25.A')
+        write_nmea(fname, hours)
+        t, prn, az, elv, snr, freq = nmea_reader.read_nmea_arrays(fname)
+    keep = ~np.isnan(az) & ~np.isnan(elv) & ~np.isnan(snr) & (freq >= 0)
+    t, prn, az, elv = t[keep], prn[keep], az[keep], elv[keep]
+
+    t0 = time.perf_counter()
+    T = []; ELV = []; AZ = []
+    for i_prn in np.unique(prn):
+        angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth(t[prn == i_prn], elv[prn == i_prn], az[prn == i_prn])
+        if (len(angle_fixed) == 0 and len(azim_fixed) == 0):
+            continue
+        T.extend(t[prn == i_prn]); ELV.extend(angle_fixed); AZ.extend(azim_fixed)
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index, angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth_all(prn, t, elv, az)
+    t_new = time.perf_counter() - t0
+
+    np.testing.assert_array_equal(t[index], T)
+    np.testing.assert_array_equal(angle_fixed, ELV)
+    np.testing.assert_array_equal(azim_fixed, AZ)
+    print('hours {0:.1f}, {1:d} observations, {2:d} satellites'.format(hours, len(t), len(np.unique(prn))))
+    print('fix_angle_azimuth, by satellite (s) : {0:6.2f}'.format(t_old))
+    print('fix_angle_azimuth_all (s)           : {0:6.2f}   {1:5.1f}x'.format(t_new, t_old/t_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: converting many stations for the same day with one SP3 file, with
+and without the orbit cache (orbit_cache.py). Every station is the same
+synthetic 30 second RINEX 3 file; the SP3 file has 5 minute orbits for
+GPS, Glonass, Galileo and Beidou.
+
+  cold : the cache is cleared before every station (parse and spline each time,
+         which is what rinex2snr did before)
+  first: the first station with an empty cache (parses and writes the cache)
+  disk : the cache is on disk but not in memory (e.g. a new worker process)
+  warm : the cache is in memory
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_orbit_cache.py [NSTATIONS]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from gnssrefl import orbit_cache
+from gnssrefl import rinex2snr
+
+from bench_rinpy import write_rinex3
+from test_orbit_cache import write_sp3
+
+
+def convert(rnx, sp3file, snrfile):
+    t0 = time.perf_counter()
+    rinex2snr.rnx2snr_v3(rnx, sp3file, snrfile, 66, 2025, 1, 21, 0, io.StringIO())
+    return time.perf_counter() - t0
+
+
+def main():
+    nstations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        rnx = os.path.join(tmp, 'test0210.25o')
+        write_rinex3(rnx, hours=24, rate=30)
+        sp3file = os.path.join(tmp, 'GBM0MGXRAP_20250210000_01D_05M_ORB.sp3')
+        write_sp3(sp3file, nsat=30, interval=300)
+        snrfile = os.path.join(tmp, 'test0210.25.snr66')
+        cachedir = orbit_cache.cache_dir()
+
+        cold = []
+        for i in range(nstations):
+            shutil.rmtree(cachedir, ignore_errors=True)
+            orbit_cache._memory.clear()
+            cold.append(convert(rnx, sp3file, snrfile))
+        shutil.rmtree(cachedir, ignore_errors=True)
+        orbit_cache._memory.clear()
+        first = convert(rnx, sp3file, snrfile)
+        disk = []; warm = []
+        for i in range(nstations):
+            orbit_cache._memory.clear()
+            disk.append(convert(rnx, sp3file, snrfile))
+            warm.append(convert(rnx, sp3file, snrfile))
+
+        print('stations: {0:d}, orbit file {1:.1f} MB'.format(nstations, os.path.getsize(sp3file)/1e6))
+        print('cold  (s/station) : {0:.3f}'.format(sum(cold)/nstations))
+        print('first (s)         : {0:.3f}'.format(first))
+        print('disk  (s/station) : {0:.3f}'.format(sum(disk)/nstations))
+        print('warm  (s/station) : {0:.3f}'.format(sum(warm)/nstations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: gnssir -reqc. NDAYS days (copies of the three mchl test days) are
+analyzed, then the QC settings are changed and applied to the stored
+periodogram peaks (-reqc T), and the same QC settings are run from the SNR
+files for comparison.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_reqc.py [NDAYS]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from gnssrefl import gnssir_cl
+
+from bench_gnssir_par import make_refl_code
+
+
+def run(ndays, **kwargs):
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=10 + ndays - 1, gzip=False, **kwargs)
+    return time.perf_counter() - t0
+
+
+def results(root):
+    return {str(f.relative_to(root)): f.read_text() for f in (root / '2025' / 'results' / 'mchl').glob('**/0*.txt')}
+
+
+def main():
+    ndays = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        root = Path(tmp)
+        make_refl_code(root, ndays)
+        print('days: {0:d}'.format(ndays))
+        print('  gnssir                          {0:7.2f} s'.format(run(ndays)))
+        sweep = [dict(PkNoise=p, ampl=a) for p in [3.0, 3.5] for a in [6, 8]]
+        t_reqc = 0
+        for qc in sweep:
+            t_reqc += run(ndays, reqc=True, **qc)
+        reqc = results(root)
+        print('  -reqc T, {0:d} QC settings          {1:7.2f} s   {2:6.3f} s/day'.format(len(sweep), t_reqc, t_reqc/ndays/len(sweep)))
+        t_full = run(ndays, **sweep[-1])
+        print('  gnssir with the last QC setting {0:7.2f} s'.format(t_full))
+        assert results(root) == reqc
+
+
+if __name__ == "__main__":
+    main()
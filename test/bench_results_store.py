@@ -0,0 +1,82 @@
+"""
+Benchmark: reading the daily result files of a long time series, as
+daily_avg and subdaily do. The files are synthetic (NYEARS years of
+ddd.txt files, about 100 arcs a day, written by results_store.write_result_file
+as retrieve_rh does). They are read with np.loadtxt one by one and with
+results_store.read_results, one year at a time, from the store files and,
+after the stores were removed, from the text files while the stores are made
+again.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_results_store.py [NYEARS]
+
+NYEARS defaults to 3.
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from gnssrefl import results_store
+
+FMT = '%4.0f %3.0f %6.3f %3.0f %6.3f %6.2f %6.2f %6.2f %6.2f %4.0f  %3.0f  %2.0f %8.5f %6.2f %7.2f %12.6f %2.0f'
+HEADER = 'station test\n(1) (2)\nyear, doy\nm\nlines'
+
+
+def write_years(root, nyears, narcs=100):
+    rng = np.random.default_rng(0)
+    dirs = []
+    for year in range(2015, 2015 + nyears):
+        direc = os.path.join(root, str(year), 'results', 'test')
+        os.makedirs(direc)
+        for doy in range(1, 366):
+            rows = rng.uniform(0, 360, size=(narcs, 17))
+            rows[:, 0] = year
+            rows[:, 1] = doy
+            results_store.write_result_file(os.path.join(direc, '{0:03d}.txt'.format(doy)), rows, FMT, HEADER)
+        dirs.append(direc)
+    return dirs
+
+
+def main():
+    nyears = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = write_years(tmp, nyears)
+
+        t0 = time.perf_counter()
+        old = []
+        for direc in dirs:
+            for f in sorted(os.listdir(direc)):
+                if len(f) == 7 and f.endswith('txt'):
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        old.append(np.loadtxt(os.path.join(direc, f), skiprows=3, comments='%'))
+        t_old = time.perf_counter() - t0
+
+        results_store._memory.clear()
+        t0 = time.perf_counter()
+        new = [a for direc in dirs for doy, a in sorted(results_store.read_results(direc).items())]
+        t_new = time.perf_counter() - t0
+
+        for direc in dirs:
+            os.remove(results_store.store_name(direc))
+        results_store._memory.clear()
+        t0 = time.perf_counter()
+        [results_store.read_results(direc) for direc in dirs]
+        t_make = time.perf_counter() - t0
+
+        assert len(old) == len(new)
+        for a, b in zip(old, new):
+            np.testing.assert_array_equal(a, b)
+        print('{0:d} years, {1:d} daily files'.format(nyears, len(old)))
+        print('np.loadtxt of each file (s)           : {0:7.2f}'.format(t_old))
+        print('read_results, from the stores (s)     : {0:7.2f}   {1:6.1f}x'.format(t_new, t_old/t_new))
+        print('read_results, making the stores (s)   : {0:7.2f}'.format(t_make))
+
+
+if __name__ == "__main__":
+    main()
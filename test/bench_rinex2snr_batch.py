@@ -0,0 +1,99 @@
+"""
+Benchmark: SNR files of a network of stations for the same day, one station at
+a time (write_snr_from_sp3, what rinex2snr does per file) and all together
+(write_snr_batch_from_sp3, rinex2snr -input_folder -batch T), where the
+satellite positions are computed once for all of the stations. The stations
+are synthetic RINEX 3 files (GPS, Glonass, Galileo, Beidou) spread over a few
+hundred km, read once before timing, so only the SNR file computation is
+compared, with and without writing the text files. The SP3 file has 5 minute
+orbits.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_rinex2snr_batch.py [NSTATIONS] [RATE]
+
+NSTATIONS defaults to 20 and RATE (seconds) to 15.
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import gnssrefl.gps as g
+from gnssrefl import orbit_cache
+from gnssrefl import rinex2snr
+from gnssrefl.snrfile_functions import elev_limits
+
+from bench_rinpy import write_rinex3
+from test_orbit_cache import write_sp3
+
+RECV = np.array([-2430697.0, -4704189.0, 3544329.0])
+write_sp3_snrfile = rinex2snr.write_sp3_snrfile
+
+
+def main():
+    nstations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        rnx = os.path.join(tmp, 'test0210.25o')
+        write_rinex3(rnx, hours=24, rate=rate)
+        sp3file = os.path.join(tmp, 'GBM0MGXRAP_20250210000_01D_05M_ORB.sp3')
+        write_sp3(sp3file, nsat=30, interval=300)
+        splines = orbit_cache.sp3_splines(sp3file)
+        sp3 = g.read_sp3file(sp3file)
+        emin, emax = elev_limits(66)
+
+        obsdata, systemsatlists, prntoidx, obstypes, header, obstimes, gpstime = rinex2snr.rinpy.streamrinexfile(rnx)
+        obsdata, obstypes = rinex2snr.rinpy.collapse_rinex3_obs(obsdata, obstypes)
+        rng = np.random.default_rng(0)
+        jobs = []
+        for i in range(nstations):
+            recv = RECV + rng.uniform(-3e5, 3e5, 3)
+            lat, lon, h = g.xyz2llh(recv, 1e-8)
+            up, East, North = g.up(lat, lon)
+            jobs.append({'gpstime': gpstime, 'systemsatlists': systemsatlists, 'obsdata': obsdata,
+                         'obstypes': obstypes, 'prntoidx': prntoidx, 'recv': recv, 'up': up, 'East': East,
+                         'North': North, 'snrfile': os.path.join(tmp, 'st{0:02d}.batch'.format(i)), 'log': io.StringIO()})
+
+        def single():
+            for i, job in enumerate(jobs):
+                rinex2snr.write_snr_from_sp3(gpstime, sp3, systemsatlists, obsdata, obstypes, prntoidx, 2025, 1, 21,
+                                             emin, emax, os.path.join(tmp, 'st{0:02d}.single'.format(i)), job['up'],
+                                             job['East'], job['North'], job['recv'], 0, io.StringIO(), splines=splines)
+
+        def batch():
+            rinex2snr.write_snr_batch_from_sp3(jobs, splines, 2025, 1, 21, emin, emax, 0)
+
+        timings = {}
+        for writing in [True, False]:
+            if not writing:
+                rinex2snr.write_sp3_snrfile = lambda out_blocks, outputfile, log: np.vstack(out_blocks)
+            for name, run in [('single', single), ('batch', batch)]:
+                t0 = time.perf_counter()
+                run()
+                timings[name, writing] = time.perf_counter() - t0
+        rinex2snr.write_sp3_snrfile = write_sp3_snrfile
+
+        worst = 0
+        for i in range(nstations):
+            a = np.loadtxt(os.path.join(tmp, 'st{0:02d}.single'.format(i)))
+            b = np.loadtxt(os.path.join(tmp, 'st{0:02d}.batch'.format(i)))
+            assert a.shape == b.shape
+            worst = max(worst, np.abs(a - b).max())
+        print('stations {0:d}, {1:d} s data, {2:d} epochs'.format(nstations, rate, len(gpstime)))
+        for writing in [True, False]:
+            t_single = timings['single', writing]
+            t_batch = timings['batch', writing]
+            print('with writing the files' if writing else 'without writing the files')
+            print('  one station at a time (s) : {0:6.2f}  ({1:.3f} s per station)'.format(t_single, t_single/nstations))
+            print('  batch (s)                 : {0:6.2f}  ({1:.3f} s per station)'.format(t_batch, t_batch/nstations))
+            print('  speedup                   : {0:6.1f}x'.format(t_single/t_batch))
+        print('largest difference in the SNR files: {0:.4f}'.format(worst))
+
+
+if __name__ == "__main__":
+    main()
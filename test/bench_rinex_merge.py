@@ -0,0 +1,105 @@
+"""
+Benchmark: the SNR data of a day of high-rate RINEX 3 files of 15 minutes.
+The old way merged the files into one RINEX file (gfzrnx, with decimation)
+and read that back with rinpy.streamrinexfile; now rinpy.streamrinexfiles
+(rinpy.RinexMerge) reads the files one after the other into the same buffers.
+Without gfzrnx the merge is timed as a plain concatenation into one file, which
+is faster than gfzrnx. The data are the synthetic 1 Hz files of bench_rinpy.py.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_rinex_merge.py [HOURS] [DEC_RATE]
+
+HOURS defaults to 2 (8 files) and DEC_RATE to 15 seconds.
+"""
+import gzip
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import rinpy
+
+from bench_rinpy import write_rinex3
+
+
+def split_15m(filename, directory):
+    """Writes the 15 minute files of a RINEX 3 file, half of them gzipped. Returns their names."""
+    with open(filename) as f:
+        lines = f.readlines()
+    end = next(i for i, line in enumerate(lines) if 'END OF HEADER' in line) + 1
+    starts = [i for i in range(end, len(lines))
+              if lines[i][0] == '>' and int(lines[i][16:18]) % 15 == 0 and float(lines[i][19:30]) == 0]
+    starts.append(len(lines))
+    names = []
+    for k, (first, last) in enumerate(zip(starts[:-1], starts[1:])):
+        name = os.path.join(directory, 'TEST00XXX_R_2025021{0:02d}{1:02d}_15M_01S_MO.rnx'.format(k // 4, 15*(k % 4)))
+        text = ''.join(lines[:end] + lines[first:last])
+        if k % 2:
+            name += '.gz'
+            with gzip.open(name, 'wt', compresslevel=1) as f:
+                f.write(text)
+        else:
+            with open(name, 'w') as f:
+                f.write(text)
+        names.append(name)
+    return names
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    dec_rate = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    gfzrnx = os.path.join(os.environ.get('EXE', ''), 'gfzrnx')
+    with tempfile.TemporaryDirectory() as tmp:
+        day = os.path.join(tmp, 'day.rnx')
+        write_rinex3(day, hours)
+        files = split_15m(day, tmp)
+        os.remove(day)
+        merged = os.path.join(tmp, 'TEST00XXX_R_20250210000_01D_01S_MO.rnx')
+
+        t0 = time.perf_counter()
+        if os.path.isfile(gfzrnx):
+            plain = []
+            for name in files:
+                if name.endswith('.gz'):
+                    subprocess.call(['gunzip', '-k', name])
+                plain.append(name[:-3] if name.endswith('.gz') else name)
+            subprocess.call([gfzrnx, '-finp'] + plain + ['-fout', merged, '-vo', '3', '-smp', str(dec_rate), '-f', '-q'])
+            how = 'gfzrnx'
+        else:
+            with open(merged, 'w') as out:
+                for k, name in enumerate(files):
+                    with (gzip.open(name, 'rt') if name.endswith('.gz') else open(name)) as f:
+                        if k > 0:
+                            for line in f:       # the header of the first file only
+                                if 'END OF HEADER' in line:
+                                    break
+                        out.writelines(f)
+            how = 'concatenation'
+        t_merge = time.perf_counter() - t0
+        size = os.path.getsize(merged)
+        t0 = time.perf_counter()
+        old = rinpy.streamrinexfile(merged, dec_rate=dec_rate)
+        t_read = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        new = rinpy.streamrinexfiles(files, dec_rate=dec_rate)
+        t_new = time.perf_counter() - t0
+
+        assert old[1] == new[1] and old[3] == new[3] and old[5] == new[5]
+        for con in old[0]:
+            for obs in old[0][con]:
+                for i in range(len(old[1][con])):
+                    np.testing.assert_array_equal(old[0][con][obs][:, i], new[0][con][obs][:, i])
+        print('{0:d} files, {1:d} epochs kept (dec_rate {2:d})'.format(len(files), len(new[5]), dec_rate))
+        print('merge ({0:s}, {1:.0f} MB) (s)   : {2:6.2f}'.format(how, size/1e6, t_merge))
+        print('then streamrinexfile (s)         : {0:6.2f}'.format(t_read))
+        print('streamrinexfiles of the files (s): {0:6.2f}   {1:5.1f}x'.format(
+            t_new, (t_merge + t_read)/t_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark: reading a RINEX 3 observation file with rinpy, all observables and
+only the SNR observables (what rinex2snr asks for), compared with the line by
+line struct parser rinpy used before. The file is synthetic: 1 Hz, GPS,
+Glonass, Galileo and Beidou, 8-16 observables per constellation.
+The streaming reader (streamrinexfile, used by rinex2snr) is also timed with
+the 1 Hz data decimated to 15 seconds while reading (dec_rate). The peak memory
+(RSS) of processrinexfile and of streamrinexfile is measured in separate processes.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_rinpy.py [HOURS]
+
+HOURS defaults to 24 (about 3 million data lines; the old parser needs a few
+GB of memory for that, use fewer hours on a small machine).
+"""
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import rinpy
+
+OBSTYPES = {'G': 'C1C L1C D1C S1C C2W L2W D2W S2W C5Q L5Q D5Q S5Q',
+            'R': 'C1C L1C D1C S1C C2P L2P D2P S2P',
+            'E': 'C1C L1C D1C S1C C5Q L5Q D5Q S5Q C7Q L7Q D7Q S7Q C8Q L8Q D8Q S8Q',
+            'C': 'C2I L2I D2I S2I C7I L7I D7I S7I C6I L6I D6I S6I'}
+NSATS = {'G': 10, 'R': 7, 'E': 9, 'C': 10}
+
+
+def write_rinex3(filename, hours=24, rate=1, seed=0):
+    """Synthetic RINEX 3 observation file. Returns the number of data lines."""
+    rng = np.random.default_rng(seed)
+    lines = ['{0:<60s}RINEX VERSION / TYPE\n'.format('     3.04           OBSERVATION DATA    M'),
+             '{0:<60s}APPROX POSITION XYZ\n'.format('  -2430697.0000 -4704189.0000  3544329.0000')]
+    for con, obs in OBSTYPES.items():
+        obs = obs.split()
+        for i in range(0, len(obs), 13):
+            head = '{0:1s}  {1:3d}'.format(con, len(obs)) if i == 0 else '      '
+            lines.append('{0:<60s}SYS / # / OBS TYPES\n'.format(head + ''.join(' ' + o for o in obs[i:i+13])))
+    lines.append('{0:<60s}END OF HEADER\n'.format(''))
+    nlines = 0
+    with open(filename, 'w') as f:
+        f.write(''.join(lines))
+        for sec in range(0, int(hours*3600), rate):
+            sats = [con + '{0:02d}'.format(prn) for con in NSATS for prn in range(1, NSATS[con] + 1)
+                    if (prn + sec//1800) % 3]
+            out = ['> 2025 01 21 {0:02d} {1:02d}{2:11.7f}  0{3:3d}\n'.format(sec//3600, (sec//60) % 60, sec % 60, len(sats))]
+            for sat in sats:
+                nobs = len(OBSTYPES[sat[0]].split())
+                vals = rng.uniform(20, 55, nobs)
+                fields = ['{0:14.3f}  '.format(v) for v in vals]
+                if sec % 7 == 0:
+                    fields[1] = ' '*16        # a missing phase
+                out.append((sat + ''.join(fields)).rstrip() + '\n')
+            f.write(''.join(out))
+            nlines += len(sats)
+    return nlines
+
+
+def reference_readblocks_v3(lines, header, headerlines, epochsatlists, satset):
+    """The struct based _readblocks_v3 rinpy used before (all observables)."""
+    nepochs = len(headerlines)
+    obstypes = {}
+    for line in header['SYS / # / OBS TYPES'].splitlines():
+        if line[0] != ' ':
+            letter = line[0]
+            obstypes[letter] = line[6:].split()
+        else:
+            obstypes[letter].extend(line[6:].split())
+    satlists = {letter: [] for letter in obstypes}
+    for sat in satset:
+        satlists[sat[0]].append(int(sat[1:]))
+    observationdata = {}; prntoidx = {}; parser = {}
+    for letter in obstypes:
+        satlists[letter].sort()
+        nobstypes = len(obstypes[letter])
+        observationdata[letter] = np.nan * np.zeros((nepochs, len(satlists[letter]), nobstypes))
+        prntoidx[letter] = {prn: idx for idx, prn in enumerate(satlists[letter])}
+        parser[letter] = struct.Struct('3x' + '14s 2x ' * (nobstypes-1) + '14s')
+    for iepoch, (headerstart, satlist) in enumerate(zip(headerlines, epochsatlists)):
+        for i, sat in enumerate(satlist):
+            raw = lines[headerstart+1+i].rstrip('\n').ljust(parser[sat[0]].size).encode('ascii')
+            observationdata[sat[0]][iepoch, prntoidx[sat[0]][int(sat[1:])], :] = \
+                np.array([rinpy._converttofloat(n.decode('ascii')) for n in parser[sat[0]].unpack_from(raw)])
+    return observationdata, obstypes
+
+
+def peak_rss(code):
+    """Peak RSS (MB) and run time of a python process running code (Linux only)."""
+    # VmHWM rather than ru_maxrss, which keeps the peak of the parent across fork and exec
+    script = ('import re, time\nfrom gnssrefl import rinpy\nt0 = time.perf_counter()\n' + code +
+              '\nhwm = re.search(r"VmHWM:\\s+(\\d+)", open("/proc/self/status").read()).group(1)'
+              '\nprint(int(hwm)/1024, time.perf_counter() - t0)')
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    mb, seconds = out.stdout.split()[-2:]
+    return float(mb), float(seconds)
+
+
+def main():
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    with tempfile.TemporaryDirectory() as tmp:
+        rnx = os.path.join(tmp, 'test0210.25o')
+        t0 = time.perf_counter()
+        nlines = write_rinex3(rnx, hours)
+        print('hours {0:.1f}, data lines {1:d}, file {2:.0f} MB (written in {3:.1f} s)'.format(
+            hours, nlines, os.path.getsize(rnx)/1e6, time.perf_counter() - t0))
+
+        with open(rnx) as f:
+            lines = f.read().splitlines(True)
+        t0 = time.perf_counter()
+        head = rinpy._readheader(lines, '3.04')
+        t_header = time.perf_counter() - t0
+        header, headerlines, _, _, epochsatlists, satset, _ = head
+
+        t0 = time.perf_counter()
+        ref, ref_obstypes = reference_readblocks_v3(lines, header, headerlines, epochsatlists, satset)
+        t_ref = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        full = rinpy._readblocks_v3(lines, header, headerlines, epochsatlists, satset)
+        t_all = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        snr = rinpy._readblocks_v3(lines, header, headerlines, epochsatlists, satset, keep_obs='S')
+        t_snr = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        rinpy.streamrinexfile(rnx)
+        t_stream = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        rinpy.streamrinexfile(rnx, dec_rate=15)
+        t_dec = time.perf_counter() - t0
+
+        for con in ref:
+            assert full[3][con] == ref_obstypes[con]
+            np.testing.assert_array_equal(full[0][con], ref[con])
+            keep = [i for i, o in enumerate(ref_obstypes[con]) if o[0] == 'S']
+            np.testing.assert_array_equal(snr[0][con], ref[con][:, :, keep])
+        mb_ref = sum(a.nbytes for a in ref.values())/1e6
+        mb_snr = sum(a.nbytes for a in snr[0].values())/1e6
+        print('epoch headers (s)               : {0:.2f}'.format(t_header))
+        print('struct parser, all obs (s)      : {0:.2f}  arrays {1:.0f} MB'.format(t_ref, mb_ref))
+        print('bulk parser, all obs (s)        : {0:.2f}'.format(t_all))
+        print('bulk parser, S obs only (s)     : {0:.2f}  arrays {1:.0f} MB'.format(t_snr, mb_snr))
+        print('speedup (S only vs struct)      : {0:.0f}x'.format(t_ref/t_snr))
+        print('streamrinexfile, S obs (s)      : {0:.2f}'.format(t_stream))
+        print('streamrinexfile, dec_rate 15 (s): {0:.2f}'.format(t_dec))
+        del lines, ref, full, snr
+
+        base, _ = peak_rss('')
+        print('peak RSS after importing gnssrefl : {0:6.0f} MB'.format(base))
+        for name, code in [('processrinexfile, S obs', 'rinpy.separateobservables(*rinpy.processrinexfile({0!r}, keep_obs="S")[0:4:3])'),
+                           ('streamrinexfile, S obs', 'rinpy.streamrinexfile({0!r})')]:
+            mb, seconds = peak_rss(code.format(rnx))
+            print('peak RSS {0:25s}: {1:6.0f} MB  (+{2:.0f} MB, {3:.2f} s)'.format(name, mb, mb - base, seconds))
+
+
+if __name__ == "__main__":
+    main()
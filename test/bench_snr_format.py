@@ -0,0 +1,81 @@
+"""
+Benchmark: writing SNR files with the fixed-width writer (snr_format.write_rows)
+and with the writers it replaces: fmt % tuple(row) per row (rinex2snr with sp3
+orbits, nmea2snr), one join of the formatted rows (rinex2snr with nav orbits)
+and np.savetxt (smoosh_snr). The rows are synthetic SNR file rows; the files
+must be the same, byte for byte. Writing straight into a gzip file is timed too.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_snr_format.py [NROWS]
+
+NROWS defaults to 1000000 (about a 1-Hz multi-GNSS day above 5 degrees).
+"""
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import snr_format
+
+SMOOSH_FORMAT = "%3.0f %9.4f %9.4f %9.1f %11.6f %6.2f %6.2f %6.2f %6.2f %6.2f %6.2f"
+
+
+def snr_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.integers(1, 400, n), rng.uniform(5, 30, n), rng.uniform(0, 360, n),
+                            np.sort(rng.integers(0, 86400, n)), rng.normal(0, 0.005, n), np.zeros(n),
+                            np.round(rng.uniform(20, 55, n)*4)/4, np.round(rng.uniform(20, 55, n)*4)/4,
+                            np.zeros(n), np.round(rng.uniform(20, 55, n)*4)/4, np.zeros(n)]).astype(float)
+
+
+def main():
+    nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    data = snr_rows(nrows)
+    nav = data[:, [0, 1, 2, 3, 5, 5, 6, 7, 9]]
+    with tempfile.TemporaryDirectory() as tmp:
+        def per_row():
+            rows = data.tolist()
+            with open(os.path.join(tmp, 'old.66'), 'w') as f:
+                write = f.write
+                for row in rows:
+                    write(snr_format.SNR_FORMAT % tuple(row))
+
+        def joined():
+            with open(os.path.join(tmp, 'old.nav'), 'w+') as fout:
+                fout.write(''.join([snr_format.NAV_SNR_FORMAT % tuple(row) for row in nav.tolist()]))
+
+        def savetxt():
+            with open(os.path.join(tmp, 'old.smoosh'), 'w+') as fout:
+                np.savetxt(fout, data, fmt=SMOOSH_FORMAT)
+
+        cases = [('sp3/nmea SNR file, per row', per_row, 'old.66', 'new.66', data, snr_format.SNR_FORMAT),
+                 ('nav SNR file, joined rows', joined, 'old.nav', 'new.nav', nav, snr_format.NAV_SNR_FORMAT),
+                 ('smoosh_snr, np.savetxt', savetxt, 'old.smoosh', 'new.smoosh', data, SMOOSH_FORMAT + '\n')]
+        print('rows {0:d}'.format(nrows))
+        for name, old, oldfile, newfile, rows, fmt in cases:
+            t0 = time.perf_counter()
+            old()
+            t_old = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            snr_format.write_rows(os.path.join(tmp, newfile), rows, fmt)
+            t_new = time.perf_counter() - t0
+            with open(os.path.join(tmp, oldfile), 'rb') as a, open(os.path.join(tmp, newfile), 'rb') as b:
+                assert a.read() == b.read()
+            print('{0:28s}: {1:6.2f} s   write_rows {2:6.2f} s   {3:5.1f}x'.format(name, t_old, t_new, t_old/t_new))
+
+        t0 = time.perf_counter()
+        snr_format.write_rows(os.path.join(tmp, 'new.66.gz'), data, snr_format.SNR_FORMAT)
+        t_gz = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        with open(os.path.join(tmp, 'old.66'), 'rb') as f_in, gzip.open(os.path.join(tmp, 'old.66.gz'), 'wb', compresslevel=6) as f_out:
+            f_out.write(f_in.read())
+        t_gzip = time.perf_counter() - t0
+        print('write_rows into gzip        : {0:6.2f} s   (gzip of the text file alone {1:.2f} s)'.format(t_gz, t_gzip))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: reading a 24 hour, 1 Hz SNR file as text (np.loadtxt) and as a
+binary sidecar (snr_store), for the whole day and for the two hour window
+used by the midnite buffering.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_snr_store.py
+"""
+import gzip
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from gnssrefl import snr_store
+from gnssrefl.read_snr_files import load_snr_time_filtered
+
+
+def make_snr_file(filename, nsat=12, rate=1):
+    """Write a synthetic 24 hour SNR 66 file with the same layout as rinex2snr."""
+    t = np.arange(0, 86400, rate, dtype=float)
+    rows = []
+    for i in range(nsat):
+        sat = i + 1
+        ele = 15 + 14*np.sin(2*np.pi*(t/43082.0) + i)
+        azi = np.mod(30*i + t/240.0, 360)
+        edot = np.gradient(ele, t)
+        snr = 40 + 5*np.cos(t/300.0 + i)
+        out = np.column_stack((np.full(t.size, sat), ele, azi, t, edot,
+                               np.zeros(t.size), snr, snr - 3, np.zeros(t.size), np.zeros(t.size), np.zeros(t.size)))
+        rows.append(out[ele < 30])
+    d = np.vstack(rows)
+    d = d[np.lexsort((d[:, 0], d[:, 3]))]
+    fmt = "%3.0f%10.4f%10.4f%10.1f%10.6f%7.2f%7.2f%7.2f%7.2f%7.2f%7.2f"
+    with gzip.open(filename, 'wt', compresslevel=6) as fout:
+        np.savetxt(fout, d, fmt=fmt)
+    return d.shape[0]
+
+
+def best_of(func, n=3):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        snrfile = os.path.join(tmp, 'test0010.24.snr66.gz')
+        nrows = make_snr_file(snrfile)
+        t_convert = best_of(lambda: snr_store.text2binary(snrfile), 1)
+        binfile = snr_store.binary_snr_name(snrfile)
+
+        t_text = best_of(lambda: np.loadtxt(snrfile, comments='%'))
+        t_bin = best_of(lambda: snr_store.read_snr_binary(binfile))
+        assert np.array_equal(np.loadtxt(snrfile, comments='%'), snr_store.read_snr_binary(binfile))
+
+        text_stats = {}; bin_stats = {}
+        # hide the sidecar so the text reader is timed
+        os.rename(binfile, binfile + '.hide')
+        t_text_window = best_of(lambda: load_snr_time_filtered(snrfile, sec_min=79200))
+        load_snr_time_filtered(snrfile, sec_min=79200, stats=text_stats)
+        os.rename(binfile + '.hide', binfile)
+        t_bin_window = best_of(lambda: snr_store.read_snr_binary_window(binfile, sec_min=79200))
+        load_snr_time_filtered(snrfile, sec_min=79200, stats=bin_stats)
+
+        print('rows                      : {0:d}'.format(nrows))
+        print('text size (gz)  MB        : {0:.1f}'.format(os.path.getsize(snrfile)/1e6))
+        print('binary size     MB        : {0:.1f}'.format(os.path.getsize(binfile)/1e6))
+        print('one time conversion (s)   : {0:.3f}'.format(t_convert))
+        print('np.loadtxt text (s)       : {0:.3f}'.format(t_text))
+        print('binary sidecar (s)        : {0:.4f}'.format(t_bin))
+        print('speedup                   : {0:.0f}x'.format(t_text/t_bin))
+        print('last 2 hours, text (s)    : {0:.3f}  bytes read {1:d}'.format(t_text_window, text_stats['bytes']))
+        print('last 2 hours, mmap (s)    : {0:.4f}  bytes read {1:d}'.format(t_bin_window, bin_stats['bytes']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: gnssir -sweep. NDAYS days (copies of the three mchl test days) are
+analyzed with the json files of six extensions (elevation angles and azimuth
+regions), one gnssir run per extension, and with one gnssir -sweep run, which
+must write the same files. The time spent reading the SNR files and
+extracting the arcs (extract_arcs_from_station) is given separately.
+
+Not collected by pytest. Run it directly:
+
+    python test/bench_sweep.py [NDAYS]
+"""
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import gnssrefl.extract_arcs as ea
+from gnssrefl import gnssir_cl
+
+from bench_gnssir_par import make_refl_code
+
+SETTINGS = {
+    'e5az1': {'azval2': [0, 180]},
+    'e5az2': {'azval2': [180, 360]},
+    'e6': {'e1': 6.0},
+    'e7': {'e1': 7.0, 'e2': 20.0},
+    'e7az1': {'e1': 7.0, 'e2': 20.0, 'azval2': [0, 180]},
+    'ellist': {'ellist': [5, 15, 10, 25]},
+}
+
+
+class Timer:
+    """wraps extract_arcs_from_station and adds up its time"""
+    def __init__(self):
+        self.seconds = 0
+        self.extract = ea.extract_arcs_from_station
+
+    def __call__(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self.extract(*args, **kwargs)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+
+def run(ndays, **kwargs):
+    timer = Timer()
+    ea.extract_arcs_from_station = timer
+    t0 = time.perf_counter()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            gnssir_cl.gnssir('mchl', 2025, 10, doy_end=10 + ndays - 1, gzip=False, **kwargs)
+    finally:
+        ea.extract_arcs_from_station = timer.extract
+    return time.perf_counter() - t0, timer.seconds
+
+
+def results(root):
+    return {str(f.relative_to(root)): f.read_text() for f in (root / '2025' / 'results' / 'mchl').glob('**/0*.txt')}
+
+
+def main():
+    ndays = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['REFL_CODE'] = tmp
+        root = Path(tmp)
+        make_refl_code(root, ndays)
+        with open(root / 'input' / 'mchl' / 'mchl.json') as f:
+            config = json.load(f)
+        for ext, settings in SETTINGS.items():
+            (root / 'input' / 'mchl' / ext).mkdir()
+            with open(root / 'input' / 'mchl' / ext / 'mchl.json', 'w') as f:
+                json.dump({**config, **settings}, f)
+
+        t_seq = 0; t_seq_arcs = 0
+        for ext in [''] + list(SETTINGS):
+            t, t_arcs = run(ndays, extension=ext)
+            t_seq += t; t_seq_arcs += t_arcs
+        separate = results(root)
+        shutil.rmtree(root / '2025' / 'results')
+
+        t_sweep, t_sweep_arcs = run(ndays, sweep=list(SETTINGS))
+        assert results(root) == separate
+
+        print('days: {0:d}  configurations: {1:d}'.format(ndays, 1 + len(SETTINGS)))
+        print('                         total (s)   SNR files and arcs (s)')
+        print('  one run per extension  {0:8.2f}    {1:8.2f}'.format(t_seq, t_seq_arcs))
+        print('  -sweep                 {0:8.2f}    {1:8.2f}'.format(t_sweep, t_sweep_arcs))
+        print('  speedup                {0:8.2f}x   {1:8.2f}x'.format(t_seq/t_sweep, t_seq_arcs/t_sweep_arcs))
+
+
+if __name__ == "__main__":
+    main()
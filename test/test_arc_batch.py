@@ -0,0 +1,90 @@
+"""
+Tests for arc_batch.ArcBatch, the arcs extract_arcs returns: the per arc
+(metadata, data) views, selections and pickling.
+"""
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from gnssrefl.arc_batch import ArcBatch, DATA_KEYS, META_KEYS
+from gnssrefl.extract_arcs import extract_arcs
+from gnssrefl.read_snr_files import read_snr
+
+SNR_FILE = Path(__file__).parent / 'data' / 'refl_code' / '2025' / 'snr' / 'mchl' / 'mchl0110.25.snr66.gz'
+
+
+@pytest.fixture(scope='module')
+def arcs():
+    _, snr_array, _, _ = read_snr(str(SNR_FILE), buffer_hours=0)
+    return extract_arcs(snr_array, freq=[1, 20, 5, 101, 201], e1=5.0, e2=25.0, ellist=[5, 15, 10, 25],
+                        polyV=4, pele=[5, 30], year=2025, doy=11)
+
+
+def test_views(arcs):
+    assert isinstance(arcs, ArcBatch) and len(arcs) > 100
+    assert arcs.offsets[0] == 0 and arcs.offsets[-1] == len(arcs.data['ele'])
+    n = 0
+    for i, (meta, data) in enumerate(arcs):
+        assert list(meta) == list(META_KEYS) and list(data) == list(DATA_KEYS)
+        assert meta['num_pts'] == len(data['ele']) == arcs.offsets[i + 1] - arcs.offsets[i]
+        assert meta['ele_start'] == data['ele'].min() and 0 <= meta['arc_timestamp'] < 24
+        # views, not copies
+        assert np.shares_memory(data['snr'], arcs.data['snr'])
+        n += 1
+    assert n == len(arcs)
+    meta, data = arcs[-1]
+    assert meta is arcs[len(arcs) - 1][0] and meta['sat'] == arcs.meta['sat'][-1]
+    assert len(arcs[2:5]) == 3
+    with pytest.raises(IndexError):
+        arcs[len(arcs)]
+
+
+def test_metadata_dicts_are_kept(arcs):
+    """keys added by attach_track_id and friends stay with the arc"""
+    batch = arcs.take(np.arange(len(arcs)))
+    for meta, data in batch:
+        meta['track_id'] = int(meta['sat'])
+    assert [m['track_id'] for m, d in batch] == batch.meta['sat'].tolist()
+    # and go along with take and pickle
+    some = batch.take([3, 1, 1])
+    assert [m['track_id'] for m, d in some] == batch.meta['sat'][[3, 1, 1]].tolist()
+    copy = pickle.loads(pickle.dumps(batch))
+    assert [m for m, d in copy] == [m for m, d in batch]
+
+
+def test_take(arcs):
+    index = np.array([7, 0, 3, 3])
+    some = arcs.take(index)
+    assert len(some) == 4
+    for (m1, d1), i in zip(some, index):
+        m2, d2 = arcs[i]
+        assert m1 == m2
+        for k in DATA_KEYS:
+            np.testing.assert_array_equal(d1[k], d2[k])
+    mask = arcs.meta['freq'] == 20
+    assert arcs.take(mask).meta['freq'].tolist() == [20]*mask.sum()
+    assert len(arcs.take([])) == 0 and arcs.take([]).offsets.tolist() == [0]
+
+
+def test_from_arcs(arcs):
+    listed = [(dict(m), {k: v.copy() for k, v in d.items()}) for m, d in arcs]
+    batch = ArcBatch.from_arcs(listed)
+    assert batch.meta.tolist() == arcs.meta.tolist()
+    for k in DATA_KEYS:
+        np.testing.assert_array_equal(batch.data[k], arcs.data[k])
+    # the dicts of the list
+    assert batch[0][0] is listed[0][0]
+    empty = ArcBatch.from_arcs([])
+    assert len(empty) == 0 and list(empty) == []
+
+
+def test_pickle_is_compact(arcs):
+    listed = [(dict(m), {k: v.copy() for k, v in d.items()}) for m, d in arcs]
+    batch = pickle.dumps(arcs)
+    assert len(batch) < len(pickle.dumps(listed))
+    copy = pickle.loads(batch)
+    assert copy.meta.tolist() == arcs.meta.tolist()
+    np.testing.assert_array_equal(copy.data['snr'], arcs.data['snr'])
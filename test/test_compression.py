@@ -0,0 +1,138 @@
+"""
+Tests for the in-process compression of SNR files (gnssrefl.compression) and
+for rinex2snr writing its SNR files compressed straight away.
+"""
+import gzip
+import io
+import os
+
+import numpy as np
+import pytest
+
+from gnssrefl import compression
+from gnssrefl import snr_format
+import gnssrefl.rinex2snr as rnx
+
+TEXT = b''.join(b'%3d %10.4f some SNR text\n' % (i % 400, i/7) for i in range(20000))
+
+
+def test_settings(monkeypatch):
+    monkeypatch.delenv(compression.ENVIRONMENT, raising=False)
+    assert compression.settings() == ('gzip', 6, 1)
+    assert compression.settings('gzip:1') == ('gzip', 1, 1)
+    assert compression.settings('GZIP:9:4') == ('gzip', 9, 4)
+    assert compression.settings('bzip2') == ('gzip', 6, 1)
+    assert compression.settings('gzip:fast') == ('gzip', 6, 1)
+    monkeypatch.setenv(compression.ENVIRONMENT, 'gzip:2')
+    assert compression.settings() == ('gzip', 2, 1)
+    monkeypatch.setattr(compression, 'zstandard', None)
+    monkeypatch.setattr(compression, '_stdlib_zstd', None)
+    assert compression.settings('zstd:3') == ('gzip', 6, 1)
+
+
+def test_names(monkeypatch):
+    monkeypatch.delenv(compression.ENVIRONMENT, raising=False)
+    assert compression.codec_of('a.snr66.gz') == 'gzip'
+    assert compression.codec_of('a.snr66.zst') == 'zstd'
+    assert compression.codec_of('a.snr66') is None
+    assert compression.plain_name('a.snr66.zst') == 'a.snr66'
+    assert compression.compressed_name('a.snr66') == 'a.snr66.gz'
+    assert compression.compressed_name('a.snr66.gz', 'zstd') == 'a.snr66.zst'
+    assert compression.compressed_versions('a.snr66') == ['a.snr66.gz', 'a.snr66.zst']
+
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_gzip_roundtrip(tmp_path, monkeypatch, threads):
+    """with threads the file is a series of gzip members, still one file to every reader"""
+    monkeypatch.setattr(compression, 'BLOCK_SIZE', 100000)
+    name = str(tmp_path / 'a.snr66.gz')
+    with compression.open_write(name, level=1, threads=threads) as f:
+        for start in range(0, len(TEXT), 33333):
+            f.write(TEXT[start:start+33333])
+    assert gzip.decompress(open(name, 'rb').read()) == TEXT
+    assert compression.read_bytes(name) == TEXT
+    with compression.open_read(name) as f:
+        np.testing.assert_array_equal(np.loadtxt(f, usecols=(0, 1)), np.loadtxt(io.BytesIO(TEXT), usecols=(0, 1)))
+
+
+def test_zstd_roundtrip(tmp_path):
+    if not compression.zstd_available():
+        pytest.skip('zstd is not installed')
+    name = str(tmp_path / 'a.snr66.zst')
+    with compression.open_write(name, level=3, threads=2) as f:
+        f.write(TEXT)
+    assert open(name, 'rb').read(4) == compression.MAGIC['zstd']
+    assert compression.read_bytes(name) == TEXT
+    plain = compression.decompress_file(name)
+    assert open(plain, 'rb').read() == TEXT
+
+
+def test_compress_and_decompress_file(tmp_path, monkeypatch):
+    monkeypatch.delenv(compression.ENVIRONMENT, raising=False)
+    plain = tmp_path / 'a.snr66'
+    plain.write_bytes(TEXT)
+    os.utime(plain, ns=(10**18, 10**18))
+    gz = compression.compress_file(str(plain))
+    assert gz == str(plain) + '.gz'
+    assert sorted(os.listdir(tmp_path)) == ['a.snr66.gz']
+    # the file times are kept, as gzip does
+    assert os.stat(gz).st_mtime_ns == 10**18
+    assert gzip.decompress(open(gz, 'rb').read()) == TEXT
+    assert not compression.is_empty(gz)
+    assert compression.decompress_file(gz) == str(plain)
+    assert sorted(os.listdir(tmp_path)) == ['a.snr66']
+    assert plain.read_bytes() == TEXT
+    assert os.stat(plain).st_mtime_ns == 10**18
+
+
+def test_interrupted_compression_leaves_original(tmp_path):
+    gz = tmp_path / 'a.snr66.gz'
+    gz.write_bytes(gzip.compress(TEXT)[:200])
+    with pytest.raises(EOFError):
+        compression.decompress_file(str(gz))
+    assert sorted(os.listdir(tmp_path)) == ['a.snr66.gz']
+
+
+def test_read_plain_file_with_any_name(tmp_path):
+    """the codec is recognized from the contents"""
+    name = tmp_path / 'a.snr66'
+    name.write_bytes(gzip.compress(TEXT))
+    assert compression.read_bytes(str(name)) == TEXT
+    name.write_bytes(TEXT)
+    assert compression.read_bytes(str(name)) == TEXT
+
+
+def test_finish_snrfile_written_compressed(tmp_path, monkeypatch):
+    """rinex2snr writes the .gz file directly; finish_snrfile only moves it"""
+    monkeypatch.delenv(compression.ENVIRONMENT, raising=False)
+    monkeypatch.setenv('REFL_CODE', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    data = np.column_stack([np.arange(1, 101), np.full(100, 10.0), np.full(100, 90.0), np.arange(100)*30.0,
+                            np.zeros(100), np.zeros(100), np.full(100, 45.25), np.zeros((100, 4))])
+    snrname = rnx.snr_output_name('test', 2025, 1, 21, 66)
+    assert snrname == 'test0210.25.snr66.gz'
+    snr_format.write_rows(snrname, data, snr_format.SNR_FORMAT)
+    snrname_full = rnx.quickname('test', 2025, '25', '021', '66')
+    # an older plain version of the same day
+    os.makedirs(os.path.dirname(snrname_full))
+    open(snrname_full, 'w').write('old\n')
+    rnx.finish_snrfile(snrname, snrname_full, 2025, 'test', io.StringIO(), True, True)
+    assert sorted(os.listdir(os.path.dirname(snrname_full))) == ['test0210.25.snr66.gz', 'test0210.25.snr66.npz']
+    with gzip.open(snrname_full + '.gz', 'rb') as f:
+        assert f.read() == snr_format.format_rows(data, snr_format.SNR_FORMAT)
+
+    # uncompressed SNR files requested
+    snr_format.write_rows(rnx.snr_output_name('test', 2025, 1, 21, 66, False), data, snr_format.SNR_FORMAT)
+    rnx.finish_snrfile('test0210.25.snr66', snrname_full, 2025, 'test', io.StringIO(), False, False)
+    assert 'test0210.25.snr66.gz' not in os.listdir(os.path.dirname(snrname_full))
+    assert os.path.isfile(snrname_full)
+
+
+def test_finish_snrfile_empty_compressed(tmp_path, monkeypatch):
+    monkeypatch.setenv('REFL_CODE', str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    snr_format.write_rows('test0210.25.snr66.gz', np.zeros((0, 11)), snr_format.SNR_FORMAT)
+    assert os.path.getsize('test0210.25.snr66.gz') > 0
+    rnx.finish_snrfile('test0210.25.snr66.gz', rnx.quickname('test', 2025, '25', '021', '66'), 2025, 'test',
+                       io.StringIO(), True)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,140 @@
+"""
+Tests for the daily_avg engine (daily_avg.readin_plot_daily): the RH files,
+daily averages and counts must be those of the day by day loop it replaced.
+"""
+
+import datetime
+import os
+import warnings
+from unittest.mock import patch
+
+import matplotlib
+import numpy as np
+import pytest
+
+from gnssrefl import daily_avg as da
+from gnssrefl import results_store
+
+FMT = '%4.0f %3.0f %6.3f %3.0f %6.3f %6.2f %6.2f %6.2f %6.2f %4.0f  %3.0f  %2.0f %8.5f %6.2f %7.2f %12.6f %2.0f'
+SATS = np.r_[1:33, 101:125, 201:237, 301:338]
+FREQS = np.array([1, 20, 5, 101, 201, 302])
+
+
+def day_rows(year, doy, n, rng):
+    rows = np.zeros((n, 17))
+    rows[:, 0] = year
+    rows[:, 1] = doy
+    rows[:, 2] = 5 + 0.1*np.sin(doy/10) + rng.normal(0, 0.08, n)
+    rows[:, 3] = rng.choice(SATS, n)
+    rows[:, 4] = rng.uniform(0, 24, n)
+    rows[:, 5] = rng.uniform(0, 360, n)
+    rows[:, 6] = rng.uniform(5, 20, n)
+    rows[:, 10] = rng.choice(FREQS, n)
+    rows[:, 13] = rng.uniform(2.7, 5, n)
+    rows[:, 15] = 60000 + doy
+    return rows
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    """RH files of two years: normal days, days with one or no RH, outliers, NaN and arcs past midnight"""
+    rng = np.random.default_rng(1)
+    (tmp_path / 'Files' / 'test').mkdir(parents=True)
+    for year in [2023, 2024]:
+        direc = tmp_path / str(year) / 'results' / 'test'
+        direc.mkdir(parents=True)
+        for doy in range(1, 80):
+            rows = day_rows(year, doy, int(rng.integers(2, 40)), rng)
+            if doy % 7 == 0:
+                rows[0:3, 2] += 2                        # outliers
+            if doy == 11:
+                rows = rows[0:1]                         # one RH
+            if doy == 12:
+                rows = rows[0:0]
+            if doy == 13:
+                rows[:, 5] = 355                         # nothing between the azimuths
+            if doy == 14:
+                rows[::2, 4] = 24.3                      # arcs that end the next day
+            if doy == 15:
+                rows[1, 2] = np.nan
+            results_store.write_result_file(direc / f'{doy:03d}.txt', rows, FMT, 'test\nyear doy RH\n(1)\n(2)')
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield tmp_path
+
+
+def reference(refl_code, year1, year2, fr, csvformat, howBig, ReqTracks, azim1, azim2):
+    """the day by day loop of gnssrefl 4.2"""
+    if csvformat:
+        line = " {0:4.0f},  {1:3.0f},{2:7.3f}, {3:2.0f}, {4:2.0f},{5:6.1f},{6:4.0f},{7:4.0f},{8:6.2f},{9:6.2f},{10:6.2f}\n"
+    else:
+        line = " {0:4.0f}   {1:3.0f} {2:7.3f} {3:2.0f} {4:2.0f} {5:6.1f} {6:4.0f} {7:4.0f} {8:6.2f} {9:6.2f} {10:6.2f}\n"
+    noqc = []; allrh = []; tv = []; NotEnough = 0
+    for yr in range(year1, year2 + 1):
+        direc = refl_code / str(yr) / 'results' / 'test'
+        for f in sorted(os.listdir(direc)):
+            if len(f) != 7:
+                continue
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                a = np.loadtxt(direc / f, comments='%')
+            if a.ndim != 2 or len(a) == 0:
+                continue
+            a = a[(a[:, 5] > azim1) & (a[:, 5] < azim2), :]
+            if len(a) == 0:
+                continue
+            y = int(a[0, 0]); doy = int(a[0, 1])
+            d = datetime.date(y, 1, 1) + datetime.timedelta(doy - 1)
+            rh = a[:, 2]
+            medv = np.median(rh)
+            cc = (rh < (medv + howBig)) & (rh > (medv - howBig))
+            if fr != 0:
+                cc = cc & (a[:, 10] == fr)
+            for r in a:
+                noqc.append(line.format(y, doy, r[2], d.month, d.day, r[5], r[10], r[3], r[6], r[13], r[4]))
+            if cc.sum() >= ReqTracks:
+                for r in a[cc]:
+                    allrh.append(line.format(y, doy, r[2], d.month, d.day, r[5], r[10], r[3], r[6], r[13], r[4]))
+                try:
+                    for u in a[cc, 4]:
+                        datetime.datetime(y, d.month, d.day, int(np.floor(u)), int(60*(u - int(np.floor(u)))))
+                except ValueError:
+                    continue
+                good = rh[cc]
+                tv.append([y, doy, np.mean(good), len(good), d.month, d.day, np.std(good), np.mean(a[cc, 6])])
+            else:
+                NotEnough += 1
+    return ''.join(noqc), ''.join(allrh), np.array(tv), NotEnough
+
+
+@pytest.mark.parametrize('fr, csvformat, howBig, ReqTracks, azim1, azim2', [
+    (0, False, 0.25, 10, 0, 360),
+    (0, True, 0.15, 5, 0, 300),
+    (20, False, 0.5, 3, 90, 270),
+])
+def test_same_as_day_by_day(refl_code, capsys, fr, csvformat, howBig, ReqTracks, azim1, azim2):
+    alldatafile = str(refl_code / 'Files' / 'test' / ('test_allRH.csv' if csvformat else 'test_allRH.txt'))
+    tv, obstimes = da.readin_plot_daily('test', '', 2023, 2024, fr, alldatafile, csvformat, howBig, ReqTracks,
+                                        azim1, azim2, False, 'test', False, plots=False)
+    noqc, allrh, tv_ref, NotEnough = reference(refl_code, 2023, 2024, fr, csvformat, howBig, ReqTracks, azim1, azim2)
+
+    with open(alldatafile + '.noqc') as f:
+        assert ''.join(f.readlines()[3:]) == noqc
+    with open(alldatafile) as f:
+        assert ''.join(f.readlines()[2:]) == allrh
+    assert tv.shape == tv_ref.shape and len(tv) > 20
+    np.testing.assert_allclose(tv, tv_ref, rtol=1e-12, atol=1e-12)
+    assert obstimes == [datetime.datetime(int(t[0]), int(t[4]), int(t[5]), 12) for t in tv_ref]
+    out = capsys.readouterr().out
+    assert '\n{0:d}  days did not meet'.format(NotEnough) in out
+    assert ' 158  days were evaluated' in out
+
+
+def test_dates_and_plots(refl_code):
+    matplotlib.use('Agg')
+    alldatafile = str(refl_code / 'Files' / 'test' / 'test_allRH.txt')
+    tv, obstimes = da.readin_plot_daily('test', '', 2023, 2024, 0, alldatafile, False, 0.25, 5, 0, 360, False,
+                                        'test', True, date1='20230301', date2='20240105')
+    # the day after date2 is included, as before
+    assert tv[0, 0:2].tolist() == [2023, 60] and tv[-1, 0:2].tolist() == [2024, 6]
+    for png in ['AllRH', 'AllRH_noQC', 'RH', 'nvals', 'LSPamp']:
+        assert (refl_code / 'Files' / 'test' / f'test_{png}.png').is_file()
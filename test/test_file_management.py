@@ -11,6 +11,7 @@ Tests cover:
 These tests are designed to run fast and locally without requiring external data processing.
 """
 
+import gzip
 import os
 import pytest
 import tempfile
@@ -399,7 +400,10 @@ class TestSNRFileResolution:
         """Helper: create a dummy SNR file (optionally .gz)."""
         target = Path(str(path) + '.gz') if compressed else path
         target.parent.mkdir(parents=True, exist_ok=True)
-        target.write_text('dummy snr data')
+        if compressed:
+            target.write_bytes(gzip.compress(b'dummy snr data'))
+        else:
+            target.write_text('dummy snr data')
         return target
 
     def test_gz_exists_gzip_true(self, temp_refl_code):
@@ -410,17 +414,10 @@ class TestSNRFileResolution:
         assert found
         assert str(obsfile).endswith('.gz')
 
-    @patch('gnssrefl.utils.subprocess.call')
-    def test_uncompressed_exists_gzip_true_compresses_it(self, mock_call, temp_refl_code):
+    def test_uncompressed_exists_gzip_true_compresses_it(self, temp_refl_code):
         """gzip=True with only uncompressed file compresses it and returns .gz path."""
         base = self._snr_path(temp_refl_code, 'test', 2024, 100, 66)
         self._create_snr(base, compressed=False)
-        gz = Path(str(base) + '.gz')
-
-        def fake_gzip(cmd):
-            base.unlink()
-            gz.write_text('dummy compressed')
-        mock_call.side_effect = fake_gzip
 
         obsfile, found = FileManagement('test', 'snr_file', 2024, 100, snr_type=66).find_snr_file(gzip=True)
         assert found
@@ -443,40 +440,39 @@ class TestSNRFileResolution:
         assert found
         assert not str(obsfile).endswith('.gz')
 
-    @patch('gnssrefl.utils.subprocess.call')
-    def test_gz_only_gzip_false_decompresses(self, mock_call, temp_refl_code):
-        """gzip=False with only .gz decompresses and returns uncompressed path."""
+    def test_gz_only_gzip_false_decompresses(self, temp_refl_code):
+        """gzip=False with only .gz decompresses (in-process) and returns uncompressed path."""
         base = self._snr_path(temp_refl_code, 'test', 2024, 100, 66)
         gz = self._create_snr(base, compressed=True)
 
-        # Simulate gunzip: remove .gz, create uncompressed
-        def fake_gunzip(cmd):
-            gz.unlink()
-            base.write_text('dummy snr data')
-        mock_call.side_effect = fake_gunzip
-
         obsfile, found = FileManagement('test', 'snr_file', 2024, 100, snr_type=66).find_snr_file(gzip=False)
         assert found
-        assert not str(obsfile).endswith('.gz')
-        mock_call.assert_called_once_with(['gunzip', str(gz)])
+        assert obsfile == base
+        assert base.read_text() == 'dummy snr data'
+        assert not gz.exists()
 
-    @patch('gnssrefl.utils.subprocess.call')
-    def test_uncompressed_only_gzip_true_compresses(self, mock_call, temp_refl_code):
-        """gzip=True with only uncompressed file compresses and returns .gz path."""
+    def test_uncompressed_only_gzip_true_compresses(self, temp_refl_code):
+        """gzip=True with only uncompressed file compresses (in-process) and returns .gz path."""
         base = self._snr_path(temp_refl_code, 'test', 2024, 100, 66)
         self._create_snr(base, compressed=False)
         gz = Path(str(base) + '.gz')
 
-        # Simulate gzip: remove uncompressed, create .gz
-        def fake_gzip(cmd):
-            base.unlink()
-            gz.write_text('dummy compressed')
-        mock_call.side_effect = fake_gzip
-
         obsfile, found = FileManagement('test', 'snr_file', 2024, 100, snr_type=66).find_snr_file(gzip=True)
         assert found
-        assert str(obsfile).endswith('.gz')
-        mock_call.assert_called_once_with(['gzip', str(base)])
+        assert obsfile == gz
+        assert gzip.decompress(gz.read_bytes()) == b'dummy snr data'
+        assert not base.exists()
+
+    def test_corrupt_gz_gzip_false_not_found(self, temp_refl_code):
+        """gzip=False with a truncated .gz leaves it alone and reports not found."""
+        base = self._snr_path(temp_refl_code, 'test', 2024, 100, 66)
+        gz = self._create_snr(base, compressed=True)
+        gz.write_bytes(gz.read_bytes()[:15])
+
+        obsfile, found = FileManagement('test', 'snr_file', 2024, 100, snr_type=66).find_snr_file(gzip=False)
+        assert not found
+        assert gz.exists()
+        assert not base.exists()
 
     def test_gzip_none_finds_gz(self, temp_refl_code):
         """gzip=None with .gz file returns .gz path without converting."""
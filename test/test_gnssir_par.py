@@ -0,0 +1,94 @@
+"""
+Tests for the gnssir worker pools (-par across days, -arc_par within a day).
+
+The pools must give the same result files as the sequential code.
+"""
+
+import os
+import shutil
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+from gnssrefl import gnssir_cl
+from gnssrefl import gnssir_v2
+from gnssrefl import refraction
+
+FIXTURE_DIR = Path(__file__).parent / 'data' / 'refl_code'
+
+
+class InProcessPool:
+    """multiprocessing.Pool stand-in running the initializer and the tasks in this process"""
+    def __init__(self, processes, initializer, initargs):
+        initializer(*initargs)
+
+    def imap_unordered(self, func, items, chunksize=1):
+        return map(func, items)
+
+    def close(self):
+        pass
+
+    def join(self):
+        pass
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    """REFL_CODE tree with the mchl test files, as in run_processing.sh."""
+    (tmp_path / '2025' / 'snr' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'input' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'Files').mkdir()
+    (tmp_path / 'logs').mkdir()
+    for f in (FIXTURE_DIR / '2025' / 'snr' / 'mchl').glob('*.snr66.gz'):
+        shutil.copy(f, tmp_path / '2025' / 'snr' / 'mchl' / f.name)
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl' / 'mchl.json', tmp_path / 'input' / 'mchl')
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl_refr.txt', tmp_path / 'input')
+    (tmp_path / 'input' / 'gpt_1wA.pickle').touch()
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield tmp_path
+
+
+class TestWorkerPool:
+
+    @pytest.mark.parametrize('ndays, par, expected', [(1, 4, 1), (40, 2, 5), (3650, 64, 14), (3650, 2, 31)])
+    def test_day_chunksize(self, ndays, par, expected):
+        assert gnssir_cl.day_chunksize(ndays, par) == expected
+
+    def test_pool_matches_sequential(self, refl_code):
+        results = refl_code / '2025' / 'results' / 'mchl'
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=12, gzip=False)
+        sequential = {d: np.loadtxt(results / f'{d:03d}.txt', comments='%') for d in [10, 11, 12]}
+        shutil.rmtree(results)
+        with patch('gnssrefl.gnssir_cl.multiprocessing.cpu_count', return_value=4):
+            gnssir_cl.gnssir('mchl', 2025, 10, doy_end=12, gzip=False, par=2)
+        for d in [10, 11, 12]:
+            np.testing.assert_array_equal(np.loadtxt(results / f'{d:03d}.txt', comments='%'), sequential[d])
+
+    def test_worker_setup_once(self, refl_code):
+        """the directories are checked by the worker initializer, not for every day"""
+        with patch('gnssrefl.gnssir_cl.multiprocessing.cpu_count', return_value=4), \
+                patch('gnssrefl.gnssir_cl.multiprocessing.Pool', InProcessPool), \
+                patch('gnssrefl.gps.make_nav_dirs') as make_nav_dirs, \
+                patch('gnssrefl.gnssir_v2.gnssir_guts_v2', wraps=gnssir_v2.gnssir_guts_v2) as guts:
+            gnssir_cl.gnssir('mchl', 2025, 10, doy_end=12, gzip=False, par=2)
+        assert make_nav_dirs.call_count == 1
+        assert guts.call_count == 3 and all(c.kwargs['setup'] is False for c in guts.call_args_list)
+        assert (refl_code / '2025' / 'results' / 'mchl' / '012.txt').exists()
+
+    def test_arc_pool_matches_sequential(self, refl_code):
+        results = refl_code / '2025' / 'results' / 'mchl' / '011.txt'
+        gnssir_cl.gnssir('mchl', 2025, 11, gzip=False)
+        sequential = results.read_text()
+        results.unlink()
+        with patch('gnssrefl.gnssir_cl.multiprocessing.cpu_count', return_value=4):
+            gnssir_cl.gnssir('mchl', 2025, 11, gzip=False, arc_par=3)
+        assert results.read_text() == sequential
+
+    def test_refraction_grid_read_once(self, refl_code):
+        refraction._grid_cache.clear()
+        first = refraction.read_4by5('mchl', 0, 0, 0)
+        with patch('gnssrefl.refraction.np.genfromtxt') as genfromtxt:
+            again = refraction.read_4by5('mchl', 0, 0, 0)
+            genfromtxt.assert_not_called()
+        assert all(a is b for a, b in zip(first, again))
@@ -0,0 +1,94 @@
+"""
+Tests for the Compact RINEX (Hatanaka) decoder. The expected RINEX files in
+test/data/hatanaka were made from the Compact RINEX files with the CRX2RNX
+executable (ver. 4.1.0). The files have satellites that rise and set, blank
+fields, LLI and signal strength flags, receiver clock offsets that come and go
+and a special event (header records inside the data).
+"""
+import gzip
+import io
+import os
+
+import numpy as np
+import pytest
+
+from gnssrefl import hatanaka
+from gnssrefl import rinpy
+import gnssrefl.rinex2snr as rnx
+
+DATA = os.path.join(os.path.dirname(__file__), 'data', 'hatanaka')
+FILES = [('test0210.25d.gz', 'test0210.25o.gz'),
+         ('TEST00XXX_R_20250210000_01D_30S_MO.crx.gz', 'TEST00XXX_R_20250210000_01D_30S_MO.rnx.gz')]
+
+
+def read(name):
+    with gzip.open(os.path.join(DATA, name), 'rt') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("crx, expected", FILES)
+def test_crx2rnx_lines_matches_executable(crx, expected):
+    lines = io.StringIO(read(crx))
+    assert ''.join(hatanaka.crx2rnx_lines(lines)) == read(expected)
+
+
+@pytest.mark.parametrize("crx, expected", FILES)
+def test_crx2rnx_file(tmp_path, crx, expected):
+    crxfile = tmp_path / crx
+    crxfile.write_bytes(open(os.path.join(DATA, crx), 'rb').read())
+    rnxfile = hatanaka.crx2rnx(str(crxfile))
+    assert os.path.basename(rnxfile) == expected[:-3]
+    assert open(rnxfile).read() == read(expected)
+    assert sorted(os.listdir(tmp_path)) == sorted([crx, expected[:-3]])
+
+
+@pytest.mark.parametrize("crx, expected", FILES)
+def test_stream_compact_rinex(tmp_path, crx, expected):
+    """the SNR data streamed from the Compact RINEX file, with only the S fields recovered"""
+    rnxfile = tmp_path / 'expected'
+    rnxfile.write_text(read(expected))
+    from_crx = rinpy.streamrinexfile(os.path.join(DATA, crx))
+    from_rnx = rinpy.streamrinexfile(str(rnxfile))
+    assert from_crx[1:4] == from_rnx[1:4]
+    np.testing.assert_array_equal(from_crx[6], from_rnx[6])
+    for con in from_rnx[0]:
+        for obs in from_rnx[0][con]:
+            a, b = from_crx[0][con][obs], from_rnx[0][con][obs]
+            assert a.shape == b.shape
+            for idx in range(b.shape[1]):
+                np.testing.assert_array_equal(a.column(idx), b.column(idx))
+
+
+def test_keep_obs_blanks_other_fields():
+    crx, expected = FILES[1]
+    decoded = ''.join(hatanaka.crx2rnx_lines(io.StringIO(read(crx)), keep_obs='S')).splitlines()
+    full = read(expected).splitlines()
+    assert len(decoded) == len(full)
+    # G: C1C L1C D1C S1C ..., so the first three fields of a GPS record are blank
+    start = full.index('{0:<60s}END OF HEADER'.format(''))
+    records = [(d, f) for d, f in zip(decoded[start:], full[start:]) if d[:1] == 'G' and len(f) > 67]
+    assert records
+    for d, f in records:
+        assert d[3:51].strip() == ''
+        assert d[51:67].rstrip() == f[51:67].rstrip()
+
+
+def test_truncated_file():
+    crx, expected = FILES[1]
+    lines = read(crx).splitlines(True)
+    # in the middle of the records of an epoch
+    cut = [i for i, line in enumerate(lines) if 'END OF HEADER' in line][0] + 5
+    with pytest.raises(hatanaka.CompactRinexError):
+        list(hatanaka.crx2rnx_lines(lines[:cut]))
+    with pytest.raises(hatanaka.CompactRinexError):
+        list(hatanaka.crx2rnx_lines(read(expected).splitlines(True)))
+
+
+def test_prepare_rinex_file_without_executable(tmp_path, monkeypatch):
+    """rinex2snr decompresses Hatanaka files itself when CRX2RNX is not installed"""
+    monkeypatch.setattr(rnx.g, 'hatanaka_version', lambda: str(tmp_path / 'no_such_CRX2RNX'))
+    crx, expected = FILES[1]
+    workdir = tmp_path / 'work'
+    workdir.mkdir()
+    obsfile = rnx.prepare_rinex_file(os.path.join(DATA, crx), str(workdir), io.StringIO())
+    assert open(obsfile).read() == read(expected)
@@ -0,0 +1,118 @@
+"""
+Tests for the batched Lomb-Scargle engine (lsp_batch).
+
+The batch engine must give the floating mean periodogram astropy computes, on
+the same reflector height grid and with the same amplitude scaling as
+gps.strip_compute.
+"""
+
+import numpy as np
+import pytest
+from astropy.timeseries import LombScargle
+
+import gnssrefl.gps as g
+from gnssrefl import lsp_batch
+
+CF = 0.1903/2  # L1 wavelength/2
+
+
+def make_arc(rh, npts, e1=5.0, e2=25.0, rising=True, seed=0):
+    """Detrended SNR arc for a reflector at height rh (m)."""
+    rng = np.random.default_rng(seed)
+    ele = np.linspace(e1, e2, npts)
+    if not rising:
+        ele = ele[::-1]
+    sx = np.sin(np.radians(ele))/CF
+    snr = 20*np.cos(2*np.pi*rh*sx + 0.3) + rng.normal(0, 2, npts)
+    return ele, snr
+
+
+class TestBatchEngine:
+
+    def test_matches_astropy_exact_periodogram(self):
+        x, y = make_arc(2.3, 240)
+        a = lsp_batch.prepare_arc(x, y, CF, 8, 0.005)
+        expected = LombScargle(a['sx'], a['y']).power(a['px'], method='slow', normalization='psd')
+        power = lsp_batch.batch_power([a])[0]
+        np.testing.assert_allclose(power, expected, rtol=1e-9, atol=1e-9*np.max(expected))
+
+    def test_ragged_batch_matches_single_arcs(self):
+        arcs = [make_arc(rh, n, rising=(i % 2 == 0), seed=i)
+                for i, (rh, n) in enumerate([(1.5, 90), (2.5, 400), (4.0, 150), (6.2, 151)])]
+        batch = lsp_batch.strip_compute_batch([(x, y, CF) for x, y in arcs], 8, 0.005, 0.5)
+        for (x, y), b in zip(arcs, batch):
+            one = lsp_batch.strip_compute_batch([(x, y, CF)], 8, 0.005, 0.5)[0]
+            assert b[0] == one[0]
+            np.testing.assert_allclose(b[6], one[6], rtol=1e-10)
+
+    @pytest.mark.parametrize('rh, rising', [(1.5, True), (3.33, False), (7.1, True)])
+    def test_same_answer_as_strip_compute(self, rh, rising):
+        x, y = make_arc(rh, 300, rising=rising)
+        fast = g.strip_compute(x, y, CF, 8, 0.005, 0.5, 'fast')
+        batch = g.strip_compute(x, y, CF, 8, 0.005, 0.5, 'batch')
+        assert batch[0] == pytest.approx(fast[0], abs=1e-12)
+        assert batch[1] == pytest.approx(fast[1], rel=1e-6)
+        assert batch[2:5] == fast[2:5]
+        np.testing.assert_array_equal(batch[5], fast[5])
+        np.testing.assert_allclose(batch[6], fast[6], rtol=1e-6, atol=1e-6*fast[1])
+        assert batch[0] == pytest.approx(rh, abs=0.01)
+
+    def test_bad_arc_is_flagged(self):
+        x = np.full(20, 10.0)
+        y = np.ones(20)
+        assert lsp_batch.strip_compute_batch([(x, y, CF)], 8, 0.005, 0.5) == [(0, 0, 0, 0, 0, 0, 0)]
+
+    def test_grid_only_evaluates_kept_heights(self):
+        arcs = [make_arc(rh, 200, seed=i) for i, rh in enumerate([2.5, 5.0])]
+        arclist = [(x, y, CF) for x, y in arcs]
+        batch = lsp_batch.strip_compute_batch(arclist, 8, 0.005, 2.0, 'batch')
+        grid = lsp_batch.strip_compute_batch(arclist, 8, 0.005, 2.0, 'grid')
+        a = lsp_batch.prepare_arc(arcs[0][0], arcs[0][1], CF, 8, 0.005, minH=2.0)
+        assert a['px'].min() > 2.0
+        for b, r in zip(grid, batch):
+            assert b[0] == r[0]
+            np.testing.assert_array_equal(b[5], r[5])
+            np.testing.assert_allclose(b[6], r[6], rtol=1e-9)
+
+
+class TestRefine:
+
+    @pytest.mark.parametrize('rh', [0.93, 2.3456, 5.0071, 7.62])
+    def test_refined_height_beats_grid_precision(self, rh):
+        x = np.linspace(5, 25, 400)
+        y = 20*np.cos(2*np.pi*rh*np.sin(np.radians(x))/CF + 0.3)
+        fine = lsp_batch.strip_compute_batch([(x, y, CF)], 8, 0.005, 0.5, refine=True)[0]
+        grid = g.strip_compute(x, y, CF, 8, 0.005, 0.5, 'fast')
+        assert abs(fine[0] - rh) < 5e-4
+        assert abs(fine[0] - rh) <= abs(grid[0] - rh)
+        # far fewer heights are evaluated than on the desiredP grid
+        assert len(fine[5]) < len(grid[5])/4
+
+    def test_agrees_with_grid(self):
+        arcs = [make_arc(rh, n, rising=(i % 2 == 0), seed=i)
+                for i, (rh, n) in enumerate([(1.5, 90), (2.5, 400), (4.0, 150), (6.2, 151)])]
+        arclist = [(x, y, CF) for x, y in arcs]
+        grid = lsp_batch.strip_compute_batch(arclist, 8, 0.005, 0.5, 'grid')
+        fine = lsp_batch.strip_compute_batch(arclist, 8, 0.005, 0.5, 'grid', refine=True)
+        for f, r in zip(fine, grid):
+            assert f[0] == pytest.approx(r[0], abs=0.005)
+            assert f[1] == pytest.approx(r[1], rel=0.01)
+            assert f[2:5] == r[2:5]
+        assert g.strip_compute(*arclist[1], 8, 0.005, 0.5, refine=True)[0] == fine[1][0]
+
+
+class TestManyArcs:
+
+    @pytest.mark.parametrize('lsp_method, refine', [('fast', False), ('grid', False), ('grid', True)])
+    def test_pool_keeps_order(self, lsp_method, refine):
+        arcs = [make_arc(rh, 120 + 7*i, rising=(i % 2 == 0), seed=i) for i, rh in enumerate(np.linspace(1, 7, 9))]
+        arclist = [(x, y, CF) for x, y in arcs]
+        one = lsp_batch.strip_compute_many(arclist, 8, 0.005, 0.5, lsp_method, refine)
+        two = lsp_batch.strip_compute_many(arclist, 8, 0.005, 0.5, lsp_method, refine, processes=2)
+        assert len(two) == len(arclist)
+        # the batch engine groups arcs differently, which only changes rounding
+        for a, b in zip(one, two):
+            assert a[0] == pytest.approx(b[0], abs=1e-12)
+            assert a[1] == pytest.approx(b[1], rel=1e-12)
+            assert a[2:5] == b[2:5]
+            np.testing.assert_allclose(a[6], b[6], rtol=1e-10)
@@ -0,0 +1,148 @@
+"""
+Tests for the manifest of the daily results (manifest.py) and gnssir -incremental:
+a day is only analyzed again when its SNR files, settings or other inputs change.
+"""
+
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from gnssrefl import gnssir_cl
+from gnssrefl import manifest
+import gnssrefl.retrieve_rh
+
+FIXTURE_DIR = Path(__file__).parent / 'data' / 'refl_code'
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    """REFL_CODE tree with the mchl test files, as in run_processing.sh."""
+    (tmp_path / '2025' / 'snr' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'input' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'Files').mkdir()
+    (tmp_path / 'logs').mkdir()
+    for f in (FIXTURE_DIR / '2025' / 'snr' / 'mchl').glob('*.snr66.gz'):
+        shutil.copy(f, tmp_path / '2025' / 'snr' / 'mchl' / f.name)
+    for name in ['mchl.json', 'mchl_phaseRH_L2.txt']:
+        shutil.copy(FIXTURE_DIR / 'input' / 'mchl' / name, tmp_path / 'input' / 'mchl')
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl_refr.txt', tmp_path / 'input')
+    (tmp_path / 'input' / 'gpt_1wA.pickle').touch()
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield tmp_path
+
+
+def analyzed_days(**kwargs):
+    """days for which gnssir computed the periodograms"""
+    with patch('gnssrefl.gnssir_v2.r.retrieve_rh', wraps=gnssrefl.retrieve_rh.retrieve_rh) as retrieve:
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=12, gzip=True, incremental=True, **kwargs)
+    return [c.args[2] for c in retrieve.call_args_list]
+
+
+def rewrite_gz(filename, lines):
+    """writes a gzipped SNR file again with only its first lines"""
+    with gzip.open(filename, 'rt') as f:
+        text = f.readlines()
+    with gzip.open(filename, 'wt') as f:
+        f.writelines(text[:lines])
+
+
+def test_incremental_gnssir(refl_code):
+    results = refl_code / '2025' / 'results' / 'mchl'
+    assert analyzed_days() == [10, 11, 12]
+    before = (results / '011.txt').read_text()
+    assert (results / 'manifest.jsonl').is_file()
+    assert analyzed_days() == []
+    assert (results / '011.txt').read_text() == before
+
+    # same contents, new modification time: still current
+    snrdir = refl_code / '2025' / 'snr' / 'mchl'
+    shutil.copyfile(snrdir / 'mchl0110.25.snr66.gz', refl_code / 'copy.gz')
+    shutil.copyfile(refl_code / 'copy.gz', snrdir / 'mchl0110.25.snr66.gz')
+    assert analyzed_days() == []
+    # other rows: the day and the days next to it (midnite arcs)
+    rewrite_gz(snrdir / 'mchl0110.25.snr66.gz', lines=20000)
+    assert analyzed_days() == [10, 11, 12]
+    assert analyzed_days() == []
+    # without midnite only that day reads it
+    assert analyzed_days(midnite=False) == [10, 11, 12]
+    rewrite_gz(snrdir / 'mchl0120.25.snr66.gz', lines=20000)
+    assert analyzed_days(midnite=False) == [12]
+
+    # a setting, and a missing result file
+    assert analyzed_days(midnite=False, e2=20) == [10, 11, 12]
+    (results / '010.txt').unlink()
+    assert analyzed_days(midnite=False, e2=20) == [10]
+
+    # compacted before the days are analyzed: one line per day, then day 10 again
+    with open(results / 'manifest.jsonl') as f:
+        assert [json.loads(line)['doy'] for line in f] == [10, 11, 12, 10]
+
+    # a run without -incremental does not touch the manifest, and its result files are new
+    manifest_text = (results / 'manifest.jsonl').read_text()
+    gnssir_cl.gnssir('mchl', 2025, 11, gzip=True, midnite=False, e2=20)
+    assert (results / 'manifest.jsonl').read_text() == manifest_text
+    assert analyzed_days(midnite=False, e2=20) == [11]
+
+
+def test_is_current(refl_code, tmp_path):
+    fname = manifest.manifest_name('mchl', 2025, 'results', 'ext')
+    assert fname == str(refl_code / '2025' / 'results' / 'mchl' / 'ext' / 'manifest.jsonl')
+    data = tmp_path / 'input.txt'
+    data.write_text('a')
+    files = [str(data), str(tmp_path / 'later.txt')]
+    key = manifest.settings_key({'e1': 5, 'screenstats': True}, snr_type=66)
+    assert key == manifest.settings_key({'e1': 5, 'screenstats': False}, snr_type=66)
+    assert key != manifest.settings_key({'e1': 6}, snr_type=66)
+    assert key != manifest.settings_key({'e1': 5}, snr_type=99)
+
+    assert not manifest.is_current(fname, 1, key, files)
+    output = tmp_path / 'result.txt'
+    output.write_text('r')
+    manifest.record(fname, 1, key, files, output)
+    manifest.record(fname, 2, key, files[:1])
+    assert manifest.is_current(fname, 1, key, files, output)
+    assert manifest.is_current(fname, 1, key, files)
+    # a result file written afterwards
+    os.utime(output, ns=(2, 2))
+    assert not manifest.is_current(fname, 1, key, files, output)
+    manifest.rekey(fname, 1, key, output)
+    assert manifest.is_current(fname, 1, key, files, output)
+    assert not manifest.is_current(fname, 1, 'other', files)
+    assert not manifest.is_current(fname, 1, key, files[:1])
+
+    # the contents count, not the modification time
+    os.utime(data, ns=(1, 1))
+    assert manifest.is_current(fname, 1, key, files)
+    assert manifest.read_manifest(fname)[1]['inputs']['input.txt']['mtime_ns'] == 1
+    data.write_text('b')
+    assert not manifest.is_current(fname, 1, key, files)
+    # a file that shows up
+    data.write_text('a')
+    (tmp_path / 'later.txt').write_text('c')
+    assert not manifest.is_current(fname, 1, key, files)
+
+    # a half written line is ignored, compaction keeps the last line of each day
+    with open(fname, 'a') as f:
+        f.write('{"doy": 1, "key"')
+    entries = manifest.read_manifest(fname)
+    assert sorted(entries) == [1, 2]
+    manifest.compact_manifest(fname)
+    assert manifest.read_manifest(fname) == entries
+    with open(fname) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_phase_inputs(refl_code):
+    from gnssrefl.phase_functions import phase_inputs
+    config = {'midnite': False, 'refraction': True}
+    files = [os.path.relpath(f, refl_code) for f in phase_inputs('mchl', 2025, 11, 66, [1, 20], config)]
+    assert files == ['2025/snr/mchl/mchl0110.25.snr66.gz', 'input/mchl_refr.txt', 'Files/mchl/vwc_tracks.json',
+                     '2025/results/mchl/011.txt', '2025/results/mchl/failQC/011.txt']
+    config['recompute_lsp'] = True
+    files = phase_inputs('mchl', 2025, 11, 66, [20], config, legacy=True)
+    assert len(files) == 3 and files[-1].endswith('mchl_phaseRH_L2.txt')
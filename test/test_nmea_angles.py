@@ -0,0 +1,98 @@
+"""
+fix_angle_azimuth_all, for all the satellites at once, against
+fix_angle_azimuth one satellite at a time (as nmea2snr did) on a day of
+NMEA-like observations: integer degree elevation angles and azimuths, two
+frequencies per satellite, satellites rising and setting, azimuths going
+through north.
+"""
+import numpy as np
+
+from gnssrefl import nmea2snr
+
+
+def nmea_day(rate=5, seed=0):
+    rng = np.random.default_rng(seed)
+    sec = np.arange(0, 86400, rate, dtype=float)
+    t = []; prn = []; elv = []; az = []
+    sats = [1, 2, 3, 5, 8, 13, 21, 101, 102, 115, 201, 204, 230, 301, 319]
+    for sat in sats:
+        phase = rng.uniform(0, 2*np.pi)
+        period = rng.uniform(30000, 50000)
+        elev = 80*np.sin(2*np.pi*sec/period + phase)
+        azim = (rng.uniform(0, 360) + rng.uniform(-40, 40)*sec/3600) % 360
+        up = elev >= 0
+        for f in range(2):
+            t.append(sec[up]); prn.append(np.full(up.sum(), sat))
+            elv.append(np.floor(elev[up])); az.append(np.floor(azim[up]))
+    t = np.concatenate(t); prn = np.concatenate(prn); elv = np.concatenate(elv); az = np.concatenate(az)
+    # as read from the file: by time, the satellites of an epoch in any order
+    order = np.lexsort((rng.random(len(t)), t))
+    t, prn, elv, az = t[order], prn[order], elv[order], az[order]
+
+    def add(tt, p, e, a):
+        p, e, a = np.broadcast_arrays(p, e, a, tt)[:3]
+        return np.append(t, tt), np.append(prn, p), np.append(elv, e), np.append(az, a)
+    n = 200
+    # a satellite whose elevation angle never changes, one with a single change
+    t, prn, elv, az = add(sec[:n], 40, 10.0, np.arange(n, dtype=float))
+    t, prn, elv, az = add(sec[:n], 41, np.where(np.arange(n) < 50, 10.0, 11.0), np.arange(n, dtype=float))
+    # negative azimuths (the circular mean), and times going backwards
+    t, prn, elv, az = add(sec[:n], 42, np.arange(n)//7, -90 + np.arange(n)//3)
+    t, prn, elv, az = add(sec[n:0:-1], 43, np.arange(n)//4, (355 + np.arange(n)//5) % 360)
+    # two values at the same time
+    t, prn, elv, az = add(np.repeat(sec[:n], 2), 44, np.arange(2*n)//3, np.arange(2*n)//2)
+    return t, prn.astype(int), elv, az
+
+
+def one_at_a_time(t, prn, elv, az):
+    T = []; PRN = []; AZ = []; ELV = []
+    for i_prn in np.unique(prn):
+        time = t[prn == i_prn]; angle = elv[prn == i_prn]; azimuth = az[prn == i_prn]
+        angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth(time, angle, azimuth)
+        if (len(angle_fixed) == 0 and len(azim_fixed) == 0):
+            continue
+        T.extend(time); AZ.extend(azim_fixed); ELV.extend(angle_fixed); PRN.extend(prn[prn == i_prn])
+    return np.array(T), np.array(PRN), np.array(ELV), np.array(AZ)
+
+
+def test_same_as_fix_angle_azimuth():
+    t, prn, elv, az = nmea_day()
+    T, PRN, ELV, AZ = one_at_a_time(t, prn, elv, az)
+    index, angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth_all(prn, t, elv, az)
+    assert len(T) > 100000
+    assert 40 not in PRN and 41 not in PRN and 42 in PRN
+    np.testing.assert_array_equal(t[index], T)
+    np.testing.assert_array_equal(prn[index], PRN)
+    np.testing.assert_array_equal(angle_fixed, ELV)
+    np.testing.assert_array_equal(azim_fixed, AZ)
+    # and so the same order once sorted by time
+    np.testing.assert_array_equal(np.argsort(t[index]), np.argsort(T))
+
+
+def test_nan_and_empty():
+    t, prn, elv, az = nmea_day(rate=60)
+    elv[::97] = np.nan
+    keep = ~np.isnan(elv)
+    T, PRN, ELV, AZ = one_at_a_time(t[keep], prn[keep], elv[keep], az[keep])
+    index, angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth_all(prn, t, elv, az)
+    np.testing.assert_array_equal(t[index], T)
+    np.testing.assert_array_equal(angle_fixed, ELV)
+    np.testing.assert_array_equal(azim_fixed, AZ)
+
+    index, angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth_all(prn[:0], t[:0], elv[:0], az[:0])
+    assert len(index) == len(angle_fixed) == len(azim_fixed) == 0
+    index, angle_fixed, azim_fixed = nmea2snr.fix_angle_azimuth_all(np.array([1, 1]), np.array([0., 1.]),
+                                                                      np.array([5., 6.]), np.array([7., 8.]))
+    assert len(index) == len(angle_fixed) == len(azim_fixed) == 0
+
+
+def test_interp1d_segments():
+    rng = np.random.default_rng(1)
+    bx = np.round(rng.uniform(0, 10, 30), 1); by = rng.normal(size=30); bseg = np.repeat([0, 1, 2], 10)
+    bx[3] = bx[4]            # ties
+    x = np.concatenate((np.linspace(-2, 12, 50), bx[10:20]))
+    seg = np.repeat([0, 1, 2, 1], [20, 20, 10, 10])
+    y = nmea2snr.interp1d_segments(seg, x, bseg, bx, by)
+    for k in range(3):
+        f = nmea2snr.interp1d(bx[bseg == k], by[bseg == k], kind='linear', fill_value='extrapolate')
+        np.testing.assert_array_equal(y[seg == k], f(x[seg == k]))
@@ -0,0 +1,143 @@
+"""
+Tests for the numpy NMEA reader (nmea_reader.read_nmea_arrays): it has to give
+the same satellites, times and values as nmea2snr.read_nmea, including for the
+broken lines that read_nmea skips.
+"""
+import gzip
+
+import numpy as np
+import pytest
+
+from gnssrefl import nmea2snr
+from gnssrefl import nmea_reader
+
+
+def sentence(body, end='\r\n'):
+    checksum = 0
+    for c in body.encode('ascii'):
+        checksum ^= c
+    return '${0:s}*{1:02X}{2:s}'.format(body, checksum, end)
+
+
+def gsv(talker, sats, signal=None, nmsg=1, msg=1):
+    fields = [talker + 'GSV', str(nmsg), str(msg), '{0:02d}'.format(len(sats))]
+    for sat in sats:
+        fields += list(sat)
+    if signal is not None:
+        fields.append(signal)
+    return sentence(','.join(fields))
+
+
+def epoch(hms, date='210125', rng=None):
+    """RMC, GGA and GSV lines of one epoch, with the signal IDs of each constellation"""
+    rng = rng or np.random.default_rng(0)
+
+    def sats(k, first=1):
+        return [('{0:02d}'.format(first + i), '{0:02d}'.format(rng.integers(0, 90)),
+                 '{0:03d}'.format(rng.integers(0, 360)), '' if rng.random() < 0.1 else '{0:02d}'.format(rng.integers(20, 50)))
+                for i in range(k)]
+    lines = [sentence('GPRMC,{0:s},A,4000.0000,N,10500.0000,W,0.0,0.0,{1:s},,,A'.format(hms, date)),
+             sentence('GPGGA,{0:s},4000.0000,N,10500.0000,W,1,12,1.0,1600.0,M,-20.0,M,,'.format(hms))]
+    lines += [gsv('GP', sats(4)), gsv('GP', sats(3), nmsg=2, msg=2)]     # NMEA 4.10, no signal ID
+    for talker, signals in [('GP', '0123456789'), ('GL', '01234'), ('GA', '01234567'), ('GB', '0123456789ABC'),
+                            ('BD', '15B')]:
+        for sig in signals:
+            lines.append(gsv(talker, sats(rng.integers(1, 5), first=65 if talker == 'GL' else 1), sig))
+    return lines
+
+
+def nmea_lines():
+    rng = np.random.default_rng(42)
+    lines = [gsv('GP', [('01', '45', '100', '40')])]     # before the first date: skipped
+    lines.append(sentence('GPRMC,000000.00,A,,,,,,,999999,,,A'))   # bad date
+    lines.append(gsv('GP', [('02', '45', '100', '40')]))
+    for sec in range(0, 240, 1):
+        hms = '{0:02d}{1:02d}{2:02d}.{3:02d}'.format(sec // 3600, (sec // 60) % 60, sec % 60, 0 if sec % 7 else 50)
+        lines += epoch(hms, rng=rng)
+    odd = [
+        gsv('GN', [('01', '45', '100', '40')], '1'),              # GNGSV is not supported
+        gsv('GP', [('01', '45', '100', '40')])[:-6] + '\n',      # no checksum, \n line end
+        gsv('GP', [('01', '45', '100', '40')], '1')[:-6] + '\n',   # signal ID '1\n': not L1
+        '$GPGSV,1,1,01,05,45,100,40*7A*11\r\n',                  # two '*'
+        '$GPGSV,1,1,02,05,45,100,40,0*6,45,100,40\r\n',        # '*' in a satellite number
+        '$GPGSV,1,1,01,05,45,100,$GPGSV,1,1,01,05,45,100,40*7A\r\n',   # two sentences in one line
+        'GPGSV,1,1,01,05,45,100,40*7A\r\n',                      # no $
+        gsv('GP', [('', '45', '100', '40'), ('x', '45', '100', '40'), (' 7', ' 5', '1.5', '4e1')]),
+        gsv('GL', [('70', '', '', '')], ''),                     # empty fields and signal ID
+        gsv('GA', [('11', '45', '100', '40')], '12'),
+        gsv('GP', [('01', '45', '100', '40'), ('02', '45', '100', '40')])[:-10] + ',40\r\n',   # wrong field count
+        sentence('GPGGA,,4000.0000,N,10500.0000,W,1,12,1.0,1600.0,M,-20.0,M,,'),   # no time: GSV skipped
+        gsv('GP', [('03', '45', '100', '40')]),
+        sentence('GPRMC,235959,A,4000.0000,N,10500.0000,W,0.0,0.0,210125,,,A'),
+        gsv('GP', [('03', '45', '100', '41')]),
+        sentence('GPGGA,000000.00,4000.0000,N,10500.0000,W,1,12,1.0,1600.0,M,-20.0,M,,'),   # midnight
+        gsv('GP', [('04', '45', '100', '42')]),
+        '\r\n', '$G\r\n', '\x00\x00\u00e9$\r\n',
+    ]
+    lines += odd
+    lines.append(gsv('GB', [('12', '30', '200', '35')], 'B')[:-2])   # last line without a newline
+    return lines
+
+
+def legacy(fname):
+    """read_nmea as arrays, with the conventions of read_nmea_arrays"""
+    t, prn, az, elv, snr, freq = nmea2snr.read_nmea(fname)
+
+    def number(values):
+        return np.array([float(v) if v != '' else np.nan for v in values])
+    freq = np.array([-1 if f == '' else int(f) if f in ['1', '2', '5', '6', '7', '8'] else 0 for f in freq])
+    return np.array(t, dtype=float), np.array(prn, dtype=int), number(az), number(elv), number(snr), freq
+
+
+def check(fname, expected, **kwargs):
+    result = nmea_reader.read_nmea_arrays(fname, **kwargs)
+    for a, b in zip(result, expected):
+        assert a.dtype == b.dtype
+        np.testing.assert_array_equal(a, b)
+
+
+@pytest.fixture
+def nmea_file(tmp_path):
+    fname = tmp_path / 'test0210.25.A'
+    fname.write_bytes(''.join(nmea_lines()).encode('utf-8'))
+    return str(fname)
+
+
+def test_matches_read_nmea(nmea_file):
+    expected = legacy(nmea_file)
+    assert len(expected[0]) > 10000
+    check(nmea_file, expected)
+    # lines cut across blocks
+    check(nmea_file, expected, blocksize=4093)
+
+
+def test_gzipped(nmea_file, tmp_path):
+    expected = legacy(nmea_file)
+    with open(nmea_file, 'rb') as f:
+        (tmp_path / 'test0210.25.A.gz').write_bytes(gzip.compress(f.read()))
+    check(str(tmp_path / 'test0210.25.A.gz'), expected, blocksize=100000)
+
+
+def test_values(tmp_path):
+    fname = tmp_path / 'test0210.25.A'
+    fname.write_text(''.join([sentence('GPRMC,010203.40,A,,,,,,,210125,,,A'),
+                              gsv('GL', [('70', '10', '200', '33'), ('71', '', '201', '34')], '3'),
+                              sentence('GPGGA,010204.00,4000.0000,N,10500.0000,W,1,12,1.0,1600.0,M,-20.0,M,,'),
+                              gsv('GA', [('05', '11', '359', '44')], '1')]))
+    t, prn, az, elv, snr, freq = nmea_reader.read_nmea_arrays(str(fname))
+    np.testing.assert_array_equal(t, [3723.4, 3723.4, 3724.0])
+    np.testing.assert_array_equal(prn, [170, 171, 205])
+    np.testing.assert_array_equal(az, [200, 201, 359])
+    np.testing.assert_array_equal(elv, [10, np.nan, 11])
+    np.testing.assert_array_equal(snr, [33, 34, 44])
+    np.testing.assert_array_equal(freq, [2, 2, 5])
+
+
+def test_empty_file(tmp_path):
+    fname = tmp_path / 'test0210.25.A'
+    fname.write_bytes(b'')
+    t, prn, az, elv, snr, freq = nmea_reader.read_nmea_arrays(str(fname))
+    assert len(t) == len(prn) == len(freq) == 0
+    fname.write_bytes(b'$GPRMC\n$GPGGA\n$GPGSV\n')
+    t, prn, az, elv, snr, freq = nmea_reader.read_nmea_arrays(str(fname))
+    assert len(t) == len(prn) == len(freq) == 0
@@ -0,0 +1,104 @@
+"""
+Tests for the orbit cache (orbit_cache).
+
+Cached orbits must be the same as parsing the file again, and an orbit file
+that changes must not be shadowed by its old cache entry.
+"""
+
+import os
+import time
+import numpy as np
+import pytest
+from unittest.mock import patch
+from scipy.interpolate import CubicSpline
+
+from gnssrefl import gps as g
+from gnssrefl import orbit_cache
+
+
+def write_sp3(filename, nsat=4, interval=900, seed=0):
+    """SP3c file for 2025 doy 21 with GPS, Glonass, Galileo and Beidou satellites."""
+    rng = np.random.default_rng(seed)
+    lines = ['#cP2025  1 21  0  0  0.00000000      96 ORBIT IGS20 FIT  XXX\n', '/* synthetic\n']
+    phase = rng.uniform(0, 2*np.pi, (4, nsat))
+    for sec in range(0, 86400 + interval, interval):
+        day, sod = divmod(sec, 86400)
+        lines.append('*  2025  1 {0:2d} {1:2d} {2:2d}  0.00000000\n'.format(21 + day, sod//3600, (sod//60) % 60))
+        for i, con in enumerate('GREC'):
+            for prn in range(1, nsat + 1):
+                a = 26560 - 3000*i
+                ph = phase[i, prn-1] + 2*np.pi*sec/43082
+                lines.append('P{0:s}{1:02d}{2:14.6f}{3:14.6f}{4:14.6f}{5:14.6f}\n'.format(
+                    con, prn, a*np.cos(ph), a*np.sin(ph)*0.5, a*np.sin(ph)*0.87, 12.3))
+    lines.append('EOF\n')
+    with open(filename, 'w') as f:
+        f.write(''.join(lines))
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        orbit_cache._memory.clear()
+        yield tmp_path
+    orbit_cache._memory.clear()
+
+
+@pytest.fixture
+def sp3file(refl_code):
+    f = refl_code / 'orbits' / 'igs23502.sp3'
+    f.parent.mkdir()
+    write_sp3(f)
+    return str(f)
+
+
+class TestOrbitCache:
+
+    def test_sp3_cached(self, sp3file, refl_code):
+        sp3 = g.read_sp3file(sp3file)
+        assert sp3.shape == (97*16, 6)
+        np.testing.assert_array_equal(sp3, g._parse_sp3file(sp3file))
+        assert len(list((refl_code / 'Files' / 'orbit_cache').glob('igs23502.sp3.*.sp3.*.npz'))) == 1
+        orbit_cache._memory.clear()
+        with patch('gnssrefl.gps._parse_sp3file') as parse:
+            again = g.read_sp3file(sp3file)
+            parse.assert_not_called()
+        np.testing.assert_array_equal(again, sp3)
+
+    def test_splines_match_cubicspline(self, sp3file):
+        sp3 = g.read_sp3file(sp3file)
+        splines = orbit_cache.sp3_splines(sp3file)
+        orbit_cache._memory.clear()
+        fromdisk = orbit_cache.sp3_splines(sp3file)
+        assert sorted(splines) == [1, 2, 3, 4, 101, 102, 103, 104, 201, 202, 203, 204, 301, 302, 303, 304]
+        t = np.linspace(sp3[0, 2] - 600, sp3[-1, 2] + 600, 1001)
+        for sat_id in [1, 104, 203, 304]:
+            m = sp3[:, 0] == sat_id
+            for k in range(3):
+                expected = CubicSpline(sp3[m, 2], sp3[m, 3+k], extrapolate=True)(t)
+                np.testing.assert_array_equal(splines[sat_id][k](t), expected)
+                np.testing.assert_array_equal(fromdisk[sat_id][k](t), expected)
+
+    def test_changed_file_is_parsed_again(self, sp3file, refl_code):
+        first = g.read_sp3file(sp3file)
+        write_sp3(sp3file, seed=1)
+        later = time.time() + 10
+        os.utime(sp3file, (later, later))
+        second = g.read_sp3file(sp3file)
+        assert not np.array_equal(first[:, 3:], second[:, 3:])
+        np.testing.assert_array_equal(second, g._parse_sp3file(sp3file))
+        # the old entry is gone
+        assert len(list((refl_code / 'Files' / 'orbit_cache').glob('igs23502.sp3.*.sp3.*.npz'))) == 1
+
+    def test_table(self, refl_code):
+        orbfile = refl_code / 'GPSorbits_21sep17.txt'
+        np.savetxt(orbfile, np.arange(50.0).reshape(10, 5), header='sat time x y z', comments='%')
+        np.testing.assert_array_equal(orbit_cache.read_table(str(orbfile)), np.genfromtxt(orbfile, comments='%'))
+
+    def test_without_refl_code(self, tmp_path):
+        f = tmp_path / 'igs23502.sp3'
+        write_sp3(f)
+        with patch.dict(os.environ):
+            os.environ.pop('REFL_CODE', None)
+            assert orbit_cache.cache_name(str(f), 'sp3') is None
+            np.testing.assert_array_equal(g.read_sp3file(str(f)), g._parse_sp3file(str(f)))
+        orbit_cache._memory.clear()
@@ -0,0 +1,97 @@
+"""
+Tests for gnssir -reqc (arc_peaks.py): the QC settings applied to the stored
+periodogram peaks must give the result and failQC files of a full gnssir run.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from gnssrefl import arc_peaks
+from gnssrefl import gnssir_cl
+import gnssrefl.extract_arcs
+
+FIXTURE_DIR = Path(__file__).parent / 'data' / 'refl_code'
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    """REFL_CODE tree with the mchl test files, as in run_processing.sh."""
+    (tmp_path / '2025' / 'snr' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'input' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'Files').mkdir()
+    (tmp_path / 'logs').mkdir()
+    for f in (FIXTURE_DIR / '2025' / 'snr' / 'mchl').glob('*.snr66.gz'):
+        shutil.copy(f, tmp_path / '2025' / 'snr' / 'mchl' / f.name)
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl' / 'mchl.json', tmp_path / 'input' / 'mchl')
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl_refr.txt', tmp_path / 'input')
+    (tmp_path / 'input' / 'gpt_1wA.pickle').touch()
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield tmp_path
+
+
+def run(**kwargs):
+    """runs gnssir for days 10 and 11; returns the days whose SNR files were read and the result files"""
+    with patch('gnssrefl.extract_arcs.extract_arcs_from_station',
+               wraps=gnssrefl.extract_arcs.extract_arcs_from_station) as extract:
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=11, gzip=False, **kwargs)
+    results = Path(os.environ['REFL_CODE']) / '2025' / 'results' / 'mchl'
+    files = {str(f.relative_to(results)): f.read_text() for f in results.glob('**/0*.txt')}
+    return [c.args[2] for c in extract.call_args_list], files
+
+
+@pytest.mark.parametrize('mmdd', [False, True])
+def test_reqc_same_as_gnssir(refl_code, mmdd):
+    tighter = dict(PkNoise=3.5, ampl=[8, 6, 7], ediff=1.0, delTmax=60)
+    days, full = run(mmdd=mmdd, **tighter)
+    assert days == [10, 11]
+    days, default = run(mmdd=mmdd, savepeaks=True)
+    assert sorted(full) == ['010.txt', '011.txt', 'failQC/010.txt', 'failQC/011.txt'] and full != default
+
+    # from the stored peaks
+    days, files = run(mmdd=mmdd, reqc=True, **tighter)
+    assert days == [] and files == full
+    days, files = run(mmdd=mmdd, reqc=True)
+    assert days == [] and files == default
+    # with -incremental the manifest knows the results are current for the other QC settings
+    run(mmdd=mmdd, incremental=True)
+    run(mmdd=mmdd, reqc=True, incremental=True, **tighter)
+    assert run(mmdd=mmdd, incremental=True, **tighter)[0] == []
+
+
+def test_reqc_needs_periodograms(refl_code):
+    run(delTmax=40, savepeaks=True)
+    with np.load(arc_peaks.peaks_name('mchl', 2025, 10)) as data:
+        peaks = data['peaks']
+    assert (peaks[peaks[:, 14] >= 40, arc_peaks.LSP] == 0).all() and (peaks[:, 14] >= 40).any()
+
+    # arcs longer than 40 minutes have no periodogram: a larger delTmax needs the SNR files
+    days, files = run(reqc=True, delTmax=75)
+    assert days == [10, 11]
+    assert files == run()[1]
+    # other settings than the ones the peaks were computed with
+    days, files = run(reqc=True, e1=6.0)
+    assert days == [10, 11]
+    assert run(reqc=True, e1=6.0)[0] == []
+
+
+def test_peaks_file(refl_code):
+    # only kept when asked for
+    run()
+    assert not (refl_code / '2025' / 'results' / 'mchl' / 'peaks').exists()
+    run(savepeaks=True)
+    fname = arc_peaks.peaks_name('mchl', 2025, 11)
+    assert fname == refl_code / '2025' / 'results' / 'mchl' / 'peaks' / '011.npz'
+    with np.load(fname) as data:
+        peaks = data['peaks']
+    assert peaks.shape[1] == 17 + len(arc_peaks.EXTRA_COLUMNS)
+    # one row per arc, with and without a periodogram
+    failqc = np.loadtxt(refl_code / '2025' / 'results' / 'mchl' / 'failQC' / '011.txt', comments='%')
+    lsp = np.loadtxt(refl_code / '2025' / 'results' / 'mchl' / '011.txt', comments='%')
+    assert len(peaks) == len(failqc) + len(lsp)
+    assert np.isnan(peaks[peaks[:, arc_peaks.LSP] == 0, 2]).all()
+    assert not np.isnan(peaks[peaks[:, arc_peaks.LSP] == 1, 2]).any()
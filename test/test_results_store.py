@@ -0,0 +1,165 @@
+"""
+Tests for the binary store of the daily result files (results_store.py): the
+readers must get the arrays np.loadtxt gives for the text files, and the text
+files stay the reference when they change behind the store's back.
+"""
+
+import os
+import shutil
+import warnings
+from pathlib import Path
+from unittest.mock import patch
+
+import matplotlib
+import numpy as np
+import pytest
+
+from gnssrefl import results_store
+
+FIXTURE_DIR = Path(__file__).parent / 'data' / 'refl_code'
+FMT = '%4.0f %3.0f %6.3f %3.0f %6.3f %6.2f %6.2f %6.2f %6.2f %4.0f  %3.0f  %2.0f %8.5f %6.2f %7.2f %12.6f %2.0f'
+HEADER = 'station test\n(1) (2) (3)\nyear, doy, RH\nm'
+
+
+def result_rows(n, doy, seed=0):
+    rng = np.random.default_rng(seed + doy)
+    rows = rng.uniform(0, 360, size=(n, 17))
+    rows[:, 0] = 2025
+    rows[:, 1] = doy
+    rows[:, 15] = 60700 + doy + np.sort(rng.uniform(0, 1, n))
+    if n:
+        rows[0, 6] = np.nan
+    return rows
+
+
+def loadtxt(filename):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return np.loadtxt(filename, comments='%')
+
+
+def assert_loadtxt(a, filename):
+    b = loadtxt(filename)
+    assert a.shape == b.shape
+    np.testing.assert_array_equal(a, b)
+
+
+@pytest.fixture
+def results_dir(tmp_path):
+    results_store._memory.clear()
+    direc = tmp_path / '2025' / 'results' / 'test'
+    direc.mkdir(parents=True)
+    for doy, n in [(1, 40), (2, 1), (3, 0), (10, 25), (200, 3)]:
+        results_store.write_result_file(direc / f'{doy:03d}.txt', result_rows(n, doy), FMT, HEADER)
+    return direc
+
+
+def test_write_and_read(results_dir, tmp_path):
+    # the same text as np.savetxt
+    np.savetxt(tmp_path / 'savetxt.txt', result_rows(40, 1), fmt=FMT, delimiter=' ', newline='\n', header=HEADER, comments='%')
+    assert (tmp_path / 'savetxt.txt').read_text() == (results_dir / '001.txt').read_text()
+    assert os.path.isfile(results_store.store_name(results_dir))
+
+    results_store._memory.clear()
+    with patch('gnssrefl.results_store._read_text') as read_text:
+        for doy in [1, 2, 3, 10, 200]:
+            assert_loadtxt(results_store.read_result_file(results_dir / f'{doy:03d}.txt'), results_dir / f'{doy:03d}.txt')
+        results = results_store.read_results(results_dir, 2, 10)
+        read_text.assert_not_called()
+    assert sorted(results) == [2, 3, 10]
+    for doy, a in results.items():
+        assert_loadtxt(a, results_dir / f'{doy:03d}.txt')
+    # arrays that can be changed
+    results[10][0, 0] = 0
+    assert results_store.read_results(results_dir)[10][0, 0] == 2025
+
+
+def test_text_file_is_the_reference(results_dir):
+    # written by something else, removed, broken, or another name: read as text
+    np.savetxt(results_dir / '010.txt', result_rows(5, 10, seed=1), fmt='%8.3f', header=HEADER, comments='%')
+    (results_dir / '200.txt').unlink()
+    (results_dir / '003.txt').write_text('% header\n1 2 3\n4 5\n')
+    np.savetxt(results_dir / 'other.txt', np.ones((2, 3)))
+    results = results_store.read_results(results_dir)
+    assert sorted(results) == [1, 2, 10]
+    assert_loadtxt(results[10], results_dir / '010.txt')
+    assert_loadtxt(results_store.read_result_file(results_dir / 'other.txt'), results_dir / 'other.txt')
+    with pytest.raises(OSError):
+        results_store.read_result_file(results_dir / '200.txt')
+
+    # and now it is in the store
+    results_store._memory.clear()
+    with patch('gnssrefl.results_store._read_text') as read_text:
+        assert_loadtxt(results_store.read_result_file(results_dir / '010.txt'), results_dir / '010.txt')
+        read_text.assert_not_called()
+
+
+def test_partial_group_and_compaction(results_dir):
+    storefile = results_store.store_name(results_dir)
+    with open(storefile, 'ab') as f:
+        f.write(b'\x01' * 100)        # a group being written
+    results_store._memory.clear()
+    with patch('gnssrefl.results_store._read_text') as read_text:
+        results_store.read_results(results_dir)
+        read_text.assert_not_called()
+
+    size = os.path.getsize(storefile)
+    for i in range(30):
+        results_store.write_result_file(results_dir / '010.txt', result_rows(2000, 10, seed=i), FMT, HEADER)
+    assert os.path.getsize(storefile) > 5*size
+    # the readers do not rewrite the store
+    grown = os.path.getsize(storefile)
+    results = results_store.read_results(results_dir)
+    assert os.path.getsize(storefile) >= grown
+    for doy, a in results.items():
+        assert_loadtxt(a, results_dir / f'{doy:03d}.txt')
+    results_store.compact_store(results_dir)
+    assert os.path.getsize(storefile) < size + 2000*17*8*2
+    results = results_store.read_results(results_dir)
+    for doy, a in results.items():
+        assert_loadtxt(a, results_dir / f'{doy:03d}.txt')
+    results_store._memory.clear()
+    for doy, a in results_store.read_results(results_dir).items():
+        assert_loadtxt(a, results_dir / f'{doy:03d}.txt')
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    """REFL_CODE tree with the mchl test files, as in run_processing.sh."""
+    (tmp_path / '2025' / 'snr' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'input' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'Files').mkdir()
+    (tmp_path / 'logs').mkdir()
+    for f in (FIXTURE_DIR / '2025' / 'snr' / 'mchl').glob('*.snr66.gz'):
+        shutil.copy(f, tmp_path / '2025' / 'snr' / 'mchl' / f.name)
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl' / 'mchl.json', tmp_path / 'input' / 'mchl')
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl_refr.txt', tmp_path / 'input')
+    (tmp_path / 'input' / 'gpt_1wA.pickle').touch()
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield tmp_path
+
+
+def test_gnssir_and_daily_avg(refl_code):
+    from gnssrefl import daily_avg_cl, gnssir_cl
+    from gnssrefl.extract_arcs import load_results_with_failqc
+    matplotlib.use('Agg')
+    gnssir_cl.gnssir('mchl', 2025, 10, doy_end=12, gzip=False)
+    results = refl_code / '2025' / 'results' / 'mchl'
+    assert os.path.isfile(results / 'rh_store.bin') and os.path.isfile(results / 'failQC' / 'rh_store.bin')
+
+    outputs = {}
+    for store in [True, False]:
+        results_store._memory.clear()
+        if not store:
+            os.remove(results / 'rh_store.bin')
+            os.remove(results / 'failQC' / 'rh_store.bin')
+        with patch('gnssrefl.results_store._read_text', wraps=results_store._read_text) as read_text:
+            daily_avg_cl.daily_avg('mchl', 0.25, 10, plt=False, year1=2025, year2=2025)
+            both = load_results_with_failqc('mchl', 2025, 11, '', require_failqc=True)
+        assert read_text.call_count == (0 if store else 4)
+        files = refl_code / 'Files' / 'mchl'
+        # without the 'calculated on' line, which has the time of the run
+        outputs[store] = {f.name: [line for line in f.read_text().splitlines() if 'calculated on' not in line]
+                          for f in files.glob('*.txt')}, both
+    assert outputs[True][0] == outputs[False][0] and len(outputs[True][0]) > 0
+    np.testing.assert_array_equal(outputs[True][1], outputs[False][1])
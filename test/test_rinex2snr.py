@@ -2,6 +2,7 @@ import gzip
 import stat
 
 import pytest
+from scipy.interpolate import CubicSpline
 
 from gnssrefl.rinex2snr import *
 from gnssrefl.gps import *
@@ -157,3 +158,159 @@ def test_cl_refusals(tmp_path, handed_over):
     rnx_cl.rinex2snr()
 
     assert handed_over == []
+
+
+def nav_table(prns, toes, week=2350, seed=0):
+    """broadcast ephemeris table (as made by myreadnav) with GPS-like orbits"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for prn in prns:
+        M0, Loa, perigee = rng.uniform(-np.pi, np.pi, 3)
+        for k, toe in enumerate(toes):
+            r = np.zeros(32)
+            r[[0, 1, 2, 14, 24]] = prn, week, toe, toe, week
+            r[8] = 4.5e-9; r[9] = M0 + 0.01*k; r[11] = 0.01; r[13] = 5153.6
+            r[16] = Loa; r[18] = 0.96; r[20] = perigee; r[21] = -8e-9
+            r[[7, 19]] = rng.normal(0, 100, 2)
+            rows.append(r)
+    return np.array(rows)
+
+
+RECV = np.array([-2430697.0, -4704189.0, 3544329.0])
+
+
+def test_nav_ephem_index_matches_myfindephem():
+    ephem = nav_table([3], [7200, 14400, 14400, 21600, 3600])
+    ephem[2, 9] += 1  # same Toe as row 1, different orbit
+    week = 2350
+    teph = ephem[:, 24]*604800 + ephem[:, 14]
+    for sow in [0, 3599, 3600, 14400, 15000, 30000]:
+        idx = rnx.nav_ephem_index(teph, np.array([week*604800 + sow]))[0]
+        np.testing.assert_array_equal(ephem[idx], myfindephem(week, sow, ephem, 3))
+
+
+def test_propagate_and_azel_nav_matches_satorb_prop():
+    ephem = nav_table([1, 2], [172800])
+    lat, lon, h = xyz2llh(RECV, 1e-8)
+    up_, East, North = up(lat, lon)
+    sow = np.arange(172800 - 7200, 172800 + 7200, 900.0)
+    block = np.repeat(ephem[1:2], len(sow), axis=0)
+    ele, azi = rnx.propagate_and_azel_nav(sow, block, RECV, up_, East, North)
+    for i, s in enumerate(sow):
+        r = np.subtract(rnx.satorb_prop(2350, s, 2, RECV, ephem[1]), RECV)
+        assert ele[i] == pytest.approx(elev_angle(up_, r)*180/np.pi, abs=1e-9)
+        assert azi[i] == pytest.approx(azimuth_angle(r, East, North), abs=1e-9)
+
+
+def test_write_snr_from_nav_epoch_order(tmp_path, monkeypatch):
+    sats = [2, 5, 9, 14, 21, 27, 31]
+    ephem = nav_table(sats[1:], np.arange(0, 6)*7200 + 172800)
+    monkeypatch.setattr(rnx.g, 'myreadnav', lambda navfile: ephem)
+    obstimes = [datetime.datetime(2025, 1, 21) + datetime.timedelta(seconds=s) for s in range(0, 36000, 60)]
+    rng = np.random.default_rng(2)
+    S1 = rng.uniform(30, 50, (len(obstimes), len(sats)))
+    S1[::7, 2] = np.nan
+    obsdata = {'G': {'S1': S1, 'S2': S1 - 3}}
+    prntoidx = {'G': {s: i for i, s in enumerate(sats)}}
+    lat, lon, h = xyz2llh(RECV, 1e-8)
+    up_, East, North = up(lat, lon)
+    snrfile = tmp_path / 'out.snr'
+    with open(tmp_path / 'log', 'w') as log:
+        rnx.write_snr_from_nav('x', obstimes, obsdata, ['S1', 'S2'], prntoidx, sats, str(snrfile),
+                               True, True, False, up_, East, North, 0, 30, RECV, 120, log)
+    # the epoch by epoch version it replaces
+    expected = []
+    for a in obstimes[::2]:
+        sod = 3600*a.hour + 60*a.minute + a.second
+        gweek, gpss = kgpsweek(a.year, a.month, a.day, a.hour, a.minute, a.second)
+        for sat in sats[1:]:
+            s1 = S1[obstimes.index(a), prntoidx['G'][sat]]
+            if np.isnan(s1):
+                continue
+            r = np.subtract(rnx.satorb_prop(gweek, gpss, sat, RECV, myfindephem(gweek, gpss, ephem, sat)), RECV)
+            ele = elev_angle(up_, r)*180/np.pi
+            if 0 <= ele <= 30:
+                expected.append("{0:3.0f} {1:10.4f} {2:10.4f} {3:10.0f} {4:7.2f} {5:7.2f} {6:7.2f} {7:7.2f} {8:7.2f} \n".format(
+                    sat, ele, azimuth_angle(r, East, North), sod, 0, 0, s1, s1 - 3, 0))
+    assert len(expected) > 50
+    assert snrfile.read_text() == ''.join(expected)
+
+
+def sp3_orbit_table(sats, sow0, seed=0):
+    """sp3 array (as read by read_sp3file) with 15 minute positions of GPS-like orbits"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for sat in sats:
+        phase, incl = rng.uniform(0, 2*np.pi, 2)
+        for t in np.arange(sow0 - 3600, sow0 + 90000, 900.0):
+            ph = phase + 2*np.pi*(t - sow0)/43082
+            rows.append([sat, 2350, t, 2.656e7*np.cos(ph), 2.656e7*np.sin(ph)*np.cos(incl), 2.656e7*np.sin(ph)*np.sin(incl)])
+    return np.array(rows)
+
+
+def rinex3_snr_file(filename, xyz, seconds, seed):
+    """RINEX 3 file with S1C and S2W (GPS) and S1C and S5Q (Galileo) observations"""
+    rng = np.random.default_rng(seed)
+    lines = ['{0:<60s}RINEX VERSION / TYPE\n'.format('     3.04           OBSERVATION DATA    M'),
+             '{0:<60s}APPROX POSITION XYZ\n'.format('{0:14.4f}{1:14.4f}{2:14.4f}'.format(*xyz)),
+             '{0:<60s}SYS / # / OBS TYPES\n'.format('G    2 S1C S2W'),
+             '{0:<60s}SYS / # / OBS TYPES\n'.format('E    2 S1C S5Q'),
+             '{0:<60s}END OF HEADER\n'.format('')]
+    sats = ['G01', 'G03', 'G06', 'G10', 'E02', 'E07']
+    for sec in seconds:
+        lines.append('> 2025 01 21 {0:02d} {1:02d}{2:11.7f}  0{3:3d}\n'.format(sec//3600, (sec//60) % 60, sec % 60, len(sats)))
+        for sat in sats:
+            lines.append(sat + ''.join('{0:14.3f}  '.format(v) for v in rng.uniform(30, 50, 2)).rstrip() + '\n')
+    with open(filename, 'w') as f:
+        f.write(''.join(lines))
+
+
+def test_azel_from_trajectory_matches_propagate_and_azel_sp3():
+    from gnssrefl.snrfile_functions import constants, sp3_trajectory, azel_from_trajectory
+    gweek, sow0 = kgpsweek(2025, 1, 21, 0, 0, 0)
+    sp3 = sp3_orbit_table([5], sow0)
+    iX, iY, iZ = [CubicSpline(sp3[:, 2], sp3[:, k], extrapolate=True) for k in [3, 4, 5]]
+    lat, lon, h = xyz2llh(RECV, 1e-8)
+    up_, East, North = up(lat, lon)
+    t = sow0 + np.arange(0, 86400, 7.0)
+    traj = sp3_trajectory(iX, iY, iZ, t)
+    for dt in [0, 0.5]:
+        ele, azi = rnx.propagate_and_azel_sp3(iX, iY, iZ, t + dt, RECV, up_, East, North, constants.omegaEarth, constants.c)
+        ele2, azi2 = azel_from_trajectory(traj, dt, RECV, up_, East, North, constants.omegaEarth, constants.c)
+        np.testing.assert_allclose(ele2, ele, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(np.cos(np.radians(azi2 - azi)), 1, rtol=0, atol=1e-12)
+
+
+def test_translate_rinex_batch_matches_single_files(tmp_path, monkeypatch, gnssrefl_dirs):
+    gweek, sow0 = kgpsweek(2025, 1, 21, 0, 0, 0)
+    sats = [1, 3, 6, 10, 202, 207]
+    orbfile = tmp_path / 'orbits' / 'gbm23502.sp3'
+    orbfile.write_text('the orbit table below is used instead\n')
+    monkeypatch.setattr(rnx.g, 'get_orbits_setexe', lambda *args: (True, orbfile.name, str(orbfile.parent)))
+    monkeypatch.setattr(rnx.g, 'read_sp3file', lambda f: sp3_orbit_table(sats, sow0))
+    stations = {'aaaa': RECV, 'bbbb': RECV + [30000.0, -20000.0, 10000.0], 'cccc': np.array([4075580.0, 931854.0, 4801568.0])}
+    folder = tmp_path / 'network'
+    os.makedirs(folder)
+    for i, (station, xyz) in enumerate(stations.items()):
+        rinex3_snr_file(folder / '{0:s}0210.25o'.format(station), xyz, range(i*15, 86400, 60), seed=i)
+
+    expected = {}
+    for station in stations:
+        rnx.translate_rinex_file(str(folder / '{0:s}0210.25o'.format(station)), station, 2025, 21, 88, 'gbm', 0, False, False)
+        snrfile = quickname(station, 2025, '25', '021', '88')
+        expected[station] = np.loadtxt(snrfile)
+        os.remove(snrfile)
+
+    batch = []
+    for station in stations:
+        rnx.translate_rinex_file(str(folder / '{0:s}0210.25o'.format(station)), station, 2025, 21, 88, 'gbm', 0,
+                                 False, False, batch=batch)
+    assert [f['station'] for f in batch] == list(stations)
+    rnx.translate_rinex_batch(batch)
+
+    for station in stations:
+        snr = np.loadtxt(quickname(station, 2025, '25', '021', '88'))
+        assert len(snr) > 1000
+        np.testing.assert_array_equal(snr[:, [0, 3, 6, 7, 8, 9, 10]], expected[station][:, [0, 3, 6, 7, 8, 9, 10]])
+        # same angles up to the last (rounded) digit
+        np.testing.assert_allclose(snr[:, [1, 2, 4, 5]], expected[station][:, [1, 2, 4, 5]], rtol=0, atol=1.5e-4)
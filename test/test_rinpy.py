@@ -0,0 +1,276 @@
+"""
+Tests for the RINEX observation file reader (rinpy).
+"""
+
+import gzip
+import os
+import re
+
+import numpy as np
+import pytest
+
+from gnssrefl import highrate
+from gnssrefl import rinpy
+
+HATANAKA = os.path.join(os.path.dirname(__file__), 'data', 'hatanaka')
+
+HEADER3 = ''.join(['{0:<60s}RINEX VERSION / TYPE\n'.format('     3.04           OBSERVATION DATA    M'),
+                   '{0:<60s}SYS / # / OBS TYPES\n'.format('G    4 C1C L1C S1C S2W'),
+                   '{0:<60s}SYS / # / OBS TYPES\n'.format('E    3 C1C S1C S5Q'),
+                   '{0:<60s}END OF HEADER\n'.format('')])
+
+
+def obs_line(sat, values):
+    """RINEX 3 data line: F14.3 plus LLI/SSI for each value, None is blank"""
+    return sat + ''.join(' '*16 if v is None else '{0:14.3f} 7'.format(v) for v in values)
+
+
+EPOCHS = [
+    ('> 2025 01 21 00 00  0.0000000  0  3', [('G05', [2.1e7, 1.1e8, 45.25, 40.0]),
+                                               ('E11', [2.3e7, 44.5, None]),
+                                               ('G12', [2.2e7, None, 38.75, None])]),
+    ('> 2025 01 21 00 00  1.0000000  0  2', [('G 5', [2.1e7, 1.1e8, 45.5]),       # short line
+                                               ('G12', [-1.5, 2.0, 39.0, 41.25])]),
+]
+
+
+@pytest.fixture
+def rinex3(tmp_path):
+    lines = [HEADER3]
+    for epoch, sats in EPOCHS:
+        lines.append(epoch + '\n')
+        lines += [obs_line(sat, values) + '\r\n' for sat, values in sats]
+    f = tmp_path / 'test0210.25o'
+    f.write_text(''.join(lines))
+    return str(f)
+
+
+class TestRinex3:
+
+    def test_values(self, rinex3):
+        obsdata, satlists, prntoidx, obstypes, header, obstimes, gpstime = rinpy.processrinexfile(rinex3)
+        assert satlists == {'G': [5, 12], 'E': [11]}
+        assert obstypes == {'G': ['C1C', 'L1C', 'S1C', 'S2W'], 'E': ['C1C', 'S1C']}   # S5Q is empty
+        g = obsdata['G']
+        np.testing.assert_array_equal(g[:, prntoidx['G'][5], 2], [45.25, 45.5])
+        np.testing.assert_array_equal(g[:, prntoidx['G'][12], 3], [np.nan, 41.25])
+        np.testing.assert_array_equal(g[1, prntoidx['G'][12]], [-1.5, 2.0, 39.0, 41.25])
+        assert np.isnan(g[1, prntoidx['G'][5], 3])
+        np.testing.assert_array_equal(obsdata['E'][0, 0], [2.3e7, 44.5])
+        assert np.isnan(obsdata['E'][1, 0]).all()
+
+    def test_keep_only_snr(self, rinex3):
+        full = rinpy.processrinexfile(rinex3)
+        snr = rinpy.processrinexfile(rinex3, keep_obs='S')
+        assert snr[3] == {'G': ['S1C', 'S2W'], 'E': ['S1C']}
+        np.testing.assert_array_equal(snr[0]['G'], full[0]['G'][:, :, 2:])
+        np.testing.assert_array_equal(snr[0]['E'], full[0]['E'][:, :, 1:])
+
+    def test_parsefields_matches_float(self):
+        fields = ['        45.250', '  -1234567.125', '              ', '45            ', '   .5         ',
+                  '   -0.000     ', '  1.5E3       ', '  4 5.2       ', '  1.2.3       ', '     +3.      ']
+        data = np.frombuffer(''.join(fields).encode('ascii'), dtype=np.uint8).reshape(len(fields), 14)
+        values = rinpy._parsefields(data)
+        expected = np.array([rinpy._converttofloat(f) for f in fields])
+        np.testing.assert_array_equal(values, expected)
+        assert np.signbit(values[5])
+
+
+HEADER2 = ''.join(['{0:<60s}RINEX VERSION / TYPE\n'.format('     2.11           OBSERVATION DATA    M (MIXED)'),
+                   '{0:<60s}# / TYPES OF OBSERV\n'.format('     7    L1    L2    C1    P2    S1    S2    S5'),
+                   '{0:<60s}TIME OF FIRST OBS\n'.format('  2025     1    21     0     0    0.0000000     GPS'),
+                   '{0:<60s}END OF HEADER\n'.format('')])
+
+
+def rinex2_epoch(second, sats, rng):
+    """RINEX 2.11 epoch with more than 12 satellites, some blank fields and short lines"""
+    codes = ''.join(sats)
+    lines = [' 25  1 21  0  0{0:11.7f}  0{1:3d}{2:s}'.format(second, len(sats), codes[:36])]
+    lines += ['{0:32s}{1:s}'.format('', codes[i:i+36]) for i in range(36, len(codes), 36)]
+    for i, sat in enumerate(sats):
+        values = ['{0:14.3f} 7'.format(v) for v in rng.uniform(20, 55, 7)]
+        if (i + int(second)) % 4 == 0:
+            values[4] = ' '*16
+        if (i + int(second)) % 5 == 0:
+            values[5:] = ['', '']
+        lines += [''.join(values[:5]), ''.join(values[5:]).rstrip()]
+    return lines
+
+
+@pytest.fixture
+def rinex2(tmp_path):
+    rng = np.random.default_rng(1)
+    lines = [HEADER2]
+    for second in range(20):
+        sats = ['G{0:02d}'.format(p) for p in range(1, 33) if (p + second//10) % 2] + ['R07', 'E11']
+        lines += rinex2_epoch(second, sats, rng)
+        if second == 5:
+            lines += [' 25  1 21  0  0  5.5000000  4  2', 'A COMMENT', 'ANOTHER ONE']
+    f = tmp_path / 'test0210.25o'
+    f.write_text('\n'.join(lines) + '\n')
+    return str(f)
+
+
+@pytest.mark.parametrize('keep_obs', ['S', None])
+@pytest.mark.parametrize('filename', ['rinex2', 'rinex3'])
+def test_stream_matches_processrinexfile(filename, keep_obs, request):
+    filename = request.getfixturevalue(filename)
+    data = rinpy.processrinexfile(filename, keep_obs=keep_obs)
+    dense = rinpy.separateobservables(data[0], data[3])
+    stream = rinpy.streamrinexfile(filename, keep_obs=keep_obs, chunklines=7)
+    assert stream[1:6] == data[1:6]
+    np.testing.assert_array_equal(stream[6], data[6])
+    for con in dense:
+        for obs in dense[con]:
+            for i in range(dense[con][obs].shape[1]):
+                np.testing.assert_array_equal(stream[0][con][obs][:, i], dense[con][obs][:, i])
+    collapsed = rinpy.collapse_rinex3_obs(dense, data[3])
+    streamcollapsed = rinpy.collapse_rinex3_obs(stream[0], stream[3])
+    assert streamcollapsed[1] == collapsed[1]
+    for con in collapsed[0]:
+        for obs in collapsed[0][con]:
+            for i in range(collapsed[0][con][obs].shape[1]):
+                np.testing.assert_array_equal(streamcollapsed[0][con][obs][:, i], collapsed[0][con][obs][:, i])
+
+
+def test_stream_from_gzip_and_file_object(rinex3, tmp_path):
+    gz = str(tmp_path / 'test0210.25o.gz')
+    with open(rinex3, 'rb') as fin, gzip.open(gz, 'wb') as fout:
+        fout.write(fin.read())
+    stream = rinpy.streamrinexfile(gz)
+    with open(rinex3) as f:
+        fromhandle = rinpy.streamrinexfile(f)
+    assert stream[3] == fromhandle[3] == {'G': ['S1C', 'S2W'], 'E': ['S1C']}
+    np.testing.assert_array_equal(stream[0]['G']['S1C'][:, 0], [45.25, 45.5])
+    np.testing.assert_array_equal(fromhandle[0]['G']['S2W'][:, 1], [np.nan, 41.25])
+
+
+@pytest.mark.parametrize('filename, dec_rate', [('rinex2', 3), ('rinex3', 2), ('rinex2', 7)])
+def test_decimation_while_reading(filename, dec_rate, request):
+    filename = request.getfixturevalue(filename)
+    full = rinpy.processrinexfile(filename, keep_obs='S')
+    # what rinex2snr kept after reading every epoch
+    keep = np.flatnonzero(full[6][:, 1] % dec_rate == 0) if 86400 % dec_rate == 0 else np.arange(len(full[6]))
+    for data in [rinpy.processrinexfile(filename, keep_obs='S', dec_rate=dec_rate),
+                 rinpy.streamrinexfile(filename, dec_rate=dec_rate, chunklines=7)]:
+        np.testing.assert_array_equal(data[6], full[6][keep])
+        assert data[5] == [full[5][k] for k in keep]
+        assert data[3] == full[3]
+        for con in data[1]:
+            for prn in data[1][con]:
+                for k, obs in enumerate(data[3][con]):
+                    expected = full[0][con][keep, full[2][con][prn], k]
+                    if isinstance(data[0][con], dict):
+                        got = data[0][con][obs][:, data[2][con][prn]]
+                    else:
+                        got = data[0][con][:, data[2][con][prn], k]
+                    np.testing.assert_array_equal(got, expected)
+
+
+# epoch line of a RINEX 3 or 2.11 file, epoch flag 0 or 1
+EPOCHLINE = re.compile(r'(> \d{4}| [ \d]\d)( [ \d]\d){5}\.\d{7}  [01]')
+
+
+def split_rinex(text, nchunks, overlap=False):
+    """The header and consecutive groups of epochs of a RINEX file, as the 15 minute
+    files of a day. With overlap, each file also has the last epoch of the file before."""
+    lines = text.splitlines(True)
+    end = next(i for i, line in enumerate(lines) if 'END OF HEADER' in line) + 1
+    epochs = [i for i in range(end, len(lines)) if EPOCHLINE.match(lines[i])]
+    cuts = [epochs[k*len(epochs)//nchunks] for k in range(1, nchunks)]
+    chunks = []
+    for k, (first, last) in enumerate(zip([end] + cuts, cuts + [len(lines)])):
+        if overlap and k > 0:
+            first = epochs[epochs.index(first) - 1]
+        chunks.append(''.join(lines[:end] + lines[first:last]))
+    return chunks
+
+
+def assert_same_stream(got, expected):
+    assert got[1:6] == expected[1:6]
+    np.testing.assert_array_equal(got[6], expected[6])
+    for con in expected[0]:
+        assert list(got[0][con]) == list(expected[0][con])
+        for obs in expected[0][con]:
+            for i in range(len(expected[1][con])):
+                np.testing.assert_array_equal(got[0][con][obs][:, i], expected[0][con][obs][:, i])
+
+
+@pytest.mark.parametrize('keep_obs, dec_rate', [('S', 0), ('S', 60), (None, 0)])
+@pytest.mark.parametrize('source', ['rinex2', 'rinex3', 'test0210.25o.gz', 'TEST00XXX_R_20250210000_01D_30S_MO.rnx.gz'])
+def test_merge_chunks_matches_whole_file(source, keep_obs, dec_rate, tmp_path, request):
+    if source.endswith('.gz'):
+        with gzip.open(os.path.join(HATANAKA, source), 'rt') as f:
+            text = f.read()
+    else:
+        with open(request.getfixturevalue(source)) as f:
+            text = f.read()
+    whole = tmp_path / 'whole.rnx'
+    whole.write_text(text)
+    expected = rinpy.streamrinexfile(str(whole), keep_obs=keep_obs, dec_rate=dec_rate)
+    assert len(expected[5]) > 0
+    for overlap in [False, True]:
+        files = []
+        for k, chunk in enumerate(split_rinex(text, 4, overlap)):
+            files.append(str(tmp_path / 'chunk{0:d}.rnx'.format(k)))
+            if k % 2:
+                files[-1] += '.gz'
+                with gzip.open(files[-1], 'wt') as f:
+                    f.write(chunk)
+            else:
+                with open(files[-1], 'w') as f:
+                    f.write(chunk)
+        merged = rinpy.streamrinexfiles(files, keep_obs=keep_obs, dec_rate=dec_rate, chunklines=7)
+        assert_same_stream(merged, expected)
+
+
+def test_merge_files_with_other_observables(rinex3, tmp_path):
+    later = tmp_path / 'test0210.25o.later'
+    later.write_text(''.join(['{0:<60s}RINEX VERSION / TYPE\n'.format('     3.04           OBSERVATION DATA    M'),
+                              '{0:<60s}SYS / # / OBS TYPES\n'.format('G    3 S2W C1C S1C'),
+                              '{0:<60s}SYS / # / OBS TYPES\n'.format('C    1 S2I'),
+                              '{0:<60s}END OF HEADER\n'.format(''),
+                              '> 2025 01 21 00 00  1.0000000  0  1\n',          # already read
+                              obs_line('G05', [1.0, 2.0, 3.0]) + '\n',
+                              '> 2025 01 21 00 00  2.0000000  0  2\n',
+                              obs_line('G05', [40.5, 2.1e7, 46.0]) + '\n',
+                              obs_line('C19', [33.0]) + '\n']))
+    merge = rinpy.RinexMerge()
+    merge.add(rinex3)
+    merge.add(str(later))
+    assert merge.nfiles == 2
+    obsdata, satlists, prntoidx, obstypes, header, obstimes, gpstime = merge.finish()
+    assert obstypes == {'G': ['S1C', 'S2W'], 'E': ['S1C'], 'C': ['S2I']}
+    assert satlists == {'G': [5, 12], 'E': [11], 'C': [19]}
+    assert [t.second for t in obstimes] == [0, 1, 2]
+    np.testing.assert_array_equal(obsdata['G']['S1C'][:, prntoidx['G'][5]], [45.25, 45.5, 46.0])
+    np.testing.assert_array_equal(obsdata['G']['S2W'][:, prntoidx['G'][5]], [40.0, np.nan, 40.5])
+    np.testing.assert_array_equal(obsdata['E']['S1C'][:, 0], [44.5, np.nan, np.nan])
+    np.testing.assert_array_equal(obsdata['C']['S2I'][:, 0], [np.nan, np.nan, 33.0])
+
+
+def test_cddis_highrate_reads_files_as_they_arrive(tmp_path, monkeypatch):
+    with gzip.open(os.path.join(HATANAKA, 'TEST00XXX_R_20250210000_01D_30S_MO.rnx.gz'), 'rt') as f:
+        text = f.read()
+    chunks = split_rinex(text, 4)
+    downloaded = []
+
+    def download(file_name, directory):
+        # the first four 15 minute files of the day are in the archive
+        hhmm = file_name[19:23]
+        if hhmm in ['0000', '0015', '0030', '0045']:
+            assert directory == '/gnss/data/highrate/2025/021/25d/00/'
+            with gzip.open(file_name, 'wt') as f:
+                f.write(chunks[['0000', '0015', '0030', '0045'].index(hhmm)])
+            downloaded.append(file_name)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('EXE', str(tmp_path))
+    monkeypatch.setattr(highrate.g, 'cddis_download_2022B', download)
+    merge = rinpy.RinexMerge(dec_rate=60)
+    name, fexist = highrate.cddis_highrate('TEST00XXX', 2025, 21, 0, 'R', 60, merge=merge)
+    assert (name, fexist) == ('', True)
+    assert len(downloaded) == merge.nfiles == 4
+    assert os.listdir(tmp_path) == []     # nothing left on disk
+    (tmp_path / 'whole.rnx').write_text(text)
+    assert_same_stream(merge.finish(), rinpy.streamrinexfile(str(tmp_path / 'whole.rnx'), dec_rate=60))
@@ -0,0 +1,72 @@
+"""
+Tests for the fixed-width SNR writer (snr_format): it has to give the same
+bytes as the printf formats it replaces.
+"""
+import gzip
+
+import numpy as np
+import pytest
+
+from gnssrefl import snr_format
+
+SMOOSH_FORMAT = "%3.0f %9.4f %9.4f %9.1f %11.6f %6.2f %6.2f %6.2f %6.2f %6.2f %6.2f\n"
+
+
+def printf(data, fmt):
+    return ''.join(fmt % tuple(row) for row in data.tolist()).encode('ascii')
+
+
+def awkward_values(fmt, n=3000, seed=0):
+    """values of every size for each field, many of them (nearly) half way between two roundings"""
+    rng = np.random.default_rng(seed)
+    columns = []
+    for width, decimals in snr_format.parse_format(fmt)[1]:
+        x = rng.uniform(-1, 1, n) * 10.0**rng.integers(-decimals - 1, width - decimals, n)
+        kind = rng.integers(0, 4, n)
+        x = np.where(kind == 0, np.round(x, decimals + 1), x)
+        x = np.where(kind == 1, np.round(x*8)/8, x)        # exactly half way in binary
+        x = np.where(kind == 2, np.round(x, decimals), x)
+        columns.append(x)
+    data = np.stack(columns, axis=1)
+    data[1, 0] = np.nan; data[2, 1] = np.inf; data[3, 2] = -np.inf
+    data[4, -1] = 1e12; data[5, -1] = -0.0; data[6, 0] = -1e-9
+    data[7, 0] = 9.5; data[8, 0] = -9.5; data[9, 0] = 999.5
+    return data
+
+
+@pytest.mark.parametrize("fmt", [snr_format.SNR_FORMAT, snr_format.NAV_SNR_FORMAT, SMOOSH_FORMAT,
+                                 "%1.0f|%2.1f|%4.0f %%\n"])
+def test_format_rows_matches_printf(fmt):
+    data = awkward_values(fmt)
+    assert snr_format.format_rows(data, fmt) == printf(data, fmt)
+
+
+def test_snr_file_rows():
+    rng = np.random.default_rng(1)
+    n = 5000
+    data = np.column_stack([rng.integers(1, 400, n), rng.uniform(0, 90, n), rng.uniform(0, 360, n),
+                            rng.integers(0, 86400, n), rng.normal(0, 0.01, n), np.zeros(n),
+                            np.round(rng.uniform(20, 55, n)*4)/4, np.round(rng.uniform(20, 55, n), 3),
+                            np.zeros(n), np.zeros(n), np.zeros(n)])
+    text = snr_format.format_rows(data, snr_format.SNR_FORMAT)
+    assert text == printf(data, snr_format.SNR_FORMAT)
+    assert len(text) == n*86
+
+
+def test_write_rows(tmp_path):
+    data = awkward_values(snr_format.SNR_FORMAT, n=1000)
+    expected = printf(data, snr_format.SNR_FORMAT)
+    snr_format.write_rows(str(tmp_path / 'a.snr66'), data, snr_format.SNR_FORMAT, chunkrows=300)
+    snr_format.write_rows(str(tmp_path / 'a.snr66.gz'), data, snr_format.SNR_FORMAT, chunkrows=300)
+    snr_format.write_rows(str(tmp_path / 'empty.snr66'), data[:0], snr_format.SNR_FORMAT)
+    assert (tmp_path / 'a.snr66').read_bytes() == expected
+    with gzip.open(tmp_path / 'a.snr66.gz', 'rb') as f:
+        assert f.read() == expected
+    assert (tmp_path / 'empty.snr66').read_bytes() == b''
+
+
+def test_unsupported():
+    with pytest.raises(ValueError):
+        snr_format.parse_format('%3d %10.4f\n')
+    with pytest.raises(ValueError):
+        snr_format.format_rows(np.zeros((2, 3)), snr_format.SNR_FORMAT)
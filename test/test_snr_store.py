@@ -0,0 +1,172 @@
+"""
+Tests for the binary SNR sidecar files (snr_store).
+
+The sidecar must give exactly what np.loadtxt gives for the text SNR file, and
+readers must only use it while it is current.
+"""
+
+import os
+import shutil
+import time
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+from gnssrefl import snr_store
+from gnssrefl.read_snr_files import read_snr, load_snr_time_filtered
+from gnssrefl.utils import FileManagement
+
+DATA_DIR = Path(__file__).parent / 'data' / 'refl_code' / '2025' / 'snr' / 'mchl'
+
+
+@pytest.fixture
+def snr_dir(tmp_path):
+    """REFL_CODE with copies of the mchl test SNR files."""
+    d = tmp_path / '2025' / 'snr' / 'mchl'
+    d.mkdir(parents=True)
+    for f in DATA_DIR.glob('*.snr66.gz'):
+        shutil.copy(f, d / f.name)
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield d
+
+
+def _age(path, seconds):
+    """Move the modification time of path into the past."""
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+class TestSidecar:
+
+    def test_binary_name(self):
+        assert snr_store.binary_snr_name('a/mchl0100.25.snr66.gz') == 'a/mchl0100.25.snr66.npz'
+        assert snr_store.binary_snr_name('a/mchl0100.25.snr66') == 'a/mchl0100.25.snr66.npz'
+        assert snr_store.binary_snr_name('a/mchl0100.25.snr66.npz') == 'a/mchl0100.25.snr66.npz'
+
+    def test_roundtrip_matches_loadtxt(self, snr_dir):
+        snrfile = str(snr_dir / 'mchl0100.25.snr66.gz')
+        nrows = snr_store.text2binary(snrfile)
+        expected = np.loadtxt(snrfile, comments='%')
+        data = snr_store.read_snr_binary(snr_store.binary_snr_name(snrfile))
+        assert nrows == expected.shape[0]
+        assert data.dtype == expected.dtype
+        np.testing.assert_array_equal(data, expected)
+
+    def test_satellite_index(self, snr_dir):
+        snrfile = str(snr_dir / 'mchl0100.25.snr66.gz')
+        snr_store.text2binary(snrfile)
+        binfile = snr_store.binary_snr_name(snrfile)
+        expected = np.loadtxt(snrfile, comments='%')
+        sat = int(expected[0, 0])
+        np.testing.assert_array_equal(snr_store.read_snr_binary_sat(binfile, sat),
+                                      expected[expected[:, 0] == sat])
+        assert snr_store.read_snr_binary_sat(binfile, 999).shape == (0, expected.shape[1])
+
+
+class TestTimeWindow:
+
+    def test_hour_index(self):
+        seconds = np.array([0., 10., 3600., 7000., 86399.])
+        offsets = snr_store.hour_index(seconds)
+        assert len(offsets) == 25
+        assert list(offsets[:4]) == [0, 2, 4, 4]
+        assert offsets[24] == 5
+        assert len(snr_store.hour_index(seconds[::-1])) == 0
+
+    @pytest.mark.parametrize('sec_min, sec_max', [(79200, None), (None, 7200), (3599.5, 3600.5), (None, None)])
+    def test_window_matches_full_read(self, snr_dir, sec_min, sec_max):
+        snrfile = str(snr_dir / 'mchl0100.25.snr66.gz')
+        snr_store.text2binary(snrfile)
+        binfile = snr_store.binary_snr_name(snrfile)
+        full = snr_store.read_snr_binary(binfile)
+        keep = np.ones(full.shape[0], dtype=bool)
+        if sec_min is not None:
+            keep &= full[:, 3] > sec_min
+        if sec_max is not None:
+            keep &= full[:, 3] < sec_max
+        data, nbytes = snr_store.read_snr_binary_window(binfile, sec_min, sec_max)
+        np.testing.assert_array_equal(data, full[keep])
+        if sec_min is not None or sec_max is not None:
+            assert nbytes < full.nbytes / 4
+
+    def test_time_filtered_stats(self, snr_dir):
+        snrfile = str(snr_dir / 'mchl0100.25.snr66.gz')
+        text_stats = {}
+        expected = load_snr_time_filtered(snrfile, sec_min=79200, stats=text_stats)
+        assert text_stats['bytes'] == os.path.getsize(snrfile)
+        snr_store.text2binary(snrfile)
+        stats = {}
+        data = load_snr_time_filtered(snrfile, sec_min=79200, stats=stats)
+        np.testing.assert_array_equal(data, expected)
+        # only hours 22 and 23 are touched
+        assert data.nbytes <= stats['bytes'] < snr_store.read_snr_binary(snr_store.binary_snr_name(snrfile)).nbytes / 4
+
+    def test_unindexed_file_falls_back(self, snr_dir, tmp_path):
+        binfile = str(tmp_path / 'old.snr66.npz')
+        d = np.array([[1, 10, 100, 50, 0, 0, 40, 0, 0, 0, 0],
+                      [1, 10, 100, 20, 0, 0, 41, 0, 0, 0, 0]], dtype=float)
+        snr_store.write_snr_binary(binfile, d)
+        data, nbytes = snr_store.read_snr_binary_window(binfile, sec_min=30)
+        np.testing.assert_array_equal(data, d[:1])
+        assert nbytes == d.nbytes
+
+
+class TestReaders:
+
+    def test_read_snr_uses_current_sidecar(self, snr_dir):
+        snrfile = str(snr_dir / 'mchl0100.25.snr66.gz')
+        allGood, expected, _, _ = read_snr(snrfile)
+        snr_store.text2binary(snrfile)
+        with patch('gnssrefl.read_snr_files.np.loadtxt') as loadtxt:
+            allGood, f, _, _ = read_snr(snrfile)
+            loadtxt.assert_not_called()
+        assert allGood == 1
+        np.testing.assert_array_equal(f, expected)
+
+    def test_stale_sidecar_is_ignored(self, snr_dir):
+        snrfile = str(snr_dir / 'mchl0100.25.snr66.gz')
+        binfile = snr_store.binary_snr_name(snrfile)
+        snr_store.write_snr_binary(binfile, np.zeros((3, 11)))
+        _age(binfile, 100)
+        assert snr_store.preferred_snr_file(snrfile) == snrfile
+        allGood, f, _, _ = read_snr(snrfile)
+        assert f.shape[0] > 3
+
+    def test_orphan_sidecar_is_ignored(self, snr_dir):
+        snrfile = snr_dir / 'mchl0100.25.snr66.gz'
+        snr_store.text2binary(str(snrfile))
+        snrfile.unlink()
+        obsfile, found = FileManagement('mchl', 'snr_file', 2025, 10, snr_type=66).find_snr_file(binary=True)
+        assert not found
+
+    def test_buffered_read_matches_text(self, snr_dir):
+        expected = read_snr(str(snr_dir / 'mchl0110.25.snr66.gz'), buffer_hours=2)[1]
+        for f in snr_dir.glob('*.snr66.gz'):
+            snr_store.text2binary(str(f))
+        f = read_snr(str(snr_dir / 'mchl0110.25.snr66.gz'), buffer_hours=2)[1]
+        np.testing.assert_array_equal(f, expected)
+
+    def test_find_snr_file_binary(self, snr_dir):
+        fm = FileManagement('mchl', 'snr_file', 2025, 10, snr_type=66)
+        obsfile, found = fm.find_snr_file(binary=True)
+        assert found and str(obsfile).endswith('.gz')
+        snr_store.text2binary(str(obsfile))
+        obsfile, found = fm.find_snr_file(binary=True)
+        assert found and str(obsfile).endswith('.snr66.npz')
+        # callers that do not ask for it never see the sidecar
+        obsfile, found = fm.find_snr_file()
+        assert str(obsfile).endswith('.gz')
+
+    def test_sidecar_survives_find_snr_file_conversions(self, snr_dir):
+        """gnssir decompresses or compresses the text file; its sidecar must stay current"""
+        fm = FileManagement('mchl', 'snr_file', 2025, 10, snr_type=66)
+        obsfile, found = fm.find_snr_file(gzip=False)
+        assert found and not str(obsfile).endswith('.gz')
+        _age(obsfile, 100)
+        snr_store.text2binary(str(obsfile))
+        binfile = snr_store.binary_snr_name(str(obsfile))
+        for gzip in [True, False, True]:
+            obsfile, found = fm.find_snr_file(gzip=gzip)
+            assert found and str(obsfile).endswith('.gz') == gzip
+            assert snr_store.preferred_snr_file(obsfile) == binfile
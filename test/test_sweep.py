@@ -0,0 +1,134 @@
+"""
+Tests for gnssir -sweep (gnssir_v2.gnssir_sweep_v2, extract_arcs.DaySweep):
+the result files of each extension must be those of separate gnssir runs,
+with the SNR file of each day read once.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from gnssrefl import gnssir_cl
+from gnssrefl import gnssir_v2
+import gnssrefl.extract_arcs as ea
+
+FIXTURE_DIR = Path(__file__).parent / 'data' / 'refl_code'
+
+# extensions of the sweep: elevation angles, azimuth regions, several
+# elevation angle pairs, and a json that needs its own arcs
+SETTINGS = {
+    'e6': {'e1': 6.0, 'e2': 20.0},
+    'north': {'azval2': [-90, 90]},
+    'ellist': {'ellist': [5, 10, 8, 15, 6, 20]},
+    'poly3': {'polyV': 3, 'azval2': [90, 270]},
+}
+
+
+@pytest.fixture
+def refl_code(tmp_path):
+    """REFL_CODE tree with the mchl test files, as in run_processing.sh, and a json per extension"""
+    (tmp_path / '2025' / 'snr' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'input' / 'mchl').mkdir(parents=True)
+    (tmp_path / 'Files').mkdir()
+    (tmp_path / 'logs').mkdir()
+    for f in (FIXTURE_DIR / '2025' / 'snr' / 'mchl').glob('*.snr66.gz'):
+        shutil.copy(f, tmp_path / '2025' / 'snr' / 'mchl' / f.name)
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl' / 'mchl.json', tmp_path / 'input' / 'mchl')
+    shutil.copy(FIXTURE_DIR / 'input' / 'mchl_refr.txt', tmp_path / 'input')
+    (tmp_path / 'input' / 'gpt_1wA.pickle').touch()
+    with open(FIXTURE_DIR / 'input' / 'mchl' / 'mchl.json') as f:
+        config = json.load(f)
+    for ext, settings in SETTINGS.items():
+        (tmp_path / 'input' / 'mchl' / ext).mkdir()
+        with open(tmp_path / 'input' / 'mchl' / ext / 'mchl.json', 'w') as f:
+            json.dump({**config, **settings}, f)
+    with patch.dict(os.environ, {'REFL_CODE': str(tmp_path)}):
+        yield tmp_path
+
+
+def results():
+    """result and failQC files of all the extensions"""
+    direc = Path(os.environ['REFL_CODE']) / '2025' / 'results' / 'mchl'
+    return {str(f.relative_to(direc)): f.read_text() for f in direc.glob('**/0*.txt')}
+
+
+def run(**kwargs):
+    """runs gnssir for days 10 and 11; returns the SNR files that were read"""
+    with patch('gnssrefl.extract_arcs.read_snr', wraps=ea.read_snr) as read_snr:
+        gnssir_cl.gnssir('mchl', 2025, 10, doy_end=11, gzip=False, **kwargs)
+    return [Path(c.args[0]).name for c in read_snr.call_args_list]
+
+
+def test_sweep_same_as_separate_runs(refl_code):
+    for ext in [''] + list(SETTINGS):
+        run(extension=ext, mmdd=True)
+    separate = results()
+    shutil.rmtree(refl_code / '2025' / 'results')
+
+    read = run(mmdd=True, sweep=list(SETTINGS), incremental=True)
+    assert read == ['mchl0100.25.snr66', 'mchl0110.25.snr66']
+    assert results() == separate
+    assert len(separate) == 4 * (1 + len(SETTINGS))
+    # the extensions give other results
+    assert len({separate[f'{ext}/010.txt'] for ext in SETTINGS} | {separate['010.txt']}) == 1 + len(SETTINGS)
+
+    # the manifest of each extension knows its results are current
+    assert run(mmdd=True, sweep=list(SETTINGS), incremental=True) == []
+
+
+def test_sweep_overrides(refl_code):
+    """the command line settings apply to all the extensions"""
+    run(extension='north', e2=18.0, fr=[1])
+    north = results()
+    shutil.rmtree(refl_code / '2025' / 'results')
+    run(e2=18.0, fr=[1], sweep=['north'])
+    files = results()
+    assert files['north/010.txt'] == north['north/010.txt']
+    rows = np.loadtxt(refl_code / '2025' / 'results' / 'mchl' / '010.txt', comments='%')
+    assert set(rows[:, 10]) == {1} and rows[:, 8].max() <= 18.0
+
+
+def test_sweep_json_defaults(refl_code):
+    """the defaults gnssir gives a json without refr_model are not applied to the other extensions"""
+    with open(refl_code / 'input' / 'mchl' / 'mchl.json') as f:
+        config = json.load(f)
+    del config['refr_model']
+    with open(refl_code / 'input' / 'mchl' / 'mchl.json', 'w') as f:
+        json.dump(config, f)
+    (refl_code / 'input' / 'mchl' / 'refr0').mkdir()
+    with open(refl_code / 'input' / 'mchl' / 'refr0' / 'mchl.json', 'w') as f:
+        json.dump({**config, 'refr_model': 0, 'lsp_method': 'scipy'}, f)
+    run(extension='refr0')
+    separate = results()
+    shutil.rmtree(refl_code / '2025' / 'results')
+    run(sweep=['refr0'])
+    files = results()
+    assert files['refr0/010.txt'] == separate['refr0/010.txt']
+    assert files['refr0/010.txt'] != files['010.txt']
+
+
+def test_select_arcs(refl_code):
+    """the arcs of a configuration are those extract_arcs returns for it, in the same order"""
+    config = gnssir_v2.read_json_file('mchl')
+    config['dbhz'] = False
+    config['onesat'] = None
+    config['dec'] = 1
+    snr = ea.load_station_snr('mchl', 2025, 10, buffer_hours=2, station_config=config, gzip=False)
+    settings = [gnssir_v2.arc_settings({**config, **s}) for s in SETTINGS.values()]
+    sweep = ea.DaySweep(settings)
+    sweep.snr['day'] = snr
+    expected = [ea.extract_arcs(snr, year=2025, doy=10, **kwargs) for kwargs in settings]
+    with patch('gnssrefl.extract_arcs.extract_arcs', wraps=ea.extract_arcs) as extract:
+        for kwargs, arcs in zip(settings, expected):
+            shared = sweep.extract_arcs('day', year=2025, doy=10, **kwargs)
+            assert [m for m, d in shared] == [m for m, d in arcs] and len(arcs) > 20
+            for (_, d1), (_, d2) in zip(shared, arcs):
+                for k in d1:
+                    np.testing.assert_array_equal(d1[k], d2[k])
+    # poly3 has its own arcs, the other three share one extract_arcs call
+    assert extract.call_count == 2